@@ -0,0 +1,5 @@
+"""
+Hanzo Painter - headless tooling around the Studio inpainting workflow.
+"""
+
+__version__ = "0.1.0"
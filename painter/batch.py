@@ -0,0 +1,457 @@
+"""
+Headless batch runner: drain a JSONL job manifest through Studio.
+
+The workflow is compiled to an API prompt once; each job only patches that
+template. At most ``max_inflight`` prompts are queued on the server at any
+time, which keeps the executor busy without flooding its queue, and
+completion is tracked over the progress websocket instead of polling
+``/history``.
+
+Jobs with a ``chunk`` entry are split into overlapping frame windows that
+run as separate prompts and are cross-faded back into one video, so long
+clips never have to fit in memory at once (see ``painter.chunking``).
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlencode
+
+import aiohttp
+
+from painter.chunking import Window, plan_windows, stitch_to_file
+from painter.client import StudioClient, StudioError
+from painter.ffmpeg import FFmpegError, probe
+from painter.workflow import LOADER, VIDEO_COMBINE, apply_job
+
+logger = logging.getLogger(__name__)
+
+# Lossless intermediate format for chunk windows so stitching does not
+# compound compression artefacts.
+WINDOW_OUTPUT_FORMAT = {"format": "video/ffv1-mkv", "save_output": True}
+# Prompt ids whose early events are kept until their POST /prompt response arrives
+RECENT = 256
+
+
+def load_manifest(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield jobs from a JSONL manifest, skipping blank lines and ``#`` comments."""
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{lineno}: invalid JSON ({e})") from e
+            if not isinstance(job, dict):
+                raise ValueError(f"{path}:{lineno}: each job must be a JSON object")
+            job.setdefault("id", f"{Path(path).stem}-{lineno}")
+            yield job
+
+
+@dataclass
+class JobResult:
+    """Outcome of a single job."""
+
+    job_id: str
+    prompt_id: Optional[str]
+    status: str
+    queued_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    outputs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def wait_time(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.queued_at
+
+    @property
+    def run_time(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def model_load_time(self) -> Optional[float]:
+        """Seconds spent loading models, as reported by PainterResidentLoader (0 when resident)."""
+        reports = self.outputs.get(LOADER, {}).get("painter_model")
+        if reports:
+            return sum(float(report.get("load_seconds", 0.0)) for report in reports)
+        windows = [w.get("model_load_time") for w in self.outputs.get("windows", [])]
+        if windows and any(t is not None for t in windows):
+            return sum(t for t in windows if t is not None)
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["wait_time"] = self.wait_time
+        data["run_time"] = self.run_time
+        data["model_load_time"] = self.model_load_time
+        return data
+
+
+@dataclass
+class BatchReport:
+    """Aggregate throughput numbers for a batch run."""
+
+    results: List[JobResult]
+    wall_time: float
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.status == "success")
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def jobs_per_minute(self) -> float:
+        return 60.0 * len(self.results) / self.wall_time if self.wall_time > 0 else 0.0
+
+    def summary(self) -> str:
+        run_times = [r.run_time for r in self.results if r.run_time is not None]
+        mean_run = sum(run_times) / len(run_times) if run_times else 0.0
+        summary = (
+            f"{len(self.results)} jobs ({self.succeeded} ok, {self.failed} failed) "
+            f"in {self.wall_time:.1f}s - {self.jobs_per_minute:.1f} jobs/min, "
+            f"mean run {mean_run:.2f}s"
+        )
+        load_times = [r.model_load_time for r in self.results if r.model_load_time is not None]
+        if load_times:
+            summary += f", model load {sum(load_times):.1f}s"
+        return summary
+
+
+class _PromptState:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.started_at: Optional[float] = None
+        self.done: "asyncio.Future[Optional[str]]" = loop.create_future()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        if not self.done.done():
+            self.done.set_result(error)
+
+
+class BatchRunner:
+    """Submit jobs with a bounded number of prompts in flight."""
+
+    def __init__(
+        self,
+        client: StudioClient,
+        template: Dict[str, Any],
+        max_inflight: int = 2,
+        on_result: Optional[Callable[[JobResult], None]] = None,
+        reconnect_attempts: int = 5,
+        input_dir: Optional[Path] = None,
+        output_dir: Optional[Path] = None,
+        stitch: Optional[Callable[[Dict[str, Any], List[Window], List[JobResult]], Dict[str, Any]]] = None,
+        profile: bool = False,
+        plan: bool = False,
+        deterministic: bool = False,
+    ):
+        if max_inflight < 1:
+            raise ValueError("max_inflight must be at least 1")
+        self.client = client
+        self.template = template
+        self.max_inflight = max_inflight
+        self.on_result = on_result
+        self.reconnect_attempts = reconnect_attempts
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.stitch = stitch or self._stitch
+        self.profile = profile
+        self.plan = plan
+        self.deterministic = deterministic
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._prompts: Dict[str, _PromptState] = {}
+        # Events of prompt ids not (yet) queued by this runner, oldest first
+        self._early: Dict[str, List[Dict[str, Any]]] = {}
+        self._connected = asyncio.Event()
+        self._listener_error: Optional[str] = None
+
+    def _track(self, prompt_id: str) -> _PromptState:
+        """Start following a prompt this runner queued, replaying what arrived before its id did."""
+        state = self._prompts[prompt_id] = _PromptState(asyncio.get_running_loop())
+        for event in self._early.pop(prompt_id, []):
+            self._dispatch(event)
+        return state
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        kind = event.get("type")
+        data = event.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+        state = self._prompts.get(prompt_id)
+        if state is None:
+            # Progress can arrive before the POST /prompt response; other prompts are dropped with age
+            self._early.setdefault(prompt_id, []).append(event)
+            while len(self._early) > RECENT:
+                del self._early[next(iter(self._early))]
+            return
+
+        if kind == "execution_start":
+            state.started_at = time.time()
+        elif kind == "execution_success" or (kind == "executing" and data.get("node") is None):
+            state.finish()
+        elif kind == "execution_error":
+            node = data.get("node_id")
+            message = data.get("exception_message") or "execution error"
+            state.finish(f"node {node}: {message}" if node else message)
+        elif kind == "execution_interrupted":
+            state.finish("interrupted")
+
+    async def _recover(self) -> None:
+        """Resolve prompts that finished while the websocket was down."""
+        for prompt_id, state in list(self._prompts.items()):
+            if state.done.done():
+                continue
+            entry = await self.client.history(prompt_id)
+            if entry is None:
+                continue
+            status = entry.get("status", {})
+            state.finish(None if status.get("status_str", "success") == "success" else "execution error")
+
+    async def _listen(self) -> None:
+        attempts = 0
+        while True:
+            try:
+                async for event in self.client.events():
+                    self._connected.set()
+                    attempts = 0
+                    self._dispatch(event)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Progress websocket failed: %s", e)
+
+            attempts += 1
+            if attempts > self.reconnect_attempts:
+                self._listener_error = "lost connection to progress websocket"
+                for state in self._prompts.values():
+                    state.finish(self._listener_error)
+                self._connected.set()
+                return
+            await asyncio.sleep(min(0.25 * 2 ** attempts, 5.0))
+            try:
+                await self._recover()
+            except (aiohttp.ClientError, StudioError) as e:
+                logger.warning("Could not check history after reconnect: %s", e)
+
+    async def _submit(self, job: Dict[str, Any]) -> JobResult:
+        """Queue one prompt for ``job`` and wait for it, holding an in-flight slot."""
+        async with self._slots:
+            result = JobResult(job_id=str(job.get("id")), prompt_id=None, status="error", queued_at=time.time())
+            try:
+                prompt = apply_job(self.template, job)
+                extra_data = {"painter_job": result.job_id}
+                if self.profile or job.get("profile"):
+                    extra_data["painter_profile"] = True
+                if self.plan or job.get("plan"):
+                    extra_data["painter_plan"] = True
+                if self.deterministic or job.get("deterministic"):
+                    extra_data["painter_deterministic"] = True
+                result.prompt_id = await self.client.queue_prompt(prompt, extra_data=extra_data)
+                state = self._track(result.prompt_id)
+                error = await state.done
+                result.started_at = state.started_at
+                result.finished_at = time.time()
+                if error:
+                    result.error = error
+                else:
+                    entry = await self.client.history(result.prompt_id) or {}
+                    result.outputs = entry.get("outputs", {})
+                    result.status = "success"
+            except (ValueError, StudioError, aiohttp.ClientError) as e:
+                result.error = str(e)
+                result.finished_at = time.time()
+            finally:
+                if result.prompt_id:
+                    self._prompts.pop(result.prompt_id, None)
+            return result
+
+    def _view_url(self, output: Dict[str, Any]) -> str:
+        query = urlencode({
+            "filename": output["filename"], "subfolder": output.get("subfolder", ""),
+            "type": output.get("type", "output"),
+        })
+        return f"{self.client.server}/view?{query}"
+
+    def _stitch(self, job: Dict[str, Any], windows: List[Window], parts: List[JobResult]) -> Dict[str, Any]:
+        """Cross-fade window outputs into one video next to the other outputs."""
+        sources = [self._view_url(part.outputs[VIDEO_COMBINE]["gifs"][0]) for part in parts]
+        return stitch_windows(job, windows, sources, self.template, self.input_dir, self.output_dir)
+
+    async def _run_chunked(self, job: Dict[str, Any]) -> JobResult:
+        job_id = str(job.get("id"))
+        result = JobResult(job_id=job_id, prompt_id=None, status="error", queued_at=time.time())
+        try:
+            chunk = job["chunk"]
+            total = job_frames(job, self.input_dir)
+            windows = plan_windows(total, int(chunk["window"]), int(chunk.get("overlap", 0)))
+        except (KeyError, ValueError, FFmpegError) as e:
+            result.error = f"cannot plan windows: {e}"
+            result.finished_at = time.time()
+            return result
+
+        parts = list(await asyncio.gather(*(self._submit(subjob) for subjob in window_jobs(job, windows))))
+        started = [p.started_at for p in parts if p.started_at is not None]
+        result.started_at = min(started) if started else None
+        result.outputs = {"windows": [p.to_dict() for p in parts]}
+
+        failed = [p for p in parts if p.status != "success"]
+        if failed:
+            result.error = f"{len(failed)}/{len(parts)} windows failed: {failed[0].error}"
+        else:
+            try:
+                loop = asyncio.get_running_loop()
+                output = await loop.run_in_executor(None, self.stitch, job, windows, parts)
+                result.outputs[VIDEO_COMBINE] = {"gifs": [output]}
+                result.status = "success"
+            except (KeyError, IndexError, ValueError, FFmpegError, OSError) as e:
+                result.error = f"stitching failed: {e}"
+        result.finished_at = time.time()
+        return result
+
+    async def _run_job(self, job: Dict[str, Any]) -> JobResult:
+        if job.get("chunk"):
+            result = await self._run_chunked(job)
+        else:
+            result = await self._submit(job)
+
+        if result.status == "success":
+            logger.info("%s done in %.1fs (%s)", result.job_id, result.finished_at - result.queued_at,
+                        result.prompt_id or "chunked")
+        else:
+            logger.error("%s failed: %s", result.job_id, result.error)
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    async def run(self, jobs: Iterable[Dict[str, Any]]) -> BatchReport:
+        """Run every job and return the aggregate report."""
+        start = time.time()
+        listener = asyncio.create_task(self._listen())
+        try:
+            await self._connected.wait()
+            if self._listener_error:
+                raise StudioError(f"Cannot connect to {self.client.server}: {self._listener_error}")
+
+            # Admission bounds how many jobs are read from the manifest ahead of
+            # the server; _slots bounds the prompts actually queued.
+            admission = asyncio.Semaphore(self.max_inflight)
+            tasks = []
+            for job in jobs:
+                await admission.acquire()
+                task = asyncio.create_task(self._run_job(job))
+                task.add_done_callback(lambda _: admission.release())
+                tasks.append(task)
+            results = list(await asyncio.gather(*tasks))
+        finally:
+            listener.cancel()
+            try:
+                await listener
+            except asyncio.CancelledError:
+                pass
+        return BatchReport(results=results, wall_time=time.time() - start)
+
+
+def job_frames(job: Dict[str, Any], input_dir: Optional[Path] = None) -> int:
+    """Frames a job loads: ``frames`` or the probed video, after skip and cap."""
+    if "frames" in job:
+        total = int(job["frames"])
+    elif input_dir is not None and "video" in job:
+        total = probe(str(Path(input_dir) / job["video"])).frames
+    else:
+        raise ValueError("chunked jobs need 'frames' or a readable 'video' under --input-dir")
+    total -= int(job.get("skip_first_frames", 0))
+    if job.get("frame_load_cap"):
+        total = min(total, int(job["frame_load_cap"]))
+    return total
+
+
+def window_jobs(job: Dict[str, Any], windows: List[Window]) -> List[Dict[str, Any]]:
+    """One job per window, loading its frame range and writing a lossless intermediate."""
+    job_id = str(job.get("id"))
+    base_skip = int(job.get("skip_first_frames", 0))
+    prefix = job.get("output_prefix", job_id)
+    subjobs = []
+    for index, window in enumerate(windows):
+        subjob = {k: v for k, v in job.items() if k not in ("chunk", "frames")}
+        subjob.update({
+            "id": f"{job_id}#w{index:03d}",
+            "skip_first_frames": base_skip + window.start,
+            "frame_load_cap": window.length,
+            "output_prefix": f"{prefix}-w{index:03d}",
+        })
+        overrides = {k: dict(v) for k, v in job.get("overrides", {}).items()}
+        overrides.setdefault(VIDEO_COMBINE, {}).update(WINDOW_OUTPUT_FORMAT)
+        subjob["overrides"] = overrides
+        subjobs.append(subjob)
+    return subjobs
+
+
+def stitch_windows(
+    job: Dict[str, Any],
+    windows: List[Window],
+    sources: List[str],
+    template: Dict[str, Any],
+    input_dir: Optional[Path],
+    output_dir: Optional[Path],
+) -> Dict[str, Any]:
+    """
+    Cross-fade the window videos at ``sources`` (paths or URLs) into one
+    ``<output_prefix>_NNNNN.mp4`` in ``output_dir`` with the source audio;
+    returns its VHS-style output entry.
+    """
+    if output_dir is None:
+        raise ValueError("chunked jobs need --output-dir to write the stitched video")
+    prefix = job.get("output_prefix") or template[VIDEO_COMBINE]["inputs"].get("filename_prefix", "Painter")
+    output = next_output_path(Path(output_dir), prefix, ".mp4")
+
+    audio_source, audio_offset = None, 0.0
+    source_info = None
+    if input_dir is not None and "video" in job and (Path(input_dir) / job["video"]).exists():
+        audio_source = str(Path(input_dir) / job["video"])
+        source_info = probe(audio_source)
+    fps = source_info.fps if source_info else probe(sources[0]).fps
+    if source_info and source_info.has_audio:
+        audio_offset = int(job.get("skip_first_frames", 0)) / fps
+    else:
+        audio_source = None
+
+    crf = template[VIDEO_COMBINE]["inputs"].get("crf", 19)
+    frames = stitch_to_file(windows, sources, str(output), fps, crf=crf,
+                            audio_source=audio_source, audio_offset=audio_offset)
+    return {"filename": output.name, "subfolder": "", "type": "output", "fullpath": str(output), "frames": frames}
+
+
+def next_output_path(directory: Path, prefix: str, suffix: str) -> Path:
+    """Return ``<prefix>_NNNNN<suffix>`` with the next free counter, like VHS_VideoCombine."""
+    directory.mkdir(parents=True, exist_ok=True)
+    counter = 1
+    for existing in directory.glob(f"{prefix}_*{suffix}"):
+        stem = existing.name[len(prefix) + 1:-len(suffix)]
+        if stem.isdigit():
+            counter = max(counter, int(stem) + 1)
+    return directory / f"{prefix}_{counter:05d}{suffix}"
+
+
+async def run_batch(
+    server: str,
+    template: Dict[str, Any],
+    jobs: Iterable[Dict[str, Any]],
+    max_inflight: int = 2,
+    on_result: Optional[Callable[[JobResult], None]] = None,
+    **options: Any,
+) -> BatchReport:
+    """Convenience wrapper that owns the client session; ``options`` go to BatchRunner."""
+    async with StudioClient(server) as client:
+        runner = BatchRunner(client, template, max_inflight=max_inflight, on_result=on_result, **options)
+        return await runner.run(jobs)
@@ -0,0 +1,318 @@
+"""
+CPU benchmark of the inpainting workflow with regression thresholds.
+
+Generates synthetic clips (moving, locked-off shots, a pan) with a watermark
+burned in where the repository masks are, compiles the workflow, applies
+each scenario's optimization passes, and executes it in-process with the
+CPU stand-ins from ``painter.standin_nodes``. Each run happens in a fresh spawned process, so
+peak RSS is that run's own and no cache or resident model leaks between
+runs. Results are frames/s, per-stage latency and peak RSS per scenario;
+:func:`compare` checks them against a stored baseline.
+"""
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from painter.workflow import apply_job, compile_workflow, load_workflow, optimize
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = PROJECT_ROOT / "benchmarks" / "baseline.json"
+
+SCENARIOS: Dict[str, List[str]] = {
+    "stock": [],
+    "static-mask": ["static-mask", "mask-cache", "lazy-switch"],
+    "crop": ["static-mask", "mask-cache", "lazy-switch", "crop"],
+    "stream": ["static-mask", "mask-cache", "lazy-switch", "stream"],
+    "compact": ["static-mask", "mask-cache", "lazy-switch", "compact"],
+    "still": ["static-mask", "mask-cache", "lazy-switch"],
+    "dedupe": ["static-mask", "mask-cache", "lazy-switch", "dedupe"],
+    "encode": ["static-mask", "mask-cache", "lazy-switch", "encode"],
+    "pan": ["static-mask", "mask-cache", "lazy-switch"],
+    "propagate": ["static-mask", "mask-cache", "lazy-switch", "propagate"],
+}
+
+# Scenarios run on another clip than the moving one: the locked-off shots
+# (four stills) or the camera pan across a textured background
+SCENARIO_CLIPS = {"still": "still", "dedupe": "still", "pan": "pan", "propagate": "pan"}
+
+# Which stage each node type's time counts towards
+STAGES = {
+    "VHS_LoadVideo": "decode",
+    "PainterLoadVideoCached": "decode",
+    "PainterLoadFrames": "decode",
+    "PainterProbeVideo": "decode",
+    "LoadImage": "mask",
+    "ImageResizeKJv2": "mask",
+    "RepeatImageBatch": "mask",
+    "easy ifElse": "mask",
+    "PainterLazySwitch": "mask",
+    "PainterStaticMask": "mask",
+    "PainterCachedMask": "mask",
+    "LayerUtility: ImageScaleByAspectRatio V2": "scale",
+    "PainterScaleFrames": "scale",
+    "PainterMaskCrop": "scale",
+    "DiffuEraserLoader": "load_model",
+    "PainterResidentLoader": "load_model",
+    "DiffuEraserSampler": "inpaint",
+    "PainterSampleFrames": "inpaint",
+    "PainterPropagateFirst": "inpaint",
+    "PainterMaskPaste": "composite",
+    "PainterDedupeFrames": "dedupe",
+    "PainterExpandFrames": "composite",
+    "PainterStreamInpaint": "stream",
+    "VHS_VideoCombine": "encode",
+    "PainterSaveFrames": "encode",
+    "PainterVideoCombine": "encode",
+}
+
+
+@dataclass
+class BenchConfig:
+    """Clip and run settings; a baseline only compares against the same config."""
+
+    frames: int = 64
+    width: int = 320
+    height: int = 176
+    fps: float = 24.0
+    steps: int = 4
+    jobs: int = 1
+
+
+def make_clip(directory: Path, config: BenchConfig) -> Dict[str, str]:
+    """
+    Encode the synthetic watermarked clips, moving (``video``), locked-off
+    (``still``) and panning (``pan``), and copy both masks next to them.
+    """
+    import shutil
+
+    from painter.synthetic import burn_watermark, moving_frames, panning_frames, still_frames, watermark_mask
+    from painter.synthetic import write_video
+
+    directory.mkdir(parents=True, exist_ok=True)
+    mask = watermark_mask(config.width, config.height)
+    paths = {}
+    for key, frames in (("video", moving_frames), ("still", still_frames), ("pan", panning_frames)):
+        clip = burn_watermark(frames(config.frames, config.width, config.height), mask)
+        paths[key] = str(write_video(directory / f"bench-{key}.mp4", clip, fps=config.fps))
+    for orientation in ("horizontal", "vertical"):
+        target = directory / f"{orientation}-mask.png"
+        shutil.copyfile(PROJECT_ROOT / f"{orientation}-mask.png", target)
+        paths[orientation] = str(target)
+    return paths
+
+
+def scenario_prompt(passes: List[str], clip: Dict[str, str], config: BenchConfig) -> Dict[str, Any]:
+    """The workflow with ``passes`` applied, patched to run ``clip``."""
+    template = optimize(compile_workflow(load_workflow(PROJECT_ROOT / "inpainting-workflow.json")), passes)
+    return apply_job(template, {
+        "video": clip["video"],
+        "frame_load_cap": config.frames,
+        "masks": {"horizontal": clip["horizontal"], "vertical": clip["vertical"]},
+        "sampler": {"num_inference_steps": config.steps},
+        "output_prefix": "bench",
+    })
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(
+    passes: List[str],
+    clip: Dict[str, str],
+    config: BenchConfig,
+    workdir: Path,
+    trace: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Execute one scenario ``config.jobs`` times in this process and return
+    its metrics. Caches live under ``workdir``. With ``trace``, every node
+    is profiled and ``<trace>.json`` / ``<trace>.txt`` are written.
+    """
+    os.environ["PAINTER_CACHE_DIR"] = str(workdir / "cache")
+    from painter import standin_nodes
+    from painter.executor import execute
+    from painter.profiler import Profiler
+    from painter.studio import nodes
+
+    prompt = scenario_prompt(passes, clip, config)
+    node_types = dict(standin_nodes.NODE_CLASS_MAPPINGS, **nodes.NODE_CLASS_MAPPINGS)
+    stages: Dict[str, float] = {}
+    wall_time = 0.0
+    rss_before = _peak_rss_mb()
+    profiler = Profiler(name=trace.name) if trace else None
+    with nodes.outside_studio(standin_nodes.NODE_CLASS_MAPPINGS, workdir / "output"):
+        for _ in range(config.jobs):
+            report = execute(prompt, node_types, profiler=profiler)
+            wall_time += report.wall_time
+            for node_id, seconds in report.timings.items():
+                stage = STAGES.get(prompt[node_id]["class_type"], "other")
+                stages[stage] = stages.get(stage, 0.0) + seconds
+    if profiler is not None:
+        profiler.write(trace.parent, trace.name)
+    frames = config.frames * config.jobs
+    return {
+        "frames": frames,
+        "wall_time": wall_time,
+        "fps": frames / wall_time if wall_time else 0.0,
+        "stages": {stage: seconds / config.jobs for stage, seconds in sorted(stages.items())},
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_isolated(
+    passes: List[str], clip: Dict[str, str], config: BenchConfig, workdir: str, trace: Optional[str] = None,
+) -> Dict[str, Any]:
+    import torch
+
+    torch.set_num_threads(int(os.environ.get("PAINTER_BENCH_THREADS", "1")))
+    return run_scenario(passes, clip, config, Path(workdir), Path(trace) if trace else None)
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Best-of-N timings (interference on a shared CPU only ever slows a run
+    down), median stage latencies for the stage gate, and median peak RSS.
+    """
+    stages = sorted({stage for run in runs for stage in run["stages"]})
+    return {
+        "frames": runs[0]["frames"],
+        "runs": len(runs),
+        "wall_time": min(run["wall_time"] for run in runs),
+        "fps": max(run["fps"] for run in runs),
+        "stages": {stage: min(run["stages"].get(stage, 0.0) for run in runs) for stage in stages},
+        "median_stages": {stage: statistics.median(run["stages"].get(stage, 0.0) for run in runs)
+                          for stage in stages},
+        "peak_rss_mb": statistics.median(run["peak_rss_mb"] for run in runs),
+    }
+
+
+def run_benchmark(
+    config: BenchConfig,
+    scenarios: Optional[List[str]] = None,
+    repeat: int = 3,
+    workdir: Optional[Path] = None,
+    trace_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Run each scenario ``repeat`` times, every run in a new process, and
+    return the summarized results together with the config.
+
+    With ``trace_dir``, each scenario gets one more, profiled run whose
+    trace is written to ``<trace_dir>/<scenario>.json``; it is not part of
+    the reported timings.
+    """
+    names = scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenario(s) {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+
+    with tempfile.TemporaryDirectory(prefix="painter-bench-", dir=workdir) as tmp:
+        root = Path(tmp)
+        clips = make_clip(root / "input", config)
+        results = {}
+        for name in names:
+            clip = dict(clips, video=clips[SCENARIO_CLIPS.get(name, "video")])
+            runs = []
+            for index in range(repeat):
+                run_dir = root / f"{name}-{index}"
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    runs.append(pool.submit(_run_isolated, SCENARIOS[name], clip, config, str(run_dir)).result())
+            results[name] = _summarize(runs)
+            if trace_dir is not None:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    pool.submit(_run_isolated, SCENARIOS[name], clip, config, str(root / f"{name}-trace"),
+                                str(Path(trace_dir).resolve() / name)).result()
+                logger.info("%s: trace written to %s", name, Path(trace_dir) / f"{name}.json")
+            logger.info("%s: %.1f fps, peak RSS %.0f MB", name, results[name]["fps"], results[name]["peak_rss_mb"])
+    machine = {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+    return {"config": asdict(config), "machine": machine, "scenarios": results}
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = 0.25,
+    rss_threshold: float = 0.1,
+    min_seconds: float = 0.25,
+) -> List[str]:
+    """
+    Regressions of ``report`` against ``baseline``, as messages.
+
+    A scenario regresses when its frames/s drop by more than ``threshold``,
+    a stage's median over the repeats gets more than ``threshold`` slower
+    (and at least ``min_seconds``, so a single noisy run or a tiny stage
+    does not flap), or peak RSS grows by more than ``rss_threshold``.
+    A scenario the baseline has no numbers for fails too, so a new scenario
+    is gated from the commit that adds it; baseline scenarios this run
+    left out are not checked.
+    """
+    if report["config"] != baseline["config"]:
+        raise ValueError(f"baseline was recorded with {baseline['config']}, this run used {report['config']}")
+    regressions = []
+    for name, current in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            regressions.append(f"{name}: not in the baseline; record one with make bench-baseline")
+            continue
+        if current["fps"] < base["fps"] * (1 - threshold):
+            regressions.append(f"{name}: {current['fps']:.2f} fps vs {base['fps']:.2f} baseline")
+        # Reports recorded before medians were kept only have the best run
+        base_stages = base.get("median_stages", base["stages"])
+        for stage, seconds in current.get("median_stages", current["stages"]).items():
+            before = base_stages.get(stage, 0.0)
+            if seconds > before * (1 + threshold) and seconds - before >= min_seconds:
+                regressions.append(f"{name}: stage {stage} {seconds:.3f}s vs {before:.3f}s baseline")
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_threshold):
+            regressions.append(
+                f"{name}: peak RSS {current['peak_rss_mb']:.0f} MB vs {base['peak_rss_mb']:.0f} MB baseline"
+            )
+    return regressions
+
+
+def format_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """A plain-text table of the report, with the baseline fps alongside when given."""
+    config = report["config"]
+    lines = [f"{config['frames']} frames at {config['width']}x{config['height']}, {config['steps']} steps, "
+             f"{config['jobs']} job(s) per run"]
+    stages = sorted({stage for result in report["scenarios"].values() for stage in result["stages"]})
+    lines.append(f"{'scenario':<12} {'fps':>7} {'base':>7} {'rss MB':>7}  " + " ".join(f"{s:>10}" for s in stages))
+    for name, result in report["scenarios"].items():
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        lines.append(
+            f"{name:<12} {result['fps']:>7.2f} {base['fps'] if base else float('nan'):>7.2f} "
+            f"{result['peak_rss_mb']:>7.0f}  "
+            + " ".join(f"{result['stages'].get(stage, 0.0):>9.3f}s" for stage in stages)
+        )
+    return "\n".join(lines)
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a stored baseline, or None if there is none yet."""
+    if not Path(path).exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(report: Dict[str, Any], path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,336 @@
+"""
+Idempotent cold start of a Studio install: ``python -m painter bootstrap``.
+
+``runpod-start.sh`` and ``install-nodes.sh`` run this on every boot. Each
+step records a fingerprint in ``Studio/.painter-bootstrap.json`` and is
+skipped while that fingerprint is unchanged:
+
+- ``studio``: clone Studio, or with ``--update`` pull it; fingerprinted by
+  its revision.
+- ``studio-requirements``: pip-install Studio's requirements (without
+  ``segment-anything``, which the SAM2 node brings) and Studio itself;
+  fingerprinted by the hash of ``requirements.txt`` and the packaging
+  files, and the Python it installs into.
+- ``node:<name>``: clone (or pull) each Hanzo custom node. These run in
+  parallel.
+- ``node-requirements``: one ``pip install -r ... -r ...`` for every node
+  whose ``requirements.txt`` hash changed. A single resolver run is faster
+  than one per node, and it avoids concurrent pips writing into the same
+  site-packages.
+- ``painter-link``: link this repository's node pack in as
+  ``Hanzo-Painter``.
+
+A failed install is reported and retried on the next boot; the server
+still starts. When a wheelhouse directory exists (``PAINTER_WHEELHOUSE``,
+default ``<workspace>/wheelhouse``), pip is pointed at it with
+``--find-links``. With ``PAINTER_OFFLINE=1`` pip uses only the wheelhouse.
+``python -m painter bootstrap --build-wheelhouse`` fills it from the
+current requirements. ``PAINTER_GIT_BASE`` and pip's own ``PIP_INDEX_URL``
+point the clones and installs at local mirrors.
+
+The run ends with a per-step timing table, and the timings are also kept
+in the state file so time-to-ready can be tracked across boots.
+"""
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+NODES = ("Hanzo-DiffuEraser", "Hanzo-VideoHelper", "Hanzo-EasyUse", "Hanzo-KJNodes", "Hanzo-LayerStyle")
+STUDIO_REPO = "studio"
+GIT_BASE = "https://github.com/hanzoai"
+STATE_FILE = ".painter-bootstrap.json"
+# Studio requirements the SAM2 custom node installs in its own way
+SKIPPED_REQUIREMENTS = ("segment-anything",)
+BASE_PACKAGES = ("pyyaml", "pillow")
+PACKAGING_FILES = ("pyproject.toml", "setup.py", "setup.cfg")
+
+
+class BootstrapError(RuntimeError):
+    """Raised when Studio itself cannot be fetched."""
+
+
+@dataclass
+class StepTiming:
+    """How long one step took and whether it ran."""
+
+    name: str
+    status: str  # "ran", "skipped" or "failed"
+    seconds: float
+    detail: str = ""
+
+
+def _hash_files(paths: Sequence[Path]) -> str:
+    h = hashlib.sha256()
+    for path in paths:
+        if path.is_file():
+            h.update(path.name.encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _run(command: Sequence[str], cwd: Optional[Path] = None, env: Optional[Dict[str, str]] = None) -> str:
+    result = subprocess.run(list(command), cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+    return result.stdout.strip()
+
+
+def revision(repo: Path) -> str:
+    """``HEAD`` of a git checkout, or "" when it is not one."""
+    try:
+        return _run(["git", "-C", str(repo), "rev-parse", "HEAD"])
+    except (subprocess.CalledProcessError, OSError):
+        return ""
+
+
+class Bootstrap:
+    """The cold-start steps for one Studio directory."""
+
+    def __init__(
+        self,
+        studio_dir: Path,
+        painter_dir: Optional[Path] = None,
+        nodes: Sequence[str] = NODES,
+        git_base: Optional[str] = None,
+        pip: Optional[Sequence[str]] = None,
+        wheelhouse: Optional[Path] = None,
+        offline: Optional[bool] = None,
+        update: bool = False,
+        jobs: int = 0,
+        log: Callable[[str], None] = print,
+    ):
+        self.studio_dir = Path(studio_dir)
+        self.painter_dir = Path(painter_dir) if painter_dir is not None else None
+        self.nodes = list(nodes)
+        self.git_base = (git_base or os.environ.get("PAINTER_GIT_BASE") or GIT_BASE).rstrip("/")
+        self.pip = list(pip) if pip is not None else [sys.executable, "-m", "pip"]
+        if wheelhouse is None and os.environ.get("PAINTER_WHEELHOUSE"):
+            wheelhouse = Path(os.environ["PAINTER_WHEELHOUSE"])
+        self.wheelhouse = Path(wheelhouse) if wheelhouse is not None else self.studio_dir.parent / "wheelhouse"
+        if offline is None:
+            offline = os.environ.get("PAINTER_OFFLINE", "").lower() in ("1", "true", "yes")
+        self.offline = offline
+        self.update = update
+        self.jobs = jobs or len(self.nodes) or 1
+        self.log = log
+        self.timings: List[StepTiming] = []
+        self.state: Dict[str, str] = {}
+
+    # State
+
+    @property
+    def state_path(self) -> Path:
+        return self.studio_dir / STATE_FILE
+
+    def _load_state(self) -> None:
+        try:
+            self.state = json.loads(self.state_path.read_text()).get("fingerprints", {})
+        except (OSError, ValueError):
+            self.state = {}
+
+    def _save_state(self) -> None:
+        data = {"fingerprints": self.state, "timings": [asdict(t) for t in self.timings],
+                "finished": time.time()}
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, self.state_path)
+
+    def _record(self, name: str, status: str, started: float, detail: str = "") -> StepTiming:
+        timing = StepTiming(name, status, time.monotonic() - started, detail)
+        self.timings.append(timing)
+        if status == "failed":
+            self.log(f"⚠ {name}: {detail}")
+        return timing
+
+    # pip
+
+    def _pip_env(self) -> Dict[str, str]:
+        # Understood by every pip; older ones reject the --break-system-packages flag
+        return dict(os.environ, PIP_BREAK_SYSTEM_PACKAGES="1")
+
+    def _pip_sources(self) -> List[str]:
+        sources = []
+        if self.wheelhouse.is_dir():
+            sources += ["--find-links", str(self.wheelhouse)]
+            if self.offline:
+                sources.append("--no-index")
+        return sources
+
+    def pip_install(self, args: Sequence[str], cwd: Optional[Path] = None) -> None:
+        _run([*self.pip, "install", "--quiet", *self._pip_sources(), *args], cwd=cwd, env=self._pip_env())
+
+    def _filtered_requirements(self, directory: Path) -> Path:
+        lines = (directory / "requirements.txt").read_text().splitlines()
+        kept = [line for line in lines if not any(skip in line for skip in SKIPPED_REQUIREMENTS)]
+        f = tempfile.NamedTemporaryFile("w", suffix="-requirements.txt", delete=False)
+        with f:
+            f.write("\n".join(kept) + "\n")
+        return Path(f.name)
+
+    # Steps
+
+    def _clone_or_update(self, name: str, repo: str, target: Path) -> StepTiming:
+        started = time.monotonic()
+        try:
+            if not target.exists() or not any(target.iterdir()):
+                _run(["git", "clone", "--quiet", "--depth", "1", f"{self.git_base}/{repo}.git", str(target)])
+                status = "ran"
+            elif not (target / ".git").exists():
+                # Copied in some other way; leave it alone
+                return self._record(name, "skipped", started, "not a git checkout")
+            elif self.update:
+                before = revision(target)
+                _run(["git", "-C", str(target), "pull", "--quiet", "--ff-only"])
+                status = "ran" if revision(target) != before else "skipped"
+            else:
+                status = "skipped"
+        except (subprocess.CalledProcessError, OSError) as e:
+            return self._record(name, "failed", started, _error(e))
+        rev = revision(target)
+        self.state[name] = rev
+        return self._record(name, status, started, rev[:12])
+
+    def studio(self) -> None:
+        timing = self._clone_or_update("studio", STUDIO_REPO, self.studio_dir)
+        if timing.status == "failed" and not (self.studio_dir / "main.py").exists():
+            raise BootstrapError(f"cannot fetch Studio: {timing.detail}")
+
+    def studio_requirements(self) -> None:
+        started = time.monotonic()
+        files = [self.studio_dir / "requirements.txt"] + [self.studio_dir / name for name in PACKAGING_FILES]
+        fingerprint = f"{sys.executable}:{_hash_files(files)}"
+        if self.state.get("studio-requirements") == fingerprint:
+            self._record("studio-requirements", "skipped", started)
+            return
+        try:
+            args = list(BASE_PACKAGES)
+            requirements = None
+            if (self.studio_dir / "requirements.txt").is_file():
+                requirements = self._filtered_requirements(self.studio_dir)
+                args += ["-r", str(requirements)]
+            try:
+                self.pip_install(args)
+            finally:
+                if requirements is not None:
+                    requirements.unlink()
+            if any((self.studio_dir / name).is_file() for name in PACKAGING_FILES):
+                self.pip_install(["-e", str(self.studio_dir)])
+        except (subprocess.CalledProcessError, OSError) as e:
+            self._record("studio-requirements", "failed", started, _error(e))
+            return
+        self.state["studio-requirements"] = fingerprint
+        self._record("studio-requirements", "ran", started)
+
+    def custom_nodes(self) -> None:
+        custom_nodes = self.studio_dir / "custom_nodes"
+        custom_nodes.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            cloned = list(pool.map(
+                lambda node: self._clone_or_update(f"node:{node}", node, custom_nodes / node), self.nodes))
+
+        started = time.monotonic()
+        changed = {}
+        for node, timing in zip(self.nodes, cloned):
+            requirements = custom_nodes / node / "requirements.txt"
+            if timing.status == "failed" or not requirements.is_file():
+                continue
+            fingerprint = f"{sys.executable}:{_hash_files([requirements])}"
+            if self.state.get(f"requirements:{node}") != fingerprint:
+                changed[node] = (requirements, fingerprint)
+        if not changed:
+            self._record("node-requirements", "skipped", started)
+            return
+        args = [arg for requirements, _ in changed.values() for arg in ("-r", str(requirements))]
+        try:
+            self.pip_install(args)
+        except (subprocess.CalledProcessError, OSError) as e:
+            self._record("node-requirements", "failed", started, _error(e))
+            return
+        for node, (_, fingerprint) in changed.items():
+            self.state[f"requirements:{node}"] = fingerprint
+        self._record("node-requirements", "ran", started, ", ".join(changed))
+
+    def painter_link(self) -> None:
+        started = time.monotonic()
+        source = self.painter_dir / "painter" / "studio" if self.painter_dir is not None else None
+        if source is None or not source.is_dir():
+            return
+        link = self.studio_dir / "custom_nodes" / "Hanzo-Painter"
+        if link.is_symlink() and Path(os.readlink(link)) == source:
+            self._record("painter-link", "skipped", started)
+            return
+        detail = ""
+        if link.is_symlink():
+            link.unlink()
+        elif link.exists():
+            # A copy from an older install or a Docker build; Studio skips *.disabled node folders
+            aside = link.with_name(f"{link.name}.disabled")
+            if aside.exists() or aside.is_symlink():
+                raise BootstrapError(f"{link} is not a link to {source} and {aside} already exists; "
+                                     f"remove one of them and run the bootstrap again")
+            link.rename(aside)
+            logger.warning("moved %s aside to %s to link %s", link, aside.name, source)
+            detail = f"moved old copy to {aside.name}"
+        link.symlink_to(source, target_is_directory=True)
+        self._record("painter-link", "ran", started, detail)
+
+    def run(self, studio: bool = True) -> List[StepTiming]:
+        """Run every step; returns their timings (also saved in the state file)."""
+        self.timings = []
+        started = time.monotonic()
+        if studio:
+            self.studio()
+        self.studio_dir.mkdir(parents=True, exist_ok=True)
+        self._load_state()
+        try:
+            if studio:
+                self.studio_requirements()
+            self.custom_nodes()
+            self.painter_link()
+        finally:
+            self._record("total", "ran", started)
+            self._save_state()
+        return self.timings
+
+    def build_wheelhouse(self) -> None:
+        """Download wheels for Studio's and the nodes' current requirements into the wheelhouse."""
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+        directories = [self.studio_dir] + [self.studio_dir / "custom_nodes" / node for node in self.nodes]
+        args = list(BASE_PACKAGES)
+        temporary = []
+        for directory in directories:
+            if (directory / "requirements.txt").is_file():
+                temporary.append(self._filtered_requirements(directory))
+                args += ["-r", str(temporary[-1])]
+        try:
+            _run([*self.pip, "wheel", "--quiet", "--wheel-dir", str(self.wheelhouse), *args], env=self._pip_env())
+        finally:
+            for path in temporary:
+                path.unlink()
+
+
+def _error(e: Exception) -> str:
+    if isinstance(e, subprocess.CalledProcessError):
+        output = (e.stderr or e.stdout or "").strip().splitlines()
+        return f"{' '.join(map(str, e.cmd[:4]))} ... exited {e.returncode}" + (f": {output[-1]}" if output else "")
+    return str(e)
+
+
+def format_timings(timings: Sequence[StepTiming]) -> str:
+    """The timing table printed at the end of a run."""
+    width = max([len(t.name) for t in timings] + [4])
+    lines = [f"{'step':<{width}}  {'status':<7}  {'seconds':>7}"]
+    for t in timings:
+        lines.append(f"{t.name:<{width}}  {t.status:<7}  {t.seconds:>7.2f}  {t.detail}".rstrip())
+    return "\n".join(lines)
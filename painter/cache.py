@@ -0,0 +1,252 @@
+"""
+Content-addressed array cache with an in-memory LRU and an on-disk spill.
+
+Entries are numpy arrays keyed by a hex digest of whatever determines their
+contents (see :func:`cache_key`). The memory tier holds up to
+``memory_bytes``; entries pushed out of it are written to ``spill_dir`` as
+``.npy`` files and served from there with ``np.load(mmap_mode="r")``, so a
+hit costs a page-cache lookup instead of recomputing the array. The spill
+directory is indexed on startup, which lets entries survive restarts, and is
+trimmed least-recently-used first to ``disk_bytes``.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".npy"
+MB = 1 << 20
+
+
+def cache_dir() -> Path:
+    """Root for on-disk caches: ``$PAINTER_CACHE_DIR`` or ``~/.cache/hanzo-painter``."""
+    return Path(os.environ.get("PAINTER_CACHE_DIR") or Path.home() / ".cache" / "hanzo-painter")
+
+
+def env_bytes(name: str, default_mb: int) -> int:
+    """Read a size in megabytes from the environment."""
+    return int(float(os.environ.get(name, default_mb)) * MB)
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable digest of JSON-serialisable key parts."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+_file_digests: Dict[Tuple[str, int, int], str] = {}
+_file_digests_lock = threading.Lock()
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """
+    SHA-256 of a file's contents.
+
+    Digests are remembered per ``(path, size, mtime)`` so unchanged files are
+    only read once per process.
+    """
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    stamp = (path, st.st_size, st.st_mtime_ns)
+    with _file_digests_lock:
+        if stamp in _file_digests:
+            return _file_digests[stamp]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    with _file_digests_lock:
+        _file_digests[stamp] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+class ArrayCache:
+    """
+    Thread-safe LRU cache of numpy arrays with an optional mmap spill tier.
+
+    Arrays handed out are read-only; callers copy before mutating.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int,
+        spill_dir: Optional[Union[str, Path]] = None,
+        disk_bytes: int = 0,
+        name: str = "cache",
+    ):
+        self.name = name
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+        if self.spill_dir is not None:
+            self._index_spill_dir()
+
+    def _index_spill_dir(self) -> None:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.spill_dir.glob(f"*{SUFFIX}"):
+            st = path.stat()
+            entries.append((st.st_mtime, path.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_used += size
+        self._trim_disk()
+
+    def _path(self, key: str) -> Path:
+        return self.spill_dir / f"{key}{SUFFIX}"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory.keys() | self._disk.keys())
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached array for ``key`` or None, counting the hit or miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                path = self._path(key)
+            else:
+                self.misses += 1
+                return None
+        try:
+            array = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning("%s: dropping unreadable spill entry %s: %s", self.name, path.name, e)
+            with self._lock:
+                self._forget_disk(key)
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+        return array
+
+    def put(self, key: str, array: np.ndarray) -> np.ndarray:
+        """
+        Store ``array`` under ``key`` and return the read-only cached copy.
+
+        Arrays larger than the whole memory budget are written straight to
+        the spill tier, without an in-memory copy, and come back mmap'd.
+        """
+        if array.nbytes > self.memory_bytes and self._spill(key, np.asarray(array)):
+            return np.load(self._path(key), mmap_mode="r")
+        array = np.array(array, copy=True)
+        array.setflags(write=False)
+        spilled = []
+        with self._lock:
+            if key in self._memory:
+                self._memory_used -= self._memory.pop(key).nbytes
+            self._memory[key] = array
+            self._memory_used += array.nbytes
+            while self._memory_used > self.memory_bytes and self._memory:
+                old_key, old = self._memory.popitem(last=False)
+                self._memory_used -= old.nbytes
+                self.evictions += 1
+                spilled.append((old_key, old))
+        for old_key, old in spilled:
+            self._spill(old_key, old)
+        return array
+
+    def get_or_compute(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the cached array for ``key``, computing and storing it on a miss."""
+        array = self.get(key)
+        if array is None:
+            array = self.put(key, compute())
+        return array
+
+    def _spill(self, key: str, array: np.ndarray) -> bool:
+        if self.spill_dir is None or self.disk_bytes <= 0 or array.nbytes > self.disk_bytes:
+            return False
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                return True
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("%s: could not spill %s: %s", self.name, key, e)
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return False
+        size = path.stat().st_size
+        with self._lock:
+            self._disk[key] = size
+            self._disk_used += size
+            self.spills += 1
+            self._trim_disk()
+            return key in self._disk
+
+    def _forget_disk(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_used -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _trim_disk(self) -> None:
+        while self._disk_used > self.disk_bytes and self._disk:
+            self._forget_disk(next(iter(self._disk)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            for key in list(self._disk):
+                self._forget_disk(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and sizes, for logs and metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "spills": self.spills,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_used,
+            }
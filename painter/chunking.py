@@ -0,0 +1,148 @@
+"""
+Split long videos into overlapping windows and stitch the results back.
+
+Each window maps onto VHS_LoadVideo's ``skip_first_frames`` and
+``frame_load_cap``, so the server only ever decodes ``window`` frames at a
+time. Stitching streams window outputs one frame at a time and keeps only
+the overlapping tail of the previous window in memory, which it cross-fades
+into the head of the next window to hide seams between independently
+inpainted segments.
+"""
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Window:
+    """A contiguous range of loaded frames."""
+
+    start: int
+    length: int
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length
+
+
+def plan_windows(total: int, window: int, overlap: int) -> List[Window]:
+    """
+    Cover ``total`` frames with windows of at most ``window`` frames.
+
+    Consecutive windows share ``overlap`` frames. The last window may be
+    shorter but always contributes at least one new frame.
+    """
+    if total <= 0:
+        raise ValueError("total frame count must be positive")
+    if window <= 0:
+        raise ValueError("window must be positive")
+    if overlap < 0 or 2 * overlap >= window:
+        raise ValueError("overlap must be non-negative and less than half the window")
+
+    step = window - overlap
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window, total)
+        windows.append(Window(start, end - start))
+        if end >= total:
+            return windows
+        start += step
+
+
+def crossfade_weights(overlap: int) -> np.ndarray:
+    """Weights of the incoming window for each overlapping frame, in (0, 1)."""
+    return np.arange(1, overlap + 1, dtype=np.float32) / (overlap + 1)
+
+
+def blend(outgoing: np.ndarray, incoming: np.ndarray, weight: float) -> np.ndarray:
+    """Linear cross-fade of two uint8 frames."""
+    mixed = outgoing.astype(np.float32) * (1.0 - weight) + incoming.astype(np.float32) * weight
+    return np.clip(np.rint(mixed), 0, 255).astype(np.uint8)
+
+
+def stitch(windows: List[Window], sources: Iterable[Iterable[np.ndarray]]) -> Iterator[np.ndarray]:
+    """
+    Yield the frames of the full clip from per-window frame iterables.
+
+    ``sources`` must produce one iterable per window, in order. Only the
+    overlapping tail of the current window is buffered. A window that
+    returns fewer frames than planned is tolerated; the missing frames are
+    simply absent from the result.
+    """
+    tail: List[np.ndarray] = []
+    sources = iter(sources)
+
+    for index, window in enumerate(windows):
+        frames = next(sources, None)
+        if frames is None:
+            raise ValueError(f"Missing output for window {index} ({window.start}-{window.end})")
+
+        keep = window.end - windows[index + 1].start if index + 1 < len(windows) else 0
+        weights = crossfade_weights(len(tail))
+        next_tail: List[np.ndarray] = []
+        count = 0
+
+        for offset, frame in enumerate(frames):
+            if offset >= window.length:
+                break
+            count += 1
+            if offset < len(tail):
+                frame = blend(tail[offset], frame, float(weights[offset]))
+            if offset >= window.length - keep:
+                next_tail.append(frame)
+            else:
+                yield frame
+
+        # Previous tail frames this window did not reach are passed through
+        yield from tail[count:]
+        tail = next_tail
+
+    yield from tail
+
+
+def split_windows(frames: Iterable[np.ndarray], windows: List[Window]) -> Iterator[np.ndarray]:
+    """
+    Group a single pass over ``frames`` into one ``(N, H, W, 3)`` array per
+    window, reusing the overlapping frames instead of decoding them twice.
+
+    Stops early, with a short last window, if ``frames`` runs out.
+    """
+    frames = iter(frames)
+    previous: List[np.ndarray] = []
+    previous_end = 0
+    for window in windows:
+        overlap = previous_end - window.start
+        if overlap < 0:
+            return
+        batch = previous[len(previous) - overlap:] if overlap else []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) == window.length:
+                break
+        if len(batch) <= overlap:
+            return
+        yield np.stack(batch)
+        previous, previous_end = batch, window.start + len(batch)
+
+
+def stitch_to_file(
+    windows: List[Window],
+    sources: List[str],
+    output: str,
+    fps: float,
+    crf: int = 19,
+    audio_source: Optional[str] = None,
+    audio_offset: float = 0.0,
+) -> int:
+    """Stitch per-window videos (paths or URLs) into one encoded file; returns frames written."""
+    from painter.ffmpeg import FrameReader, FrameWriter, probe
+
+    info = probe(sources[0])
+    readers = (FrameReader(src, info=info) for src in sources)
+    with FrameWriter(output, info.width, info.height, fps, crf=crf,
+                     audio_source=audio_source, audio_offset=audio_offset) as writer:
+        for frame in stitch(windows, readers):
+            writer.write(frame)
+    return writer.frames
@@ -0,0 +1,403 @@
+"""
+Command line interface: ``python -m painter <command>``.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_WORKFLOW = PROJECT_ROOT / "inpainting-workflow.json"
+DEFAULT_SERVER = os.environ.get("PAINTER_SERVER", "http://127.0.0.1:8188")
+STUDIO_DIR = Path(os.environ.get("STUDIO_DIR", PROJECT_ROOT / "Studio"))
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    from painter.batch import load_manifest, run_batch
+    from painter.client import StudioClient
+    from painter.workflow import compile_workflow, load_workflow, optimize
+
+    async def fetch_object_info():
+        async with StudioClient(args.server) as client:
+            return await client.object_info()
+
+    object_info = asyncio.run(fetch_object_info()) if args.object_info else None
+    template = optimize(compile_workflow(load_workflow(args.workflow), object_info), args.optimize)
+
+    results = open(args.results, "a") if args.results else None
+
+    def on_result(result):
+        if results:
+            results.write(json.dumps(result.to_dict()) + "\n")
+            results.flush()
+
+    try:
+        report = asyncio.run(run_batch(
+            args.server, template, load_manifest(args.manifest),
+            max_inflight=args.max_inflight, on_result=on_result,
+            input_dir=args.input_dir, output_dir=args.output_dir, profile=args.profile, plan=args.plan,
+            deterministic=args.deterministic,
+        ))
+    finally:
+        if results:
+            results.close()
+
+    print(report.summary())
+    return 0 if report.failed == 0 else 1
+
+
+def cmd_compile(args: argparse.Namespace) -> int:
+    from painter.workflow import apply_job, compile_workflow, load_workflow, optimize
+
+    prompt = optimize(compile_workflow(load_workflow(args.workflow)), args.optimize)
+    if args.job:
+        prompt = apply_job(prompt, json.loads(args.job))
+    json.dump(prompt, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    from painter import planner
+    from painter.ffmpeg import probe
+    from painter.workflow import apply_job, compile_workflow, load_workflow, optimize
+
+    prompt = optimize(compile_workflow(load_workflow(args.workflow)), args.optimize)
+    prompt = apply_job(prompt, dict(json.loads(args.job) if args.job else {}, video=args.video.name))
+    info = probe(str(args.video))
+    available = planner.available_memory(args.device) if args.memory_mb is None else {}
+    if args.memory_mb is not None:
+        available["host"] = args.memory_mb * planner.MB
+    if args.device_memory_mb is not None:
+        available["device"] = args.device_memory_mb * planner.MB
+    planned = planner.plan_prompt(prompt, info.width, info.height, info.frames, available, args.device,
+                                  headroom=args.headroom, scale=args.scale)
+    json.dump(planned.to_dict(), sys.stdout, indent=2)
+    print()
+    return 0 if planned.fits else 1
+
+
+def cmd_bootstrap(args: argparse.Namespace) -> int:
+    from painter.bootstrap import Bootstrap, BootstrapError, format_timings
+
+    bootstrap = Bootstrap(args.studio_dir, painter_dir=PROJECT_ROOT, update=args.update, jobs=args.jobs)
+    if args.build_wheelhouse:
+        bootstrap.build_wheelhouse()
+        print(f"Wheels written to {bootstrap.wheelhouse}")
+        return 0
+    try:
+        timings = bootstrap.run(studio=not args.nodes_only)
+    except BootstrapError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(format_timings(timings))
+    return 0
+
+
+def cmd_models(args: argparse.Namespace) -> int:
+    from painter.models import ModelFetcher, format_results, load_manifest, pin, save_manifest
+
+    specs = load_manifest(args.manifest)
+    selected = [spec for spec in specs if not args.only or spec.name in args.only]
+    fetcher = ModelFetcher(args.models_dir, connections=args.connections, require_pinned=args.require_pinned)
+    if args.no_cache:
+        fetcher.cache = None
+    elif args.cache_dir is not None:
+        fetcher.cache = args.cache_dir
+    results = asyncio.run(fetcher.fetch_all(selected))
+    print(format_results(results))
+    if args.pin:
+        save_manifest(pin(specs, results), args.manifest)
+        print(f"Pinned sizes and digests in {args.manifest}")
+    return 0 if all(result.status != "failed" for result in results) else 1
+
+
+def cmd_convert_models(args: argparse.Namespace) -> int:
+    from painter.fused import convert
+    from painter.workflow import LOADER, compile_workflow, load_workflow
+
+    inputs = compile_workflow(load_workflow(args.workflow))[LOADER]["inputs"]
+    result = convert(args.models_dir, args.checkpoint or inputs["checkpoint"], args.lora or inputs["lora"],
+                     strength=args.strength, force=args.force)
+    if result.converted:
+        print(f"Fused {result.layers} LoRA layers into {result.checkpoint} ({result.size / 1e6:.0f} MB) "
+              f"in {result.seconds:.1f}s")
+    else:
+        print(f"{result.checkpoint} is up to date")
+    print(f"Use it with --optimize fused (checkpoint {result.checkpoint}, lora {result.identity})")
+    return 0
+
+
+def cmd_profile_startup(args: argparse.Namespace) -> int:
+    from dataclasses import asdict
+
+    from painter.startup import format_startup_report, profile_startup
+
+    report = profile_startup(args.studio_dir, only=args.only)
+    print(format_startup_report(report))
+    if args.output:
+        args.output.write_text(json.dumps(asdict(report), indent=2) + "\n")
+    return 0
+
+
+def cmd_bench_load(args: argparse.Namespace) -> int:
+    from painter.fused import benchmark_load, format_load_report
+
+    report = benchmark_load(megabytes=args.megabytes, workers=args.workers, repeat=args.repeat)
+    print(format_load_report(report))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    return 0
+
+
+def cmd_upload(args: argparse.Namespace) -> int:
+    from painter.client import StudioClient
+
+    async def upload() -> None:
+        async with StudioClient(args.server) as client:
+            for path in args.files:
+                print(json.dumps(await client.upload(path)), flush=True)
+
+    asyncio.run(upload())
+    return 0
+
+
+def cmd_download(args: argparse.Namespace) -> int:
+    from painter.client import StudioClient
+
+    async def download() -> None:
+        async with StudioClient(args.server) as client:
+            dest = args.output or Path(args.filename)
+            print(await client.download(args.filename, dest, subfolder=args.subfolder, type=args.type))
+
+    asyncio.run(download())
+    return 0
+
+
+def cmd_standin(args: argparse.Namespace) -> int:
+    from painter.standin import serve
+
+    serve(host=args.host, port=args.port, latency=args.latency,
+          input_dir=args.input_dir, output_dir=args.output_dir)
+    return 0
+
+
+def cmd_dispatch(args: argparse.Namespace) -> int:
+    from painter.dispatcher import Worker, plan_workers, serve
+
+    if args.worker:
+        workers = [Worker(f"worker-{index}", url.rstrip("/")) for index, url in enumerate(args.worker)]
+    else:
+        extra_args = []
+        if args.standin:
+            extra_args += ["--latency", str(args.latency)]
+            for flag, path in (("--input-dir", args.input_dir), ("--output-dir", args.output_dir)):
+                if path is not None:
+                    extra_args += [flag, str(path)]
+        elif args.lazy_nodes:
+            from painter.startup import LAZY_FLAGS
+
+            os.environ["PAINTER_LAZY_NODES"] = "1"
+            extra_args += list(LAZY_FLAGS)
+        devices = [d for d in args.devices.split(",") if d] if args.devices else None
+        workers = plan_workers(args.workers, base_port=args.base_port, devices=devices,
+                               cpus_per_worker=args.cpus_per_worker, standin=args.standin,
+                               studio_dir=STUDIO_DIR, extra_args=extra_args)
+    serve(workers, host=args.host, port=args.port, input_dir=args.input_dir, output_dir=args.output_dir)
+    return 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    from painter.bench import BenchConfig, compare, format_report, load_baseline, run_benchmark, save_baseline
+
+    config = BenchConfig(frames=args.frames, width=args.width, height=args.height, steps=args.steps, jobs=args.jobs)
+    report = run_benchmark(config, args.scenario or None, repeat=args.repeat, trace_dir=args.trace)
+    if args.output:
+        save_baseline(report, args.output)
+    if args.update_baseline:
+        save_baseline(report, args.baseline)
+        print(format_report(report))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    print(format_report(report, baseline))
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+        return 0
+    regressions = compare(report, baseline, threshold=args.threshold, rss_threshold=args.rss_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+def add_optimize_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--optimize", action="append", default=[], metavar="PASS",
+                        help="Apply an optimization pass to the workflow (repeatable), e.g. static-mask")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="painter", description="Hanzo Painter command line tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="Run a JSONL job manifest through Studio")
+    batch.add_argument("manifest", type=Path, help="JSONL file with one job per line")
+    batch.add_argument("--workflow", type=Path, default=DEFAULT_WORKFLOW, help="UI-format workflow JSON")
+    batch.add_argument("--server", default=DEFAULT_SERVER, help="Studio base URL")
+    batch.add_argument("--max-inflight", type=int, default=2, help="Prompts queued on the server at once")
+    batch.add_argument("--results", type=Path, help="Append per-job results to this JSONL file")
+    batch.add_argument("--input-dir", type=Path, default=STUDIO_DIR / "input",
+                       help="Where job videos live (used to probe chunked jobs and copy their audio)")
+    batch.add_argument("--output-dir", type=Path, default=STUDIO_DIR / "output",
+                       help="Where stitched videos of chunked jobs are written")
+    batch.add_argument("--object-info", action="store_true",
+                       help="Name widget values from the server's /object_info instead of the built-in table")
+    batch.add_argument("--profile", action="store_true",
+                       help="Profile every prompt; traces land in the server's output/painter-profiles")
+    batch.add_argument("--plan", action="store_true",
+                       help="Have the server fit each prompt's frame cap and sampler windows to its free memory")
+    batch.add_argument("--deterministic", action="store_true",
+                       help="Derive each prompt's seed from its content and reuse the server's cached result "
+                            "for identical jobs")
+    add_optimize_argument(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    compile_ = sub.add_parser("compile", help="Print the workflow as an API prompt")
+    compile_.add_argument("--workflow", type=Path, default=DEFAULT_WORKFLOW, help="UI-format workflow JSON")
+    compile_.add_argument("--job", help="JSON job overrides to apply")
+    add_optimize_argument(compile_)
+    compile_.set_defaults(func=cmd_compile)
+
+    plan = sub.add_parser("plan", help="Print the frame cap and sampler windows that fit a video in memory")
+    plan.add_argument("video", type=Path, help="Video to plan for")
+    plan.add_argument("--workflow", type=Path, default=DEFAULT_WORKFLOW, help="UI-format workflow JSON")
+    plan.add_argument("--job", help="JSON job overrides to apply")
+    plan.add_argument("--device", choices=["cpu", "cuda"], default="cpu", help="Device the sampler runs on")
+    plan.add_argument("--memory-mb", type=int, help="Free RAM to plan for (default: available now)")
+    plan.add_argument("--device-memory-mb", type=int, help="Free VRAM to plan for with --device cuda")
+    plan.add_argument("--headroom", type=float, default=0.9, help="Fraction of free memory a job may use")
+    plan.add_argument("--scale", type=float, default=1.0, help="Calibration factor applied to estimates")
+    add_optimize_argument(plan)
+    plan.set_defaults(func=cmd_plan)
+
+    bootstrap = sub.add_parser("bootstrap", help="Set up Studio and the custom nodes, skipping what is current")
+    bootstrap.add_argument("--studio-dir", type=Path, default=STUDIO_DIR, help="Studio checkout to set up")
+    bootstrap.add_argument("--update", action="store_true", help="Pull Studio and the nodes before installing")
+    bootstrap.add_argument("--nodes-only", action="store_true", help="Only install the custom nodes")
+    bootstrap.add_argument("--jobs", type=int, default=0, help="Nodes fetched at once (default: all)")
+    bootstrap.add_argument("--build-wheelhouse", action="store_true",
+                           help="Download wheels for the current requirements into the wheelhouse and exit")
+    bootstrap.set_defaults(func=cmd_bootstrap)
+
+    models = sub.add_parser("models", help="Download the workflow's models, resumably and verified, via a shared cache")
+    models.add_argument("--manifest", type=Path, default=PROJECT_ROOT / "models.json", help="Model manifest JSON")
+    models.add_argument("--models-dir", type=Path, default=STUDIO_DIR / "models", help="Studio's models folder")
+    models.add_argument("--cache-dir", type=Path,
+                        help="Shared download cache (default: $PAINTER_MODEL_CACHE or ~/.cache/hanzo-painter/models)")
+    models.add_argument("--no-cache", action="store_true", help="Download straight into the models folder")
+    models.add_argument("--connections", type=int, default=8, help="Parallel ranged connections per file")
+    models.add_argument("--only", action="append", default=[], metavar="NAME",
+                        help="Fetch only this model (repeatable)")
+    models.add_argument("--pin", action="store_true",
+                        help="Record the size and sha256 of what was fetched in the manifest")
+    models.add_argument("--require-pinned", action="store_true",
+                        help="Fail entries without a pinned size and sha256 instead of trusting the server's digest")
+    models.set_defaults(func=cmd_models)
+
+    convert_models = sub.add_parser("convert-models",
+                                    help="Fuse DiffuEraser's LoRA into its checkpoint as an fp16, mmap-ready file")
+    convert_models.add_argument("--models-dir", type=Path, default=STUDIO_DIR / "models", help="Studio's models folder")
+    convert_models.add_argument("--workflow", type=Path, default=PROJECT_ROOT / "inpainting-workflow.json",
+                                help="Workflow whose DiffuEraserLoader names the checkpoint and LoRA")
+    convert_models.add_argument("--checkpoint", help="Checkpoint file name (default: the workflow's)")
+    convert_models.add_argument("--lora", help="LoRA file name (default: the workflow's)")
+    convert_models.add_argument("--strength", type=float, default=1.0, help="LoRA strength to fuse with")
+    convert_models.add_argument("--force", action="store_true", help="Convert even if the fused file is up to date")
+    convert_models.set_defaults(func=cmd_convert_models)
+
+    upload = sub.add_parser("upload", help="Upload videos or masks into the server's input folder, resumably")
+    upload.add_argument("files", type=Path, nargs="+", help="Files to upload")
+    upload.add_argument("--server", default=DEFAULT_SERVER, help="Studio base URL")
+    upload.set_defaults(func=cmd_upload)
+
+    download = sub.add_parser("download", help="Download an output from the server, resuming a partial file")
+    download.add_argument("filename", help="Output file name, as reported in the prompt's history")
+    download.add_argument("--subfolder", default="", help="Subfolder of the output folder")
+    download.add_argument("--type", choices=["output", "input", "temp"], default="output", help="Folder to read from")
+    download.add_argument("-o", "--output", type=Path, help="Where to write it (default: the file name)")
+    download.add_argument("--server", default=DEFAULT_SERVER, help="Studio base URL")
+    download.set_defaults(func=cmd_download)
+
+    standin = sub.add_parser("standin", help="Serve a fake Studio prompt API for local throughput tests")
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--port", type=int, default=8188)
+    standin.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per prompt")
+    standin.add_argument("--input-dir", type=Path, help="Serve identity 'inpainting' of videos found here")
+    standin.add_argument("--output-dir", type=Path, help="Where identity outputs are written and served from")
+    standin.set_defaults(func=cmd_standin)
+
+    dispatch = sub.add_parser("dispatch", help="Serve one prompt API in front of several Studio workers")
+    dispatch.add_argument("--workers", type=int, default=2, help="Worker processes to start")
+    dispatch.add_argument("--devices", help="Comma-separated CUDA devices, assigned round-robin (default: CPU)")
+    dispatch.add_argument("--cpus-per-worker", type=int, help="CPUs pinned per CPU worker (default: an even share)")
+    dispatch.add_argument("--standin", action="store_true", help="Start stand-in servers instead of Studio")
+    dispatch.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per prompt with --standin")
+    dispatch.add_argument("--lazy-nodes", action="store_true",
+                          help="Start workers with lazy custom node registration (see profile-startup)")
+    dispatch.add_argument("--worker", action="append", default=[], metavar="URL",
+                          help="Use an already running server instead of starting workers (repeatable)")
+    dispatch.add_argument("--host", default="127.0.0.1")
+    dispatch.add_argument("--port", type=int, default=8188)
+    dispatch.add_argument("--base-port", type=int, default=8190, help="Port of the first worker")
+    dispatch.add_argument("--input-dir", type=Path, help="Where the videos of split prompts are probed")
+    dispatch.add_argument("--output-dir", type=Path, help="Where stitched videos of split prompts are written")
+    dispatch.set_defaults(func=cmd_dispatch)
+
+    bench = sub.add_parser("bench", help="Benchmark the workflow on CPU with stand-in models")
+    bench.add_argument("--scenario", action="append", default=[], metavar="NAME",
+                       help="Scenario to run (repeatable; default all)")
+    bench.add_argument("--frames", type=int, default=64, help="Frames in the synthetic clip")
+    bench.add_argument("--width", type=int, default=320)
+    bench.add_argument("--height", type=int, default=176)
+    bench.add_argument("--steps", type=int, default=4, help="Sampler steps per frame")
+    bench.add_argument("--jobs", type=int, default=1, help="Times each run executes the prompt")
+    bench.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the best is reported")
+    bench.add_argument("--baseline", type=Path, default=PROJECT_ROOT / "benchmarks" / "baseline.json",
+                       help="Baseline JSON to compare against")
+    bench.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    bench.add_argument("--threshold", type=float, default=0.25,
+                       help="Allowed relative drop in frames/s or growth of a stage's latency")
+    bench.add_argument("--rss-threshold", type=float, default=0.1, help="Allowed relative growth of peak RSS")
+    bench.add_argument("--output", type=Path, help="Also write this run's report here")
+    bench.add_argument("--trace", type=Path, metavar="DIR",
+                       help="Make one extra profiled run per scenario and write its Chrome trace and summary here")
+    bench.set_defaults(func=cmd_bench)
+
+    profile = sub.add_parser("profile-startup", help="Attribute Studio's boot time and memory to each custom node pack")
+    profile.add_argument("--studio-dir", type=Path, default=STUDIO_DIR, help="Studio checkout to profile")
+    profile.add_argument("--only", action="append", default=[], metavar="PACK",
+                         help="Profile only this node pack (repeatable)")
+    profile.add_argument("--output", type=Path, help="Also write the report as JSON here")
+    profile.set_defaults(func=cmd_profile_startup)
+
+    bench_load = sub.add_parser("bench-load", help="Compare stock and fused model loading on CPU across processes")
+    bench_load.add_argument("--megabytes", type=int, default=512, help="Size of the synthetic fp32 checkpoint")
+    bench_load.add_argument("--workers", type=int, default=4, help="Processes loading at the same time")
+    bench_load.add_argument("--repeat", type=int, default=3, help="Rounds per load path")
+    bench_load.add_argument("--output", type=Path, help="Also write the report as JSON here")
+    bench_load.set_defaults(func=cmd_bench_load)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,179 @@
+"""
+Async client for the Studio HTTP + websocket API.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from painter.transfer import CHUNK_SIZE, READ_SIZE, sha256_file
+
+logger = logging.getLogger(__name__)
+
+# What a 416 reports as the file's size
+UNSATISFIED_RANGE = re.compile(r"^bytes \*/(\d+)$")
+
+
+class StudioError(RuntimeError):
+    """Raised when the server rejects a request."""
+
+
+def _read_at(path: Path, offset: int, size: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+class StudioClient:
+    """Thin wrapper over ``/prompt``, ``/history``, ``/queue``, ``/ws`` and the transfer endpoints."""
+
+    def __init__(self, server: str = "http://127.0.0.1:8188", client_id: Optional[str] = None):
+        self.server = server.rstrip("/")
+        self.client_id = client_id or uuid.uuid4().hex
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "StudioClient":
+        self._session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError("StudioClient must be used as an async context manager")
+        return self._session
+
+    async def _get_json(self, path: str) -> Any:
+        async with self.session.get(f"{self.server}{path}") as resp:
+            if resp.status != 200:
+                raise StudioError(f"GET {path} returned {resp.status}: {await resp.text()}")
+            return await resp.json()
+
+    async def queue_prompt(self, prompt: Dict[str, Any], extra_data: Optional[Dict[str, Any]] = None) -> str:
+        """Queue an API-format prompt and return its prompt id."""
+        body: Dict[str, Any] = {"prompt": prompt, "client_id": self.client_id}
+        if extra_data:
+            body["extra_data"] = extra_data
+        async with self.session.post(f"{self.server}/prompt", json=body) as resp:
+            data = await resp.json(content_type=None)
+            if resp.status != 200 or "prompt_id" not in data:
+                raise StudioError(f"Prompt rejected ({resp.status}): {json.dumps(data)[:500]}")
+            return data["prompt_id"]
+
+    async def history(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """Return the history entry for a prompt, or None if it has not finished."""
+        data = await self._get_json(f"/history/{prompt_id}")
+        return data.get(prompt_id)
+
+    async def queue(self) -> Dict[str, Any]:
+        return await self._get_json("/queue")
+
+    async def object_info(self) -> Dict[str, Any]:
+        return await self._get_json("/object_info")
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield JSON messages from the progress websocket until it closes."""
+        url = self.server.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+        async with self.session.ws_connect(f"{url}/ws?clientId={self.client_id}", heartbeat=30) as ws:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    yield json.loads(msg.data)
+                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+                # Binary frames are latent previews; the batch runner ignores them
+
+    async def upload(self, path: Path, name: Optional[str] = None, chunk_size: int = CHUNK_SIZE,
+                     retries: int = 5) -> Dict[str, Any]:
+        """
+        Upload ``path`` into the server's input folder, resuming where an
+        earlier attempt stopped; returns the stored ``name``, ``sha256`` and ``size``.
+
+        At most ``chunk_size`` bytes are held in memory. A dropped
+        connection is retried up to ``retries`` times from the server's offset.
+        """
+        path = Path(path)
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, sha256_file, path)
+        total = path.stat().st_size
+        url = f"{self.server}/painter/upload/{digest}"
+        params = {"filename": name or path.name}
+        failures = 0
+        while True:
+            try:
+                offset = (await self._get_json(f"/painter/upload/{digest}"))["offset"]
+                while True:
+                    if total and offset >= total:
+                        # Every byte arrived but the upload was not finished: ask the server to complete it
+                        chunk, headers = b"", {"Content-Range": f"bytes */{total}"}
+                    else:
+                        size = min(chunk_size, total - offset)
+                        chunk = await loop.run_in_executor(None, _read_at, path, offset, size)
+                        # An empty file is sent whole, since a range cannot describe it
+                        headers = {"Content-Range": f"bytes {offset}-{offset + size - 1}/{total}"} if total else {}
+                    async with self.session.put(url, params=params, data=chunk, headers=headers) as resp:
+                        data = await resp.json(content_type=None)
+                        if resp.status == 201:
+                            return data
+                        if resp.status not in (200, 409):
+                            raise StudioError(f"Upload of {path.name} rejected ({resp.status}): {data}")
+                        offset = data["offset"]
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                failures += 1
+                if failures > retries:
+                    raise StudioError(f"Upload of {path.name} failed: {e}") from e
+                logger.warning("upload of %s interrupted (%s); resuming", path.name, e)
+
+    async def download(self, filename: str, dest: Path, subfolder: str = "", type: str = "output",
+                       retries: int = 5) -> Path:
+        """
+        Download an output to ``dest``, resuming a partial ``dest.part`` with
+        a ``Range`` request; the file appears at ``dest`` only once complete.
+        """
+        dest = Path(dest)
+        partial = dest.with_name(dest.name + ".part")
+        loop = asyncio.get_running_loop()
+        params = {"filename": filename, "subfolder": subfolder, "type": type}
+        failures = 0
+        while True:
+            offset = partial.stat().st_size if partial.exists() else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                async with self.session.get(f"{self.server}/painter/download", params=params,
+                                            headers=headers) as resp:
+                    if resp.status == 416:
+                        match = UNSATISFIED_RANGE.match(resp.headers.get("Content-Range", "").strip())
+                        if match and int(match.group(1)) == offset:
+                            # The partial is already the whole file
+                            break
+                        logger.warning("partial download of %s does not match the file; restarting", filename)
+                        await loop.run_in_executor(None, partial.unlink)
+                        continue
+                    if resp.status not in (200, 206):
+                        raise StudioError(f"Download of {filename} failed ({resp.status}): {await resp.text()}")
+                    f = await loop.run_in_executor(None, open, partial, "ab" if resp.status == 206 else "wb")
+                    try:
+                        async for block in resp.content.iter_chunked(READ_SIZE):
+                            await loop.run_in_executor(None, f.write, block)
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                failures += 1
+                if failures > retries:
+                    raise StudioError(f"Download of {filename} failed: {e}") from e
+                logger.warning("download of %s interrupted (%s); resuming", filename, e)
+        os.replace(partial, dest)
+        return dest
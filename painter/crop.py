@@ -0,0 +1,125 @@
+"""
+Mask bounding-box crop and paste.
+
+Watermarks cover a small part of the frame, so instead of letterboxing the
+whole frame to the sampler's working size, the clip is cropped to the union
+of the mask over all frames plus some context, inpainted at native
+resolution, and pasted back into the untouched source frames.
+"""
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class Box(NamedTuple):
+    """Crop rectangle in pixels, ``x``/``y`` inclusive and ``x + width`` exclusive."""
+
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @property
+    def slices(self) -> Tuple[slice, slice]:
+        """``(rows, cols)`` slices for indexing ``(..., H, W, ...)`` arrays."""
+        return slice(self.y, self.y + self.height), slice(self.x, self.x + self.width)
+
+
+def union_bbox(masks: np.ndarray, threshold: float = 0.5) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Return ``(x0, y0, x1, y1)`` covering every masked pixel of an
+    ``(N, H, W[, C])`` mask batch, or None if nothing is masked.
+
+    Broadcast (zero-stride) batches are only scanned once.
+    """
+    masks = np.asarray(masks)
+    if masks.ndim == 4:
+        masks = masks.max(axis=-1) if masks.strides[0] else masks[:1].max(axis=-1)
+    elif masks.ndim == 3 and masks.strides[0] == 0:
+        masks = masks[:1]
+    if masks.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) or (N, H, W, C) mask batch, got shape {masks.shape}")
+
+    limit = threshold * 255 if masks.dtype == np.uint8 else threshold
+    covered = (masks >= limit).any(axis=0)
+    rows = np.flatnonzero(covered.any(axis=1))
+    cols = np.flatnonzero(covered.any(axis=0))
+    if rows.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def _expand(lo: int, hi: int, margin: int, multiple: int, size: int) -> Tuple[int, int]:
+    lo, hi = max(0, lo - margin), min(size, hi + margin)
+    length = -(-(hi - lo) // multiple) * multiple
+    if length > size:
+        length = size // multiple * multiple or size
+    # Centre the rounding slack on the region, sliding back inside the frame
+    start = lo - (length - (hi - lo)) // 2
+    return max(0, min(start, size - length)), length
+
+
+def crop_box(
+    bbox: Optional[Tuple[int, int, int, int]],
+    width: int,
+    height: int,
+    margin: int = 64,
+    multiple: int = 8,
+) -> Box:
+    """
+    Expand ``bbox`` by ``margin`` pixels of context and round its size up to
+    ``multiple`` (the latent downscale factor), keeping it inside the frame.
+
+    With no bbox the whole frame is used, trimmed to ``multiple``.
+    """
+    if multiple < 1 or margin < 0:
+        raise ValueError("multiple must be positive and margin non-negative")
+    if bbox is None:
+        bbox, margin = (0, 0, width, height), 0
+    x0, y0, x1, y1 = bbox
+    x, w = _expand(x0, x1, margin, multiple, width)
+    y, h = _expand(y0, y1, margin, multiple, height)
+    return Box(x, y, w, h)
+
+
+def feather_weights(box: Box, width: int, height: int, feather: int) -> np.ndarray:
+    """
+    ``(h, w, 1)`` float32 paste weights ramping from 0 at the crop border to
+    1 ``feather`` pixels inside it.
+
+    Sides that lie on the frame edge are not feathered, since there is no
+    source pixel beyond them to blend with.
+    """
+    def ramp(length: int, at_start: bool, at_end: bool) -> np.ndarray:
+        weights = np.ones(length, dtype=np.float32)
+        if feather <= 0:
+            return weights
+        steps = np.arange(1, length + 1, dtype=np.float32) / (feather + 1)
+        if at_start:
+            weights = np.minimum(weights, steps)
+        if at_end:
+            weights = np.minimum(weights, steps[::-1])
+        return weights
+
+    rows = ramp(box.height, box.y > 0, box.y + box.height < height)
+    cols = ramp(box.width, box.x > 0, box.x + box.width < width)
+    return (rows[:, None] * cols[None, :])[:, :, None]
+
+
+def paste(frames: np.ndarray, patch: np.ndarray, box: Box, feather: int = 8) -> np.ndarray:
+    """
+    Return a copy of ``frames`` ``(N, H, W, C)`` with ``patch``
+    ``(N, h, w, C)`` blended into ``box``.
+    """
+    if patch.shape[1:3] != (box.height, box.width):
+        raise ValueError(f"Patch is {patch.shape[2]}x{patch.shape[1]}, crop is {box.width}x{box.height}")
+    count = min(len(frames), len(patch))
+    out = np.array(frames[:count], copy=True)
+    rows, cols = box.slices
+    weights = feather_weights(box, frames.shape[2], frames.shape[1], feather)
+    region = out[:, rows, cols].astype(np.float32)
+    region += (patch[:count].astype(np.float32) - region) * weights
+    if np.issubdtype(out.dtype, np.integer):
+        region = np.rint(region)
+    out[:, rows, cols] = region.astype(out.dtype)
+    return out
@@ -0,0 +1,127 @@
+"""
+Collapse runs of frames whose masked region does not change.
+
+On static-camera footage the pixels under and around a watermark are often
+the same for dozens of frames, yet the sampler inpaints every one of them.
+:func:`static_runs` compares the mask plus a ring of context around it
+between frames and groups consecutive frames that match within a
+tolerance. Only the first frame of each run is inpainted; :func:`expand`
+copies its fill into the region of every other frame of the run, while
+pixels outside the region stay the frame's own.
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from painter.masks import dilate, is_broadcast
+
+
+class Runs(NamedTuple):
+    """Run number of every frame, first frame of every run, and the compared ``(H, W)`` region."""
+
+    index: np.ndarray
+    starts: np.ndarray
+    region: np.ndarray
+
+    @property
+    def frames(self) -> int:
+        return len(self.index)
+
+
+def compare_region(mask: np.ndarray, context: int, threshold: float = 0.5) -> np.ndarray:
+    """
+    Bool ``(H, W)`` union of an ``(N, H, W[, C])`` mask batch over all frames,
+    grown by ``context`` pixels.
+
+    The ring of context is what the sampler looks at around the hole, so a
+    change there (someone walking past the logo) also starts a new run.
+    """
+    mask = np.asarray(mask)
+    if mask.ndim == 4:
+        mask = mask.max(axis=-1)
+    if mask.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) or (N, H, W, C) mask batch, got shape {mask.shape}")
+    if is_broadcast(mask):
+        mask = mask[:1]
+    limit = threshold * 255 if mask.dtype == np.uint8 else threshold
+    return dilate((mask >= limit).any(axis=0), context)
+
+
+def static_runs(
+    frames: np.ndarray,
+    region: np.ndarray,
+    tolerance: float = 1.0,
+    masks: Optional[np.ndarray] = None,
+    max_block: int = 64,
+) -> Runs:
+    """
+    Group consecutive ``frames`` ``(N, H, W, C)`` whose ``region`` matches.
+
+    A frame joins the current run when the mean absolute difference of its
+    region pixels from the run's first frame is at most ``tolerance`` (in
+    8-bit levels), so slow drift cannot chain a run along. With per-frame
+    ``masks`` (bool ``(N, H, W)``), a frame whose mask differs inside the
+    region also starts a new run. An empty region leaves every frame in its
+    own run.
+
+    Frames are compared a block at a time; the block doubles (up to
+    ``max_block``) while they keep matching, so a long static stretch costs a
+    few vectorised comparisons and a moving one about one per frame.
+    """
+    count = len(frames)
+    if not region.any() or count == 0:
+        every = np.arange(count)
+        return Runs(every, every, region)
+    # Index within the region's bounding box so each gather scans only that
+    rows, cols = np.flatnonzero(region.any(axis=1)), np.flatnonzero(region.any(axis=0))
+    box = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+    inside = region[box]
+
+    def pixels(batch: np.ndarray) -> np.ndarray:
+        return batch[(slice(None),) + box][:, inside]
+
+    scale = 1.0 if np.issubdtype(frames.dtype, np.integer) else 255.0
+    index = np.zeros(count, dtype=np.int64)
+    starts = [0]
+    reference = pixels(frames[:1]).astype(np.float32)
+    i, step = 1, 1
+    while i < count:
+        block = pixels(frames[i:i + step]).astype(np.float32)
+        same = np.abs(block - reference).mean(axis=(1, 2)) * scale <= tolerance
+        if masks is not None:
+            same &= ~(pixels(masks[i:i + step]) != pixels(masks[starts[-1]:starts[-1] + 1])).any(axis=1)
+        changed = np.flatnonzero(~same)
+        if changed.size == 0:
+            index[i:i + len(block)] = len(starts) - 1
+            i += len(block)
+            step = min(step * 2, max_block)
+            continue
+        first = i + int(changed[0])
+        index[i:first] = len(starts) - 1
+        starts.append(first)
+        index[first] = len(starts) - 1
+        reference = pixels(frames[first:first + 1]).astype(np.float32)
+        i, step = first + 1, 1
+    return Runs(index, np.asarray(starts, dtype=np.int64), region)
+
+
+def expand(frames: np.ndarray, inpainted: np.ndarray, runs: Runs, chunk: int = 16) -> np.ndarray:
+    """
+    Full-length output: each of ``frames`` with its run's inpainted ``region``.
+
+    ``inpainted`` holds one frame per run, in run order, at the size and
+    dtype of ``frames``.
+    """
+    if len(inpainted) != len(runs.starts):
+        raise ValueError(f"Got {len(inpainted)} inpainted frames for {len(runs.starts)} runs")
+    if inpainted.shape[1:3] != frames.shape[1:3]:
+        raise ValueError(f"Inpainted frames are {inpainted.shape[2]}x{inpainted.shape[1]}, "
+                         f"source frames are {frames.shape[2]}x{frames.shape[1]}")
+    count = min(len(frames), runs.frames)
+    out = np.empty((count,) + frames.shape[1:], dtype=inpainted.dtype)
+    fill = inpainted[:, runs.region]
+    for start in range(0, count, chunk):
+        end = min(start + chunk, count)
+        out[start:end] = frames[start:end]
+        out[start:end, runs.region] = fill[runs.index[start:end]]
+    return out
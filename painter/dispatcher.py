@@ -0,0 +1,695 @@
+"""
+One Studio-compatible API in front of several worker processes.
+
+``make run`` starts a single executor, so a box with several GPUs (or many
+CPU cores) runs one prompt at a time. The dispatcher starts N workers, each
+pinned to a device (``CUDA_VISIBLE_DEVICES``) or a CPU set, and serves
+``/prompt``, ``/ws``, ``/history``, ``/queue``, ``/system_stats``,
+``/ready``, ``/object_info``, ``/view``, ``/metrics`` and the transfer
+endpoints (:mod:`painter.transfer`) on the usual port. ``/metrics`` has
+the dispatcher's own metrics followed by each worker's, labelled
+``worker``. Existing clients, including ``python -m painter batch``, need
+no changes.
+
+Each prompt goes to the healthy worker with the fewest prompts in flight.
+Progress messages from the workers are relayed to the client that queued
+the prompt. A prompt whose ``extra_data`` has ``painter_chunk``
+(``{"window": 120, "overlap": 8}``) is split into overlapping frame ranges,
+as chunked batch jobs are. The ranges run on whichever workers are free,
+and the dispatcher stitches the result into one video under one prompt id.
+"""
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+from aiohttp import WSMsgType, web
+
+from painter.batch import job_frames, stitch_windows, window_jobs
+from painter.chunking import plan_windows
+from painter.ffmpeg import FFmpegError
+from painter.metrics import CONTENT_TYPE, Registry, merge_labelled
+from painter.transfer import Transfers
+from painter.workflow import FRAME_CAP, LOAD_VIDEO, VIDEO_COMBINE, apply_job
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+STUDIO_DIR = PROJECT_ROOT / "Studio"
+FINISHED = ("execution_success", "execution_error", "execution_interrupted")
+# Prompt ids remembered for messages that arrive before the POST returns or after the prompt finished
+RECENT = 256
+# Headers of a worker's /view response that the dispatcher passes on
+PASSED_HEADERS = ("Content-Type", "Content-Length", "Content-Range", "Accept-Ranges", "Last-Modified", "ETag")
+
+
+@dataclass
+class Worker:
+    """One executor process (or an already running server at ``url``)."""
+
+    name: str
+    url: str
+    command: Optional[List[str]] = None
+    env: Dict[str, str] = field(default_factory=dict)
+    cpus: Optional[List[int]] = None
+    cwd: Optional[str] = None
+    process: Optional[subprocess.Popen] = None
+    inflight: int = 0
+    submitted: int = 0
+    healthy: bool = False
+    queue_remaining: int = 0
+    running: Optional[str] = None
+
+    def start(self) -> None:
+        """Launch ``command`` pinned to ``cpus``; a worker without a command is external."""
+        if self.command is None or self.process is not None:
+            return
+        cpus = self.cpus
+        preexec = (lambda: os.sched_setaffinity(0, cpus)) if cpus and hasattr(os, "sched_setaffinity") else None
+        self.process = subprocess.Popen(self.command, cwd=self.cwd, env={**os.environ, **self.env},
+                                        preexec_fn=preexec)
+        logger.info("%s: started pid %d on %s (%s)", self.name, self.process.pid, self.url, self.placement)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    @property
+    def placement(self) -> str:
+        if "CUDA_VISIBLE_DEVICES" in self.env:
+            return f"cuda:{self.env['CUDA_VISIBLE_DEVICES']}"
+        return f"cpus {self.cpus[0]}-{self.cpus[-1]}" if self.cpus else "unpinned"
+
+
+@dataclass
+class _Route:
+    """Where a worker prompt runs and who hears about it."""
+
+    worker: Worker
+    client_id: Optional[str]
+    relay: bool
+    done: "asyncio.Future[Optional[str]]"
+
+
+def plan_workers(
+    count: int,
+    base_port: int = 8190,
+    devices: Optional[Sequence[str]] = None,
+    cpus_per_worker: Optional[int] = None,
+    standin: bool = False,
+    studio_dir: Path = STUDIO_DIR,
+    extra_args: Sequence[str] = (),
+) -> List[Worker]:
+    """
+    ``count`` workers on consecutive ports from ``base_port``.
+
+    With ``devices``, worker i sees only ``devices[i % len(devices)]``.
+    Without, workers run on CPU and split this process's CPUs into disjoint
+    sets of ``cpus_per_worker`` (default: an even share). ``standin`` runs
+    ``python -m painter standin`` instead of Studio, for local scaling tests.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    per = cpus_per_worker or max(1, len(available) // count)
+    workers = []
+    for index in range(count):
+        port = base_port + index
+        env: Dict[str, str] = {}
+        cpus = None
+        if devices:
+            env["CUDA_VISIBLE_DEVICES"] = str(devices[index % len(devices)])
+        else:
+            start = (index * per) % len(available)
+            cpus = (available[start:] + available[:start])[:per]
+            env.update(OMP_NUM_THREADS=str(len(cpus)), MKL_NUM_THREADS=str(len(cpus)))
+        if standin:
+            command = [sys.executable, "-m", "painter", "standin", "--port", str(port), *extra_args]
+            cwd = str(PROJECT_ROOT)
+        else:
+            command = [sys.executable, "main.py", "--listen", "127.0.0.1", "--port", str(port), *extra_args]
+            if not devices:
+                command.append("--cpu")
+            cwd = str(studio_dir)
+        workers.append(Worker(f"worker-{index}", f"http://127.0.0.1:{port}", command, env, cpus, cwd))
+    return workers
+
+
+def _literal(prompt: Dict[str, Any], value: Any) -> Any:
+    """Follow a ``[node_id, slot]`` link to a JWInteger-style literal."""
+    if isinstance(value, list) and len(value) == 2:
+        return prompt.get(str(value[0]), {}).get("inputs", {}).get("value")
+    return value
+
+
+def _prompt_job(prompt: Dict[str, Any], prompt_id: str, chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """The chunked-job view of a compiled painter prompt, for window planning and stitching."""
+    load = prompt[LOAD_VIDEO]["inputs"]
+    job: Dict[str, Any] = {"id": prompt_id, "video": load["video"],
+                           "skip_first_frames": int(load.get("skip_first_frames", 0))}
+    cap = _literal(prompt, load.get("frame_load_cap", [FRAME_CAP, 0]))
+    if cap:
+        job["frame_load_cap"] = int(cap)
+    prefix = prompt.get(VIDEO_COMBINE, {}).get("inputs", {}).get("filename_prefix")
+    if prefix:
+        job["output_prefix"] = prefix
+    if chunk.get("frames"):
+        job["frames"] = int(chunk["frames"])
+    return job
+
+
+def _view_url(worker: Worker, output: Dict[str, Any]) -> str:
+    query = urlencode({"filename": output["filename"], "subfolder": output.get("subfolder", ""),
+                       "type": output.get("type", "output")})
+    return f"{worker.url}/view?{query}"
+
+
+class Dispatcher:
+    """aiohttp front end that routes prompts to :class:`Worker` servers."""
+
+    def __init__(
+        self,
+        workers: List[Worker],
+        input_dir: Optional[Path] = None,
+        output_dir: Optional[Path] = None,
+        reconnect_delay: float = 1.0,
+    ):
+        if not workers:
+            raise ValueError("at least one worker is required")
+        self.workers = workers
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.reconnect_delay = reconnect_delay
+        # worker prompt id -> route, while it is queued or running
+        self._routes: Dict[str, _Route] = {}
+        self._finished: Dict[str, _Route] = {}
+        self._early: Dict[str, List[Dict[str, Any]]] = {}
+        self._history: Dict[str, Dict[str, Any]] = {}
+        self._clients: Dict[str, web.WebSocketResponse] = {}
+        self._client_ids = {worker.name: f"painter-dispatch-{worker.name}-{uuid.uuid4().hex[:8]}"
+                            for worker in workers}
+        self._tasks: List["asyncio.Task[Any]"] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._number = 0
+        self.metrics = Registry()
+        self.transfers = Transfers(input_dir, output_dir)
+        self.metrics.gauge("painter_dispatch_inflight", "Prompts in flight per worker",
+                           lambda: {(("worker", w.name),): w.inflight for w in self.workers})
+        self.metrics.counter("painter_dispatch_submitted_total", "Prompts sent to each worker",
+                             lambda: {(("worker", w.name),): w.submitted for w in self.workers})
+        self.metrics.gauge("painter_dispatch_worker_up", "1 while the worker's progress socket is connected",
+                           lambda: {(("worker", w.name),): int(w.healthy) for w in self.workers})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 << 20)
+        app.router.add_post("/prompt", self.post_prompt)
+        app.router.add_get("/prompt", self.get_prompt)
+        app.router.add_get("/history", self.get_history_all)
+        app.router.add_get("/history/{prompt_id}", self.get_history)
+        app.router.add_get("/queue", self.get_queue)
+        app.router.add_post("/interrupt", self.post_interrupt)
+        app.router.add_get("/system_stats", self.get_system_stats)
+        app.router.add_get("/ready", self.get_ready)
+        app.router.add_get("/object_info", self.get_object_info)
+        app.router.add_get("/view", self.view)
+        app.router.add_get("/metrics", self.get_metrics)
+        app.router.add_get("/ws", self.websocket)
+        self.transfers.add_routes(app.router)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def _start(self, app: web.Application) -> None:
+        self._session = aiohttp.ClientSession()
+        self._tasks = [asyncio.create_task(self._listen(worker)) for worker in self.workers]
+
+    async def _stop(self, app: web.Application) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for ws in list(self._clients.values()):
+            await ws.close()
+        await self._session.close()
+
+    # Routing
+
+    def choose(self) -> Worker:
+        """The healthy worker with the fewest prompts in flight (then the fewest submitted)."""
+        candidates = [w for w in self.workers if w.healthy] or self.workers
+        return min(candidates, key=lambda w: (w.inflight, w.submitted))
+
+    async def _submit(
+        self, body: Dict[str, Any], client_id: Optional[str], relay: bool,
+    ) -> Tuple[int, Dict[str, Any], Optional[_Route]]:
+        """Queue ``body`` on the least-loaded worker that accepts it; ``(status, response json, route)``."""
+        tried = set()
+        last_error = "no workers"
+        while len(tried) < len(self.workers):
+            worker = self.choose() if not tried else min(
+                (w for w in self.workers if w.name not in tried), key=lambda w: (not w.healthy, w.inflight))
+            tried.add(worker.name)
+            forwarded = dict(body, client_id=self._client_ids[worker.name])
+            # Reserve the slot before awaiting, so concurrent submissions spread out
+            worker.inflight += 1
+            try:
+                async with self._session.post(f"{worker.url}/prompt", json=forwarded) as resp:
+                    data = await resp.json(content_type=None)
+                    status = resp.status
+            except (aiohttp.ClientError, json.JSONDecodeError) as e:
+                worker.inflight -= 1
+                worker.healthy = False
+                last_error = f"{worker.name}: {e}"
+                logger.warning("could not queue on %s: %s", worker.name, e)
+                continue
+            if status != 200 or "prompt_id" not in data:
+                worker.inflight -= 1
+                return status, data, None
+            worker.submitted += 1
+            prompt_id = data["prompt_id"]
+            route = _Route(worker, client_id, relay, asyncio.get_running_loop().create_future())
+            self._routes[prompt_id] = route
+            for message in self._early.pop(prompt_id, []):
+                await self._on_message(worker, message)
+            return status, data, route
+        return 503, {"error": {"type": "no_worker", "message": last_error}, "node_errors": {}}, None
+
+    def _finish(self, prompt_id: str, error: Optional[str]) -> None:
+        route = self._routes.pop(prompt_id, None)
+        if route is None:
+            return
+        route.worker.inflight = max(0, route.worker.inflight - 1)
+        if route.worker.running == prompt_id:
+            route.worker.running = None
+        if not route.done.done():
+            route.done.set_result(error)
+        self._finished[prompt_id] = route
+        while len(self._finished) > RECENT:
+            del self._finished[next(iter(self._finished))]
+
+    # Worker progress sockets
+
+    async def _listen(self, worker: Worker) -> None:
+        url = worker.url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+        while True:
+            try:
+                async with self._session.ws_connect(f"{url}/ws?clientId={self._client_ids[worker.name]}",
+                                                    heartbeat=30) as ws:
+                    worker.healthy = True
+                    await self._recover(worker)
+                    async for msg in ws:
+                        if msg.type == WSMsgType.TEXT:
+                            await self._on_message(worker, json.loads(msg.data))
+                        elif msg.type == WSMsgType.BINARY:
+                            await self._relay_binary(worker, msg.data)
+                        elif msg.type in (WSMsgType.CLOSED, WSMsgType.ERROR):
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logger.debug("%s progress socket: %s", worker.name, e)
+            worker.healthy = False
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _recover(self, worker: Worker) -> None:
+        """Resolve prompts on ``worker`` that finished while its socket was down."""
+        for prompt_id, route in list(self._routes.items()):
+            if route.worker is not worker:
+                continue
+            try:
+                entry = await self._worker_json(worker, f"/history/{prompt_id}")
+            except (aiohttp.ClientError, json.JSONDecodeError):
+                return
+            if prompt_id in entry:
+                status = entry[prompt_id].get("status", {})
+                self._finish(prompt_id, None if status.get("status_str", "success") == "success" else "error")
+
+    async def _on_message(self, worker: Worker, message: Dict[str, Any]) -> None:
+        kind, data = message.get("type"), message.get("data") or {}
+        if kind == "status":
+            worker.queue_remaining = data.get("status", {}).get("exec_info", {}).get("queue_remaining", 0)
+            await self._broadcast(self._status())
+            return
+        prompt_id = data.get("prompt_id") if isinstance(data, dict) else None
+        if not prompt_id:
+            return
+        route = self._routes.get(prompt_id)
+        if route is None:
+            finished = self._finished.get(prompt_id)
+            if finished is not None:
+                if finished.relay:
+                    await self._send(finished.client_id, message)
+            else:
+                # The worker can report progress before its POST /prompt response arrives
+                self._early.setdefault(prompt_id, []).append(message)
+                while len(self._early) > RECENT:
+                    del self._early[next(iter(self._early))]
+            return
+        if kind == "execution_start":
+            worker.running = prompt_id
+        if route.relay:
+            await self._send(route.client_id, message)
+        if kind in FINISHED or (kind == "executing" and data.get("node") is None):
+            error = None
+            if kind == "execution_error":
+                error = data.get("exception_message") or "execution error"
+            elif kind == "execution_interrupted":
+                error = "interrupted"
+            self._finish(prompt_id, error)
+
+    async def _relay_binary(self, worker: Worker, payload: bytes) -> None:
+        route = self._routes.get(worker.running) if worker.running else None
+        if route is not None and route.relay:
+            ws = self._clients.get(route.client_id) if route.client_id else None
+            if ws is not None and not ws.closed:
+                await ws.send_bytes(payload)
+
+    def _status(self) -> Dict[str, Any]:
+        remaining = sum(w.queue_remaining for w in self.workers)
+        return {"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}}}}
+
+    async def _send(self, client_id: Optional[str], message: Dict[str, Any]) -> None:
+        if client_id is None:
+            await self._broadcast(message)
+            return
+        ws = self._clients.get(client_id)
+        if ws is not None and not ws.closed:
+            await ws.send_json(message)
+
+    async def _broadcast(self, message: Dict[str, Any]) -> None:
+        for ws in list(self._clients.values()):
+            if not ws.closed:
+                await ws.send_json(message)
+
+    async def _worker_json(self, worker: Worker, path: str) -> Any:
+        async with self._session.get(f"{worker.url}{path}") as resp:
+            return await resp.json(content_type=None)
+
+    # Chunked prompts
+
+    async def _run_window(self, prompt: Dict[str, Any], extra_data: Dict[str, Any]) -> Tuple[Worker, str, Dict[str, Any]]:
+        status, data, route = await self._submit({"prompt": prompt, "extra_data": extra_data}, None, relay=False)
+        if route is None:
+            raise RuntimeError(f"window rejected ({status}): {json.dumps(data)[:300]}")
+        prompt_id, worker = data["prompt_id"], route.worker
+        try:
+            error = await route.done
+        except asyncio.CancelledError:
+            await self._cancel(worker, prompt_id)
+            raise
+        if error:
+            raise RuntimeError(f"{worker.name}: {error}")
+        entry = (await self._worker_json(worker, f"/history/{prompt_id}")).get(prompt_id, {})
+        return worker, prompt_id, entry.get("outputs", {})
+
+    async def _cancel(self, worker: Worker, prompt_id: str) -> None:
+        """Take ``prompt_id`` off ``worker``'s queue, or interrupt it if it is already running."""
+        try:
+            async with self._session.post(f"{worker.url}/queue", json={"delete": [prompt_id]}):
+                pass
+            if worker.running == prompt_id:
+                async with self._session.post(f"{worker.url}/interrupt", json={"prompt_id": prompt_id}):
+                    pass
+        except aiohttp.ClientError as e:
+            logger.warning("could not cancel %s on %s: %s", prompt_id, worker.name, e)
+        self._finish(prompt_id, "cancelled")
+
+    async def _run_chunked(self, prompt_id: str, number: int, body: Dict[str, Any], client_id: Optional[str]) -> None:
+        prompt, extra_data = body["prompt"], dict(body.get("extra_data") or {})
+        chunk = extra_data.pop("painter_chunk")
+        started = time.time()
+        await self._send(client_id, {"type": "execution_start", "data": {"prompt_id": prompt_id}})
+        outputs: Dict[str, Any] = {}
+        error = None
+        try:
+            job = _prompt_job(prompt, prompt_id, chunk)
+            windows = plan_windows(job_frames(job, self.input_dir), int(chunk["window"]), int(chunk.get("overlap", 0)))
+            prompts = [apply_job(prompt, subjob) for subjob in window_jobs(job, windows)]
+            tasks = [asyncio.create_task(self._run_window(window, extra_data)) for window in prompts]
+            try:
+                parts = await asyncio.gather(*tasks)
+            except BaseException:
+                # One window failed: the others' results would be thrown away, so stop them
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            sources = [_view_url(worker, window_outputs[VIDEO_COMBINE]["gifs"][0]) for worker, _, window_outputs in parts]
+            loop = asyncio.get_running_loop()
+            output = await loop.run_in_executor(
+                None, stitch_windows, job, windows, sources, prompt, self.input_dir, self.output_dir,
+            )
+            outputs = {
+                VIDEO_COMBINE: {"gifs": [output]},
+                "windows": [{"worker": worker.name, "prompt_id": window_id, "start": window.start,
+                             "frames": window.length} for (worker, window_id, _), window in zip(parts, windows)],
+            }
+        except (KeyError, IndexError, ValueError, RuntimeError, FFmpegError, OSError, aiohttp.ClientError) as e:
+            error = str(e)
+            logger.error("chunked prompt %s failed: %s", prompt_id, e)
+
+        self._history[prompt_id] = {
+            "prompt": [number, prompt_id, prompt, body.get("extra_data") or {}],
+            "outputs": outputs,
+            "status": {"status_str": "error" if error else "success", "completed": error is None, "messages": []},
+        }
+        if error:
+            await self._send(client_id, {"type": "execution_error", "data": {
+                "prompt_id": prompt_id, "node_id": LOAD_VIDEO, "exception_message": error,
+            }})
+            return
+        logger.info("chunked prompt %s: %d windows in %.1fs", prompt_id, len(parts), time.time() - started)
+        await self._send(client_id, {"type": "executed", "data": {
+            "node": VIDEO_COMBINE, "output": outputs[VIDEO_COMBINE], "prompt_id": prompt_id,
+        }})
+        await self._send(client_id, {"type": "execution_success", "data": {"prompt_id": prompt_id}})
+        await self._send(client_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+
+    # HTTP API
+
+    async def post_prompt(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return web.json_response({"error": "invalid JSON", "node_errors": {}}, status=400)
+        prompt = body.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            return web.json_response({"error": "no prompt", "node_errors": {}}, status=400)
+        client_id = body.get("client_id")
+
+        if (body.get("extra_data") or {}).get("painter_chunk"):
+            self._number += 1
+            prompt_id = str(uuid.uuid4())
+            task = asyncio.create_task(self._run_chunked(prompt_id, self._number, body, client_id))
+            self._tasks.append(task)
+            task.add_done_callback(self._tasks.remove)
+            return web.json_response({"prompt_id": prompt_id, "number": self._number, "node_errors": {}})
+
+        status, data, _ = await self._submit(body, client_id, relay=True)
+        return web.json_response(data, status=status)
+
+    async def get_prompt(self, request: web.Request) -> web.Response:
+        remaining = sum(w.queue_remaining for w in self.workers)
+        return web.json_response({"exec_info": {"queue_remaining": remaining}})
+
+    async def get_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info["prompt_id"]
+        if prompt_id in self._history:
+            return web.json_response({prompt_id: self._history[prompt_id]})
+        for worker in self.workers:
+            try:
+                entry = await self._worker_json(worker, f"/history/{prompt_id}")
+            except (aiohttp.ClientError, json.JSONDecodeError):
+                continue
+            if entry:
+                return web.json_response(entry)
+        return web.json_response({})
+
+    async def get_history_all(self, request: web.Request) -> web.Response:
+        merged: Dict[str, Any] = {}
+        for worker in self.workers:
+            try:
+                merged.update(await self._worker_json(worker, "/history"))
+            except (aiohttp.ClientError, json.JSONDecodeError):
+                continue
+        merged.update(self._history)
+        return web.json_response(merged)
+
+    async def get_queue(self, request: web.Request) -> web.Response:
+        running: List[Any] = []
+        pending: List[Any] = []
+        for worker in self.workers:
+            try:
+                queue = await self._worker_json(worker, "/queue")
+            except (aiohttp.ClientError, json.JSONDecodeError):
+                continue
+            running.extend(queue.get("queue_running", []))
+            pending.extend(queue.get("queue_pending", []))
+        return web.json_response({"queue_running": running, "queue_pending": pending})
+
+    async def post_interrupt(self, request: web.Request) -> web.Response:
+        for worker in self.workers:
+            try:
+                async with self._session.post(f"{worker.url}/interrupt"):
+                    pass
+            except aiohttp.ClientError:
+                continue
+        return web.Response(status=200)
+
+    async def get_system_stats(self, request: web.Request) -> web.Response:
+        system: Dict[str, Any] = {}
+        devices: List[Any] = []
+        workers = []
+        for worker in self.workers:
+            try:
+                stats = await self._worker_json(worker, "/system_stats")
+                system = system or stats.get("system", {})
+                devices.extend(dict(device, worker=worker.name) for device in stats.get("devices", []))
+                reachable = True
+            except (aiohttp.ClientError, json.JSONDecodeError):
+                reachable = False
+            workers.append({"name": worker.name, "url": worker.url, "placement": worker.placement,
+                            "reachable": reachable, "inflight": worker.inflight, "submitted": worker.submitted})
+        return web.json_response({"system": system, "devices": devices, "workers": workers})
+
+    async def get_ready(self, request: web.Request) -> web.Response:
+        # Workers are warm before the dispatcher serves; after that, ready while any is connected
+        workers = {worker.name: worker.healthy for worker in self.workers}
+        ready = any(workers.values())
+        return web.json_response({"ready": ready, "workers": workers}, status=200 if ready else 503)
+
+    async def get_object_info(self, request: web.Request) -> web.Response:
+        for worker in sorted(self.workers, key=lambda w: not w.healthy):
+            try:
+                return web.json_response(await self._worker_json(worker, "/object_info"))
+            except (aiohttp.ClientError, json.JSONDecodeError):
+                continue
+        return web.json_response({"error": "no worker reachable"}, status=503)
+
+    async def view(self, request: web.Request) -> web.StreamResponse:
+        if self.output_dir is not None and request.query.get("type", "output") == "output":
+            root = self.output_dir.resolve()
+            path = (root / request.query.get("subfolder", "") / request.query.get("filename", "")).resolve()
+            if root in path.parents and path.is_file():
+                return web.FileResponse(path)
+        # Pass ranges through, so a client can resume or seek in a worker's output
+        headers = {name: request.headers[name] for name in ("Range", "If-Range") if name in request.headers}
+        for worker in self.workers:
+            try:
+                upstream = await self._session.get(f"{worker.url}/view", params=request.query, headers=headers)
+            except aiohttp.ClientError:
+                continue
+            async with upstream:
+                if upstream.status not in (200, 206):
+                    continue
+                passed = {name: upstream.headers[name] for name in PASSED_HEADERS if name in upstream.headers}
+                passed.setdefault("Content-Type", "application/octet-stream")
+                response = web.StreamResponse(status=upstream.status, headers=passed)
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_chunked(1 << 16):
+                    await response.write(chunk)
+            await response.write_eof()
+            return response
+        raise web.HTTPNotFound()
+
+    async def _worker_metrics(self, worker: Worker) -> Optional[str]:
+        try:
+            async with self._session.get(f"{worker.url}/metrics", timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                return await resp.text() if resp.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        # The dispatcher's own metrics, then every reachable worker's with a worker label
+        texts = await asyncio.gather(*(self._worker_metrics(worker) for worker in self.workers))
+        workers = {worker.name: text for worker, text in zip(self.workers, texts) if text is not None}
+        body = self.metrics.render() + merge_labelled(workers, "worker")
+        return web.Response(body=body.encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self._clients[client_id] = ws
+        status = self._status()
+        status["data"]["sid"] = client_id
+        await ws.send_json(status)
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            if self._clients.get(client_id) is ws:
+                del self._clients[client_id]
+        return ws
+
+
+async def _worker_ready(session: aiohttp.ClientSession, worker: Worker) -> bool:
+    """Whether ``worker`` answers ``/ready``, or ``/system_stats`` when it has no ``/ready``."""
+    timeout = aiohttp.ClientTimeout(total=2)
+    async with session.get(f"{worker.url}/ready", timeout=timeout) as resp:
+        if resp.status != 404:
+            status = await resp.json(content_type=None) if resp.status == 503 else {}
+            if status.get("state") == "failed":
+                raise RuntimeError(f"{worker.name} failed to warm up: {status.get('error')}")
+            return resp.status == 200
+    # Studio without the Painter node pack: it is ready once it answers
+    async with session.get(f"{worker.url}/system_stats", timeout=timeout) as resp:
+        return resp.status == 200
+
+
+async def wait_until_ready(workers: List[Worker], timeout: float = 600.0) -> None:
+    """
+    Poll each worker's ``/ready`` until it answers 200, so a warming-up
+    worker (``PAINTER_WARMUP=1``) gets no prompts before its warm-up has
+    run. Raises if one exits, fails to warm up or times out.
+    """
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        for worker in workers:
+            while True:
+                if worker.process is not None and worker.process.poll() is not None:
+                    raise RuntimeError(f"{worker.name} exited with code {worker.process.returncode}")
+                try:
+                    if await _worker_ready(session, worker):
+                        break
+                except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError):
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{worker.name} was not ready on {worker.url} within {timeout:.0f}s")
+                await asyncio.sleep(0.5)
+            logger.info("%s ready on %s", worker.name, worker.url)
+
+
+def serve(
+    workers: List[Worker],
+    host: str = "127.0.0.1",
+    port: int = 8188,
+    input_dir: Optional[Path] = None,
+    output_dir: Optional[Path] = None,
+    ready_timeout: float = 600.0,
+) -> None:
+    """Start the workers, serve the dispatcher until interrupted, then stop them."""
+    for worker in workers:
+        worker.start()
+    try:
+        asyncio.run(wait_until_ready(workers, ready_timeout))
+        dispatcher = Dispatcher(workers, input_dir=input_dir, output_dir=output_dir)
+        web.run_app(dispatcher.app(), host=host, port=port)
+    finally:
+        for worker in workers:
+            worker.stop()
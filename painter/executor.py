@@ -0,0 +1,194 @@
+"""
+Execute an API prompt in-process, without a Studio server.
+
+Only what the CPU benchmark needs: nodes reachable from output nodes run
+once each in dependency order, links are resolved to upstream outputs, and
+every node's wall time is recorded. Lazy inputs follow Studio's contract: a
+node with a ``check_lazy_status`` method runs only the upstream nodes of the
+lazy inputs it asks for, so an untaken branch is skipped. There is no
+validation, caching or partial re-execution; Studio remains the way to
+serve prompts.
+"""
+import contextlib
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set
+
+from painter import profiler as profiling
+
+
+class ExecutionError(RuntimeError):
+    """Raised when a prompt cannot be executed, naming the failing node."""
+
+
+def _is_link(value: Any) -> bool:
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+@dataclass
+class ExecutionReport:
+    """Per-node outputs and timings of one execution."""
+
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    ui: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    order: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    wall_time: float = 0.0
+
+
+def _output_nodes(prompt: Dict[str, Any], node_types: Mapping[str, Any]) -> List[str]:
+    wanted = [node_id for node_id, node in prompt.items()
+              if getattr(node_types[node["class_type"]], "OUTPUT_NODE", False)]
+    return sorted(wanted, key=lambda n: (len(n), n))
+
+
+def lazy_inputs(cls: Any) -> Set[str]:
+    """Inputs declared ``{"lazy": True}`` by a node class with ``check_lazy_status``."""
+    if not hasattr(cls, "check_lazy_status"):
+        return set()
+    names = set()
+    for group in cls.INPUT_TYPES().values():
+        for name, spec in (group or {}).items():
+            if isinstance(spec, tuple) and len(spec) > 1 and isinstance(spec[1], dict) and spec[1].get("lazy"):
+                names.add(name)
+    return names
+
+
+def execution_order(prompt: Dict[str, Any], node_types: Mapping[str, Any]) -> List[str]:
+    """
+    Ids of the nodes that feed an output node, dependencies first.
+
+    Ties are broken by node id so the order is deterministic. This is the
+    full plan: nodes behind lazy inputs are included whether or not they end
+    up running.
+    """
+    for node_id, node in prompt.items():
+        if node["class_type"] not in node_types:
+            raise ExecutionError(f"node {node_id}: unknown type {node['class_type']!r}")
+    wanted = _output_nodes(prompt, node_types)
+    if not wanted:
+        raise ExecutionError("prompt has no output nodes")
+
+    order: List[str] = []
+    state: Dict[str, str] = {}
+
+    def visit(node_id: str, path: List[str]) -> None:
+        if state.get(node_id) == "done":
+            return
+        if state.get(node_id) == "visiting":
+            raise ExecutionError(f"cycle through nodes {' -> '.join(path + [node_id])}")
+        if node_id not in prompt:
+            raise ExecutionError(f"node {path[-1]} links to missing node {node_id}")
+        state[node_id] = "visiting"
+        inputs = prompt[node_id]["inputs"]
+        for name in sorted(inputs):
+            if _is_link(inputs[name]):
+                visit(inputs[name][0], path + [node_id])
+        state[node_id] = "done"
+        order.append(node_id)
+
+    for node_id in wanted:
+        visit(node_id, [])
+    return order
+
+
+def execute(
+    prompt: Dict[str, Any],
+    node_types: Mapping[str, Any],
+    on_node: Optional[Callable[[str, str, float], None]] = None,
+    profiler: Optional[profiling.Profiler] = None,
+) -> ExecutionReport:
+    """
+    Run ``prompt`` with node classes from ``node_types``.
+
+    ``on_node(node_id, class_type, seconds)`` is called after each node.
+    With a ``profiler``, every node and the sub-spans inside it are recorded,
+    and so is each planned node that a lazy input left unevaluated.
+    """
+    plan = execution_order(prompt, node_types)
+    report = ExecutionReport()
+    with profiling.activate(profiler) if profiler else contextlib.nullcontext():
+        started = time.perf_counter()
+        runner = _Runner(prompt, node_types, report, on_node, profiler)
+        for node_id in _output_nodes(prompt, node_types):
+            runner.evaluate(node_id)
+        report.wall_time = time.perf_counter() - started
+        report.skipped = [node_id for node_id in plan if node_id not in report.outputs]
+        if profiler is not None:
+            for node_id in report.skipped:
+                profiler.skip(node_id, prompt[node_id]["class_type"])
+    return report
+
+
+class _Runner:
+    """Evaluates nodes on demand, so lazy inputs nobody asks for never run."""
+
+    def __init__(self, prompt, node_types, report, on_node, profiler):
+        self.prompt = prompt
+        self.node_types = node_types
+        self.report = report
+        self.on_node = on_node
+        self.profiler = profiler
+
+    def _value(self, node_id: str, name: str, value: Any) -> Any:
+        source, slot = value
+        try:
+            return self.report.outputs[source][slot]
+        except (IndexError, TypeError):
+            raise ExecutionError(f"node {node_id} input {name!r}: node {source} has no output {slot}")
+
+    def _kwargs(self, node_id: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolved inputs; links to nodes that have not run (lazy ones) are passed as None."""
+        kwargs = {}
+        for name, value in inputs.items():
+            if _is_link(value):
+                value = self._value(node_id, name, value) if value[0] in self.report.outputs else None
+            kwargs[name] = value
+        return kwargs
+
+    def evaluate(self, node_id: str) -> None:
+        if node_id in self.report.outputs:
+            return
+        node = self.prompt[node_id]
+        cls = self.node_types[node["class_type"]]
+        inputs = node["inputs"]
+        lazy = lazy_inputs(cls)
+        for name in sorted(inputs):
+            if name not in lazy and _is_link(inputs[name]):
+                self.evaluate(inputs[name][0])
+
+        instance = cls()
+        while lazy:
+            requested = instance.check_lazy_status(**self._kwargs(node_id, inputs)) or []
+            pending = [inputs[name][0] for name in requested
+                       if name in lazy and _is_link(inputs.get(name)) and inputs[name][0] not in self.report.outputs]
+            if not pending:
+                break
+            for source in pending:
+                self.evaluate(source)
+        self._call(node_id, node, instance, self._kwargs(node_id, inputs))
+
+    def _call(self, node_id: str, node: Dict[str, Any], instance: Any, kwargs: Dict[str, Any]) -> None:
+        function = getattr(instance, type(instance).FUNCTION)
+        t = time.perf_counter()
+        try:
+            if self.profiler is None:
+                result = function(**kwargs)
+            else:
+                with self.profiler.node(node_id, node["class_type"], kwargs) as record:
+                    result = function(**kwargs)
+                    record.outputs(result)
+        except Exception as e:
+            raise ExecutionError(f"node {node_id} ({node['class_type']}): {e}") from e
+        elapsed = time.perf_counter() - t
+
+        if isinstance(result, dict):
+            if "ui" in result:
+                self.report.ui[node_id] = result["ui"]
+            result = result.get("result", ())
+        self.report.outputs[node_id] = tuple(result or ())
+        self.report.timings[node_id] = elapsed
+        self.report.order.append(node_id)
+        if self.on_node is not None:
+            self.on_node(node_id, node["class_type"], elapsed)
@@ -0,0 +1,236 @@
+"""
+Stream uint8 RGB frames in and out of ffmpeg through pipes.
+
+Frames never touch intermediate image files and are read or written one at
+a time, so memory stays proportional to a single frame regardless of clip
+length.
+"""
+import json
+import re
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+# VHS_VideoCombine format -> (extension, codec, pix_fmt)
+OUTPUT_FORMATS = {
+    "video/ffv1-mkv": (".mkv", "ffv1", "bgr0"),
+    "video/h264-mp4": (".mp4", "libx264", "yuv420p"),
+}
+
+
+class FFmpegError(RuntimeError):
+    """Raised when an ffmpeg or ffprobe process fails."""
+
+
+def ffmpeg_exe() -> str:
+    """Return the ffmpeg binary, preferring the system one over imageio-ffmpeg's."""
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        raise FFmpegError("ffmpeg not found (install ffmpeg or imageio-ffmpeg)") from None
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+@dataclass
+class VideoInfo:
+    """Basic properties of a video stream."""
+
+    width: int
+    height: int
+    fps: float
+    frames: int
+    has_audio: bool = False
+
+
+def _parse_rate(rate: str) -> float:
+    num, _, den = rate.partition("/")
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+def _probe_ffprobe(exe: str, source: str) -> VideoInfo:
+    cmd = [exe, "-v", "error", "-show_entries",
+           "stream=codec_type,width,height,avg_frame_rate,r_frame_rate,nb_frames:format=duration",
+           "-of", "json", source]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise FFmpegError(f"ffprobe failed for {source}: {proc.stderr.strip()}")
+    data = json.loads(proc.stdout)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise FFmpegError(f"No video stream in {source}")
+    fps = _parse_rate(video.get("avg_frame_rate", "0/0") if video.get("avg_frame_rate") != "0/0"
+                      else video.get("r_frame_rate", "0/1"))
+    frames = int(video.get("nb_frames") or 0)
+    if not frames:
+        frames = int(round(float(data.get("format", {}).get("duration", 0)) * fps))
+    return VideoInfo(
+        width=int(video["width"]), height=int(video["height"]), fps=fps, frames=frames,
+        has_audio=any(s.get("codec_type") == "audio" for s in streams),
+    )
+
+
+def _probe_header(source: str) -> VideoInfo:
+    proc = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", source], capture_output=True, text=True)
+    header = proc.stderr
+    video = re.search(r"Stream #\S+.*?: Video: .*?(\d{2,5})x(\d{2,5}).*?(?:([\d.]+) fps|([\d.]+) tbr)", header)
+    if not video:
+        raise FFmpegError(f"Could not read video stream from {source}: {header.strip()[-300:]}")
+    fps = float(video.group(3) or video.group(4))
+    duration = re.search(r"Duration: (\d+):(\d+):([\d.]+)", header)
+    seconds = 0.0
+    if duration:
+        h, m, s = duration.groups()
+        seconds = int(h) * 3600 + int(m) * 60 + float(s)
+    return VideoInfo(
+        width=int(video.group(1)), height=int(video.group(2)), fps=fps,
+        frames=int(round(seconds * fps)), has_audio=bool(re.search(r"Stream #\S+.*?: Audio:", header)),
+    )
+
+
+def probe(source: str) -> VideoInfo:
+    """Return size, frame rate, frame count and audio presence of ``source``."""
+    exe = shutil.which("ffprobe")
+    if exe:
+        return _probe_ffprobe(exe, str(source))
+    # imageio-ffmpeg ships ffmpeg only; the header estimate is exact for CFR clips
+    return _probe_header(str(source))
+
+
+class FrameReader:
+    """Iterate decoded RGB frames of a video as ``(H, W, 3)`` uint8 arrays."""
+
+    def __init__(
+        self,
+        source: str,
+        start: int = 0,
+        count: Optional[int] = None,
+        size: Optional[Sequence[int]] = None,
+        info: Optional[VideoInfo] = None,
+    ):
+        self.source = str(source)
+        self.info = info or probe(self.source)
+        self.width, self.height = size or (self.info.width, self.info.height)
+        self.start = start
+        self.count = count
+        self._proc: Optional[subprocess.Popen] = None
+
+    def _command(self) -> List[str]:
+        filters = []
+        if self.start:
+            filters.append(f"trim=start_frame={self.start},setpts=PTS-STARTPTS")
+        if (self.width, self.height) != (self.info.width, self.info.height):
+            filters.append(f"scale={self.width}:{self.height}:flags=lanczos")
+        cmd = [ffmpeg_exe(), "-v", "error", "-nostdin", "-i", self.source, "-map", "0:v:0"]
+        if filters:
+            cmd += ["-vf", ",".join(filters)]
+        if self.count is not None:
+            cmd += ["-frames:v", str(self.count)]
+        # Without passthrough the rawvideo muxer pads trimmed clips with duplicated frames
+        return cmd + ["-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        frame_bytes = self.width * self.height * 3
+        self._proc = subprocess.Popen(self._command(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                buf = self._proc.stdout.read(frame_bytes)
+                if len(buf) < frame_bytes:
+                    break
+                yield np.frombuffer(buf, dtype=np.uint8).reshape(self.height, self.width, 3)
+        finally:
+            self.close()
+
+    def read(self, n: Optional[int] = None) -> np.ndarray:
+        """Read up to ``n`` frames (all remaining if None) into one array."""
+        frames = []
+        for frame in self:
+            frames.append(frame)
+            if n is not None and len(frames) >= n:
+                break
+        if not frames:
+            return np.empty((0, self.height, self.width, 3), dtype=np.uint8)
+        return np.stack(frames)
+
+    def close(self) -> None:
+        if self._proc is not None:
+            self._proc.stdout.close()
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+
+class FrameWriter:
+    """Encode uint8 RGB frames by streaming them into ffmpeg's stdin."""
+
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        fps: float,
+        codec: str = "libx264",
+        crf: int = 19,
+        preset: str = "medium",
+        pix_fmt: str = "yuv420p",
+        threads: int = 0,
+        audio_source: Optional[str] = None,
+        audio_offset: float = 0.0,
+    ):
+        self.path = str(path)
+        self.width = width
+        self.height = height
+        self.frames = 0
+        cmd = [ffmpeg_exe(), "-v", "error", "-y",
+               "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", f"{fps}", "-i", "-"]
+        if audio_source:
+            if audio_offset:
+                cmd += ["-ss", f"{audio_offset}"]
+            cmd += ["-i", str(audio_source), "-map", "0:v:0", "-map", "1:a?", "-c:a", "copy", "-shortest"]
+        cmd += ["-c:v", codec, "-pix_fmt", pix_fmt, "-threads", str(threads)]
+        if codec in ("libx264", "libx265"):
+            cmd += ["-crf", str(crf), "-preset", preset]
+        cmd.append(self.path)
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, frames: np.ndarray) -> None:
+        """Write one ``(H, W, 3)`` frame or an ``(N, H, W, 3)`` batch."""
+        if frames.dtype != np.uint8:
+            raise TypeError(f"FrameWriter expects uint8 frames, got {frames.dtype}")
+        if frames.shape[-3:] != (self.height, self.width, 3):
+            raise ValueError(f"Frame shape {frames.shape} does not match {self.height}x{self.width}x3")
+        self._proc.stdin.write(memoryview(np.ascontiguousarray(frames)).cast("B"))
+        self.frames += 1 if frames.ndim == 3 else len(frames)
+
+    def close(self) -> None:
+        self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode(errors="replace").strip()
+            self._stderr.close()
+            raise FFmpegError(f"ffmpeg failed writing {self.path}: {message}")
+        self._stderr.close()
+
+    def abort(self) -> None:
+        self._proc.kill()
+        self._proc.wait()
+        self._stderr.close()
@@ -0,0 +1,124 @@
+"""
+Persistent cache of decoded video frames.
+
+Re-queuing the same clip with different sampler settings would otherwise
+decode it again every time. Decoded frames are stored as uint8 ``.npy``
+files keyed by the source file's hash and the load parameters, and a hit is
+an ``np.load(mmap_mode="r")`` instead of an ffmpeg run.
+"""
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from painter.cache import ArrayCache, cache_dir, cache_key, env_bytes, file_digest
+
+# VHS_LoadVideo inputs that change which frames come out, and at what size
+LOAD_PARAMETERS = (
+    "force_rate",
+    "custom_width",
+    "custom_height",
+    "frame_load_cap",
+    "skip_first_frames",
+    "select_every_nth",
+)
+
+_frame_cache: Optional[ArrayCache] = None
+_frame_cache_lock = threading.Lock()
+
+
+def frame_cache() -> ArrayCache:
+    """
+    Process-wide decoded-frame cache under ``cache_dir()/frames``.
+
+    The disk budget is ``PAINTER_FRAME_CACHE_MB`` (default 20480; 0 disables
+    the cache). Frames never stay in the memory tier; the page cache already
+    keeps recently used mmaps resident.
+    """
+    global _frame_cache
+    with _frame_cache_lock:
+        if _frame_cache is None:
+            disk = env_bytes("PAINTER_FRAME_CACHE_MB", 20480)
+            _frame_cache = ArrayCache(
+                memory_bytes=0,
+                spill_dir=cache_dir() / "frames" if disk else None,
+                disk_bytes=disk,
+                name="frames",
+            )
+        return _frame_cache
+
+
+def frame_key(path: str, parameters: Dict[str, Any], decoder: str = "vhs") -> str:
+    """
+    Cache key for ``path`` loaded with the given VHS_LoadVideo inputs.
+
+    ``decoder`` keeps entries from different decoders (and their different
+    metadata) apart.
+    """
+    selected = {name: parameters.get(name) for name in LOAD_PARAMETERS}
+    return cache_key("frames", decoder, file_digest(path), selected)
+
+
+def to_uint8(images: np.ndarray, chunk: int = 16) -> np.ndarray:
+    """
+    Convert float frames in ``[0, 1]`` to uint8, exactly inverting ``x / 255``.
+
+    Works ``chunk`` frames at a time so the float temporaries stay small.
+    """
+    images = np.asarray(images)
+    out = np.empty(images.shape, dtype=np.uint8)
+    for start in range(0, len(images), chunk):
+        scaled = images[start:start + chunk].astype(np.float32) * 255.0
+        np.clip(np.rint(scaled, out=scaled), 0, 255, out=scaled)
+        out[start:start + chunk] = scaled
+    return out
+
+
+def to_float(frames_u8: np.ndarray, chunk: int = 16) -> np.ndarray:
+    """
+    Convert uint8 frames (possibly mmap'd) to float32 ``x / 255``.
+
+    Reads ``chunk`` frames at a time, so an mmap'd clip is paged in once.
+    """
+    out = np.empty(frames_u8.shape, dtype=np.float32)
+    for start in range(0, len(frames_u8), chunk):
+        np.divide(frames_u8[start:start + chunk], np.float32(255), out=out[start:start + chunk])
+    return out
+
+
+def store(
+    cache: ArrayCache,
+    key: str,
+    frames: np.ndarray,
+    meta: Dict[str, Any],
+    audio: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Cache uint8 ``frames`` with JSON ``meta`` and an optional audio waveform.
+
+    The metadata entry is written last and only counts as a hit when the
+    frames (and audio, if any) are still cached, so a partly evicted entry
+    is a miss rather than a broken result.
+    """
+    if frames.dtype != np.uint8:
+        raise ValueError(f"Expected uint8 frames, got {frames.dtype}")
+    cached = cache.put(key, frames)
+    if audio is not None:
+        cache.put(f"{key}-audio", audio)
+    meta = dict(meta, has_audio=audio is not None)
+    cache.put(f"{key}-meta", np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8))
+    return cached
+
+
+def load(cache: ArrayCache, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any], Optional[np.ndarray]]]:
+    """Return ``(frames, meta, audio)`` for ``key``, or None on a miss."""
+    meta_bytes = cache.get(f"{key}-meta")
+    if meta_bytes is None:
+        return None
+    meta = json.loads(bytes(meta_bytes).decode())
+    frames = cache.get(key)
+    audio = cache.get(f"{key}-audio") if meta.get("has_audio") else None
+    if frames is None or (meta.get("has_audio") and audio is None):
+        return None
+    return frames, meta, audio
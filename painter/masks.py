@@ -0,0 +1,87 @@
+"""
+Static mask helpers.
+
+A watermark mask is the same for every frame, so it is prepared once
+(binarised, dilated) and then broadcast to the clip length as a zero-stride
+view instead of being copied per frame. Consumers that slice a subvideo
+window out of the broadcast batch only ever touch that window's frames.
+
+Prepared masks are also cached across prompts (see :func:`mask_cache`): the
+same few mask files are reused for thousands of clips at a handful of sizes.
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+
+from painter.cache import ArrayCache, cache_dir, env_bytes
+
+
+def to_binary(mask: np.ndarray, threshold: float = 0.5) -> np.ndarray:
+    """Collapse an ``(H, W)``, ``(H, W, C)`` or ``(1, H, W, C)`` mask to a bool ``(H, W)`` array."""
+    mask = np.asarray(mask)
+    if mask.ndim == 4:
+        if mask.shape[0] != 1:
+            raise ValueError(f"Expected a single mask image, got a batch of {mask.shape[0]}")
+        mask = mask[0]
+    if mask.ndim == 3:
+        mask = mask.max(axis=-1)
+    if mask.dtype == np.uint8:
+        return mask >= threshold * 255
+    return mask >= threshold
+
+
+def dilate(mask: np.ndarray, iterations: int) -> np.ndarray:
+    """
+    Binary dilation with a 3x3 cross, repeated ``iterations`` times.
+
+    Matches ``scipy.ndimage.binary_dilation(mask, iterations=n)`` and
+    ``cv2.dilate`` with ``MORPH_CROSS``, which is what DiffuEraser's
+    ``mask_dilation_iter`` applies per frame.
+    """
+    out = np.asarray(mask, dtype=bool).copy()
+    for _ in range(max(0, iterations)):
+        grown = out.copy()
+        grown[1:, :] |= out[:-1, :]
+        grown[:-1, :] |= out[1:, :]
+        grown[:, 1:] |= out[:, :-1]
+        grown[:, :-1] |= out[:, 1:]
+        out = grown
+    return out
+
+
+def broadcast(frame: np.ndarray, count: int) -> np.ndarray:
+    """Return a read-only ``(count, ...)`` view of ``frame`` without copying it."""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    return np.broadcast_to(frame, (count,) + frame.shape)
+
+
+def is_broadcast(batch: np.ndarray) -> bool:
+    """True if every frame of ``batch`` shares the same memory."""
+    return batch.ndim > 0 and batch.shape[0] > 1 and batch.strides[0] == 0
+
+
+_mask_cache: Optional[ArrayCache] = None
+_mask_cache_lock = threading.Lock()
+
+
+def mask_cache() -> ArrayCache:
+    """
+    Process-wide cache of prepared (resized, binarised, dilated) masks.
+
+    Sized by ``PAINTER_MASK_CACHE_MB`` (memory, default 256) and
+    ``PAINTER_MASK_DISK_MB`` (spill under ``cache_dir()/masks``, default 1024;
+    0 disables the spill).
+    """
+    global _mask_cache
+    with _mask_cache_lock:
+        if _mask_cache is None:
+            disk = env_bytes("PAINTER_MASK_DISK_MB", 1024)
+            _mask_cache = ArrayCache(
+                memory_bytes=env_bytes("PAINTER_MASK_CACHE_MB", 256),
+                spill_dir=cache_dir() / "masks" if disk else None,
+                disk_bytes=disk,
+                name="masks",
+            )
+        return _mask_cache
@@ -0,0 +1,293 @@
+"""
+Prometheus metrics in the text exposition format, without a client library.
+
+:class:`Registry` holds counters, gauges and histograms and renders them
+for a ``/metrics`` endpoint. Updates take a short lock per metric; values
+computed at scrape time (queue depth, cache counters) come from callbacks
+that must not block. :class:`PromptMetrics` is the set of per-prompt
+metrics shared by the Studio pack and the stand-in server.
+"""
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+MEMORY_BUCKETS = tuple(float(gb << 30) for gb in (1, 2, 4, 8, 16, 32, 64, 128))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = ((k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic total; ``function`` reads it at scrape time instead of :meth:`inc`."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, function: Optional[Callable[[], Dict[Labels, float]]] = None):
+        super().__init__(name, help)
+        self.function = function
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_labels(labels), 0.0)
+
+    def samples(self):
+        values = self.function() if self.function else dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    """Current value; settable, or read from ``function`` at scrape time."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative buckets plus ``_sum`` and ``_count`` per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [0.0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += value
+
+    def count(self, **labels: Any) -> int:
+        counts = self._values.get(_labels(labels))
+        return int(counts[-2]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            values = {labels: list(counts) for labels, counts in self._values.items()}
+        for labels, counts in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = "+Inf" if math.isinf(bound) else _format_value(bound)
+                yield f"{self.name}_bucket", labels + (("le", le),), count
+            yield f"{self.name}_sum", labels, counts[-1]
+            yield f"{self.name}_count", labels, counts[-2]
+
+
+class Registry:
+    """An ordered set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, function=None) -> Counter:
+        return self.register(Counter(name, help, function))
+
+    def gauge(self, name: str, help: str, function=None) -> Gauge:
+        return self.register(Gauge(name, help, function))
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def merge_labelled(expositions: Dict[str, str], label: str) -> str:
+    """
+    Merge the expositions of several servers, keyed by a name that is added
+    to each of their samples as ``label``. All samples of one metric end up
+    together under a single HELP and TYPE, as the format requires.
+    """
+    families: Dict[str, Dict[str, Any]] = {}
+    for source, text in expositions.items():
+        added = _format_labels(((label, source),))[1:-1]
+        family = None
+        for line in text.splitlines():
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = families.setdefault(parts[2], {"samples": []})
+                    family.setdefault(parts[1], line)
+                continue
+            if not line.strip():
+                continue
+            name, brace, rest = line.partition("{")
+            if not brace:
+                name, _, rest = line.partition(" ")
+                rest = "} " + rest
+            if family is None:
+                family = families.setdefault(name, {"samples": []})
+            family["samples"].append(f"{name}{{{added}{',' if not rest.startswith('}') else ''}{rest}")
+    lines: List[str] = []
+    for family in families.values():
+        lines.extend(family[kind] for kind in ("HELP", "TYPE") if kind in family)
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _one(value: float) -> Dict[Labels, float]:
+    return {(): value}
+
+
+def _cache_counters(caches: Callable[[], Dict[str, Any]], attribute: str) -> Callable[[], Dict[Labels, float]]:
+    def read() -> Dict[Labels, float]:
+        # Plain attribute reads: scrapes must not wait on a cache or model load holding the lock
+        return {(("cache", name),): float(getattr(cache, attribute)) for name, cache in caches().items()}
+
+    return read
+
+
+def _hit_ratio(caches: Callable[[], Dict[str, Any]]) -> Callable[[], Dict[Labels, float]]:
+    def read() -> Dict[Labels, float]:
+        ratios = {}
+        for name, cache in caches().items():
+            lookups = cache.hits + cache.misses
+            ratios[(("cache", name),)] = cache.hits / lookups if lookups else 0.0
+        return ratios
+
+    return read
+
+
+class PromptMetrics:
+    """
+    Per-prompt latency, throughput and memory, plus queue, model and cache
+    gauges read at scrape time.
+
+    ``queue`` returns ``(pending, running)``; ``caches`` returns the live
+    caches by name (anything with ``hits``/``misses``, e.g. ``ArrayCache``);
+    ``models`` returns the model residency manager or None.
+    """
+
+    def __init__(
+        self,
+        queue: Callable[[], Tuple[int, int]],
+        caches: Callable[[], Dict[str, Any]] = dict,
+        models: Callable[[], Any] = lambda: None,
+    ):
+        self.registry = Registry()
+        self._started: Dict[str, float] = {}
+        r = self.registry
+        r.gauge("painter_queue_pending", "Prompts waiting to run", lambda: _one(queue()[0]))
+        r.gauge("painter_queue_running", "Prompts running", lambda: _one(queue()[1]))
+        self.prompts = r.counter("painter_prompts_total", "Finished prompts by status")
+        self.wait = r.histogram("painter_prompt_wait_seconds", "Time from queueing to execution start")
+        self.run = r.histogram("painter_prompt_run_seconds", "Execution time by status")
+        self.frames = r.counter("painter_frames_processed_total", "Frames written by finished prompts")
+        self.fps = r.gauge("painter_last_prompt_frames_per_second", "Frames/s of the last prompt that reported frames")
+        self.peak = r.histogram("painter_prompt_peak_rss_bytes", "Peak process RSS while a prompt ran",
+                                MEMORY_BUCKETS)
+        self.last_peak = r.gauge("painter_last_prompt_peak_rss_bytes", "Peak process RSS of the last prompt")
+
+        def model_stat(attribute):
+            def read():
+                residency = models()
+                return _one(float(getattr(residency, attribute))) if residency is not None else {}
+            return read
+
+        r.counter("painter_model_loads_total", "Model loads (residency misses)", model_stat("misses"))
+        r.counter("painter_model_load_seconds_total", "Time spent loading models", model_stat("load_seconds"))
+        r.gauge("painter_model_last_load_seconds", "Duration of the most recent model load",
+                model_stat("last_load_seconds"))
+        r.gauge("painter_model_resident_bytes", "Estimated size of resident models", model_stat("resident_bytes"))
+
+        def all_caches():
+            found = dict(caches())
+            residency = models()
+            if residency is not None:
+                found["models"] = residency
+            return found
+
+        r.counter("painter_cache_hits_total", "Cache hits", _cache_counters(all_caches, "hits"))
+        r.counter("painter_cache_misses_total", "Cache misses", _cache_counters(all_caches, "misses"))
+        r.gauge("painter_cache_hit_ratio", "Hits over lookups since start", _hit_ratio(all_caches))
+
+    def start(self, prompt_id: str, queued_at: Optional[float] = None, now: Optional[float] = None) -> None:
+        """Record that ``prompt_id`` started; ``queued_at`` is a ``time.time()`` timestamp."""
+        now = time.time() if now is None else now
+        self._started[prompt_id] = now
+        if queued_at is not None:
+            self.wait.observe(max(0.0, now - queued_at))
+
+    def finish(
+        self,
+        prompt_id: str,
+        status: str,
+        frames: int = 0,
+        peak_rss: int = 0,
+        now: Optional[float] = None,
+    ) -> None:
+        """Record the end of ``prompt_id``; unknown prompts only count towards the total."""
+        now = time.time() if now is None else now
+        self.prompts.inc(status=status)
+        started = self._started.pop(prompt_id, None)
+        if started is None:
+            return
+        elapsed = now - started
+        self.run.observe(elapsed, status=status)
+        if frames:
+            self.frames.inc(frames)
+            if elapsed > 0:
+                self.fps.set(frames / elapsed)
+        if peak_rss:
+            self.peak.observe(peak_rss)
+            self.last_peak.set(peak_rss)
+
+    def render(self) -> str:
+        return self.registry.render()
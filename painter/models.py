@@ -0,0 +1,431 @@
+"""
+Fetch the workflow's model files listed in ``models.json``: ``python -m painter models``.
+
+Each manifest entry gives a ``url``, the ``path`` under ``Studio/models``
+and, once pinned, the file's ``size`` and ``sha256``. A file is fetched
+over several connections, each requesting its own byte range, into a
+``.part`` file. A small JSON sidecar records how far each range got, so an
+interrupted download resumes where it stopped. The finished file is hashed
+and compared with the pinned digest before it is renamed into place. When
+an entry has no ``sha256``, the digest the server publishes is used
+instead: Hugging Face sends an ``X-Linked-ETag`` with each LFS file. Run
+``--pin`` to record the digest of what was fetched, and
+``--require-pinned`` to refuse entries that have no pinned digest.
+
+Downloads land in a shared cache first (``PAINTER_MODEL_CACHE``, default
+``~/.cache/hanzo-painter/models``), one file per SHA-256. From there they
+are hard-linked into the models folder, or copied across filesystems. Pods
+that mount the same volume, or several Studio installs on one host, fetch
+each file only once; a lock on the partial file keeps two of them from
+downloading it at the same time. Files already in the models folder are
+stamped with their size, mtime and digest in ``.painter-models.json``, so
+they are not re-hashed on every boot.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from painter.cache import cache_dir
+from painter.transfer import sha256_file
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = Path(__file__).resolve().parent.parent / "models.json"
+STAMPS = ".painter-models.json"
+# Ranges smaller than this are not split further
+MIN_SEGMENT = 16 << 20
+READ_SIZE = 1 << 20
+# Bytes written between saves of a partial download's progress
+SAVE_EVERY = 64 << 20
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ModelError(RuntimeError):
+    """Raised when a model cannot be fetched or does not match its manifest entry."""
+
+
+@dataclass
+class ModelSpec:
+    """One manifest entry."""
+
+    name: str
+    url: str
+    path: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+
+
+@dataclass
+class FetchResult:
+    """What happened to one model."""
+
+    name: str
+    status: str  # "present", "cached", "downloaded" or "failed"
+    seconds: float = 0.0
+    downloaded: int = 0
+    sha256: Optional[str] = None
+    size: Optional[int] = None
+    error: str = ""
+
+
+def load_manifest(path: Path = MANIFEST) -> List[ModelSpec]:
+    with open(path) as f:
+        return [ModelSpec(**entry) for entry in json.load(f)["models"]]
+
+
+def save_manifest(specs: Sequence[ModelSpec], path: Path = MANIFEST) -> None:
+    with open(path, "w") as f:
+        json.dump({"models": [asdict(spec) for spec in specs]}, f, indent=2)
+        f.write("\n")
+
+
+def model_cache_dir() -> Path:
+    return Path(os.environ.get("PAINTER_MODEL_CACHE") or cache_dir() / "models")
+
+
+def split_ranges(size: int, connections: int, min_segment: int = MIN_SEGMENT) -> List[List[int]]:
+    """``[start, end exclusive, done]`` for each connection's share of ``size`` bytes."""
+    count = max(1, min(connections, size // max(min_segment, 1)))
+    bounds = [size * i // count for i in range(count + 1)]
+    return [[bounds[i], bounds[i + 1], 0] for i in range(count)]
+
+
+def _published_digest(response: aiohttp.ClientResponse) -> Optional[str]:
+    for hop in [*response.history, response]:
+        value = hop.headers.get("X-Linked-ETag", "").strip('"').lower()
+        if DIGEST.match(value):
+            return value
+    return None
+
+
+def _published_size(response: aiohttp.ClientResponse) -> Optional[int]:
+    if response.headers.get("Content-Length"):
+        return int(response.headers["Content-Length"])
+    for hop in response.history:
+        if hop.headers.get("X-Linked-Size"):
+            return int(hop.headers["X-Linked-Size"])
+    return None
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+class _FileLock:
+    """Exclusive ``flock`` on a file, held across processes and hosts sharing a volume."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+@dataclass
+class ModelFetcher:
+    """Fetch manifest entries into ``models_dir`` through a shared ``cache``."""
+
+    models_dir: Path
+    cache: Optional[Path] = field(default_factory=model_cache_dir)
+    connections: int = 8
+    retries: int = 5
+    retry_delay: float = 1.0
+    min_segment: int = MIN_SEGMENT
+    require_pinned: bool = False
+
+    def __post_init__(self):
+        self.models_dir = Path(self.models_dir)
+        self.cache = Path(self.cache) if self.cache is not None else None
+        self._stamps: Dict[str, Dict[str, Any]] = {}
+
+    # Stamps of files already in place
+
+    def _load_stamps(self) -> None:
+        try:
+            self._stamps = json.loads((self.models_dir / STAMPS).read_text())
+        except (OSError, ValueError):
+            self._stamps = {}
+
+    def _save_stamps(self) -> None:
+        self.models_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.models_dir / (STAMPS + ".tmp")
+        tmp.write_text(json.dumps(self._stamps, indent=2))
+        os.replace(tmp, self.models_dir / STAMPS)
+
+    def _stamp(self, spec: ModelSpec, digest: str) -> None:
+        st = (self.models_dir / spec.path).stat()
+        self._stamps[spec.path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+    def _present_digest(self, spec: ModelSpec) -> Optional[str]:
+        """Digest of the file already at ``spec.path`` if it is the right one, hashing it only when unstamped."""
+        target = self.models_dir / spec.path
+        if not target.is_file():
+            return None
+        st = target.stat()
+        if spec.size is not None and st.st_size != spec.size:
+            logger.warning("%s is not %d bytes; fetching it again", target, spec.size)
+            return None
+        stamp = self._stamps.get(spec.path, {})
+        if stamp.get("size") == st.st_size and stamp.get("mtime_ns") == st.st_mtime_ns:
+            digest = stamp["sha256"]
+        else:
+            digest = sha256_file(target)
+        if spec.sha256 and digest != spec.sha256:
+            logger.warning("%s does not match its sha256; fetching it again", target)
+            return None
+        return digest
+
+    # Cache
+
+    def _blob(self, digest: str) -> Path:
+        return self.cache / "sha256" / digest
+
+    def _url_digests(self) -> Dict[str, str]:
+        try:
+            return json.loads((self.cache / "urls.json").read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _remember_url(self, url: str, digest: str) -> None:
+        known = self._url_digests()
+        known[url] = digest
+        tmp = self.cache / f"urls.json.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(known, indent=2))
+        os.replace(tmp, self.cache / "urls.json")
+
+    def _cached(self, spec: ModelSpec) -> Optional[Path]:
+        if self.cache is None:
+            return None
+        digest = spec.sha256 or self._url_digests().get(spec.url)
+        blob = self._blob(digest) if digest else None
+        if blob is not None and blob.is_file() and (spec.size is None or blob.stat().st_size == spec.size):
+            return blob
+        return None
+
+    # Fetching
+
+    async def fetch_all(self, specs: Sequence[ModelSpec]) -> List[FetchResult]:
+        """Fetch every entry; failures are reported, not raised."""
+        self._load_stamps()
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+        connector = aiohttp.TCPConnector(limit=self.connections)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                results = []
+                for spec in specs:
+                    results.append(await self.fetch(session, spec))
+        finally:
+            self._save_stamps()
+        return results
+
+    async def fetch(self, session: aiohttp.ClientSession, spec: ModelSpec) -> FetchResult:
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        target = self.models_dir / spec.path
+        try:
+            if self.require_pinned and not (spec.sha256 and spec.size is not None):
+                raise ModelError(f"{spec.name} has no pinned size and sha256; run with --pin and commit the manifest")
+            digest = await loop.run_in_executor(None, self._present_digest, spec)
+            if digest is not None:
+                self._stamp(spec, digest)
+                return FetchResult(spec.name, "present", time.monotonic() - started, sha256=digest,
+                                   size=target.stat().st_size)
+
+            blob = await loop.run_in_executor(None, self._cached, spec)
+            downloaded = 0
+            if blob is None:
+                blob, downloaded = await self._download(session, spec)
+            if blob != target:
+                await loop.run_in_executor(None, _link_or_copy, blob, target)
+            digest = spec.sha256 or (blob.name if self.cache is not None else None)
+            if digest is None:
+                digest = await loop.run_in_executor(None, sha256_file, target)
+            self._stamp(spec, digest)
+            status = "downloaded" if downloaded else "cached"
+            logger.info("%s %s to %s", spec.name, status, target)
+            return FetchResult(spec.name, status, time.monotonic() - started, downloaded, digest,
+                               target.stat().st_size)
+        except (ModelError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logger.error("%s: %s", spec.name, e)
+            return FetchResult(spec.name, "failed", time.monotonic() - started, error=str(e))
+
+    async def _download(self, session: aiohttp.ClientSession, spec: ModelSpec) -> Tuple[Path, int]:
+        """Download ``spec`` and return the verified file (in the cache when there is one) and the bytes fetched."""
+        loop = asyncio.get_running_loop()
+        key = hashlib.sha256(spec.url.encode()).hexdigest()
+        if self.cache is not None:
+            part = self.cache / "partial" / f"{key}.part"
+        else:
+            part = self.models_dir / (spec.path + ".part")
+        part.parent.mkdir(parents=True, exist_ok=True)
+
+        lock = _FileLock(part.with_suffix(".lock"))
+        await loop.run_in_executor(None, lock.acquire)
+        try:
+            # Another process may have finished it while this one waited
+            blob = await loop.run_in_executor(None, self._cached, spec)
+            if blob is not None:
+                return blob, 0
+            async with session.head(spec.url, allow_redirects=True) as head:
+                head.raise_for_status()
+                size = spec.size if spec.size is not None else _published_size(head)
+                expected = spec.sha256 or _published_digest(head)
+                ranged = head.headers.get("Accept-Ranges", "").lower() == "bytes"
+            if size is not None and ranged:
+                downloaded = await self._ranged(session, spec.url, part, size)
+            else:
+                downloaded = await self._streamed(session, spec.url, part)
+
+            actual = await loop.run_in_executor(None, sha256_file, part)
+            actual_size = part.stat().st_size
+            if (expected and actual != expected) or (size is not None and actual_size != size):
+                part.unlink()
+                part.with_suffix(".json").unlink(missing_ok=True)
+                raise ModelError(f"{spec.name}: got {actual_size} bytes hashing to {actual}, "
+                                 f"expected {size} bytes hashing to {expected}")
+            if expected is None:
+                logger.warning("%s has no pinned sha256; run with --pin to record %s", spec.name, actual)
+            await loop.run_in_executor(None, _fsync, part)
+            if self.cache is not None:
+                blob = self._blob(actual)
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(part, blob)
+                self._remember_url(spec.url, actual)
+            else:
+                blob = self.models_dir / spec.path
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(part, blob)
+            part.with_suffix(".json").unlink(missing_ok=True)
+            return blob, downloaded
+        finally:
+            lock.release()
+
+    async def _ranged(self, session: aiohttp.ClientSession, url: str, part: Path, size: int) -> int:
+        """Fill ``part`` with ``size`` bytes over several connections, resuming recorded progress."""
+        loop = asyncio.get_running_loop()
+        progress_path = part.with_suffix(".json")
+        segments = None
+        if part.exists() and part.stat().st_size == size:
+            try:
+                saved = json.loads(progress_path.read_text())
+                if saved.get("url") == url and saved.get("size") == size:
+                    segments = saved["segments"]
+            except (OSError, ValueError, KeyError):
+                pass
+        if segments is None:
+            segments = split_ranges(size, self.connections, self.min_segment)
+            with open(part, "wb") as f:
+                f.truncate(size)
+
+        def save() -> None:
+            tmp = progress_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"url": url, "size": size, "segments": segments}))
+            os.replace(tmp, progress_path)
+
+        fd = os.open(part, os.O_WRONLY)
+        fetched = [0]
+        unsaved = [0]
+
+        async def segment(entry: List[int]) -> None:
+            failures = 0
+            while entry[0] + entry[2] < entry[1]:
+                offset = entry[0] + entry[2]
+                if failures > self.retries:
+                    raise ModelError(f"range {offset}-{entry[1]} of {url} keeps failing")
+                try:
+                    headers = {"Range": f"bytes={offset}-{entry[1] - 1}"}
+                    async with session.get(url, headers=headers) as resp:
+                        if resp.status != 206:
+                            raise ModelError(f"server ignored the range request ({resp.status})")
+                        async for block in resp.content.iter_chunked(READ_SIZE):
+                            block = block[:entry[1] - entry[0] - entry[2]]
+                            await loop.run_in_executor(None, os.pwrite, fd, block, entry[0] + entry[2])
+                            entry[2] += len(block)
+                            fetched[0] += len(block)
+                            unsaved[0] += len(block)
+                            if unsaved[0] >= SAVE_EVERY:
+                                unsaved[0] = 0
+                                await loop.run_in_executor(None, save)
+                    if entry[0] + entry[2] == offset:
+                        failures += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    failures += 1
+                    if failures > self.retries:
+                        raise
+                    logger.warning("range %d-%d of %s interrupted (%s); retrying", offset, entry[1], url, e)
+                    await asyncio.sleep(self.retry_delay * failures)
+
+        try:
+            await asyncio.gather(*(segment(entry) for entry in segments))
+        finally:
+            await loop.run_in_executor(None, save)
+            os.close(fd)
+        return fetched[0]
+
+    async def _streamed(self, session: aiohttp.ClientSession, url: str, part: Path) -> int:
+        """Fetch ``url`` in one request, for servers that do not serve ranges or sizes."""
+        loop = asyncio.get_running_loop()
+        fetched = 0
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            f = await loop.run_in_executor(None, open, part, "wb")
+            try:
+                async for block in resp.content.iter_chunked(READ_SIZE):
+                    await loop.run_in_executor(None, f.write, block)
+                    fetched += len(block)
+            finally:
+                await loop.run_in_executor(None, f.close)
+        return fetched
+
+
+def _fsync(path: Path) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def pin(specs: Sequence[ModelSpec], results: Sequence[FetchResult]) -> List[ModelSpec]:
+    """``specs`` with ``size`` and ``sha256`` filled in from successful results."""
+    fetched = {result.name: result for result in results if result.status != "failed"}
+    pinned = []
+    for spec in specs:
+        result = fetched.get(spec.name)
+        if result is not None:
+            spec = ModelSpec(spec.name, spec.url, spec.path, result.size, result.sha256)
+        pinned.append(spec)
+    return pinned
+
+
+def format_results(results: Sequence[FetchResult]) -> str:
+    width = max([len(r.name) for r in results] + [5])
+    lines = [f"{'model':<{width}}  {'status':<10}  {'MB':>8}  {'seconds':>7}"]
+    for r in results:
+        lines.append(f"{r.name:<{width}}  {r.status:<10}  {r.downloaded / (1 << 20):>8.1f}  {r.seconds:>7.2f}"
+                     + (f"  {r.error}" if r.error else ""))
+    return "\n".join(lines)
@@ -0,0 +1,188 @@
+"""
+Overlap decoding, inpainting and encoding of consecutive windows.
+
+Run as one graph, a clip goes through three serial phases: decode every
+frame, inpaint every frame, then encode. Here each window is its own unit
+of work. The caller's thread inpaints window k (it owns the accelerator)
+while a decoder thread prepares window k+1 and an encoder thread writes
+window k-1. Stages are connected by bounded queues, so at most ``depth``
+windows wait on each side of the sampler; peak memory follows the queue
+depth, not the clip length.
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, TypeVar
+
+from painter.profiler import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+_DONE = object()
+_STOPPED = object()
+_POLL = 0.1
+
+
+class PipelineAborted(RuntimeError):
+    """Raised inside the sink when another stage failed, so it can clean up."""
+
+
+@dataclass
+class PipelineStats:
+    """Per-stage busy time and how many windows were in flight at once."""
+
+    wall_time: float = 0.0
+    items: int = 0
+    busy: Dict[str, float] = field(default_factory=lambda: {"decode": 0.0, "inpaint": 0.0, "encode": 0.0})
+    max_in_flight: int = 0
+    result: Any = None
+
+    @property
+    def serial_time(self) -> float:
+        """Wall time the same work would take with the stages run back to back."""
+        return sum(self.busy.values())
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.busy.items())
+        return (
+            f"{self.items} windows in {self.wall_time:.2f}s ({stages}; "
+            f"serial {self.serial_time:.2f}s, max {self.max_in_flight} in flight)"
+        )
+
+
+class _Pipeline:
+    def __init__(self, depth: int):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.decoded: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+        self.inpainted: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.errors: List[BaseException] = []
+        self.stats = PipelineStats()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def fail(self, error: BaseException) -> None:
+        self.errors.append(error)
+        self.stop.set()
+
+    def track(self, delta: int) -> None:
+        with self._lock:
+            self._in_flight += delta
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self._in_flight)
+
+    def put(self, q: "queue.Queue[Any]", item: Any) -> bool:
+        """Block until ``item`` is queued; False if the pipeline stopped first."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q: "queue.Queue[Any]") -> Any:
+        """Block for the next item; ``_STOPPED`` if the pipeline stopped first."""
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+        return _STOPPED
+
+    def decode(self, source: Iterable[Any]) -> None:
+        iterator = iter(source)
+        try:
+            while not self.stop.is_set():
+                started = time.perf_counter()
+                with span("decode"):
+                    item = next(iterator, _DONE)
+                self.stats.busy["decode"] += time.perf_counter() - started
+                if item is _DONE:
+                    break
+                self.track(1)
+                if not self.put(self.decoded, item):
+                    break
+            self.put(self.decoded, _DONE)
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def results(self) -> Iterator[Any]:
+        while True:
+            item = self.get(self.inpainted)
+            if item is _DONE:
+                return
+            if item is _STOPPED:
+                raise PipelineAborted("pipeline stopped before the last window")
+            started = time.perf_counter()
+            with span("encode"):
+                yield item
+            # Time between handing an item out and asking for the next is encode work
+            self.stats.busy["encode"] += time.perf_counter() - started
+            self.track(-1)
+
+    def encode(self, sink: Callable[[Iterator[Any]], Any]) -> None:
+        try:
+            self.stats.result = sink(self.results())
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            # A sink that stops early must not leave the sampler blocked
+            self.stop.set()
+
+
+def run_pipeline(
+    source: Iterable[T],
+    process: Callable[[T], U],
+    sink: Callable[[Iterator[U]], Any],
+    depth: int = 2,
+) -> PipelineStats:
+    """
+    Run ``process`` on the calling thread over items pulled from ``source``
+    by a decoder thread, feeding results in order to ``sink`` on an encoder
+    thread.
+
+    ``sink`` receives an iterator of results and its return value ends up in
+    ``PipelineStats.result``. The first exception raised by any stage stops
+    the others and is re-raised here.
+    """
+    pipe = _Pipeline(depth)
+    started = time.perf_counter()
+    decoder = threading.Thread(target=pipe.decode, args=(source,), name="painter-decode", daemon=True)
+    encoder = threading.Thread(target=pipe.encode, args=(sink,), name="painter-encode", daemon=True)
+    decoder.start()
+    encoder.start()
+    try:
+        while True:
+            item = pipe.get(pipe.decoded)
+            if item is _DONE or item is _STOPPED:
+                break
+            t = time.perf_counter()
+            with span("inpaint"):
+                result = process(item)
+            pipe.stats.busy["inpaint"] += time.perf_counter() - t
+            pipe.stats.items += 1
+            if not pipe.put(pipe.inpainted, result):
+                break
+        pipe.put(pipe.inpainted, _DONE)
+    except BaseException as e:
+        pipe.fail(e)
+    finally:
+        encoder.join()
+        pipe.stop.set()
+        decoder.join()
+
+    pipe.stats.wall_time = time.perf_counter() - started
+    if pipe.errors:
+        raise pipe.errors[0]
+    logger.info("pipeline: %s", pipe.stats.summary())
+    return pipe.stats
@@ -0,0 +1,355 @@
+"""
+Fit a prompt's frame count and sampler windows to the memory it will run in.
+
+The usual advice for out-of-memory errors is a table of smaller
+``frame_load_cap``, ``video_length``, ``subvideo_length`` and
+``neighbor_length`` values, found by trial and error one crashed job at a
+time. :func:`estimate` instead predicts a job's peak memory from:
+- the source size and frame count;
+- the size node 290 scales to;
+- the dtype the clip is held in;
+- the sampler's window settings.
+
+:func:`plan` shrinks the settings until the prediction fits the memory
+that is actually free, taking the largest values that fit but never more
+than the prompt asked for.
+
+Two pools are checked:
+- Host memory holds the decoded, scaled, mask and output clips.
+- The compute device holds the model and the sampler's working set.
+
+On CPU (``make run-cpu``) both come out of the same RAM. The per-pixel
+constants are starting points. Each planned prompt logs its predicted and
+actual peak, and :func:`calibration_scale` turns those records into the
+factor applied to later estimates.
+"""
+import copy
+import json
+import logging
+import math
+import os
+import statistics
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from painter.cache import MB
+from painter.workflow import FRAME_CAP, LOAD_VIDEO, REPEAT_MASK, SCALE, VIDEO_COMBINE, sampler_id, set_input
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 * MB
+
+# Sampler working set per pixel of the scaled size. Propagation (ProPainter)
+# holds flows, features and masks for every frame of a subvideo and attends
+# over the neighbour and reference frames; diffusion holds UNet and BrushNet
+# activations for ``video_length`` frames at a time.
+PROPAGATION_BYTES_PER_PIXEL = 160
+ATTENTION_BYTES_PER_PIXEL = 320
+DIFFUSION_BYTES_PER_PIXEL = 720
+# DiffuEraser weights (SD1.5 UNet, BrushNet, VAE, text encoder, ProPainter)
+MODEL_BYTES = {"cuda": int(4.5 * GB), "cpu": 9 * GB}
+# Activations are float32 on CPU and mostly half precision on CUDA
+DEVICE_SCALE = {"cuda": 1.0, "cpu": 2.0}
+
+# Smallest values the planner will shrink to, and the knobs in the order they are given up
+MINIMUMS = {"subvideo_length": 10, "neighbor_length": 4, "video_length": 2, "frame_load_cap": 8}
+WINDOW_KNOBS = ("subvideo_length", "video_length", "neighbor_length")
+SHRINK = 0.8
+
+
+@dataclass
+class ClipShape:
+    """What a prompt will load: source and scaled size, frames, and how the clip is held."""
+
+    width: int
+    height: int
+    frames: int
+    scaled_width: int
+    scaled_height: int
+    bytes_per_value: int = 4
+    static_mask: bool = False
+    streaming_window: Optional[int] = None
+
+
+@dataclass
+class Estimate:
+    """Predicted peak bytes per pool and what they are made of."""
+
+    host: int
+    device: int
+    parts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return self.host + self.device
+
+
+@dataclass
+class Plan:
+    """Settings chosen for one prompt and the prediction they were chosen by."""
+
+    device: str
+    settings: Dict[str, int]
+    changed: Dict[str, Tuple[int, int]]
+    estimate: Estimate
+    available: Dict[str, int]
+    fits: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["estimate"]["total"] = self.estimate.total
+        return data
+
+
+def scaled_size(width: int, height: int, inputs: Dict[str, Any], length: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Output size of LayerUtility ImageScaleByAspectRatio V2 for ``aspect_ratio original``.
+
+    ``scale_to_side`` longest, shortest, width or height scales to ``length``
+    (node 284) keeping the aspect ratio. The result is rounded down to
+    ``round_to_multiple``, as node 290 does.
+    """
+    side = inputs.get("scale_to_side", "None")
+    if length and side in ("longest", "shortest", "width", "height"):
+        reference = {"longest": max(width, height), "shortest": min(width, height),
+                     "width": width, "height": height}[side]
+        factor = length / reference
+        width, height = round(width * factor), round(height * factor)
+    multiple = inputs.get("round_to_multiple", "8")
+    multiple = int(multiple) if str(multiple).isdigit() else 1
+    if multiple > 1:
+        width, height = width - width % multiple, height - height % multiple
+    return max(width, 1), max(height, 1)
+
+
+def _literal(prompt: Dict[str, Any], value: Any, default: int = 0) -> int:
+    if isinstance(value, list) and len(value) == 2:
+        value = prompt.get(str(value[0]), {}).get("inputs", {}).get("value", default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def clip_shape(prompt: Dict[str, Any], width: int, height: int, frames: int) -> ClipShape:
+    """
+    The :class:`ClipShape` a compiled prompt loads from a ``width`` x ``height``
+    source of ``frames`` frames, after skip, cap, custom size and optimisation passes.
+    """
+    load = prompt[LOAD_VIDEO]["inputs"]
+    frames -= _literal(prompt, load.get("skip_first_frames", 0))
+    # The cap counts frames after select_every_nth, as the loader does
+    nth = max(_literal(prompt, load.get("select_every_nth", 1), 1), 1)
+    frames = max(math.ceil(frames / nth), 1)
+    cap = _literal(prompt, load.get("frame_load_cap", 0))
+    if cap:
+        frames = min(frames, cap)
+    custom_w, custom_h = _literal(prompt, load.get("custom_width", 0)), _literal(prompt, load.get("custom_height", 0))
+    if custom_w and custom_h:
+        width, height = custom_w, custom_h
+
+    scale = prompt.get(SCALE)
+    if scale is None:
+        scaled = (width, height)
+    elif scale["class_type"] == "PainterScaleFrames":
+        multiple = _literal(prompt, scale["inputs"].get("multiple", 8), 8)
+        scaled = (width - width % multiple, height - height % multiple)
+    else:
+        scaled = scaled_size(width, height, scale["inputs"], _literal(prompt, scale["inputs"].get("scale_to_length")))
+
+    combine = prompt.get(VIDEO_COMBINE, {})
+    streaming = None
+    if combine.get("class_type") == "PainterStreamInpaint":
+        inputs = combine["inputs"]
+        streaming = _literal(prompt, inputs.get("window", 50), 50) * (_literal(prompt, inputs.get("queue_depth", 2), 2) + 2)
+    return ClipShape(
+        width=width, height=height, frames=frames, scaled_width=scaled[0], scaled_height=scaled[1],
+        bytes_per_value=1 if prompt[LOAD_VIDEO]["class_type"] == "PainterLoadFrames" else 4,
+        static_mask=prompt.get(REPEAT_MASK, {}).get("class_type") == "PainterStaticMask",
+        streaming_window=streaming,
+    )
+
+
+def sampler_settings(prompt: Dict[str, Any]) -> Dict[str, int]:
+    """The plannable settings of a prompt: frame cap and the sampler's literal window inputs."""
+    inputs = prompt[sampler_id(prompt)]["inputs"]
+    settings = {knob: int(inputs[knob]) for knob in WINDOW_KNOBS if isinstance(inputs.get(knob), int)}
+    settings["ref_stride"] = int(inputs.get("ref_stride", 10)) if isinstance(inputs.get("ref_stride"), int) else 10
+    return settings
+
+
+def estimate(shape: ClipShape, settings: Dict[str, int], device: str, model_loaded: bool = False,
+             scale: float = 1.0) -> Estimate:
+    """Predicted peak memory of one prompt with ``settings`` on ``device`` ("cuda" or "cpu")."""
+    frames = min(shape.frames, settings.get("frame_load_cap") or shape.frames)
+    held = min(frames, shape.streaming_window) if shape.streaming_window else frames
+    source = shape.width * shape.height * 3 * shape.bytes_per_value
+    pixels = shape.scaled_width * shape.scaled_height
+    scaled = pixels * 3 * shape.bytes_per_value
+    parts = {
+        "decoded": held * source,
+        "scaled": held * scaled if (shape.scaled_width, shape.scaled_height) != (shape.width, shape.height) else 0,
+        "mask": (1 if shape.static_mask else held) * pixels * 3 * 4,
+        "output": held * scaled,
+    }
+
+    subvideo = min(settings.get("subvideo_length", 50), frames)
+    references = math.ceil(subvideo / max(settings.get("ref_stride", 10), 1))
+    attended = min(settings.get("neighbor_length", 10) + references, subvideo)
+    device_scale = DEVICE_SCALE[device]
+    propagation = pixels * (subvideo * PROPAGATION_BYTES_PER_PIXEL + attended * ATTENTION_BYTES_PER_PIXEL)
+    diffusion = pixels * min(settings.get("video_length", 10), frames) * DIFFUSION_BYTES_PER_PIXEL
+    parts["sampler"] = int(max(propagation, diffusion) * device_scale)
+    # The window being inpainted, as float on the host
+    parts["window"] = subvideo * pixels * 3 * 4
+    parts["model"] = 0 if model_loaded else MODEL_BYTES[device]
+
+    host = parts["decoded"] + parts["scaled"] + parts["mask"] + parts["output"] + parts["window"]
+    work = parts["sampler"] + parts["model"]
+    if device == "cpu":
+        host, work = host + work, 0
+    return Estimate(host=int(host * scale), device=int(work * scale), parts=parts)
+
+
+def plan(
+    shape: ClipShape,
+    settings: Dict[str, int],
+    available: Dict[str, int],
+    device: str,
+    headroom: float = 0.9,
+    model_loaded: bool = False,
+    scale: float = 1.0,
+) -> Plan:
+    """
+    Largest settings, no larger than ``settings``, whose estimate fits ``headroom`` of ``available``.
+
+    ``available`` has free bytes for ``"host"`` and, on CUDA, ``"device"``.
+    Window sizes shrink first, whichever saves the most each step. The frame
+    count (``frame_load_cap``) is cut only when the windows are at their
+    minimums, since it shortens the output.
+    """
+    budget = {pool: int(free * headroom) for pool, free in available.items()}
+    requested = dict(settings, frame_load_cap=min(settings.get("frame_load_cap") or shape.frames, shape.frames))
+    current = dict(requested)
+
+    def excess(candidate: Dict[str, int]) -> Tuple[int, int]:
+        e = estimate(shape, candidate, device, model_loaded, scale)
+        return max(0, e.host - budget.get("host", e.host)), max(0, e.device - budget.get("device", e.device))
+
+    def over(candidate: Dict[str, int]) -> int:
+        return sum(excess(candidate))
+
+    while over(current):
+        options = []
+        for knob in WINDOW_KNOBS:
+            if knob in current and current[knob] > MINIMUMS[knob]:
+                smaller = dict(current, **{knob: max(MINIMUMS[knob], int(current[knob] * SHRINK))})
+                options.append((over(smaller), knob, smaller))
+        if options:
+            current = min(options, key=lambda option: (option[0], WINDOW_KNOBS.index(option[1])))[2]
+            continue
+        # Fewer frames only relieve host memory (all of it on CPU); when the
+        # device is what is short, cutting them would shorten the output for nothing
+        if not excess(current)[0] or current["frame_load_cap"] <= MINIMUMS["frame_load_cap"]:
+            break
+        # Host memory is linear in frames: bisect for the largest count that fits
+        low, high = MINIMUMS["frame_load_cap"], current["frame_load_cap"]
+        while low < high:
+            middle = (low + high + 1) // 2
+            if excess(dict(current, frame_load_cap=middle))[0]:
+                high = middle - 1
+            else:
+                low = middle
+        current["frame_load_cap"] = low
+        break
+
+    result = estimate(shape, current, device, model_loaded, scale)
+    changed = {knob: (requested[knob], value) for knob, value in current.items() if value != requested[knob]}
+    return Plan(device=device, settings=current, changed=changed, estimate=result, available=dict(available),
+                fits=not over(current))
+
+
+def plan_prompt(
+    prompt: Dict[str, Any],
+    width: int,
+    height: int,
+    frames: int,
+    available: Dict[str, int],
+    device: str,
+    **options: Any,
+) -> Plan:
+    """:func:`plan` for a compiled prompt whose video is ``width`` x ``height`` with ``frames`` frames."""
+    return plan(clip_shape(prompt, width, height, frames), sampler_settings(prompt), available, device, **options)
+
+
+def apply_plan(prompt: Dict[str, Any], planned: Plan) -> Dict[str, Any]:
+    """Return a copy of ``prompt`` with the planned settings written in."""
+    prompt = copy.deepcopy(prompt)
+    sampler = sampler_id(prompt)
+    for knob, (_, value) in planned.changed.items():
+        if knob == "frame_load_cap":
+            cap = prompt[LOAD_VIDEO]["inputs"].get("frame_load_cap")
+            if isinstance(cap, list) and cap[0] == FRAME_CAP:
+                set_input(prompt, FRAME_CAP, "value", value)
+            else:
+                set_input(prompt, LOAD_VIDEO, "frame_load_cap", value)
+        else:
+            set_input(prompt, sampler, knob, value)
+            # The uint8 and stream samplers split the clip into their own windows first
+            window = prompt[sampler]["inputs"].get("window")
+            if knob == "subvideo_length" and isinstance(window, int) and window > value:
+                set_input(prompt, sampler, "window", value)
+    return prompt
+
+
+def available_memory(device: str, index: Optional[int] = None) -> Dict[str, int]:
+    """Free bytes per pool: available RAM as ``host``, plus free VRAM as ``device`` on CUDA."""
+    import psutil
+
+    free = {"host": int(psutil.virtual_memory().available)}
+    if device == "cuda":
+        import torch
+
+        free["device"] = int(torch.cuda.mem_get_info(index)[0])
+    return free
+
+
+def record(path: Path, prompt_id: str, planned: Plan, actual: Dict[str, int]) -> None:
+    """Append one predicted-vs-actual record to the JSONL calibration log."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {"prompt_id": prompt_id, "device": planned.device, "settings": planned.settings,
+             "predicted": {"host": planned.estimate.host, "device": planned.estimate.device},
+             "actual": actual, "parts": planned.estimate.parts}
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def calibration_scale(records: Iterable[Dict[str, Any]], last: int = 50) -> float:
+    """
+    Factor to multiply estimates by: the upper quartile of actual/predicted
+    over the ``last`` records, so most jobs land under their prediction.
+    """
+    ratios = []
+    for entry in list(records)[-last:]:
+        predicted = sum(entry["predicted"].values())
+        actual = sum(entry["actual"].values())
+        if predicted > 0 and actual > 0:
+            ratios.append(actual / predicted)
+    if not ratios:
+        return 1.0
+    if len(ratios) < 4:
+        return max(ratios)
+    return statistics.quantiles(ratios, n=4)[-1]
+
+
+def load_scale(path: Path) -> float:
+    """``PAINTER_PLAN_SCALE``, else the calibration factor from the log at ``path``, else 1."""
+    if os.environ.get("PAINTER_PLAN_SCALE"):
+        return float(os.environ["PAINTER_PLAN_SCALE"])
+    try:
+        with open(path) as f:
+            records: List[Dict[str, Any]] = [json.loads(line) for line in f if line.strip()]
+    except (OSError, json.JSONDecodeError):
+        return 1.0
+    return calibration_scale(records)
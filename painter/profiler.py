@@ -0,0 +1,348 @@
+"""
+Per-node execution profiler with Chrome trace export.
+
+A :class:`Profiler` records one span per executed node (wall time, CPU
+time, RSS delta and peak, accelerator allocator delta, and the shapes and
+dtypes of the outputs) plus nested sub-spans: explicit ones opened with
+:func:`span` anywhere in node code, and one per ``forward`` call of the
+models a node was given. For DiffuEraser that makes every subvideo and
+every UNet denoising step visible.
+
+Profiling is opt-in per prompt. While no profiler is active, :func:`span`
+returns a shared no-op context manager and nothing else runs.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_NULL = contextlib.nullcontext()
+_active: Optional["Profiler"] = None
+
+MB = 1 << 20
+
+
+def current() -> Optional["Profiler"]:
+    """The active profiler, or None when profiling is off."""
+    return _active
+
+
+@contextlib.contextmanager
+def activate(profiler: "Profiler") -> Iterator["Profiler"]:
+    """Make ``profiler`` the active one for the duration of the block."""
+    global _active
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+
+
+def span(name: str, **args: Any):
+    """Record a sub-span under the active profiler; a no-op when profiling is off."""
+    profiler = _active
+    if profiler is None:
+        return _NULL
+    return profiler.span(name, **args)
+
+
+def _rss() -> int:
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's high-water mark (Linux only) so a node's own peak can be read."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """Peak RSS since the last :func:`reset_peak_rss` (or process start), 0 where unknown."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _allocator() -> Optional[Any]:
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.cuda if torch.cuda.is_available() else None
+
+
+def describe(value: Any, limit: int = 8) -> Any:
+    """Shapes and dtypes of tensors and arrays in a node output, for the trace."""
+    if hasattr(value, "shape") and hasattr(value, "dtype"):
+        described = {"shape": list(value.shape), "dtype": str(value.dtype)}
+        device = str(getattr(value, "device", "cpu"))
+        if device != "cpu":
+            described["device"] = device
+        return described
+    if isinstance(value, (list, tuple)):
+        items = [describe(item, limit) for item in value[:limit]]
+        return items + [f"... {len(value) - limit} more"] if len(value) > limit else items
+    if isinstance(value, dict):
+        return {str(k): describe(v, limit) for k, v in list(value.items())[:limit]}
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= 80 else value[:77] + "..."
+    return type(value).__name__
+
+
+def find_modules(value: Any, prefix: str = "", depth: int = 3, _seen: Optional[set] = None) -> List[Tuple[str, Any]]:
+    """
+    ``(path, module)`` for torch modules reachable from ``value`` through
+    attributes, dicts and sequences. Modules are not descended into, so each
+    model contributes its top-level networks (UNet, VAE, ProPainter, ...).
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen or depth < 0:
+        return []
+    seen.add(id(value))
+    if hasattr(value, "register_forward_pre_hook") and hasattr(value, "register_forward_hook"):
+        return [(prefix or type(value).__name__, value)]
+    if isinstance(value, dict):
+        children = [(str(k), v) for k, v in value.items()]
+    elif isinstance(value, (list, tuple)):
+        children = [(str(i), v) for i, v in enumerate(value)]
+    elif hasattr(value, "__dict__") and not isinstance(value, type) and not hasattr(value, "shape"):
+        children = list(vars(value).items())
+    else:
+        return []
+    found = []
+    for name, child in children:
+        path = f"{prefix}.{name}" if prefix else name
+        found.extend(find_modules(child, path, depth - 1, seen))
+    return found
+
+
+@dataclass
+class Span:
+    """One timed interval; ``node_id`` is set on node-level spans."""
+
+    name: str
+    start: float
+    end: float = 0.0
+    thread: int = 0
+    node_id: Optional[str] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class _NodeRecord:
+    """Handle yielded by :meth:`Profiler.node` to attach outputs to the span."""
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    def outputs(self, result: Any) -> None:
+        if isinstance(result, dict):
+            result = result.get("result", ())
+        self.span.args["outputs"] = describe(result)
+
+
+class Profiler:
+    """Collects spans for one prompt."""
+
+    def __init__(self, name: str = "prompt", module_spans: bool = True):
+        self.name = name
+        self.module_spans = module_spans
+        self.spans: List[Span] = []
+        self.events: List[Dict[str, Any]] = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads: Dict[int, str] = {}
+        self._pid = os.getpid()
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+            self._threads[threading.get_ident()] = threading.current_thread().name
+        return self._local.stack
+
+    def in_node(self) -> bool:
+        """True inside a node span on this thread."""
+        return any(s.node_id is not None for s in self._stack())
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Span]:
+        record = Span(name, time.perf_counter(), thread=threading.get_ident(), args=args)
+        stack = self._stack()
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            record.end = time.perf_counter()
+            stack.remove(record)
+            with self._lock:
+                self.spans.append(record)
+
+    @contextlib.contextmanager
+    def node(self, node_id: str, class_type: str, inputs: Optional[Dict[str, Any]] = None) -> Iterator[_NodeRecord]:
+        """
+        Time one node: wall and CPU time, RSS delta and peak, allocator
+        delta, and a sub-span per forward call of any model in ``inputs``.
+        """
+        allocator = _allocator()
+        if allocator is not None:
+            allocator.reset_peak_memory_stats()
+            allocated = allocator.memory_allocated()
+        peak_reset = reset_peak_rss()
+        rss = _rss()
+        cpu = time.process_time()
+        hooks = self._hook_modules(inputs) if inputs and self.module_spans else []
+        with self.span(class_type, node=node_id) as record:
+            record.node_id = node_id
+            try:
+                yield _NodeRecord(record)
+            finally:
+                for handle in hooks:
+                    handle.remove()
+                record.args["cpu_ms"] = round((time.process_time() - cpu) * 1000, 3)
+                after = _rss()
+                record.args["rss_mb"] = round(after / MB, 1)
+                record.args["rss_delta_mb"] = round((after - rss) / MB, 1)
+                if peak_reset:
+                    record.args["peak_rss_mb"] = round(peak_rss() / MB, 1)
+                if allocator is not None:
+                    record.args["allocated_delta_mb"] = round((allocator.memory_allocated() - allocated) / MB, 1)
+                    record.args["peak_allocated_mb"] = round(allocator.max_memory_allocated() / MB, 1)
+
+    def _hook_modules(self, inputs: Dict[str, Any]) -> List[Any]:
+        handles = []
+        for path, module in find_modules({k: v for k, v in inputs.items() if not hasattr(v, "shape")}):
+            opened: List[Any] = []
+
+            def before(module, args, path=path, opened=opened):
+                context = self.span(path, kind="forward")
+                context.__enter__()
+                opened.append(context)
+
+            def after(module, args, output, opened=opened):
+                if opened:
+                    opened.pop().__exit__(None, None, None)
+
+            handles.append(module.register_forward_pre_hook(before))
+            handles.append(module.register_forward_hook(after))
+        return handles
+
+    def instant(self, name: str, **args: Any) -> None:
+        """Record a zero-length event, such as a node served from cache."""
+        self._stack()
+        with self._lock:
+            self.events.append({"name": name, "ts": time.perf_counter(), "thread": threading.get_ident(),
+                                "args": args})
+
+    def skip(self, node_id: str, class_type: Optional[str], reason: str = "lazy") -> None:
+        """Record a planned node that never ran because nothing needed its output."""
+        self.instant("skipped", node=node_id, class_type=class_type, reason=reason)
+
+    def skipped(self) -> List[Dict[str, Any]]:
+        return [e["args"] for e in self.events if e["name"] == "skipped"]
+
+    def node_spans(self) -> List[Span]:
+        return [s for s in self.spans if s.node_id is not None]
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The spans as a Chrome trace (load in chrome://tracing or Perfetto)."""
+        first_seen = sorted(self.spans, key=lambda s: s.start)
+        threads = list(dict.fromkeys([s.thread for s in first_seen] + [e["thread"] for e in self.events]))
+        tids = {thread: index for index, thread in enumerate(threads)}
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": self.name}},
+        ]
+        for thread, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                           "args": {"name": self._threads.get(thread, str(thread))}})
+        for s in sorted(self.spans, key=lambda s: (s.start, -s.end)):
+            events.append({
+                "name": f"#{s.node_id} {s.name}" if s.node_id else s.name,
+                "cat": "node" if s.node_id else "span",
+                "ph": "X",
+                "ts": round((s.start - self.origin) * 1e6, 3),
+                "dur": round(s.duration * 1e6, 3),
+                "pid": self._pid,
+                "tid": tids[s.thread],
+                "args": s.args,
+            })
+        for event in self.events:
+            events.append({
+                "name": event["name"], "cat": "event", "ph": "i", "s": "t",
+                "ts": round((event["ts"] - self.origin) * 1e6, 3),
+                "pid": self._pid, "tid": tids[event["thread"]], "args": event["args"],
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}
+
+    def summary(self) -> str:
+        """Plain-text table of nodes by wall time, then sub-spans grouped by name."""
+        nodes = sorted(self.node_spans(), key=lambda s: s.duration, reverse=True)
+        total = sum(s.duration for s in nodes if not any(
+            o is not s and o.node_id and o.start <= s.start and s.end <= o.end and o.thread == s.thread
+            for o in nodes
+        ))
+        skipped = self.skipped()
+        lines = [f"{self.name}: {len(nodes)} nodes, {total * 1000:.1f} ms"
+                 + (f", {len(skipped)} skipped" if skipped else "")]
+        lines.append(f"{'node':>6} {'class':<36} {'wall ms':>9} {'%':>5} {'cpu ms':>9} {'rss +MB':>8}  outputs")
+        for s in nodes:
+            share = 100 * s.duration / total if total else 0.0
+            outputs = json.dumps(s.args.get("outputs"), separators=(",", ":"))
+            if len(outputs) > 60:
+                outputs = outputs[:57] + "..."
+            lines.append(
+                f"{s.node_id:>6} {s.name[:36]:<36} {s.duration * 1000:>9.1f} {share:>5.1f} "
+                f"{s.args.get('cpu_ms', 0.0):>9.1f} {s.args.get('rss_delta_mb', 0.0):>8.1f}  {outputs}"
+            )
+
+        grouped: Dict[str, List[float]] = {}
+        for s in self.spans:
+            if s.node_id is None:
+                grouped.setdefault(s.name, []).append(s.duration)
+        if grouped:
+            lines.append("")
+            lines.append(f"{'span':<44} {'count':>6} {'total ms':>9} {'mean ms':>9}")
+            for name, durations in sorted(grouped.items(), key=lambda kv: sum(kv[1]), reverse=True):
+                lines.append(f"{name[:44]:<44} {len(durations):>6} {sum(durations) * 1000:>9.1f} "
+                             f"{sum(durations) * 1000 / len(durations):>9.2f}")
+        if skipped:
+            lines.append("")
+            lines.append("skipped: " + ", ".join(f"{a['node']} {a['class_type']}" for a in skipped))
+        for event in self.events:
+            if event["name"] != "skipped":
+                lines.append(f"{event['name']}: {json.dumps(event['args'], separators=(',', ':'))}")
+        return "\n".join(lines)
+
+    def write(self, directory: Path, stem: Optional[str] = None) -> Tuple[Path, Path]:
+        """Write ``<stem>.json`` (Chrome trace) and ``<stem>.txt`` (summary) into ``directory``."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = stem or self.name
+        trace, text = directory / f"{stem}.json", directory / f"{stem}.txt"
+        with open(trace, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        text.write_text(self.summary() + "\n")
+        return trace, text
@@ -0,0 +1,209 @@
+"""
+Fill masked pixels from neighbouring frames where the background moves.
+
+When the camera pans behind a fixed watermark, every pixel under the logo
+is visible in some nearby frame. This is the premise of ProPainter's
+flow-guided propagation, and for such clips propagation alone recovers the
+true pixels without diffusion. The stock sampler only exposes its
+propagation result alongside the diffusion pass, so this module does a
+cheaper global-motion version of it:
+
+- :func:`camera_path` estimates each frame's translation by block matching
+  the unmasked pixels of consecutive frames.
+- :func:`propagate` copies hole pixels from the nearest frames whose aligned
+  context ring matches, and scores every frame by how much of its hole was
+  filled from real pixels.
+
+The caller runs diffusion only where the score is too low.
+"""
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from painter.masks import dilate
+
+
+def to_gray(frames: np.ndarray) -> np.ndarray:
+    """Luma-ish float32 ``(..., H, W)`` in 8-bit levels."""
+    gray = frames.mean(axis=-1, dtype=np.float32)
+    return gray if np.issubdtype(frames.dtype, np.integer) else gray * 255
+
+
+def _overlap(shift: int, size: int) -> Tuple[slice, slice]:
+    """Slices of ``a`` and ``b`` along one axis where ``a[i]`` lines up with ``b[i - shift]``."""
+    return slice(max(shift, 0), size + min(shift, 0)), slice(max(-shift, 0), size - max(shift, 0))
+
+
+def _block_mean(frame: np.ndarray, factor: int) -> np.ndarray:
+    height, width = frame.shape[0] // factor * factor, frame.shape[1] // factor * factor
+    return frame[:height, :width].reshape(height // factor, factor, width // factor, factor).mean(axis=(1, 3))
+
+
+def _search(a, b, a_valid, b_valid, candidates) -> Tuple[int, int]:
+    """The candidate ``(dy, dx)`` with the lowest mean absolute difference over pixels valid in both frames."""
+    best, best_error = (0, 0), float("inf")
+    for dy, dx in candidates:
+        (ay, by), (ax, bx) = _overlap(dy, a.shape[0]), _overlap(dx, a.shape[1])
+        both = a_valid[ay, ax] & b_valid[by, bx]
+        count = both.sum()
+        if count < 16:
+            continue
+        error = np.abs(a[ay, ax] - b[by, bx])[both].sum() / count
+        if error < best_error:
+            best, best_error = (dy, dx), error
+    return best
+
+
+def frame_shift(a: np.ndarray, b: np.ndarray, a_valid: np.ndarray, b_valid: np.ndarray,
+                search: int = 16, factor: int = 4) -> Tuple[int, int]:
+    """
+    ``(dy, dx)`` within ``search`` pixels such that ``a[y, x]`` is about
+    ``b[y - dy, x - dx]``, for grayscale frames with bool masks of their
+    usable (unmasked) pixels.
+
+    Only pixels valid in both frames are compared, so a static logo or its
+    edge cannot pull the estimate to zero the way it does with phase
+    correlation. The search runs on ``factor``-times smaller block means
+    first and is refined by one pixel per halving of the scale.
+    """
+    shift, level = None, factor
+    while level >= 1:
+        if level == 1:
+            frames, valid = (a, b), (a_valid, b_valid)
+        else:
+            frames = [_block_mean(frame, level) for frame in (a, b)]
+            valid = [_block_mean(mask.astype(np.float32), level) == 1.0 for mask in (a_valid, b_valid)]
+        if shift is None:
+            reach = -(-search // level)
+            candidates = [(dy, dx) for dy in range(-reach, reach + 1) for dx in range(-reach, reach + 1)]
+        else:
+            candidates = [(2 * shift[0] + dy, 2 * shift[1] + dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+        shift = _search(*frames, *valid, candidates)
+        level //= 2
+    return shift
+
+
+def _shifted(offset: Tuple[int, int], ys: np.ndarray, xs: np.ndarray, shape: Tuple[int, int]):
+    """Source coordinates ``(y - dy, x - dx)`` and whether they fall inside the frame."""
+    sy, sx = ys - offset[0], xs - offset[1]
+    inside = (sy >= 0) & (sy < shape[0]) & (sx >= 0) & (sx < shape[1])
+    return np.clip(sy, 0, shape[0] - 1), np.clip(sx, 0, shape[1] - 1), inside
+
+
+def alignment_error(a: np.ndarray, b: np.ndarray, offset: Tuple[int, int], pixels: Tuple[np.ndarray, np.ndarray],
+                    usable: np.ndarray) -> float:
+    """Mean absolute difference (8-bit levels) of ``a`` at ``pixels`` and ``b`` at their offset source, or inf."""
+    ys, xs = pixels
+    sy, sx, inside = _shifted(offset, ys, xs, a.shape)
+    inside &= usable[sy, sx]
+    if inside.sum() < max(16, len(ys) // 4):
+        return float("inf")
+    return float(np.abs(a[ys[inside], xs[inside]] - b[sy[inside], sx[inside]]).mean())
+
+
+def camera_path(gray: np.ndarray, holes: np.ndarray, search: int = 16) -> np.ndarray:
+    """
+    Cumulative ``(N, 2)`` translation of each frame relative to the first,
+    from :func:`frame_shift` between consecutive frames of :func:`to_gray`
+    output, moving at most ``search`` pixels per frame.
+    """
+    positions = np.zeros((len(gray), 2), dtype=np.int64)
+    for t in range(1, len(gray)):
+        positions[t] = positions[t - 1] + frame_shift(gray[t], gray[t - 1], ~holes[t], ~holes[t - 1], search)
+    return positions
+
+
+def _nearest(t: int, count: int, reach: int) -> Iterator[int]:
+    for distance in range(1, reach + 1):
+        for u in (t - distance, t + distance):
+            if 0 <= u < count:
+                yield u
+
+
+def fill_remaining(frame: np.ndarray, unknown: np.ndarray, limit: int = 64) -> None:
+    """Fill ``unknown`` pixels of ``frame`` in place by growing the mean of known 4-neighbours inwards."""
+    if not unknown.any():
+        return
+    rows, cols = np.flatnonzero(unknown.any(axis=1)), np.flatnonzero(unknown.any(axis=0))
+    box = (slice(max(rows[0] - 1, 0), rows[-1] + 2), slice(max(cols[0] - 1, 0), cols[-1] + 2))
+    values = frame[box].astype(np.float32)
+    missing = unknown[box].copy()
+    for _ in range(limit):
+        if not missing.any():
+            break
+        known = ~missing
+        total = np.zeros_like(values)
+        count = np.zeros(missing.shape, dtype=np.float32)
+        for axis, shift in ((0, 1), (0, -1), (1, 1), (1, -1)):
+            rolled = np.roll(known, shift, axis=axis)
+            edge = [slice(None)] * 2
+            edge[axis] = slice(0, 1) if shift == 1 else slice(-1, None)
+            rolled[tuple(edge)] = False
+            total += np.roll(values * known[..., None], shift, axis=axis) * rolled[..., None]
+            count += rolled
+        grow = missing & (count > 0)
+        values[grow] = total[grow] / count[grow][:, None]
+        missing &= ~grow
+    frame[box] = values.astype(frame.dtype) if np.issubdtype(frame.dtype, np.floating) else np.rint(values)
+
+
+def propagate(
+    frames: np.ndarray,
+    holes: np.ndarray,
+    positions: np.ndarray,
+    reach: int = 10,
+    max_error: float = 6.0,
+    ring: int = 8,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Copy of ``frames`` ``(N, H, W, C)`` with each frame's ``holes`` pixels
+    taken from up to ``reach`` frames either side, nearest first, plus each
+    frame's coverage in [0, 1].
+
+    A neighbour is used only if the ``ring`` pixels around the hole, aligned
+    by the ``positions`` from :func:`camera_path`, differ by at most
+    ``max_error`` 8-bit levels on average; that is the confidence check.
+    Coverage is the fraction of hole pixels filled from a source pixel that
+    is unmasked in its own frame. What is left is filled from the
+    surrounding pixels by :func:`fill_remaining`.
+    """
+    out = np.array(frames, copy=True)
+    gray = to_gray(frames)
+    shape = frames.shape[1:3]
+    scores = np.ones(len(frames), dtype=np.float32)
+    static = holes.strides[0] == 0
+    for t in range(len(frames)):
+        hole = holes[t]
+        if t == 0 or not static:
+            ys, xs = np.nonzero(hole)
+            # Every other ring pixel is plenty to judge the alignment
+            around = tuple(axis[::2] for axis in np.nonzero(dilate(hole, ring) & ~hole))
+        if len(ys) == 0:
+            continue
+        uncovered = np.ones(len(ys), dtype=bool)
+        for u in _nearest(t, len(frames), reach):
+            offset = tuple(positions[t] - positions[u])
+            if alignment_error(gray[t], gray[u], offset, around, ~holes[u]) > max_error:
+                continue
+            index = np.flatnonzero(uncovered)
+            sy, sx, inside = _shifted(offset, ys[index], xs[index], shape)
+            usable = inside & ~holes[u][sy, sx]
+            out[t, ys[index[usable]], xs[index[usable]]] = frames[u, sy[usable], sx[usable]]
+            uncovered[index[usable]] = False
+            if not uncovered.any():
+                break
+        scores[t] = 1.0 - uncovered.mean()
+        if uncovered.any():
+            leftover = np.zeros(shape, dtype=bool)
+            leftover[ys[uncovered], xs[uncovered]] = True
+            fill_remaining(out[t], leftover)
+    return out, scores
+
+
+def easy_windows(scores: np.ndarray, window: int, threshold: float) -> List[Tuple[int, int, bool]]:
+    """``(start, end, easy)`` per ``window``-frame span; easy when its mean coverage reaches ``threshold``."""
+    spans = []
+    for start in range(0, len(scores), max(window, 1)):
+        end = min(start + max(window, 1), len(scores))
+        spans.append((start, end, bool(scores[start:end].mean() >= threshold)))
+    return spans
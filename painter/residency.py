@@ -0,0 +1,244 @@
+"""
+Keep loaded models resident between prompts.
+
+The workflow loads DiffuEraser (checkpoint plus fused LoRA) at the start of
+every prompt and flushes the GPU at the end, so a queue of short clips
+spends most of its time reloading the same weights. :class:`ModelResidency`
+holds loaded models keyed by what was loaded and evicts least-recently-used
+first once their estimated size exceeds ``budget_bytes``. Releasing memory
+becomes a decision made under pressure (:meth:`ModelResidency.relieve`)
+instead of an unconditional flush after each prompt.
+"""
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from painter.cache import MB, env_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_bytes(obj: Any, _seen: Optional[set] = None, _depth: int = 0) -> int:
+    """
+    Approximate the memory held by ``obj``'s tensors.
+
+    Counts parameters and buffers of modules and any tensors reachable
+    through attributes, dicts and sequences (a few levels deep), so pipeline
+    objects that bundle several modules are measured as a whole. Tensors
+    shared between modules are counted once.
+    """
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen or _depth > 4:
+        return 0
+    seen.add(id(obj))
+
+    if hasattr(obj, "element_size") and hasattr(obj, "nelement"):
+        return int(obj.element_size() * obj.nelement())
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        total = 0
+        for tensor in list(obj.parameters()) + list(obj.buffers()):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += int(tensor.element_size() * tensor.nelement())
+        return total
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        children = vars(obj).values()
+    else:
+        return 0
+    return sum(estimate_bytes(child, seen, _depth + 1) for child in children)
+
+
+def free_bytes() -> Tuple[str, int]:
+    """
+    Free memory on the device models live on: ``("cuda", bytes)`` when a
+    GPU is available, otherwise available system RAM.
+    """
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            free, _ = torch.cuda.mem_get_info()
+            return "cuda", int(free)
+    except ImportError:
+        pass
+    import psutil
+
+    return "ram", int(psutil.virtual_memory().available)
+
+
+def empty_device_cache() -> None:
+    """Hand cached allocator blocks back to the driver after an eviction."""
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+@dataclass
+class _Entry:
+    model: Any
+    size: int
+
+
+class ModelResidency:
+    """
+    Thread-safe LRU of loaded models with a memory budget.
+
+    ``min_free_bytes`` is the headroom :meth:`relieve` tries to restore by
+    evicting resident models when ``free()`` reports less than that.
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        min_free_bytes: int = 0,
+        name: str = "models",
+        free: Callable[[], Tuple[str, int]] = free_bytes,
+        measure: Callable[[Any], int] = estimate_bytes,
+    ):
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self._free = free
+        self._measure = measure
+        self._models: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._used = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.releases = 0
+        self.load_seconds = 0.0
+        self.last_load_seconds = 0.0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    def get_or_load(self, key: str, load: Callable[[], Any]) -> Tuple[Any, float, bool]:
+        """
+        Return ``(model, load_seconds, resident)`` for ``key``.
+
+        A resident model is returned as is with ``load_seconds`` 0. Otherwise
+        ``load`` runs under the lock, so concurrent prompts never load the same
+        weights twice, and the result is kept if it fits the budget.
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry.model, 0.0, True
+
+            self.misses += 1
+            started = time.perf_counter()
+            model = load()
+            elapsed = time.perf_counter() - started
+            self.load_seconds += elapsed
+            self.last_load_seconds = elapsed
+
+            size = self._measure(model)
+            if size > self.budget_bytes:
+                logger.info("%s: %s (%.0f MB) exceeds the %.0f MB budget; not kept resident",
+                            self.name, key[:12], size / MB, self.budget_bytes / MB)
+                return model, elapsed, False
+            self._models[key] = _Entry(model, size)
+            self._used += size
+            self._evict(lambda: self._used > self.budget_bytes, keep=key)
+            logger.info("%s: loaded %s in %.2fs (%.0f MB resident)", self.name, key[:12], elapsed, self._used / MB)
+            return model, elapsed, False
+
+    def _evict(self, condition: Callable[[], bool], keep: Optional[str] = None) -> int:
+        evicted = 0
+        while condition():
+            victim = next((k for k in self._models if k != keep), None)
+            if victim is None:
+                break
+            self._used -= self._models.pop(victim).size
+            self.evictions += 1
+            evicted += 1
+            logger.info("%s: evicted %s", self.name, victim[:12])
+            # Free the weights before the condition looks at device memory again
+            empty_device_cache()
+        return evicted
+
+    def under_pressure(self) -> bool:
+        """True when the model device has less than ``min_free_bytes`` free."""
+        _, available = self._free()
+        return available < self.min_free_bytes
+
+    def relieve(self) -> int:
+        """
+        Evict resident models, least recently used first, until the device is
+        no longer under pressure. Returns how many were evicted.
+        """
+        with self._lock:
+            if not self.under_pressure():
+                return 0
+            self.releases += 1
+            return self._evict(self.under_pressure)
+
+    def clear(self) -> None:
+        """Drop every resident model."""
+        with self._lock:
+            self._evict(lambda: bool(self._models))
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._used
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and sizes, for logs and metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "releases": self.releases,
+                "load_seconds": self.load_seconds,
+                "last_load_seconds": self.last_load_seconds,
+                "resident_models": len(self._models),
+                "resident_bytes": self._used,
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+_residency: Optional[ModelResidency] = None
+_residency_lock = threading.Lock()
+
+
+def model_residency() -> ModelResidency:
+    """
+    Process-wide residency manager.
+
+    The budget is ``PAINTER_MODEL_CACHE_MB`` (default 16384) and models are
+    released once free device memory drops below ``PAINTER_MODEL_MIN_FREE_MB``
+    (default 2048).
+    """
+    global _residency
+    with _residency_lock:
+        if _residency is None:
+            _residency = ModelResidency(
+                budget_bytes=env_bytes("PAINTER_MODEL_CACHE_MB", 16384),
+                min_free_bytes=env_bytes("PAINTER_MODEL_MIN_FREE_MB", 2048),
+            )
+        return _residency
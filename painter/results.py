@@ -0,0 +1,107 @@
+"""
+Content-addressed keys for whole inpainting jobs, and an index of their outputs.
+
+A job's key is a digest of the prompt with every input file (the video and
+the mask images) replaced by the SHA-256 of its contents, so a resubmitted
+job gets the same key whatever the file is called, and any change to a
+sampler, encoder or pass setting gives a new one. Only ``filename_prefix``
+is left out, since it names the output without changing it.
+
+In deterministic mode the sampler seed is derived from the key of
+everything else (:func:`derive_seed`) instead of taken from the client,
+which with the UI's ``randomize`` is different on every submission.
+:class:`ResultIndex` maps keys to the output entry their first run wrote.
+"""
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from painter.cache import cache_key, file_digest
+from painter.workflow import sampler_id, set_input
+
+logger = logging.getLogger(__name__)
+
+# Inputs naming a file in Studio's input folder
+FILE_INPUTS = ("video", "image")
+# Inputs that do not change what a job produces
+NAMING_INPUTS = ("filename_prefix",)
+SEED_RANGE = 2 ** 32
+
+
+def job_key(prompt: Dict[str, Any], resolve: Callable[[str], str], ignore: Iterable[str] = ()) -> str:
+    """
+    Digest of ``prompt`` with file inputs replaced by their content hash.
+
+    ``resolve`` maps an input's file name to a path. Inputs named in
+    ``ignore`` and :data:`NAMING_INPUTS` are left out. Raises ``OSError``
+    when a referenced file cannot be read.
+    """
+    skipped = set(ignore) | set(NAMING_INPUTS)
+    nodes = {}
+    for node_id, node in prompt.items():
+        inputs = {}
+        for name, value in node.get("inputs", {}).items():
+            if name in skipped:
+                continue
+            if name in FILE_INPUTS and isinstance(value, str) and value:
+                value = {"sha256": file_digest(resolve(value))}
+            inputs[name] = value
+        nodes[node_id] = [node["class_type"], inputs]
+    return cache_key("job", nodes)
+
+
+def derive_seed(key: str) -> int:
+    """Sampler seed for a job key, in the range numpy and torch both accept."""
+    return int(key[:16], 16) % SEED_RANGE
+
+
+def make_deterministic(prompt: Dict[str, Any], resolve: Callable[[str], str]) -> int:
+    """Set the sampler's seed from the content of the rest of ``prompt``, in place; returns the seed."""
+    seed = derive_seed(job_key(prompt, resolve, ignore=("seed",)))
+    set_input(prompt, sampler_id(prompt), "seed", seed)
+    return seed
+
+
+class ResultIndex:
+    """
+    Job key -> the VideoCombine-style output entry of its run, one JSON file
+    per key under ``directory``.
+
+    An entry whose video has since been deleted is dropped on lookup.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(entry.get("fullpath", "")):
+            logger.info("cached result %s is gone; dropping it", entry.get("fullpath"))
+            path.unlink(missing_ok=True)
+            return None
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        """Record ``entry``, which must carry the output's ``fullpath``."""
+        if not entry.get("fullpath"):
+            raise ValueError("a cached result needs the output's fullpath")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,274 @@
+"""
+Local stand-in for the Studio prompt API.
+
+Implements just enough of ``/prompt``, ``/ws``, ``/history``, ``/queue``, ``/interrupt``,
+``/system_stats``, ``/ready``, ``/metrics`` and the transfer endpoints to drive the batch tooling without a GPU. Prompts run one
+at a time with a fixed simulated latency, like a single executor would, so
+queue saturation and throughput can be measured locally.
+
+When given an input and output directory the stand-in also "inpaints" for
+real with an identity pass: it decodes the requested frame range of the
+job's video and encodes it unchanged, so chunked jobs can be stitched and
+checked end to end.
+"""
+import asyncio
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from aiohttp import WSMsgType, web
+
+from painter.ffmpeg import OUTPUT_FORMATS
+from painter.metrics import CONTENT_TYPE, PromptMetrics
+from painter.transfer import Transfers
+from painter.workflow import FRAME_CAP, LOAD_VIDEO, VIDEO_COMBINE
+
+def _resolve(prompt: Dict[str, Any], value: Any) -> Any:
+    """Follow a ``[node_id, slot]`` link to a JWInteger-style literal."""
+    if isinstance(value, list) and len(value) == 2:
+        return prompt.get(str(value[0]), {}).get("inputs", {}).get("value", 0)
+    return value
+
+
+class StandinServer:
+    """In-process fake of a single Studio executor."""
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        steps: int = 4,
+        should_fail: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        input_dir: Optional[Path] = None,
+        output_dir: Optional[Path] = None,
+    ):
+        self.latency = latency
+        self.steps = steps
+        self.should_fail = should_fail
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.running: Optional[List[Any]] = None
+        self.pending: List[List[Any]] = []
+        self.max_queue_depth = 0
+        self.executed = 0
+        self.busy_time = 0.0
+        self._number = 0
+        self._queue: "Optional[asyncio.Queue[List[Any]]]" = None
+        self._sockets: Dict[str, web.WebSocketResponse] = {}
+        self._worker: Optional["asyncio.Task[None]"] = None
+        self._queued_at: Dict[str, float] = {}
+        self._deleted: Set[str] = set()
+        self._interrupted: Optional[str] = None
+        self.metrics = PromptMetrics(lambda: (len(self.pending), 1 if self.running else 0))
+        self.transfers = Transfers(input_dir, output_dir)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/prompt", self.post_prompt)
+        app.router.add_get("/history", self.get_history_all)
+        app.router.add_get("/history/{prompt_id}", self.get_history)
+        app.router.add_get("/queue", self.get_queue)
+        app.router.add_post("/queue", self.post_queue)
+        app.router.add_post("/interrupt", self.post_interrupt)
+        app.router.add_get("/system_stats", self.get_system_stats)
+        app.router.add_get("/ready", self.get_ready)
+        app.router.add_get("/metrics", self.get_metrics)
+        app.router.add_get("/object_info", self.get_object_info)
+        app.router.add_get("/ws", self.websocket)
+        app.router.add_get("/view", self.view)
+        self.transfers.add_routes(app.router)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def _start(self, app: web.Application) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._execute_loop())
+
+    async def _stop(self, app: web.Application) -> None:
+        if self._worker:
+            self._worker.cancel()
+        for ws in list(self._sockets.values()):
+            await ws.close()
+
+    async def _send(self, client_id: Optional[str], kind: str, data: Dict[str, Any]) -> None:
+        ws = self._sockets.get(client_id) if client_id else None
+        if ws is not None and not ws.closed:
+            await ws.send_json({"type": kind, "data": data})
+
+    def queue_depth(self) -> int:
+        return len(self.pending) + (1 if self.running else 0)
+
+    async def post_prompt(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = body.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            return web.json_response({"error": "no prompt", "node_errors": {}}, status=400)
+
+        prompt_id = str(uuid.uuid4())
+        self._number += 1
+        item = [self._number, prompt_id, prompt, body.get("extra_data", {}), body.get("client_id")]
+        self.pending.append(item)
+        self._queued_at[prompt_id] = time.time()
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        self._queue.put_nowait(item)
+        return web.json_response({"prompt_id": prompt_id, "number": self._number, "node_errors": {}})
+
+    async def _execute_loop(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item[1] in self._deleted:
+                self._deleted.discard(item[1])
+                continue
+            self.pending.remove(item)
+            self.running = item
+            _, prompt_id, prompt, _, client_id = item
+            started = time.time()
+            self.metrics.start(prompt_id, queued_at=self._queued_at.pop(prompt_id, None), now=started)
+            await self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+
+            status = "success"
+            for step in range(1, self.steps + 1):
+                await asyncio.sleep(self.latency / self.steps)
+                if self._interrupted == prompt_id:
+                    break
+                await self._send(client_id, "progress", {"value": step, "max": self.steps, "prompt_id": prompt_id})
+
+            outputs: Dict[str, Any] = {}
+            frames = 0
+            error = "stand-in failure" if self.should_fail and self.should_fail(prompt) else None
+            if self._interrupted == prompt_id:
+                self._interrupted = None
+                status = error = "interrupted"
+                await self._send(client_id, "execution_interrupted", {"prompt_id": prompt_id, "node_id": "208"})
+            elif error is None:
+                combine = prompt.get(VIDEO_COMBINE, {}).get("inputs", {})
+                prefix = combine.get("filename_prefix", "Painter")
+                ext, codec, pix_fmt = OUTPUT_FORMATS.get(combine.get("format"), OUTPUT_FORMATS["video/h264-mp4"])
+                filename = f"{prefix}_{item[0]:05d}{ext}"
+                if self.input_dir is not None and self.output_dir is not None:
+                    loop = asyncio.get_running_loop()
+                    try:
+                        frames = await loop.run_in_executor(None, self._render, prompt, filename, codec, pix_fmt)
+                    except (OSError, RuntimeError, KeyError) as e:
+                        error = str(e)
+                outputs[VIDEO_COMBINE] = {"gifs": [{"filename": filename, "subfolder": "", "type": "output"}]}
+
+            if error is None:
+                await self._send(client_id, "executed", {
+                    "node": VIDEO_COMBINE, "output": outputs[VIDEO_COMBINE], "prompt_id": prompt_id,
+                })
+                await self._send(client_id, "execution_success", {"prompt_id": prompt_id})
+                await self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+            elif status != "interrupted":
+                status = "error"
+                outputs = {}
+                await self._send(client_id, "execution_error", {
+                    "prompt_id": prompt_id, "node_id": "208", "exception_message": error,
+                })
+
+            self.history[prompt_id] = {
+                "prompt": item[:4],
+                "outputs": outputs,
+                "status": {"status_str": "success" if status == "success" else "error",
+                           "completed": status == "success", "messages": []},
+            }
+            self.executed += 1
+            self.busy_time += time.time() - started
+            self.metrics.finish(prompt_id, status, frames=frames)
+            self.running = None
+
+    def _render(self, prompt: Dict[str, Any], filename: str, codec: str, pix_fmt: str) -> int:
+        """Identity "inpaint": copy the requested frame range of the source video; returns the frame count."""
+        from painter.ffmpeg import FrameReader, FrameWriter
+
+        load = prompt[LOAD_VIDEO]["inputs"]
+        cap = int(_resolve(prompt, load.get("frame_load_cap", [FRAME_CAP, 0])) or 0)
+        reader = FrameReader(str(self.input_dir / load["video"]), start=int(load.get("skip_first_frames", 0)),
+                             count=cap or None)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with FrameWriter(str(self.output_dir / filename), reader.width, reader.height, reader.info.fps,
+                         codec=codec, pix_fmt=pix_fmt) as writer:
+            for frame in reader:
+                writer.write(frame)
+        return writer.frames
+
+    async def view(self, request: web.Request) -> web.StreamResponse:
+        if self.output_dir is None:
+            raise web.HTTPNotFound()
+        path = (self.output_dir / request.query.get("subfolder", "") / request.query.get("filename", "")).resolve()
+        if self.output_dir.resolve() not in path.parents or not path.is_file():
+            raise web.HTTPNotFound()
+        return web.FileResponse(path)
+
+    async def get_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info["prompt_id"]
+        entry = self.history.get(prompt_id)
+        return web.json_response({prompt_id: entry} if entry else {})
+
+    async def get_history_all(self, request: web.Request) -> web.Response:
+        return web.json_response(self.history)
+
+    async def get_queue(self, request: web.Request) -> web.Response:
+        running = [self.running[:4]] if self.running else []
+        return web.json_response({"queue_running": running, "queue_pending": [p[:4] for p in self.pending]})
+
+    async def post_queue(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        deleted = [item[1] for item in self.pending] if body.get("clear") else body.get("delete", [])
+        for item in [item for item in self.pending if item[1] in deleted]:
+            self.pending.remove(item)
+            self._deleted.add(item[1])
+        return web.Response(status=200)
+
+    async def post_interrupt(self, request: web.Request) -> web.Response:
+        body = await request.json() if request.can_read_body else {}
+        if self.running is not None and body.get("prompt_id") in (None, self.running[1]):
+            self._interrupted = self.running[1]
+        return web.Response(status=200)
+
+    async def get_system_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "system": {"os": "standin", "studio_version": "standin", "python_version": "", "pytorch_version": ""},
+            "devices": [],
+        })
+
+    async def get_ready(self, request: web.Request) -> web.Response:
+        # Nothing to load, so no warm-up to wait for
+        return web.json_response({"ready": True, "state": "disabled"})
+
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.metrics.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def get_object_info(self, request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self._sockets[client_id] = ws
+        await ws.send_json({"type": "status", "data": {
+            "status": {"exec_info": {"queue_remaining": self.queue_depth()}}, "sid": client_id,
+        }})
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            if self._sockets.get(client_id) is ws:
+                del self._sockets[client_id]
+        return ws
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8188,
+    latency: float = 0.5,
+    input_dir: Optional[Path] = None,
+    output_dir: Optional[Path] = None,
+) -> None:
+    """Run the stand-in server until interrupted."""
+    server = StandinServer(latency=latency, input_dir=input_dir, output_dir=output_dir)
+    web.run_app(server.app(), host=host, port=port)
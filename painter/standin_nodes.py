@@ -0,0 +1,230 @@
+"""
+CPU stand-ins for the stock nodes used by the inpainting workflow.
+
+They follow the stock nodes' inputs and outputs closely enough to execute
+the compiled workflow (and every optimization pass) in-process without
+Studio, custom node packs or model weights. DiffuEraser is replaced by a
+tiny random-weight convolutional network, so the benchmark exercises the
+real data path (decode, mask preparation, scaling, windowed sampling,
+encode) while the "model" costs a predictable amount of CPU per frame.
+"""
+import gc
+
+import numpy as np
+import torch
+
+from painter.cache import cache_key
+from painter.ffmpeg import FrameReader
+from painter.frames import to_float, to_uint8
+from painter.profiler import span
+
+RESIZE_MODES = {"nearest-exact": "nearest-exact", "bilinear": "bilinear", "area": "area", "bicubic": "bicubic",
+                "lanczos": "bilinear"}
+
+
+def _resize(images, width, height, method="bilinear"):
+    if images.shape[1:3] == (height, width):
+        return images
+    mode = RESIZE_MODES.get(method, "bilinear")
+    smooth = mode in ("bilinear", "bicubic")
+    resized = torch.nn.functional.interpolate(
+        images.movedim(-1, 1), size=(height, width), mode=mode,
+        **({"align_corners": False, "antialias": True} if smooth else {}),
+    )
+    return resized.movedim(1, -1).clamp(0, 1)
+
+
+class JWInteger:
+    FUNCTION = "run"
+
+    def run(self, value):
+        return (int(value),)
+
+
+class VHSLoadVideo:
+    """Decode with ffmpeg; no audio, like a silent VHS load."""
+
+    FUNCTION = "load_video"
+
+    def load_video(self, video, frame_load_cap=0, skip_first_frames=0, **kwargs):
+        from painter.studio.nodes import _input_path, _video_info
+
+        path = _input_path(video)
+        video_info = _video_info(path, skip_first_frames=skip_first_frames, frame_load_cap=frame_load_cap, **kwargs)
+        reader = FrameReader(path, start=skip_first_frames, count=frame_load_cap or None)
+        frames = np.stack(list(reader))
+        return (torch.from_numpy(to_float(frames)), len(frames), None, video_info)
+
+
+class VHSVideoInfo:
+    FUNCTION = "get_video_info"
+    FIELDS = ("source_fps", "source_frame_count", "source_duration", "source_width", "source_height",
+              "loaded_fps", "loaded_frame_count", "loaded_duration", "loaded_width", "loaded_height")
+
+    def get_video_info(self, video_info):
+        return tuple(video_info[name] for name in self.FIELDS)
+
+
+class VHSVideoCombine:
+    """Encode to H.264 MP4 in the output directory."""
+
+    FUNCTION = "combine_video"
+    OUTPUT_NODE = True
+
+    def combine_video(self, images, frame_rate, filename_prefix="Painter", crf=19, audio=None, **kwargs):
+        from painter.studio.nodes import _encode, _output_path
+
+        output, subfolder = _output_path(filename_prefix, ".mp4")
+        height, width = images.shape[1:3]
+        preview = _encode(output, subfolder, to_uint8(images.cpu().numpy()), width, height, frame_rate, crf)
+        return {"ui": {"gifs": [preview]}, "result": ((True, [output]),)}
+
+
+class LoadImage:
+    FUNCTION = "load_image"
+
+    def load_image(self, image):
+        from PIL import Image
+
+        from painter.studio.nodes import _input_path
+
+        with Image.open(_input_path(image)) as source:
+            rgb = np.asarray(source.convert("RGB"), dtype=np.float32) / 255.0
+        tensor = torch.from_numpy(rgb)[None]
+        return (tensor, torch.zeros(tensor.shape[:3]))
+
+
+class ImageResizeKJv2:
+    FUNCTION = "resize"
+
+    def resize(self, image, width, height, upscale_method="nearest-exact", divisible_by=1, **kwargs):
+        if divisible_by > 1:
+            width, height = width - width % divisible_by, height - height % divisible_by
+        resized = _resize(image, width, height, upscale_method)
+        return (resized, width, height)
+
+
+class RepeatImageBatch:
+    FUNCTION = "repeat"
+
+    def repeat(self, image, amount):
+        return (image.repeat((amount, 1, 1, 1)),)
+
+
+class ImageScaleByAspectRatioV2:
+    """The ``aspect_ratio original``, ``scale_to_side None`` case: round down to the multiple."""
+
+    FUNCTION = "image_scale_by_aspect_ratio"
+
+    def image_scale_by_aspect_ratio(self, image, round_to_multiple="8", method="lanczos", **kwargs):
+        height, width = image.shape[1:3]
+        multiple = int(round_to_multiple) if str(round_to_multiple).isdigit() else 1
+        target_w, target_h = width - width % multiple, height - height % multiple
+        scaled = _resize(image, target_w, target_h, method)
+        return (scaled, torch.ones(scaled.shape[:3]), [width, height], target_w, target_h)
+
+
+class EasyCompare:
+    FUNCTION = "compare"
+    OPERATORS = {
+        "a == b": lambda a, b: a == b, "a != b": lambda a, b: a != b,
+        "a < b": lambda a, b: a < b, "a > b": lambda a, b: a > b,
+        "a <= b": lambda a, b: a <= b, "a >= b": lambda a, b: a >= b,
+    }
+
+    def compare(self, a, b, comparison):
+        return (bool(self.OPERATORS[comparison](a, b)),)
+
+
+class EasyIfElse:
+    FUNCTION = "execute"
+
+    def execute(self, boolean, on_true=None, on_false=None):
+        return (on_true if boolean else on_false,)
+
+
+class EasyCleanGpuUsed:
+    FUNCTION = "empty_cache"
+    OUTPUT_NODE = True
+
+    def empty_cache(self, anything=None, **kwargs):
+        gc.collect()
+        return ()
+
+
+class TinyEraser(torch.nn.Module):
+    """Two 3x3 convolutions over RGB + mask: a few MFLOP per pixel-step instead of a UNet."""
+
+    def __init__(self, hidden=8):
+        super().__init__()
+        self.encode = torch.nn.Conv2d(4, hidden, 3, padding=1)
+        self.decode = torch.nn.Conv2d(hidden, 3, 3, padding=1)
+
+    def forward(self, images, mask):
+        return self.decode(torch.tanh(self.encode(torch.cat([images, mask], dim=1))))
+
+
+class DiffuEraserLoader:
+    """Random weights seeded by the checkpoint name, with a rank-2 "LoRA" fused in."""
+
+    FUNCTION = "load"
+
+    def load(self, checkpoint, lora):
+        generator = torch.Generator().manual_seed(int(cache_key(checkpoint)[:8], 16))
+        model = TinyEraser()
+        with torch.no_grad():
+            for parameter in model.parameters():
+                parameter.copy_(torch.randn(parameter.shape, generator=generator) * 0.1)
+            lora_generator = torch.Generator().manual_seed(int(cache_key(lora)[:8], 16))
+            weight = model.encode.weight
+            down = torch.randn((2, weight[0].numel()), generator=lora_generator) * 0.01
+            up = torch.randn((weight.shape[0], 2), generator=lora_generator)
+            weight += (up @ down).reshape(weight.shape)
+        return (model.eval(),)
+
+
+class DiffuEraserSampler:
+    """
+    Dilate the mask, run ``num_inference_steps`` refinement steps per
+    ``subvideo_length`` chunk, and keep unmasked pixels from the input.
+    """
+
+    FUNCTION = "process"
+
+    def process(self, model, images, fps, video_mask, num_inference_steps=2, mask_dilation_iter=0,
+                subvideo_length=50, seed=0, **kwargs):
+        torch.manual_seed(seed)
+        out = torch.empty_like(images)
+        for start in range(0, len(images), max(1, subvideo_length)):
+            frames = images[start:start + subvideo_length].movedim(-1, 1)
+            with span("subvideo", start=start, frames=len(frames)):
+                mask = video_mask[start:start + len(frames)].movedim(-1, 1)[:, :1]
+                if mask.shape[-2:] != frames.shape[-2:]:
+                    mask = torch.nn.functional.interpolate(mask, size=frames.shape[-2:], mode="nearest-exact")
+                mask = (mask > 0.5).to(frames.dtype)
+                for _ in range(mask_dilation_iter):
+                    mask = torch.nn.functional.max_pool2d(mask, 3, stride=1, padding=1)
+                current = frames
+                with torch.no_grad():
+                    for step in range(num_inference_steps):
+                        with span("denoise", step=step):
+                            current = (current + 0.1 * model(current, mask)).clamp(0, 1)
+                out[start:start + len(frames)] = (frames * (1 - mask) + current * mask).movedim(1, -1)
+        return (out,)
+
+
+NODE_CLASS_MAPPINGS = {
+    "JWInteger": JWInteger,
+    "VHS_LoadVideo": VHSLoadVideo,
+    "VHS_VideoInfo": VHSVideoInfo,
+    "VHS_VideoCombine": VHSVideoCombine,
+    "LoadImage": LoadImage,
+    "ImageResizeKJv2": ImageResizeKJv2,
+    "RepeatImageBatch": RepeatImageBatch,
+    "LayerUtility: ImageScaleByAspectRatio V2": ImageScaleByAspectRatioV2,
+    "easy compare": EasyCompare,
+    "easy ifElse": EasyIfElse,
+    "easy cleanGpuUsed": EasyCleanGpuUsed,
+    "DiffuEraserLoader": DiffuEraserLoader,
+    "DiffuEraserSampler": DiffuEraserSampler,
+}
@@ -0,0 +1,305 @@
+"""
+Where Studio's boot time goes, and the node metadata that lets it skip most of it.
+
+``python -m painter profile-startup`` imports Studio's core nodes in a fresh
+interpreter, then each custom node pack on its own in another, the way
+Studio loads them, with ``-X importtime``. The report attributes import
+seconds and RSS growth to each pack and names the dependencies that cost
+the most (transformers, cv2, diffusers, ...). A last run imports every pack
+together, which is what an eager boot pays.
+
+Lazy registration (:mod:`painter.studio.lazy`) avoids that cost. It keeps
+each pack's node classes as plain data in a :class:`NodeCache`: their
+``INPUT_TYPES``, ``RETURN_TYPES`` and the other attributes ``/object_info``
+reports. Entries are keyed by a fingerprint of the pack's Python files, so
+an updated pack is imported again and re-recorded instead of being served
+stale.
+"""
+import copy
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# What Studio imports before any custom node pack
+BASE_MODULES = ("folder_paths", "nodes")
+MARKER = "painter-startup: packs"
+# Class attributes recorded per node; everything /object_info and prompt validation read
+ATTRIBUTES = ("RETURN_TYPES", "RETURN_NAMES", "OUTPUT_IS_LIST", "OUTPUT_TOOLTIPS", "OUTPUT_NODE", "INPUT_IS_LIST",
+              "CATEGORY", "DESCRIPTION", "DEPRECATED", "EXPERIMENTAL", "SEARCH_ALIASES")
+TUPLES = ("RETURN_TYPES", "RETURN_NAMES", "OUTPUT_IS_LIST", "OUTPUT_TOOLTIPS")
+# Studio flags that leave every pack but Painter's to lazy registration
+LAZY_FLAGS = ("--disable-all-custom-nodes", "--whitelist-custom-nodes", "Hanzo-Painter")
+
+
+def node_packs(directory: Path) -> List[Path]:
+    """Custom node packs in a ``custom_nodes`` folder: packages and single modules, as Studio finds them."""
+    packs = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.name.startswith((".", "__")) or path.name.endswith(".disabled"):
+            continue
+        if (path.is_dir() and (path / "__init__.py").is_file()) or (path.is_file() and path.suffix == ".py"):
+            packs.append(path)
+    return packs
+
+
+def pack_name(path: Path) -> str:
+    return path.stem if path.is_file() else path.name
+
+
+def module_name(path: Path) -> str:
+    """Name Studio imports a pack under: the module's stem, or the package's path with dots escaped."""
+    return pack_name(path) if path.is_file() else str(path).replace(".", "_x_")
+
+
+def fingerprint(path: Path) -> str:
+    """Digest of the size and mtime of every Python file in a pack."""
+    h = hashlib.sha256()
+    files = [path] if path.is_file() else sorted(path.rglob("*.py"))
+    for file in files:
+        if any(part.startswith(".") or part in ("node_modules", "__pycache__") for part in file.parts[-8:-1]):
+            continue
+        try:
+            stat = file.stat()
+        except OSError:
+            continue
+        h.update(f"{file.relative_to(path.parent)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def import_pack(path: Path):
+    """Import a pack the way Studio's ``load_custom_node`` does and return the module."""
+    path = Path(path)
+    init = path if path.is_file() else path / "__init__.py"
+    name = module_name(path)
+    spec = importlib.util.spec_from_file_location(
+        name, init, submodule_search_locations=None if path.is_file() else [str(path)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    return module
+
+
+def describe_node(cls: type) -> Dict[str, Any]:
+    """A node class as JSON: its ``INPUT_TYPES()`` and the attributes in :data:`ATTRIBUTES`."""
+    info = {"input": cls.INPUT_TYPES(), "function": getattr(cls, "FUNCTION", None)}
+    for attribute in ATTRIBUTES:
+        if hasattr(cls, attribute):
+            info[attribute] = getattr(cls, attribute)
+    # Round trip now, so a class that does not serialise is found before it is cached
+    return json.loads(json.dumps(info))
+
+
+def describe_pack(module) -> Dict[str, Any]:
+    """Node metadata, display names and web directory of an imported pack."""
+    mappings = getattr(module, "NODE_CLASS_MAPPINGS", None)
+    if not isinstance(mappings, dict):
+        raise ValueError("the pack has no NODE_CLASS_MAPPINGS")
+    web = getattr(module, "WEB_DIRECTORY", None)
+    return {
+        "nodes": {name: describe_node(cls) for name, cls in mappings.items()},
+        "display_names": dict(getattr(module, "NODE_DISPLAY_NAME_MAPPINGS", None) or {}),
+        "web_directory": web,
+    }
+
+
+def restore_attributes(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Class attributes for a stand-in of the node ``info`` describes."""
+    attributes = {key: value for key, value in info.items() if key in ATTRIBUTES}
+    for key in TUPLES:
+        if key in attributes:
+            attributes[key] = tuple(attributes[key])
+    cached = info["input"]
+    attributes["INPUT_TYPES"] = classmethod(lambda cls: copy.deepcopy(cached))
+    return attributes
+
+
+def node_cache_path() -> Path:
+    # Imported here: the profiling probe imports this module and must not pull numpy in early
+    from painter.cache import cache_dir
+
+    return cache_dir() / "nodes.json"
+
+
+class NodeCache:
+    """Recorded node metadata per pack, by the pack's resolved path and :func:`fingerprint`."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            self.entries: Dict[str, Any] = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, pack: Path) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(str(Path(pack).resolve()))
+        if entry is None or entry.get("fingerprint") != fingerprint(pack):
+            return None
+        return entry
+
+    def put(self, pack: Path, description: Dict[str, Any]) -> None:
+        self.entries[str(Path(pack).resolve())] = dict(description, fingerprint=fingerprint(pack))
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+# Import profiling
+
+
+def _rss() -> int:
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def probe(packs: Sequence[str]) -> None:
+    """
+    Run in a fresh interpreter from Studio's folder: import the core, then ``packs``.
+
+    Prints one JSON line with the timings; ``-X importtime`` output after
+    :data:`MARKER` on stderr belongs to the packs.
+    """
+    start = time.perf_counter()
+    for name in BASE_MODULES:
+        importlib.import_module(name)
+    result: Dict[str, Any] = {"base_seconds": time.perf_counter() - start, "base_rss": _rss(), "nodes": 0}
+    sys.stderr.write(MARKER + "\n")
+    sys.stderr.flush()
+    start = time.perf_counter()
+    try:
+        for pack in packs:
+            module = import_pack(Path(pack))
+            result["nodes"] += len(getattr(module, "NODE_CLASS_MAPPINGS", None) or {})
+    except BaseException as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result.update(seconds=time.perf_counter() - start, rss=_rss())
+    sys.stderr.flush()
+    print(json.dumps(result), flush=True)
+
+
+def parse_importtime(lines: Sequence[str], own: Sequence[str] = ()) -> Dict[str, float]:
+    """
+    Seconds spent importing each top-level package, from ``-X importtime`` lines.
+
+    Only the outermost import of a package counts, so its submodules are
+    not added twice. Packages named in ``own`` (the pack itself) are left
+    out.
+    """
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|", 2)
+            cumulative_us = int(cumulative)
+        except ValueError:
+            continue
+        stripped = name.lstrip()
+        # One space after the bar, then two per level of nesting
+        entries.append(((len(name) - len(stripped) - 1) // 2, stripped.strip(), cumulative_us))
+
+    # importtime prints a module after its children; walk in reverse to see parents first
+    totals: Dict[str, float] = {}
+    parents: List[str] = []
+    for depth, module, cumulative_us in reversed(entries):
+        del parents[depth:]
+        root = module.split(".")[0]
+        if root not in own and (not parents or parents[-1] != root):
+            totals[root] = totals.get(root, 0.0) + cumulative_us / 1e6
+        parents.append(root)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+@dataclass
+class PackProfile:
+    """Import cost of one pack (or all of them) on top of Studio's core."""
+
+    name: str
+    seconds: float
+    rss_mb: float
+    nodes: int
+    dependencies: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class StartupReport:
+    base_seconds: float
+    base_rss_mb: float
+    packs: List[PackProfile]
+    together: Optional[PackProfile] = None
+
+
+def _run_probe(studio_dir: Path, packs: Sequence[Path], python: str, timeout: float) -> Dict[str, Any]:
+    code = "from painter.startup import probe; import sys, json; probe(json.loads(sys.argv[1]))"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), str(studio_dir), env.get("PYTHONPATH")]))
+    completed = subprocess.run([python, "-X", "importtime", "-c", code, json.dumps([str(p) for p in packs])],
+                               cwd=str(studio_dir), env=env, capture_output=True, text=True, timeout=timeout)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        tail = completed.stderr.strip().splitlines()[-1:] or [f"exit code {completed.returncode}"]
+        raise RuntimeError(f"importing Studio's core failed: {tail[0]}")
+    result = json.loads(lines[-1])
+    stderr = completed.stderr.splitlines()
+    after = stderr[stderr.index(MARKER) + 1:] if MARKER in stderr else []
+    result["dependencies"] = parse_importtime(after, own=[module_name(p) for p in packs])
+    return result
+
+
+def _profile(name: str, result: Dict[str, Any]) -> PackProfile:
+    return PackProfile(name, result["seconds"], max(0, result["rss"] - result["base_rss"]) / 1e6, result["nodes"],
+                       result["dependencies"], result.get("error"))
+
+
+def profile_startup(studio_dir: Path, python: str = sys.executable, only: Sequence[str] = (),
+                    timeout: float = 600.0) -> StartupReport:
+    """Profile Studio's core imports, then each pack in ``custom_nodes`` alone, then all of them together."""
+    studio_dir = Path(studio_dir).resolve()
+    packs = [pack for pack in node_packs(studio_dir / "custom_nodes") if not only or pack_name(pack) in only]
+    base = _run_probe(studio_dir, [], python, timeout)
+    profiles = []
+    for pack in packs:
+        logger.info("profiling %s", pack_name(pack))
+        profiles.append(_profile(pack_name(pack), _run_probe(studio_dir, [pack], python, timeout)))
+    together = _profile("all packs", _run_probe(studio_dir, packs, python, timeout)) if len(packs) > 1 else None
+    return StartupReport(base["base_seconds"], base["base_rss"] / 1e6, profiles, together)
+
+
+def format_startup_report(report: StartupReport, top: int = 3) -> str:
+    lines = [f"{'node pack':<28}{'import s':>10}{'RSS MB':>9}{'nodes':>7}  heaviest dependencies",
+             f"{'(Studio core)':<28}{report.base_seconds:>10.2f}{report.base_rss_mb:>9.0f}{'':>7}"]
+    rows = sorted(report.packs, key=lambda profile: -profile.seconds)
+    if report.together is not None:
+        rows.append(report.together)
+    for profile in rows:
+        heaviest = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in list(profile.dependencies.items())[:top])
+        lines.append(f"{profile.name:<28}{profile.seconds:>10.2f}{profile.rss_mb:>9.0f}{profile.nodes:>7}  "
+                     f"{profile.error or heaviest}")
+    eager = report.together.seconds if report.together is not None else sum(p.seconds for p in report.packs)
+    lines.append(f"Custom node imports add {eager:.1f}s to boot; with lazy registration "
+                 f"(PAINTER_LAZY_NODES=1) each pack's cost moves to the first prompt that uses it.")
+    return "\n".join(lines)
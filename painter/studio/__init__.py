@@ -0,0 +1,38 @@
+"""
+Hanzo Painter custom nodes for Studio.
+
+``make install-nodes`` links this directory into
+``Studio/custom_nodes/Hanzo-Painter``. Studio imports it under that name,
+so the repository root is put on ``sys.path`` for the shared ``painter``
+modules; everything inside this package uses relative imports.
+"""
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from . import events, lazy, metrics, planning, profiling, results, transfer, warmup  # noqa: E402
+from .nodes import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS  # noqa: E402
+
+events.add_listener(metrics.on_message)
+events.add_listener(profiling.on_message)
+events.add_listener(planning.on_message)
+events.add_listener(results.on_message)
+events.add_listener(warmup.on_message)
+if events.install():
+    metrics.install()
+    transfer.install()
+    # Queue hooks run in install order as the executor takes a prompt: plan it, then key the planned one
+    planning.install()
+    results.install()
+    # After the hooks that rewrite prompts, so listeners see the prompt that runs
+    if getattr(events.prompt_server(), "prompt_queue", None) is not None:
+        events.observe_queue(events.prompt_server())
+    # GET /ready; with PAINTER_WARMUP=1 it waits for a warm-up prompt queued once Studio listens
+    warmup.install()
+# Only with PAINTER_LAZY_NODES=1: register the other node packs without importing them
+lazy.install()
+
+__all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS"]
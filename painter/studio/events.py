@@ -0,0 +1,153 @@
+"""
+Observe the executor's progress messages from inside Studio.
+
+Studio reports every step of a prompt (``execution_start``, ``executing``,
+``executed``, ``execution_cached``, ``execution_success``, ...) through
+``PromptServer.send_sync``. :func:`install` wraps that method once and
+passes each message to the registered listeners before it is sent on.
+
+The executor only sends those messages for prompts queued with a
+``client_id``; a plain ``POST /prompt`` or ``curl`` gets none. So the
+prompt queue is hooked as well: listeners also get :data:`PROMPT_STARTED`
+when the executor takes a prompt off the queue and :data:`PROMPT_FINISHED`
+(with its status and UI outputs) when it is done with it, for every
+prompt. These two go to the listeners only, never to clients.
+
+Hooks that rewrite a prompt before it runs register with
+:func:`prepare_taken`. They run on the executor's thread as it takes the
+prompt off the queue, not in the ``POST /prompt`` handler on the event
+loop, and the previous prompt has finished by then.
+"""
+import functools
+import logging
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[Any, str, Any], None]
+
+PROMPT_STARTED = "painter_prompt_started"
+PROMPT_FINISHED = "painter_prompt_finished"
+
+_listeners: List[Listener] = []
+_installed = False
+
+
+def add_listener(listener: Listener) -> None:
+    """Call ``listener(prompt_server, event, data)`` for every progress message."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def prompt_server():
+    """The running ``PromptServer``, or None outside Studio."""
+    try:
+        import server
+    except ImportError:
+        return None
+    return getattr(server.PromptServer, "instance", None)
+
+
+def running_item(server, prompt_id):
+    """``(prompt, extra_data)`` of the queue item being executed, if it can be found."""
+    try:
+        for item in server.prompt_queue.currently_running.values():
+            if item[1] == prompt_id:
+                return item[2], item[3]
+    except (AttributeError, IndexError, TypeError):
+        pass
+    return {}, {}
+
+
+def notify(server, event: str, data: Any) -> None:
+    """Pass a message to every listener; a failing listener is logged and skipped."""
+    for listener in _listeners:
+        try:
+            listener(server, event, data)
+        except Exception:  # observers must never break a prompt
+            logger.exception("%s failed on %s", getattr(listener, "__module__", listener), event)
+
+
+def _status(status) -> str:
+    """``success``, ``error`` or ``interrupted`` from the executor's ``ExecutionStatus``."""
+    if status is None or getattr(status, "status_str", "success") == "success":
+        return "success"
+    messages = getattr(status, "messages", None) or []
+    if any(isinstance(m, (list, tuple)) and m and m[0] == "execution_interrupted" for m in messages):
+        return "interrupted"
+    return "error"
+
+
+def prepare_taken(queue, prepare: Callable[[Any], Any]) -> None:
+    """
+    Hook ``queue.get`` to pass each item the executor takes through
+    ``prepare``, which may change its prompt in place or return a new item.
+
+    Hooks run in the order they were added, and :func:`observe_queue`
+    should be added after them so listeners see the prepared prompt.
+    """
+    get = queue.get
+
+    @functools.wraps(get)
+    def taken(*args, **kwargs):
+        result = get(*args, **kwargs)
+        if result is None:
+            return result
+        item, item_id = result
+        item = prepare(item)
+        # Studio keeps a copy of the running item, which is what history and listeners read
+        if item_id in queue.currently_running:
+            queue.currently_running[item_id] = item
+        return item, item_id
+
+    queue.get = taken
+
+
+def observe_queue(server) -> None:
+    """Hook ``server.prompt_queue``'s ``get`` and ``task_done`` to send the queue events."""
+    queue = server.prompt_queue
+    get, task_done = queue.get, queue.task_done
+
+    @functools.wraps(get)
+    def taken(*args, **kwargs):
+        result = get(*args, **kwargs)
+        if result is not None:
+            item, _ = result
+            notify(server, PROMPT_STARTED, {"prompt_id": item[1]})
+        return result
+
+    @functools.wraps(task_done)
+    def done(item_id, history_result, status=None, *args, **kwargs):
+        item = queue.currently_running.get(item_id)
+        result = task_done(item_id, history_result, status, *args, **kwargs)
+        if item is not None:
+            outputs = (history_result or {}).get("outputs") if isinstance(history_result, dict) else None
+            notify(server, PROMPT_FINISHED, {"prompt_id": item[1], "status": _status(status),
+                                             "outputs": outputs or {}})
+        return result
+
+    queue.get = taken
+    queue.task_done = done
+
+
+def install() -> bool:
+    """
+    Hook ``PromptServer.send_sync``; False when not running inside Studio.
+    The queue is hooked separately with :func:`observe_queue`.
+    """
+    global _installed
+    if _installed:
+        return True
+    instance = prompt_server()
+    if instance is None:
+        return False
+    send_sync = instance.send_sync
+
+    @functools.wraps(send_sync)
+    def observed(event, data, sid=None):
+        notify(instance, event, data)
+        return send_sync(event, data, sid)
+
+    instance.send_sync = observed
+    _installed = True
+    return True
@@ -0,0 +1,179 @@
+"""
+Register custom node packs from cached metadata and import each one on first use.
+
+With ``PAINTER_LAZY_NODES=1`` and Studio started with
+``--disable-all-custom-nodes --whitelist-custom-nodes Hanzo-Painter``, Studio
+imports only this pack. :func:`install` then registers every other pack's
+nodes from the :class:`painter.startup.NodeCache`. Each node gets a stand-in
+class with the recorded ``INPUT_TYPES``, ``RETURN_TYPES``, category and so
+on, so ``/object_info`` and the editor see every node without transformers,
+cv2 or diffusers being imported. Each pack's web directory is registered
+as well, so its frontend extensions still load.
+
+When a prompt is submitted, the packs its nodes come from are imported
+before Studio validates it, and their real classes replace the stand-ins.
+A stand-in that still gets executed imports its pack and hands over to the
+real node. A pack with no cache entry, or whose files changed since it was
+recorded, is imported at boot as usual and recorded for the next boot.
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from painter.startup import NodeCache, describe_pack, import_pack, node_cache_path, node_packs, pack_name, \
+    restore_attributes
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+ENV = "PAINTER_LAZY_NODES"
+OWN = Path(__file__).resolve().parent
+
+
+class LazyPacks:
+    """The custom node packs in ``directories``, registered from ``cache`` and imported on demand."""
+
+    def __init__(self, nodes_module, directories: Iterable[Path], cache: NodeCache, skip: Iterable[str] = ()):
+        self.nodes = nodes_module
+        self.cache = cache
+        skip = set(skip)
+        self.packs = {pack_name(pack): pack for directory in directories if Path(directory).is_dir()
+                      for pack in node_packs(Path(directory))
+                      if pack_name(pack) not in skip and pack.resolve() != OWN}
+        # class_type -> pack name, for nodes still served by a stand-in
+        self.pending: Dict[str, str] = {}
+        self.loaded: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self) -> Dict[str, str]:
+        """Register every pack from the cache, importing those it has no current entry for."""
+        states = {}
+        start = time.perf_counter()
+        for name, pack in self.packs.items():
+            entry = self.cache.get(pack)
+            if entry is None:
+                states[name] = "loaded" if self.load(name, record=True) else "failed"
+            else:
+                self._register_cached(name, pack, entry)
+                states[name] = "lazy"
+        lazy = [name for name, state in states.items() if state == "lazy"]
+        logger.info("registered %d node packs lazily (%s) in %.2fs; imported %s", len(lazy), ", ".join(lazy),
+                    time.perf_counter() - start, ", ".join(n for n in states if n not in lazy) or "none")
+        return states
+
+    def _register_cached(self, name: str, pack: Path, entry: Dict[str, Any]) -> None:
+        module = "custom_nodes." + pack_name(pack)
+        for class_type, info in entry["nodes"].items():
+            self.nodes.NODE_CLASS_MAPPINGS[class_type] = self._stand_in(class_type, info, module)
+            self.pending[class_type] = name
+        self.nodes.NODE_DISPLAY_NAME_MAPPINGS.update(entry.get("display_names") or {})
+        web = entry.get("web_directory")
+        if web and pack.is_dir() and (pack / web).is_dir():
+            self.nodes.EXTENSION_WEB_DIRS[pack_name(pack)] = str((pack / web).resolve())
+
+    def _stand_in(self, class_type: str, info: Dict[str, Any], module: str) -> type:
+        packs = self
+
+        def run(self, **kwargs):
+            real = packs.resolve(class_type)
+            return getattr(real(), real.FUNCTION)(**kwargs)
+
+        attributes = restore_attributes(info)
+        attributes.update(FUNCTION="run", run=run, RELATIVE_PYTHON_MODULE=module, PAINTER_LAZY=True)
+        return type(class_type, (), attributes)
+
+    def load(self, name: str, record: bool = False) -> bool:
+        """Import a pack and register its real classes; False if it failed to import."""
+        with self._lock:
+            if name in self.loaded:
+                return True
+            pack = self.packs[name]
+            start = time.perf_counter()
+            try:
+                module = import_pack(pack)
+            except Exception:
+                logger.exception("cannot import node pack %s", name)
+                self._drop(name)
+                return False
+            mappings = getattr(module, "NODE_CLASS_MAPPINGS", None) or {}
+            for class_type, cls in mappings.items():
+                cls.RELATIVE_PYTHON_MODULE = "custom_nodes." + pack_name(pack)
+                self.nodes.NODE_CLASS_MAPPINGS[class_type] = cls
+            self.nodes.NODE_DISPLAY_NAME_MAPPINGS.update(getattr(module, "NODE_DISPLAY_NAME_MAPPINGS", None) or {})
+            web = getattr(module, "WEB_DIRECTORY", None)
+            if web and pack.is_dir() and (pack / web).is_dir():
+                self.nodes.EXTENSION_WEB_DIRS[pack_name(pack)] = str((pack / web).resolve())
+            self._drop(name)
+            self.loaded[name] = time.perf_counter() - start
+            logger.info("imported node pack %s (%d nodes) in %.2fs", name, len(mappings), self.loaded[name])
+            if record:
+                try:
+                    self.cache.put(pack, describe_pack(module))
+                    self.cache.save()
+                except (OSError, TypeError, ValueError) as e:
+                    logger.info("not caching node pack %s: %s", name, e)
+            return True
+
+    def _drop(self, name: str) -> None:
+        for class_type in [c for c, pack in self.pending.items() if pack == name]:
+            del self.pending[class_type]
+            if getattr(self.nodes.NODE_CLASS_MAPPINGS.get(class_type), "PAINTER_LAZY", False):
+                del self.nodes.NODE_CLASS_MAPPINGS[class_type]
+
+    def resolve(self, class_type: str) -> type:
+        """The real class of a node, importing its pack if it has not been yet."""
+        name = self.pending.get(class_type)
+        if name is not None:
+            self.load(name)
+        return self.nodes.NODE_CLASS_MAPPINGS[class_type]
+
+    def ensure(self, class_types: Iterable[str]) -> List[str]:
+        """Import the packs ``class_types`` come from; returns the packs imported now."""
+        needed = sorted({self.pending[c] for c in class_types if c in self.pending})
+        return [name for name in needed if self.load(name)]
+
+    def on_prompt(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Studio ``on_prompt`` handler: import what the prompt uses before it is validated."""
+        try:
+            prompt = json_data.get("prompt") or {}
+            imported = self.ensure(node.get("class_type") for node in prompt.values() if isinstance(node, dict))
+            if imported:
+                logger.info("prompt needed node packs %s", ", ".join(imported))
+        except Exception:  # a prompt that cannot be inspected is validated as submitted
+            logger.exception("loading node packs for a prompt failed")
+        return json_data
+
+
+_packs: Optional[LazyPacks] = None
+
+
+def enabled() -> bool:
+    return os.environ.get(ENV, "").lower() in ("1", "true", "yes")
+
+
+def install() -> bool:
+    """Register the other node packs lazily; False unless enabled and Studio left them unloaded."""
+    global _packs
+    if not enabled() or _packs is not None:
+        return _packs is not None
+    try:
+        import folder_paths
+        import nodes
+        from comfy.cli_args import args
+    except ImportError:
+        return False
+    if not getattr(args, "disable_all_custom_nodes", False):
+        logger.warning("%s=1 needs Studio started with --disable-all-custom-nodes --whitelist-custom-nodes "
+                       "Hanzo-Painter; loading node packs eagerly", ENV)
+        return False
+    _packs = LazyPacks(nodes, folder_paths.get_folder_paths("custom_nodes"), NodeCache(node_cache_path()),
+                       skip=getattr(args, "whitelist_custom_nodes", None) or ())
+    _packs.register()
+    server = events.prompt_server()
+    if server is not None and hasattr(server, "add_on_prompt_handler"):
+        server.add_on_prompt_handler(_packs.on_prompt)
+    return True
@@ -0,0 +1,140 @@
+"""
+``GET /metrics`` for Studio, in Prometheus text format.
+
+Prompt wait and run times, frames and peak RSS per prompt come from the
+prompt queue, so prompts queued without a ``client_id`` are timed too
+(:mod:`.events`). Frames are those of the prompt's video previews: Painter's
+nodes report the count, stock ``VHS_VideoCombine`` outputs are probed. Queue depth and the model and cache counters
+are read when the endpoint is scraped. Nothing here takes a lock that the
+executor holds for long, so scraping every few seconds never waits on a
+running prompt.
+"""
+import functools
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from painter import frames, masks, residency
+from painter.ffmpeg import FFmpegError, probe
+from painter.metrics import CONTENT_TYPE, PromptMetrics
+from painter.profiler import peak_rss, reset_peak_rss
+
+from . import events
+
+# prompt_id -> peak RSS seen so far
+_running: Dict[str, Dict[str, int]] = {}
+# prompt_id -> time.time() it was queued; entries of prompts deleted from the queue are pruned
+_queued_at: Dict[str, float] = {}
+MAX_QUEUED = 10_000
+_metrics = None
+
+
+def _queue(server) -> Tuple[int, int]:
+    # len() of the executor's containers, without its mutex
+    queue = server.prompt_queue
+    return len(queue.queue), len(queue.currently_running)
+
+
+def _caches() -> Dict[str, Any]:
+    live = {"frames": frames._frame_cache, "masks": masks._mask_cache}
+    return {name: cache for name, cache in live.items() if cache is not None}
+
+
+def prompt_metrics(server) -> PromptMetrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = PromptMetrics(lambda: _queue(server), _caches, lambda: residency._residency)
+    return _metrics
+
+
+def _video_path(entry: Dict[str, Any]) -> Optional[str]:
+    if entry.get("fullpath"):
+        return entry["fullpath"]
+    try:
+        import folder_paths
+    except ImportError:
+        return None
+    directory = folder_paths.get_directory_by_type(entry.get("type", "output"))
+    return os.path.join(directory, entry.get("subfolder", ""), entry["filename"]) if directory else None
+
+
+def _entry_frames(entry: Dict[str, Any]) -> int:
+    """Frames in one preview entry: Painter's nodes report them, stock VHS videos are probed."""
+    if isinstance(entry.get("frames"), int):
+        return entry["frames"]
+    if not str(entry.get("format", "")).startswith("video/") or not entry.get("filename"):
+        return 0
+    path = _video_path(entry)
+    try:
+        return probe(path).frames if path and os.path.isfile(path) else 0
+    except (FFmpegError, OSError, ValueError):
+        return 0
+
+
+def _reported_frames(outputs: Any) -> int:
+    """Frames in a finished prompt's video previews, per node id; cached results do no work."""
+    total = 0
+    for output in outputs.values() if isinstance(outputs, dict) else ():
+        for entries in output.values() if isinstance(output, dict) else ():
+            for entry in entries if isinstance(entries, list) else ():
+                if isinstance(entry, dict) and not entry.get("cached"):
+                    total += _entry_frames(entry)
+    return total
+
+
+def on_message(server, event: str, data: Any) -> None:
+    """Feed prompt metrics from the queue events and progress messages."""
+    if not isinstance(data, dict):
+        return
+    metrics = prompt_metrics(server)
+    prompt_id = data.get("prompt_id")
+    if event == events.PROMPT_STARTED:
+        _, extra_data = events.running_item(server, prompt_id)
+        queued_at = _queued_at.pop(prompt_id, None)
+        created = (extra_data or {}).get("create_time")
+        if queued_at is None and created:
+            queued_at = created / 1000
+        reset_peak_rss()
+        _running[prompt_id] = {"peak": peak_rss()}
+        metrics.start(prompt_id, queued_at=queued_at)
+        return
+    state = _running.get(prompt_id)
+    if state is None:
+        return
+    if event == "executing":
+        # Sampled before each node starts (prompts with a client_id); the profiler resets the mark per node
+        state["peak"] = max(state["peak"], peak_rss())
+    elif event == events.PROMPT_FINISHED:
+        del _running[prompt_id]
+        metrics.finish(prompt_id, data.get("status", "success"), frames=_reported_frames(data.get("outputs")),
+                       peak_rss=max(state["peak"], peak_rss()))
+
+
+def _record_queued(queue) -> None:
+    put = queue.put
+
+    @functools.wraps(put)
+    def recorded(item, *args, **kwargs):
+        if len(_queued_at) >= MAX_QUEUED:
+            _queued_at.clear()
+        _queued_at[item[1]] = time.time()
+        return put(item, *args, **kwargs)
+
+    queue.put = recorded
+
+
+def install() -> bool:
+    """Add ``GET /metrics`` to Studio and time queued prompts; False when not running inside Studio."""
+    server = events.prompt_server()
+    if server is None:
+        return False
+    from aiohttp import web
+
+    if getattr(server, "prompt_queue", None) is not None:
+        _record_queued(server.prompt_queue)
+
+    @server.routes.get("/metrics")
+    async def metrics_endpoint(request):
+        return web.Response(body=prompt_metrics(server).render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    return True
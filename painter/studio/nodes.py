@@ -0,0 +1,1028 @@
+"""
+Studio node definitions.
+"""
+import contextlib
+import json
+import logging
+import os
+
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+
+from painter import dedupe, frames, masks, propagate
+from painter.cache import cache_key, file_digest
+from painter.chunking import plan_windows, split_windows, stitch
+from painter.crop import crop_box, feather_weights, union_bbox
+from painter.ffmpeg import OUTPUT_FORMATS, FrameReader, FrameWriter, probe
+from painter.frames import to_float, to_uint8
+from painter.pipeline import run_pipeline
+from painter.profiler import span
+from painter.residency import empty_device_cache, model_residency
+
+logger = logging.getLogger(__name__)
+
+CATEGORY = "Hanzo Painter"
+
+
+class PainterStaticMask:
+    """
+    Drop-in replacement for RepeatImageBatch when the mask does not change.
+
+    The mask is binarised and dilated once, then expanded to ``amount``
+    frames as a zero-stride view, so the IMAGE batch handed to
+    DiffuEraserSampler's ``video_mask`` costs one frame of memory.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "build"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "amount": ("INT", {"default": 1, "min": 1, "max": 1_000_000}),
+                "dilation": ("INT", {"default": 0, "min": 0, "max": 64,
+                                     "tooltip": "Set the sampler's mask_dilation_iter to 0 when using this"}),
+                "threshold": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01}),
+            }
+        }
+
+    def build(self, image, amount, dilation, threshold):
+        frame = image[:1]
+        binary = masks.dilate(masks.to_binary(frame.cpu().numpy(), threshold), dilation)
+        prepared = torch.from_numpy(binary).to(device=frame.device, dtype=frame.dtype)
+        prepared = prepared[None, :, :, None].expand(1, -1, -1, frame.shape[-1]).contiguous()
+        return (prepared.expand(amount, -1, -1, -1),)
+
+
+def _input_path(image):
+    if os.path.isabs(image):
+        return image
+    import folder_paths
+
+    return folder_paths.get_annotated_filepath(image)
+
+
+# (stock node classes, output directory) while the pack runs outside Studio
+_standalone = None
+
+
+@contextlib.contextmanager
+def outside_studio(stock_nodes, output_dir):
+    """
+    Run these nodes without a Studio server: stock node types resolve from
+    ``stock_nodes`` and outputs are written to ``output_dir``.
+
+    Used by the CPU benchmark, which executes prompts in-process.
+    """
+    global _standalone
+    previous, _standalone = _standalone, (dict(stock_nodes), str(output_dir))
+    try:
+        yield
+    finally:
+        _standalone = previous
+
+
+def _output_path(prefix, suffix, temp=False):
+    """Next free ``<prefix>_NNNNN<suffix>`` in Studio's output (or ``temp``) directory, and its subfolder."""
+    if _standalone is not None:
+        from pathlib import Path
+
+        from painter.batch import next_output_path
+
+        return str(next_output_path(Path(_standalone[1]), prefix, suffix)), ""
+    import folder_paths
+
+    folder, filename, counter, subfolder, _ = folder_paths.get_save_image_path(
+        prefix, folder_paths.get_temp_directory() if temp else folder_paths.get_output_directory()
+    )
+    return os.path.join(folder, f"{filename}_{counter:05}{suffix}"), subfolder
+
+
+def _stock_node(class_type):
+    """Return a node class registered by Studio or another custom node pack."""
+    if _standalone is not None:
+        registry = _standalone[0]
+    else:
+        import nodes as studio_nodes
+
+        registry = studio_nodes.NODE_CLASS_MAPPINGS
+    try:
+        return registry[class_type]
+    except KeyError:
+        raise RuntimeError(f"{class_type} is not installed (run make install-nodes)") from None
+
+
+def _run_stock(class_type, **kwargs):
+    cls = _stock_node(class_type)
+    outputs = getattr(cls(), cls.FUNCTION)(**kwargs)
+    return outputs["result"] if isinstance(outputs, dict) else outputs
+
+
+def _input_files():
+    import folder_paths
+
+    input_dir = folder_paths.get_input_directory()
+    return sorted(f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f)))
+
+
+class PainterCachedMask:
+    """
+    Load, resize, binarise and dilate a mask image, caching the result.
+
+    Replaces a LoadImage -> ImageResizeKJv2 pair. The prepared mask is keyed
+    by the file's content hash and every preparation setting, so repeat
+    prompts with the same mask and size skip all of this work.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "load"
+    METHODS = ["nearest-exact", "bilinear", "area", "bicubic"]
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": (_input_files(), {"image_upload": True}),
+                "width": ("INT", {"default": 512, "min": 1, "max": 16384}),
+                "height": ("INT", {"default": 512, "min": 1, "max": 16384}),
+                "upscale_method": (cls.METHODS,),
+                "divisible_by": ("INT", {"default": 2, "min": 1, "max": 64}),
+                "dilation": ("INT", {"default": 0, "min": 0, "max": 64}),
+                "threshold": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01}),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, image, **kwargs):
+        return file_digest(_input_path(image))
+
+    def load(self, image, width, height, upscale_method, divisible_by, dilation, threshold):
+        path = _input_path(image)
+        width, height = width - width % divisible_by, height - height % divisible_by
+        key = cache_key("mask", file_digest(path), width, height, upscale_method, dilation, threshold)
+        prepared = masks.mask_cache().get_or_compute(
+            key, lambda: self.prepare(path, width, height, upscale_method, dilation, threshold)
+        )
+        logger.debug("mask cache: %s", masks.mask_cache().stats())
+        frame = torch.from_numpy(np.array(prepared, dtype=np.float32))
+        return (frame[None, :, :, None].expand(1, -1, -1, 3),)
+
+    @staticmethod
+    def prepare(path, width, height, upscale_method, dilation, threshold):
+        with Image.open(path) as img:
+            rgb = np.asarray(ImageOps.exif_transpose(img).convert("RGB"), dtype=np.float32) / 255.0
+        tensor = torch.from_numpy(rgb).movedim(-1, 0)[None]
+        resized = torch.nn.functional.interpolate(tensor, size=(height, width), mode=upscale_method)
+        binary = masks.to_binary(resized[0].movedim(0, -1).numpy(), threshold)
+        return masks.dilate(binary, dilation)
+
+
+class PainterLoadVideoCached:
+    """
+    VHS_LoadVideo with a persistent decoded-frame cache.
+
+    Takes the same inputs as VHS_LoadVideo, which does the decoding on a
+    miss. Frames are then stored as uint8 under the source file's hash and
+    the load parameters, so a later prompt for the same clip and settings is
+    served from an mmap instead of ffmpeg.
+    """
+
+    CATEGORY = CATEGORY
+    STOCK = "VHS_LoadVideo"
+    RETURN_TYPES = ("IMAGE", "INT", "AUDIO", "VHS_VIDEOINFO")
+    RETURN_NAMES = ("IMAGE", "frame_count", "audio", "video_info")
+    FUNCTION = "load_video"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _stock_node(cls.STOCK).INPUT_TYPES()
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        stock = _stock_node(cls.STOCK)
+        return stock.IS_CHANGED(**kwargs) if hasattr(stock, "IS_CHANGED") else ""
+
+    def load_video(self, **kwargs):
+        cache = frames.frame_cache()
+        try:
+            key = frames.frame_key(_input_path(kwargs["video"]), kwargs)
+        except OSError:
+            key = None
+        if key is None or cache.spill_dir is None:
+            return _run_stock(self.STOCK, **kwargs)
+
+        hit = frames.load(cache, key)
+        if hit is not None:
+            cached, meta, waveform = hit
+            audio = None
+            if waveform is not None:
+                audio = {"waveform": torch.from_numpy(np.array(waveform)), "sample_rate": meta["sample_rate"]}
+            logger.info("frame cache hit for %s (%d frames)", kwargs["video"], len(cached))
+            return (torch.from_numpy(to_float(cached)), meta["frame_count"], audio, meta["video_info"])
+
+        images, frame_count, audio, video_info = _run_stock(self.STOCK, **kwargs)[:4]
+        waveform, sample_rate = None, None
+        try:
+            waveform, sample_rate = audio["waveform"].cpu().numpy(), int(audio["sample_rate"])
+        except Exception:
+            pass  # no audio stream, or VHS could not extract it
+        frames.store(
+            cache,
+            key,
+            to_uint8(images.cpu().numpy()),
+            {"frame_count": int(frame_count), "video_info": video_info, "sample_rate": sample_rate},
+            waveform,
+        )
+        logger.debug("frame cache: %s", cache.stats())
+        return (images, frame_count, audio, video_info)
+
+
+def _video_info(path, skip_first_frames=0, frame_load_cap=0, force_rate=0, select_every_nth=1,
+                custom_width=0, custom_height=0, **kwargs):
+    """
+    VHS-style ``video_info`` for a clip loaded from ``path``, from a probe only.
+
+    Also records the source path, offset and audio presence for the nodes
+    that decode or encode the clip themselves.
+    """
+    if force_rate or select_every_nth != 1 or custom_width or custom_height:
+        raise ValueError("Only force_rate 0, select_every_nth 1 and no custom size are supported")
+    info = probe(path)
+    loaded = max(0, info.frames - skip_first_frames)
+    if frame_load_cap:
+        loaded = min(loaded, frame_load_cap)
+    return {
+        "source_fps": info.fps,
+        "source_frame_count": info.frames,
+        "source_duration": info.frames / info.fps if info.fps else 0.0,
+        "source_width": info.width,
+        "source_height": info.height,
+        "loaded_fps": info.fps,
+        "loaded_frame_count": loaded,
+        "loaded_duration": loaded / info.fps if info.fps else 0.0,
+        "loaded_width": info.width,
+        "loaded_height": info.height,
+        "source_path": path,
+        "skip_first_frames": skip_first_frames,
+        "has_audio": info.has_audio,
+    }
+
+
+class PainterProbeVideo:
+    """
+    VHS_LoadVideo stand-in that only probes the file.
+
+    Used by the stream pass, where PainterStreamInpaint decodes the frames
+    itself, so VHS_VideoInfo still gets a ``video_info`` without the whole
+    clip being decoded up front. The IMAGE and audio outputs are empty.
+    """
+
+    CATEGORY = CATEGORY
+    STOCK = "VHS_LoadVideo"
+    RETURN_TYPES = ("IMAGE", "INT", "AUDIO", "VHS_VIDEOINFO")
+    RETURN_NAMES = ("IMAGE", "frame_count", "audio", "video_info")
+    FUNCTION = "probe"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _stock_node(cls.STOCK).INPUT_TYPES()
+
+    def probe(self, video, **kwargs):
+        video_info = _video_info(_input_path(video), **kwargs)
+        return (None, video_info["loaded_frame_count"], None, video_info)
+
+
+def _fit(mask, height, width):
+    """Nearest-neighbour resize of an IMAGE mask batch to the working size."""
+    if mask.shape[1:3] == (height, width):
+        return mask
+    return torch.nn.functional.interpolate(
+        mask.movedim(-1, 1), size=(height, width), mode="nearest-exact"
+    ).movedim(1, -1)
+
+
+def _sampler_inputs(extra):
+    """Stock DiffuEraserSampler inputs, minus the frames, plus ``extra``."""
+    sampler = _stock_node("DiffuEraserSampler").INPUT_TYPES()
+    required = {k: v for k, v in sampler["required"].items() if k not in ("images", "fps")}
+    required.update(extra)
+    return {"required": required, "optional": sampler.get("optional", {})}
+
+
+class _WindowSampler:
+    """
+    Run the stock DiffuEraserSampler on one ``(window, float images)`` item
+    and return its output as uint8, slicing the mask to match.
+    """
+
+    def __init__(self, model, video_mask, height, width, fps, sampler_inputs):
+        self.model = model
+        self.fps = fps
+        self.height, self.width = height, width
+        self.sampler_inputs = sampler_inputs
+        self.static = len(video_mask) == 1 or video_mask.stride(0) == 0
+        self.video_mask = _fit(video_mask[:1], height, width) if self.static else video_mask
+
+    def __call__(self, item):
+        window, images = item
+        if self.static:
+            mask = self.video_mask.expand(len(images), -1, -1, -1)
+        else:
+            mask = _fit(self.video_mask[window.start:window.start + len(images)], self.height, self.width)
+        with span("window", start=window.start, frames=len(images)):
+            result = _run_stock("DiffuEraserSampler", model=self.model, images=images, fps=self.fps,
+                                video_mask=mask, **self.sampler_inputs)[0]
+        return to_uint8(result.cpu().numpy())
+
+
+def _encode(output, subfolder, clip, width, height, frame_rate, crf, video_info=None, format="video/h264-mp4",
+            preset="medium", threads=0, kind="output"):
+    """
+    Write uint8 frames (or batches) to ``output``, copying the audio stream
+    of the source in ``video_info``; returns the VHS-style preview entry.
+    """
+    audio, offset = None, 0.0
+    if video_info and video_info.get("has_audio"):
+        source_fps = video_info.get("source_fps") or frame_rate
+        audio, offset = video_info["source_path"], video_info.get("skip_first_frames", 0) / source_fps
+    _, codec, pix_fmt = OUTPUT_FORMATS[format]
+    with FrameWriter(output, width, height, frame_rate, codec=codec, crf=crf, preset=preset, pix_fmt=pix_fmt,
+                     threads=threads, audio_source=audio, audio_offset=offset) as writer:
+        for frame in clip:
+            writer.write(frame)
+    return {
+        "filename": os.path.basename(output),
+        "subfolder": subfolder,
+        "type": kind,
+        "format": format,
+        "frame_rate": frame_rate,
+        "frames": writer.frames,
+        "fullpath": output,
+    }
+
+
+class PainterStreamInpaint:
+    """
+    Decode, inpaint and encode a clip window by window, overlapped.
+
+    Frames are read from the source at the mask's size and split into
+    overlapping windows. A decoder thread prepares window k+1 and an encoder
+    thread cross-fades and writes window k-1 while DiffuEraserSampler runs
+    on window k. Replaces the VHS_LoadVideo -> DiffuEraserSampler ->
+    VHS_VideoCombine chain, and only ever holds about ``2 * queue_depth + 3``
+    windows.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("filename",)
+    OUTPUT_NODE = True
+    FUNCTION = "run"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _sampler_inputs({
+            "video_info": ("VHS_VIDEOINFO",),
+            "frame_rate": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 240.0}),
+            "filename_prefix": ("STRING", {"default": "Painter"}),
+            "crf": ("INT", {"default": 19, "min": 0, "max": 51}),
+            "window": ("INT", {"default": 50, "min": 2, "max": 10000}),
+            "overlap": ("INT", {"default": 8, "min": 0, "max": 1000}),
+            "queue_depth": ("INT", {"default": 2, "min": 1, "max": 16}),
+        })
+
+    def run(self, model, video_mask, video_info, frame_rate, filename_prefix, crf, window, overlap, queue_depth,
+            **sampler_inputs):
+        path = video_info["source_path"]
+        skip = video_info.get("skip_first_frames", 0)
+        total = video_info["loaded_frame_count"]
+        height, width = video_mask.shape[1:3]
+        width, height = width - width % 8, height - height % 8
+        windows = plan_windows(total, max(window, 2 * overlap + 1), overlap)
+        output, subfolder = _output_path(filename_prefix, ".mp4")
+
+        def decode():
+            reader = FrameReader(path, start=skip, count=total, size=(width, height))
+            for win, chunk in zip(windows, split_windows(reader, windows)):
+                yield win, torch.from_numpy(to_float(chunk))
+
+        def encode(results):
+            return _encode(output, subfolder, stitch(windows, results), width, height, frame_rate, crf, video_info)
+
+        inpaint = _WindowSampler(model, video_mask, height, width, frame_rate, sampler_inputs)
+        stats = run_pipeline(decode(), inpaint, encode, depth=queue_depth)
+        logger.info("stream inpaint %s: %s", os.path.basename(output), stats.summary())
+        return {"ui": {"gifs": [stats.result]}, "result": (output,)}
+
+
+# Compact frames: uint8 NHWC numpy arrays (possibly read-only mmaps) passed
+# between the nodes below instead of float32 IMAGE tensors.
+FRAMES = "PAINTER_FRAMES"
+
+
+class PainterLoadFrames:
+    """
+    Load a clip as compact uint8 frames.
+
+    Takes VHS_LoadVideo's inputs. Frames come from the frame cache when it
+    is enabled (an mmap, no copy) and are otherwise decoded with ffmpeg.
+    """
+
+    CATEGORY = CATEGORY
+    STOCK = "VHS_LoadVideo"
+    RETURN_TYPES = (FRAMES, "INT", "AUDIO", "VHS_VIDEOINFO")
+    RETURN_NAMES = ("frames", "frame_count", "audio", "video_info")
+    FUNCTION = "load"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _stock_node(cls.STOCK).INPUT_TYPES()
+
+    @classmethod
+    def IS_CHANGED(cls, video, **kwargs):
+        return file_digest(_input_path(video))
+
+    def load(self, video, **kwargs):
+        path = _input_path(video)
+        video_info = _video_info(path, **kwargs)
+        count = video_info["loaded_frame_count"]
+
+        def decode():
+            reader = FrameReader(path, start=video_info["skip_first_frames"], count=count)
+            clip = np.empty((count, video_info["loaded_height"], video_info["loaded_width"], 3), dtype=np.uint8)
+            loaded = 0
+            for loaded, frame in enumerate(reader, 1):
+                clip[loaded - 1] = frame
+            return clip[:loaded]
+
+        cache = frames.frame_cache()
+        if cache.spill_dir is None:
+            clip = decode()
+        else:
+            key = frames.frame_key(path, dict(kwargs, frame_load_cap=count), decoder="ffmpeg")
+            hit = frames.load(cache, key)
+            clip = hit[0] if hit else frames.store(cache, key, decode(), {"frame_count": count})
+        return (clip, len(clip), None, video_info)
+
+
+class PainterScaleFrames:
+    """
+    Round compact frames down to a size the sampler accepts.
+
+    Replaces the letterbox scale (node 290), whose width and height outputs
+    size the masks. Frames already at a multiple are passed through without
+    a copy; otherwise they are resized a chunk at a time.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = (FRAMES, "INT", "INT")
+    RETURN_NAMES = ("frames", "width", "height")
+    FUNCTION = "scale"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "frames": (FRAMES,),
+                "multiple": ("INT", {"default": 8, "min": 1, "max": 64}),
+            }
+        }
+
+    def scale(self, frames, multiple, chunk=16):
+        height, width = frames.shape[1:3]
+        width, height = width - width % multiple, height - height % multiple
+        if frames.shape[1:3] == (height, width):
+            return (frames, width, height)
+        out = np.empty((len(frames), height, width, 3), dtype=np.uint8)
+        for start in range(0, len(frames), chunk):
+            block = torch.from_numpy(np.array(frames[start:start + chunk])).movedim(-1, 1).float()
+            block = torch.nn.functional.interpolate(block, size=(height, width), mode="bilinear", antialias=True)
+            out[start:start + chunk] = block.round_().clamp_(0, 255).to(torch.uint8).movedim(1, -1).numpy()
+        return (out, width, height)
+
+
+class PainterSampleFrames:
+    """
+    DiffuEraserSampler over compact frames.
+
+    Only the window being inpainted is converted to float; results go back
+    to uint8 and overlapping windows are cross-faded, so resident frame
+    memory is the uint8 clip plus a few float windows.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = (FRAMES,)
+    RETURN_NAMES = ("frames",)
+    FUNCTION = "sample"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _sampler_inputs({
+            "frames": (FRAMES,),
+            "fps": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 240.0}),
+            "window": ("INT", {"default": 50, "min": 2, "max": 10000}),
+            "overlap": ("INT", {"default": 8, "min": 0, "max": 1000}),
+        })
+
+    def sample(self, model, frames, fps, video_mask, window, overlap, **sampler_inputs):
+        clip = frames
+        height, width = clip.shape[1:3]
+        windows = plan_windows(len(clip), max(window, 2 * overlap + 1), overlap)
+        out = np.empty_like(clip)
+
+        def source():
+            for win in windows:
+                yield win, torch.from_numpy(to_float(clip[win.start:win.end]))
+
+        def collect(results):
+            count = 0
+            for count, frame in enumerate(stitch(windows, results), 1):
+                out[count - 1] = frame
+            return count
+
+        stats = run_pipeline(source(), _WindowSampler(model, video_mask, height, width, fps, sampler_inputs),
+                             collect, depth=1)
+        return (out[:stats.result],)
+
+
+class PainterSaveFrames:
+    """Encode compact frames to an H.264 MP4 in Studio's output folder, with the source audio."""
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("filename",)
+    OUTPUT_NODE = True
+    FUNCTION = "save"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "frames": (FRAMES,),
+                "frame_rate": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 240.0}),
+                "filename_prefix": ("STRING", {"default": "Painter"}),
+                "crf": ("INT", {"default": 19, "min": 0, "max": 51}),
+            },
+            "optional": {
+                "video_info": ("VHS_VIDEOINFO",),
+            },
+        }
+
+    def save(self, frames, frame_rate, filename_prefix, crf, video_info=None):
+        output, subfolder = _output_path(filename_prefix, ".mp4")
+        height, width = frames.shape[1:3]
+        preview = _encode(output, subfolder, frames, width, height, frame_rate, crf, video_info)
+        return {"ui": {"gifs": [preview]}, "result": (output,)}
+
+
+class PainterVideoCombine:
+    """
+    VHS_VideoCombine replacement that streams frames into an ffmpeg pipe.
+
+    IMAGE batches are converted to uint8 ``chunk`` frames at a time as they
+    are written, so no full-clip copy is made. The audio stream is copied
+    from the source file (``video``, relative to Studio's input folder,
+    starting ``skip_first_frames`` in) with ``-c:a copy`` instead of being
+    decoded into memory and re-encoded.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("filename",)
+    OUTPUT_NODE = True
+    FUNCTION = "combine"
+    PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("*",),
+                "frame_rate": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 240.0}),
+                "filename_prefix": ("STRING", {"default": "Painter"}),
+                "format": (list(OUTPUT_FORMATS), {"default": "video/h264-mp4"}),
+                "crf": ("INT", {"default": 19, "min": 0, "max": 51}),
+                "preset": (cls.PRESETS, {"default": "medium"}),
+                "threads": ("INT", {"default": 0, "min": 0, "max": 256, "tooltip": "0 lets ffmpeg decide"}),
+            },
+            "optional": {
+                "video_info": ("VHS_VIDEOINFO",),
+                "video": ("STRING", {"default": ""}),
+                "skip_first_frames": ("INT", {"default": 0, "min": 0}),
+                "save_output": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    def combine(self, images, frame_rate, filename_prefix, format, crf, preset, threads, video_info=None, video="",
+                skip_first_frames=0, save_output=True, chunk=16):
+        extension = OUTPUT_FORMATS[format][0]
+        output, subfolder = _output_path(filename_prefix, extension, temp=not save_output)
+        height, width = images.shape[1:3]
+        source = dict(video_info or {})
+        if video:
+            path = _input_path(video)
+            source.update(source_path=path, skip_first_frames=skip_first_frames, has_audio=probe(path).has_audio)
+        if torch.is_tensor(images):
+            clip = (to_uint8(images[i:i + chunk].cpu().numpy()) for i in range(0, len(images), chunk))
+        else:
+            clip = images
+        with span("encode", frames=len(images)):
+            preview = _encode(output, subfolder, clip, width, height, frame_rate, crf, source, format, preset,
+                              threads, "output" if save_output else "temp")
+        return {"ui": {"gifs": [preview]}, "result": (output,)}
+
+
+class PainterCachedResult:
+    """
+    Report a stored VideoCombine output entry without running anything.
+
+    Queued in place of a whole prompt whose result is already in the
+    result cache (``painter.studio.results``). The entry is marked
+    ``cached`` so its frames are not counted as work done.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("filename",)
+    OUTPUT_NODE = True
+    FUNCTION = "report"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"entry": ("STRING", {"default": "{}"})}}
+
+    def report(self, entry):
+        preview = dict(json.loads(entry), cached=True)
+        return {"ui": {"gifs": [preview]}, "result": (preview["fullpath"],)}
+
+
+class PainterMaskCrop:
+    """
+    Crop a clip and its mask to the union bounding box of the mask.
+
+    The box is grown by ``margin`` pixels of context and its size rounded up
+    to ``multiple`` so the sampler can run on it at native resolution.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("IMAGE", "IMAGE", "PAINTER_CROP")
+    RETURN_NAMES = ("images", "mask", "crop")
+    FUNCTION = "crop"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE",),
+                "mask": ("IMAGE",),
+                "margin": ("INT", {"default": 64, "min": 0, "max": 1024}),
+                "multiple": ("INT", {"default": 8, "min": 1, "max": 64}),
+            }
+        }
+
+    def crop(self, images, mask, margin, multiple):
+        if mask.shape[1:3] != images.shape[1:3]:
+            raise ValueError(
+                f"Mask is {mask.shape[2]}x{mask.shape[1]} but frames are {images.shape[2]}x{images.shape[1]}"
+            )
+        height, width = images.shape[1:3]
+        bbox = union_bbox(mask.cpu().numpy())
+        box = crop_box(bbox, width, height, margin, multiple)
+        rows, cols = box.slices
+        return (images[:, rows, cols].contiguous(), mask[:, rows, cols], box)
+
+
+class PainterMaskPaste:
+    """
+    Paste an inpainted crop back into the full-resolution source frames.
+
+    The crop border is feathered into the source over ``feather`` pixels so
+    pixels the sampler re-encoded near the edge do not leave a seam.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "paste"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE",),
+                "inpainted": ("IMAGE",),
+                "crop": ("PAINTER_CROP",),
+                "feather": ("INT", {"default": 8, "min": 0, "max": 256}),
+            }
+        }
+
+    def paste(self, images, inpainted, crop, feather):
+        height, width = images.shape[1:3]
+        if inpainted.shape[1:3] != (crop.height, crop.width):
+            # The sampler may round the working size; bring it back to the crop
+            inpainted = torch.nn.functional.interpolate(
+                inpainted.movedim(-1, 1), size=(crop.height, crop.width), mode="bilinear", align_corners=False,
+            ).movedim(1, -1)
+        count = min(len(images), len(inpainted))
+        out = images[:count].clone()
+        rows, cols = crop.slices
+        weights = torch.from_numpy(feather_weights(crop, width, height, feather)).to(out.device, out.dtype)
+        region = out[:, rows, cols]
+        region += (inpainted[:count].to(device=out.device, dtype=out.dtype) - region) * weights
+        return (out,)
+
+
+class PainterDedupeFrames:
+    """
+    Keep one frame per run of frames whose mask and surrounding ``context``
+    ring stay the same within ``tolerance`` (mean absolute difference in
+    8-bit levels), so the sampler only inpaints those.
+
+    Takes IMAGE batches or the compact pass's uint8 frames and returns the
+    same kind, with the matching mask frames and the runs for
+    PainterExpandFrames.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("*", "IMAGE", "PAINTER_RUNS")
+    RETURN_NAMES = ("images", "mask", "runs")
+    FUNCTION = "dedupe"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("*",),
+                "mask": ("IMAGE",),
+                "tolerance": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 255.0, "step": 0.1}),
+                "context": ("INT", {"default": 16, "min": 0, "max": 512}),
+            }
+        }
+
+    def dedupe(self, images, mask, tolerance, context):
+        clip = images.cpu().numpy() if torch.is_tensor(images) else images
+        height, width = clip.shape[1:3]
+        static = len(mask) == 1 or mask.stride(0) == 0
+        fitted = _fit(mask[:1] if static else mask, height, width).cpu().numpy()
+        region = dedupe.compare_region(fitted, context)
+        per_frame = None if static else fitted.max(axis=-1) >= 0.5
+        with span("find runs", frames=len(clip)):
+            runs = dedupe.static_runs(clip, region, tolerance, per_frame)
+        logger.info("inpainting %d of %d frames; the rest repeat their run's fill", len(runs.starts), len(clip))
+        if torch.is_tensor(images):
+            kept = images[torch.from_numpy(runs.starts).to(images.device)]
+        else:
+            kept = clip[runs.starts]
+        if static:
+            kept_mask = mask[:1].expand(len(runs.starts), -1, -1, -1)
+        else:
+            kept_mask = mask[torch.from_numpy(runs.starts).to(mask.device)]
+        return (kept, kept_mask, runs)
+
+
+class PainterExpandFrames:
+    """
+    Undo PainterDedupeFrames after the sampler: every frame gets its run's
+    inpainted fill inside the compared region and keeps its own pixels
+    everywhere else.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("*",)
+    RETURN_NAMES = ("images",)
+    FUNCTION = "expand"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("*",),
+                "inpainted": ("*",),
+                "runs": ("PAINTER_RUNS",),
+            }
+        }
+
+    def expand(self, images, inpainted, runs):
+        if not torch.is_tensor(inpainted):
+            return (dedupe.expand(images, inpainted, runs),)
+        height, width = images.shape[1:3]
+        if inpainted.shape[1:3] != (height, width):
+            # The sampler may round the working size; bring it back to the source
+            inpainted = torch.nn.functional.interpolate(
+                inpainted.movedim(-1, 1), size=(height, width), mode="bilinear", align_corners=False,
+            ).movedim(1, -1)
+        out = dedupe.expand(images.cpu().numpy(), inpainted.to(images.dtype).cpu().numpy(), runs)
+        return (torch.from_numpy(out).to(images.device),)
+
+
+class PainterPropagateFirst:
+    """
+    DiffuEraserSampler that only runs on windows propagation cannot fill.
+
+    Hole pixels are first copied from neighbouring frames along the
+    estimated camera motion (``painter.propagate``), from up to ``reach``
+    frames away whose aligned context is within ``max_error`` 8-bit levels.
+    Every ``window``-frame span whose frames have on average at least
+    ``coverage`` of their hole filled from real pixels keeps that fill. Runs of the remaining spans
+    go through the stock sampler. The fraction of frames that skipped
+    diffusion is logged and reported in the node's UI output.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("IMAGE",)
+    RETURN_NAMES = ("images",)
+    FUNCTION = "sample"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _sampler_inputs({
+            "images": ("IMAGE",),
+            "fps": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 240.0}),
+            "coverage": ("FLOAT", {"default": 0.98, "min": 0.0, "max": 1.0, "step": 0.01}),
+            "max_error": ("FLOAT", {"default": 6.0, "min": 0.0, "max": 255.0, "step": 0.1}),
+            "reach": ("INT", {"default": 50, "min": 1, "max": 1000}),
+            "window": ("INT", {"default": 50, "min": 1, "max": 10000}),
+        })
+
+    def sample(self, model, images, fps, video_mask, coverage, max_error, reach, window, **sampler_inputs):
+        clip = images.cpu().numpy()
+        height, width = clip.shape[1:3]
+        static = len(video_mask) == 1 or video_mask.stride(0) == 0
+        fitted = _fit(video_mask[:1] if static else video_mask, height, width).cpu().numpy().max(axis=-1) >= 0.5
+        dilation = sampler_inputs.get("mask_dilation_iter", 0)
+        if dilation:
+            fitted = np.stack([masks.dilate(hole, dilation) for hole in fitted])
+        holes = np.broadcast_to(fitted, (len(clip), height, width)) if static else fitted
+        with span("propagate", frames=len(clip)):
+            positions = propagate.camera_path(propagate.to_gray(clip), holes)
+            filled, scores = propagate.propagate(clip, holes, positions, reach, max_error)
+
+        out = torch.from_numpy(filled)
+        spans = propagate.easy_windows(scores, window, coverage)
+        hard = [(start, end) for start, end, easy in spans if not easy]
+        for start, end in _merge_spans(hard):
+            mask = video_mask[:1].expand(end - start, -1, -1, -1) if static else video_mask[start:end]
+            result = _run_stock("DiffuEraserSampler", model=model, images=images[start:end], fps=fps,
+                                video_mask=mask, **sampler_inputs)[0]
+            if result.shape[1:3] != (height, width):
+                result = torch.nn.functional.interpolate(
+                    result.movedim(-1, 1), size=(height, width), mode="bilinear", align_corners=False,
+                ).movedim(1, -1)
+            out[start:end] = result.to(out.dtype).cpu()
+        skipped = len(clip) - sum(end - start for start, end in hard)
+        fraction = skipped / len(clip) if len(clip) else 0.0
+        logger.info("propagation filled %d of %d frames (%.0f%%); diffusion ran on the rest",
+                    skipped, len(clip), 100 * fraction)
+        report = {"total": len(clip), "propagated": skipped, "fraction": round(fraction, 4),
+                  "min_coverage": round(float(scores.min()), 4) if len(scores) else 1.0}
+        return {"ui": {"painter_propagation": [report]}, "result": (out.to(images.device),)}
+
+
+def _merge_spans(spans):
+    """Join touching ``(start, end)`` spans so each hard stretch is one sampler call."""
+    merged = []
+    for start, end in spans:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class PainterLazySwitch:
+    """
+    easy ifElse that only evaluates the branch it returns.
+
+    Both branches are lazy inputs: ``check_lazy_status`` asks the executor
+    for the selected one once ``boolean`` is known, so the other branch's
+    loads and resizes never run.
+    """
+
+    CATEGORY = CATEGORY
+    RETURN_TYPES = ("*",)
+    RETURN_NAMES = ("*",)
+    FUNCTION = "switch"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "boolean": ("BOOLEAN", {"forceInput": True}),
+                "on_true": ("*", {"lazy": True}),
+                "on_false": ("*", {"lazy": True}),
+            }
+        }
+
+    def check_lazy_status(self, boolean, on_true=None, on_false=None):
+        return ["on_true" if boolean else "on_false"]
+
+    def switch(self, boolean, on_true=None, on_false=None):
+        return (on_true if boolean else on_false,)
+
+
+class PainterResidentLoader:
+    """
+    DiffuEraserLoader that keeps loaded models resident between prompts.
+
+    Takes the same inputs as DiffuEraserLoader, which does the loading on a
+    miss. Models are kept per checkpoint and LoRA combination under the
+    ``PAINTER_MODEL_CACHE_MB`` budget, so the next prompt skips the load and
+    the LoRA fusion. Load time is reported in the node's UI output.
+    """
+
+    CATEGORY = CATEGORY
+    STOCK = "DiffuEraserLoader"
+    RETURN_TYPES = ("MODEL_DiffuEraser",)
+    FUNCTION = "load"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return _stock_node(cls.STOCK).INPUT_TYPES()
+
+    def load(self, **kwargs):
+        key = cache_key(self.STOCK, kwargs)
+        model, seconds, resident = model_residency().get_or_load(key, lambda: _run_stock(self.STOCK, **kwargs)[0])
+        return {"ui": {"painter_model": [{"load_seconds": seconds, "resident": resident}]}, "result": (model,)}
+
+
+class PainterReleaseModels:
+    """
+    easy cleanGpuUsed that only frees memory when the device is short of it.
+
+    Resident models are evicted least recently used first until
+    ``PAINTER_MODEL_MIN_FREE_MB`` is free again; only if that is not enough
+    does the stock flush run.
+    """
+
+    CATEGORY = CATEGORY
+    STOCK = "easy cleanGpuUsed"
+    RETURN_TYPES = ()
+    OUTPUT_NODE = True
+    FUNCTION = "release"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"anything": ("*", {})}}
+
+    def release(self, anything):
+        residency = model_residency()
+        evicted = residency.relieve()
+        if residency.under_pressure():
+            try:
+                stock = _stock_node(self.STOCK)
+            except RuntimeError:
+                empty_device_cache()
+            else:
+                getattr(stock(), stock.FUNCTION)(anything=anything)
+        stats = residency.stats()
+        logger.debug("model residency: %s", stats)
+        return {"ui": {"painter_models": [dict(stats, evicted=evicted)]}, "result": ()}
+
+
+NODE_CLASS_MAPPINGS = {
+    "PainterStaticMask": PainterStaticMask,
+    "PainterCachedMask": PainterCachedMask,
+    "PainterLoadVideoCached": PainterLoadVideoCached,
+    "PainterProbeVideo": PainterProbeVideo,
+    "PainterStreamInpaint": PainterStreamInpaint,
+    "PainterMaskCrop": PainterMaskCrop,
+    "PainterMaskPaste": PainterMaskPaste,
+    "PainterLoadFrames": PainterLoadFrames,
+    "PainterScaleFrames": PainterScaleFrames,
+    "PainterSampleFrames": PainterSampleFrames,
+    "PainterSaveFrames": PainterSaveFrames,
+    "PainterVideoCombine": PainterVideoCombine,
+    "PainterCachedResult": PainterCachedResult,
+    "PainterDedupeFrames": PainterDedupeFrames,
+    "PainterExpandFrames": PainterExpandFrames,
+    "PainterPropagateFirst": PainterPropagateFirst,
+    "PainterLazySwitch": PainterLazySwitch,
+    "PainterResidentLoader": PainterResidentLoader,
+    "PainterReleaseModels": PainterReleaseModels,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "PainterStaticMask": "Static Mask Batch (Painter)",
+    "PainterCachedMask": "Load Mask Cached (Painter)",
+    "PainterLoadVideoCached": "Load Video Cached (Painter)",
+    "PainterProbeVideo": "Probe Video (Painter)",
+    "PainterStreamInpaint": "Stream Inpaint (Painter)",
+    "PainterMaskCrop": "Crop To Mask (Painter)",
+    "PainterMaskPaste": "Paste Crop (Painter)",
+    "PainterLoadFrames": "Load Frames uint8 (Painter)",
+    "PainterScaleFrames": "Scale Frames uint8 (Painter)",
+    "PainterSampleFrames": "DiffuEraser Sampler uint8 (Painter)",
+    "PainterSaveFrames": "Save Frames uint8 (Painter)",
+    "PainterVideoCombine": "Video Combine Pipe (Painter)",
+    "PainterCachedResult": "Cached Result (Painter)",
+    "PainterDedupeFrames": "Dedupe Static Frames (Painter)",
+    "PainterExpandFrames": "Expand Static Frames (Painter)",
+    "PainterPropagateFirst": "DiffuEraser Sampler Propagate First (Painter)",
+    "PainterLazySwitch": "If Else Lazy (Painter)",
+    "PainterResidentLoader": "DiffuEraser Loader Resident (Painter)",
+    "PainterReleaseModels": "Release Models Under Pressure (Painter)",
+}
@@ -0,0 +1,192 @@
+"""
+Fit queued prompts to the memory Studio has free.
+
+A prompt is planned when its ``extra_data`` has ``"painter_plan": true``
+(``python -m painter batch --plan`` sets it), or every prompt when Studio
+runs with ``PAINTER_AUTOPLAN=1``. As the executor takes the prompt off the
+queue, once the prompt before it has finished and released its working
+set, its video is probed and :mod:`painter.planner` lowers
+``frame_load_cap`` and the sampler's window sizes until the predicted peak
+fits free RAM (and free VRAM on CUDA); anything changed is logged.
+
+While a planned prompt runs, its peak host memory above the starting RSS
+and, on CUDA, its peak allocated device memory are measured, from the
+queue's :data:`~painter.studio.events.PROMPT_STARTED` to ``PROMPT_FINISHED``
+so prompts queued without a ``client_id`` are measured too. When it
+finishes, predicted and actual are logged and appended to
+``output/painter-plans/calibration.jsonl``, which scales later estimates.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from painter import planner, profiler, residency
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+SUBFOLDER = "painter-plans"
+CALIBRATION = "calibration.jsonl"
+FINISHED = ("execution_success", "execution_error", "execution_interrupted")
+MAX_PLANNED = 1000
+
+# prompt_id -> Plan, from the executor taking the prompt until it finishes
+_plans: Dict[str, planner.Plan] = {}
+# Peak memory of the planned prompt that is running
+_running: Dict[str, Any] = {"prompt_id": None}
+
+
+def _wants_plan(extra_data: Optional[Dict[str, Any]]) -> bool:
+    if os.environ.get("PAINTER_AUTOPLAN", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool((extra_data or {}).get("painter_plan"))
+
+
+def _calibration_path() -> Path:
+    import folder_paths
+
+    return Path(folder_paths.get_output_directory()) / SUBFOLDER / CALIBRATION
+
+
+def _device() -> Tuple[str, Optional[int]]:
+    """Type and index of the torch device prompts run on."""
+    import comfy.model_management
+
+    device = comfy.model_management.get_torch_device()
+    return ("cuda", device.index or 0) if device.type == "cuda" else ("cpu", None)
+
+
+def _headroom() -> float:
+    try:
+        return float(os.environ.get("PAINTER_PLAN_HEADROOM", 0.9))
+    except ValueError:
+        return 0.9
+
+
+def _describe(planned: planner.Plan) -> str:
+    changes = ", ".join(f"{knob} {old} -> {new}" for knob, (old, new) in planned.changed.items()) or "unchanged"
+    predicted = ", ".join(f"{pool} {size / planner.GB:.1f} GB" for pool, size in
+                          (("host", planned.estimate.host), ("device", planned.estimate.device)) if size)
+    free = ", ".join(f"{pool} {size / planner.GB:.1f} GB" for pool, size in planned.available.items())
+    return f"{changes}; predicted {predicted or '0 GB'} of free {free}"
+
+
+def plan_queued(prompt_id: str, prompt: Dict[str, Any]) -> Optional[planner.Plan]:
+    """Rewrite ``prompt`` in place to fit the memory free now; None when its video cannot be probed."""
+    from painter.ffmpeg import FFmpegError, probe
+    from painter.workflow import LOAD_VIDEO
+
+    from .nodes import _input_path
+
+    video = prompt.get(LOAD_VIDEO, {}).get("inputs", {}).get("video")
+    if not isinstance(video, str):
+        return None
+    try:
+        info = probe(_input_path(video))
+    except (FFmpegError, OSError) as e:
+        logger.warning("not planning prompt %s: %s", prompt_id, e)
+        return None
+    device, index = _device()
+    planned = planner.plan_prompt(
+        prompt, info.width, info.height, info.frames, planner.available_memory(device, index), device,
+        headroom=_headroom(), model_loaded=residency._residency is not None and len(residency._residency) > 0,
+        scale=planner.load_scale(_calibration_path()),
+    )
+    rewritten = planner.apply_plan(prompt, planned)
+    prompt.clear()
+    prompt.update(rewritten)
+
+    if not planned.fits:
+        logger.warning("prompt %s may not fit even at the smallest settings: %s", prompt_id, _describe(planned))
+    elif "frame_load_cap" in planned.changed:
+        logger.warning("prompt %s is cut to %d frames to fit: %s", prompt_id,
+                       planned.settings["frame_load_cap"], _describe(planned))
+    else:
+        logger.info("planned prompt %s: %s", prompt_id, _describe(planned))
+    return planned
+
+
+def prepare_taken(item):
+    """Plan a queue item the executor has taken against the memory free now."""
+    try:
+        if _wants_plan(item[3]):
+            result = plan_queued(item[1], item[2])
+            if result is not None:
+                if len(_plans) >= MAX_PLANNED:
+                    _plans.clear()
+                _plans[item[1]] = result
+    except Exception:  # a prompt that cannot be planned still runs as submitted
+        logger.exception("planning prompt %s failed", item[1])
+    return item
+
+
+def _cuda(index: Optional[int]):
+    if index is None:
+        return None
+    import torch
+
+    return torch.cuda if torch.cuda.is_available() else None
+
+
+def _finish(prompt_id: str) -> None:
+    state = dict(_running)
+    _running.clear()
+    _running["prompt_id"] = None
+    planned = _plans.pop(prompt_id, None)
+    if planned is None:
+        return
+    actual = {"host": max(0, max(state["peak"], profiler.peak_rss()) - state["rss"]), "device": 0}
+    cuda = _cuda(state["index"])
+    if cuda is not None:
+        actual["device"] = max(0, int(cuda.max_memory_allocated(state["index"])) - state["allocated"])
+    if planned.device == "cpu":
+        actual = {"host": actual["host"] + actual["device"], "device": 0}
+    logger.info("prompt %s peak memory: predicted host %.1f GB, device %.1f GB; actual host %.1f GB, device %.1f GB",
+                prompt_id, planned.estimate.host / planner.GB, planned.estimate.device / planner.GB,
+                actual["host"] / planner.GB, actual["device"] / planner.GB)
+    try:
+        planner.record(_calibration_path(), prompt_id, planned, actual)
+    except OSError as e:
+        logger.warning("could not record calibration for %s: %s", prompt_id, e)
+
+
+def on_message(server, event: str, data: Any) -> None:
+    """Measure planned prompts from the queue events and the executor's progress messages."""
+    if not isinstance(data, dict):
+        return
+    prompt_id = data.get("prompt_id")
+    if event == events.PROMPT_STARTED:
+        planned = _plans.get(prompt_id)
+        if planned is None:
+            return
+        index = _device()[1] if planned.device == "cuda" else None
+        cuda = _cuda(index)
+        allocated = 0
+        if cuda is not None:
+            cuda.reset_peak_memory_stats(index)
+            allocated = int(cuda.memory_allocated(index))
+        profiler.reset_peak_rss()
+        _running.update(prompt_id=prompt_id, rss=profiler._rss(), peak=profiler.peak_rss(),
+                        index=index, allocated=allocated)
+        return
+    if _running["prompt_id"] is None or prompt_id != _running["prompt_id"]:
+        return
+    if event == "executing":
+        if data.get("node") is None:
+            _finish(prompt_id)
+            return
+        # Sampled before each node starts; the profiler resets the mark per node
+        _running["peak"] = max(_running["peak"], profiler.peak_rss())
+    elif event in FINISHED or event == events.PROMPT_FINISHED:
+        _finish(prompt_id)
+
+
+def install() -> bool:
+    """Plan prompts as the executor takes them; False when not running inside Studio."""
+    server = events.prompt_server()
+    if server is None or getattr(server, "prompt_queue", None) is None:
+        return False
+    events.prepare_taken(server.prompt_queue, prepare_taken)
+    return True
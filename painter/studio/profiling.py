@@ -0,0 +1,170 @@
+"""
+Per-prompt profiling inside Studio.
+
+A prompt is profiled when its ``extra_data`` has ``"painter_profile": true``
+(``python -m painter batch --profile`` sets it), or every prompt when Studio
+runs with ``PAINTER_PROFILE=1``. Profiling starts and stops with the
+prompt queue's :data:`~painter.studio.events.PROMPT_STARTED` and
+``PROMPT_FINISHED``, so prompts queued without a ``client_id`` are profiled
+too. The executor's progress messages, sent only with a ``client_id``, name
+the running node and the cached ones; without them each call is put down to
+the first node of its class that has not run yet. Node functions are only
+wrapped once the first profiled prompt starts, and while no prompt is
+profiled the wrapper is a single global check before the original call.
+
+When a profiled prompt finishes, ``<prompt_id>.json`` (Chrome trace) and
+``<prompt_id>.txt`` (summary) are written to ``output/painter-profiles``.
+Nodes that feed an output but neither ran nor came from cache, such as the
+untaken branch of a lazy switch, are listed as skipped when progress
+messages were available to tell them apart.
+"""
+import functools
+import inspect
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from painter import profiler
+from painter.executor import ExecutionError, execution_order
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+SUBFOLDER = "painter-profiles"
+FINISHED = ("execution_success", "execution_error", "execution_interrupted")
+# PROMPT_FINISHED status -> the progress message it stands for
+STATUS_EVENTS = {"success": "execution_success", "error": "execution_error", "interrupted": "execution_interrupted"}
+
+# Node currently executing in the profiled prompt, its class_type, the nodes that ran or were cached,
+# and whether the executor sends progress messages for it
+_state: Dict[str, Any] = {"prompt_id": None, "node": None, "class_type": None, "prompt": {}, "seen": set(),
+                          "reported": False}
+
+
+def _wants_profile(extra_data: Optional[Dict[str, Any]]) -> bool:
+    if os.environ.get("PAINTER_PROFILE", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool((extra_data or {}).get("painter_profile"))
+
+
+def _wrap(cls) -> None:
+    name = getattr(cls, "FUNCTION", None)
+    function = inspect.getattr_static(cls, name, None) if name else None
+    if not inspect.isfunction(function) or getattr(function, "_painter_profiled", False):
+        return
+
+    @functools.wraps(function)
+    def profiled(self, *args, **kwargs):
+        active = profiler._active
+        if active is None:
+            return function(self, *args, **kwargs)
+        class_type = _state["class_type"] or cls.__name__
+        if active.in_node():
+            # A stock node run from inside one of ours, e.g. the sampler per window
+            with active.span(class_type, kind="nested"):
+                return function(self, *args, **kwargs)
+        node = _state["node"]
+        if not _state["reported"]:
+            node = _next_node(cls)
+            class_type = _state["prompt"].get(node, {}).get("class_type") or cls.__name__
+        with active.node(node or "?", class_type, kwargs) as record:
+            result = function(self, *args, **kwargs)
+            record.outputs(result)
+            return result
+
+    profiled._painter_profiled = True
+    setattr(cls, name, profiled)
+
+
+def _next_node(cls) -> Optional[str]:
+    """The first node of ``cls`` in the prompt that has not run yet, marked as run."""
+    import nodes
+
+    for node_id, node in _state["prompt"].items():
+        if node_id not in _state["seen"] and nodes.NODE_CLASS_MAPPINGS.get(node.get("class_type")) is cls:
+            _state["seen"].add(node_id)
+            return node_id
+    return None
+
+
+def _wrap_all() -> None:
+    import nodes
+
+    for cls in list(nodes.NODE_CLASS_MAPPINGS.values()):
+        _wrap(cls)
+
+
+def _record_skipped(active: profiler.Profiler, prompt: Dict[str, Any], seen: set) -> None:
+    import nodes
+
+    try:
+        planned = execution_order(prompt, nodes.NODE_CLASS_MAPPINGS)
+    except ExecutionError:
+        return
+    for node_id in planned:
+        if node_id not in seen:
+            active.skip(node_id, prompt[node_id]["class_type"])
+
+
+def _finish(prompt_id: str, event: str) -> None:
+    active = profiler._active
+    profiler._active = None
+    prompt, seen, reported = _state["prompt"], _state["seen"], _state["reported"]
+    _state.update(prompt_id=None, node=None, class_type=None, prompt={}, seen=set(), reported=False)
+    if active is None:
+        return
+    import folder_paths
+
+    # Without progress messages a cached node cannot be told from a skipped one
+    if reported and event in ("execution_success", "execution_done"):
+        _record_skipped(active, prompt, seen)
+    active.instant(event)
+    try:
+        trace, _ = active.write(os.path.join(folder_paths.get_output_directory(), SUBFOLDER), prompt_id)
+    except OSError as e:
+        logger.warning("could not write profile for %s: %s", prompt_id, e)
+        return
+    logger.info("profile written to %s\n%s", trace, active.summary())
+
+
+def _start(server, prompt_id: str) -> None:
+    prompt, extra_data = events.running_item(server, prompt_id)
+    if not _wants_profile(extra_data):
+        return
+    _wrap_all()
+    _state.update(prompt_id=prompt_id, node=None, class_type=None, prompt=prompt or {}, seen=set(),
+                  reported=False)
+    profiler._active = profiler.Profiler(name=f"prompt {prompt_id}")
+
+
+def on_message(server, event: str, data: Any) -> None:
+    """Track the prompt queue and the executor's progress messages."""
+    if not isinstance(data, dict):
+        return
+    if event in (events.PROMPT_STARTED, "execution_start"):
+        if data.get("prompt_id") != _state["prompt_id"]:
+            _start(server, data.get("prompt_id"))
+        return
+    if _state["prompt_id"] is None or data.get("prompt_id", _state["prompt_id"]) != _state["prompt_id"]:
+        return
+    if event in ("executing", "execution_cached"):
+        _state["reported"] = True
+    if event == "executing":
+        node = data.get("node")
+        if node is None:
+            _finish(_state["prompt_id"], "execution_done")
+            return
+        _state["seen"].add(str(node))
+        node = data.get("display_node") or node
+        _state["node"] = str(node)
+        _state["class_type"] = _state["prompt"].get(str(node), {}).get("class_type")
+    elif event == "execution_cached":
+        for node in data.get("nodes", []):
+            _state["seen"].add(str(node))
+            profiler._active.instant("cached", node=str(node),
+                                     class_type=_state["prompt"].get(str(node), {}).get("class_type"))
+    elif event in FINISHED:
+        _finish(_state["prompt_id"], event)
+    elif event == events.PROMPT_FINISHED:
+        _finish(_state["prompt_id"], STATUS_EVENTS.get(data.get("status"), "execution_error"))
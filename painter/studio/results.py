@@ -0,0 +1,159 @@
+"""
+Deterministic seeds and a content-addressed result cache for queued prompts.
+
+A prompt opts in when its ``extra_data`` has ``"painter_deterministic":
+true`` (``python -m painter batch --deterministic`` sets it), or every
+prompt does when Studio runs with ``PAINTER_DETERMINISTIC=1``. As the
+executor takes the prompt off the queue, its sampler seed is derived from
+its content (:mod:`painter.results`) and its key is looked up in
+``output/painter-results``. The input video is hashed there, on the
+executor's thread, so a large clip does not stall the event loop that
+serves ``POST /prompt``, websockets and uploads. On a hit whose video
+still exists, the prompt is replaced by a single PainterCachedResult node
+under VideoCombine's id 209, which reports the stored output without
+running anything, and the queue item's outputs to execute are cut down to
+it. On a miss, the output
+VideoCombine reports is held until the whole prompt succeeds and only then
+recorded under the key; a prompt that errors or is interrupted afterwards
+records nothing.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from painter import results
+from painter.workflow import VIDEO_COMBINE
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+SUBFOLDER = "painter-results"
+FINISHED = ("execution_success", "execution_error", "execution_interrupted")
+MAX_PENDING = 1000
+
+# prompt_id -> job key, from the executor taking the prompt until it finishes
+_pending: Dict[str, str] = {}
+# prompt_id -> VideoCombine's output, held until the prompt succeeds
+_outputs: Dict[str, Any] = {}
+
+
+def _wants_determinism(extra_data: Optional[Dict[str, Any]]) -> bool:
+    if (extra_data or {}).get("painter_warmup"):
+        return False  # a cached warm-up would load nothing
+    if os.environ.get("PAINTER_DETERMINISTIC", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool((extra_data or {}).get("painter_deterministic"))
+
+
+def _output_dir() -> Path:
+    import folder_paths
+
+    return Path(folder_paths.get_output_directory())
+
+
+def result_index() -> results.ResultIndex:
+    return results.ResultIndex(_output_dir() / SUBFOLDER)
+
+
+def cached_prompt(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """A prompt that only reports ``entry`` as VideoCombine 209's output."""
+    return {
+        VIDEO_COMBINE: {
+            "class_type": "PainterCachedResult",
+            "inputs": {"entry": json.dumps(entry, sort_keys=True)},
+            "_meta": {"title": "Cached Result"},
+        }
+    }
+
+
+def prepare_queued(prompt_id: str, prompt: Dict[str, Any]) -> Optional[str]:
+    """
+    Seed ``prompt`` from its content and swap in the cached output on a
+    hit, in place; returns the job key, or None when an input file cannot
+    be read.
+    """
+    from .nodes import _input_path
+
+    try:
+        seed = results.make_deterministic(prompt, _input_path)
+        key = results.job_key(prompt, _input_path)
+    except OSError as e:
+        logger.warning("not caching prompt %s: %s", prompt_id, e)
+        return None
+    entry = result_index().get(key)
+    if entry is None:
+        logger.info("prompt %s: seed %d, result %s not cached yet", prompt_id, seed, key[:12])
+        if len(_pending) >= MAX_PENDING:
+            _pending.clear()
+            _outputs.clear()
+        _pending[prompt_id] = key
+        return key
+    logger.info("prompt %s: result %s cached as %s", prompt_id, key[:12], entry["fullpath"])
+    prompt.clear()
+    prompt.update(cached_prompt(entry))
+    return key
+
+
+def _drop_missing_outputs(item):
+    """``item`` with its outputs to execute limited to nodes still in its prompt."""
+    outputs = [node for node in item[4] if node in item[2]]
+    if len(outputs) == len(item[4]):
+        return item
+    return type(item)((*item[:4], outputs or [VIDEO_COMBINE], *item[5:]))
+
+
+def prepare_taken(item):
+    """Seed and key a queue item the executor has taken, replacing it with the cached output on a hit."""
+    try:
+        if _wants_determinism(item[3]):
+            prepare_queued(item[1], item[2])
+            item = _drop_missing_outputs(item)
+    except Exception:  # a prompt that cannot be keyed still runs as submitted
+        logger.exception("keying prompt %s failed", item[1])
+    return item
+
+
+def _record(key: str, output: Any) -> None:
+    entries = (output or {}).get("gifs") if isinstance(output, dict) else None
+    if not entries:
+        return
+    entry = dict(entries[0])
+    if not entry.get("fullpath") and entry.get("type", "output") == "output":
+        entry["fullpath"] = str(_output_dir() / entry.get("subfolder", "") / entry["filename"])
+    try:
+        result_index().put(key, entry)
+    except (OSError, ValueError) as e:
+        logger.warning("could not cache result %s: %s", key[:12], e)
+
+
+def on_message(server, event: str, data: Any) -> None:
+    """Record VideoCombine's output for prompts that were not cached, once they succeed."""
+    if not isinstance(data, dict):
+        return
+    prompt_id = data.get("prompt_id")
+    if prompt_id not in _pending:
+        return
+    if event == "executed" and str(data.get("node")) == VIDEO_COMBINE:
+        _outputs[prompt_id] = data.get("output")
+        return
+    if event == events.PROMPT_FINISHED:
+        succeeded = data.get("status") == "success"
+    elif event in FINISHED:
+        succeeded = event == "execution_success"
+    else:
+        return
+    key, output = _pending.pop(prompt_id), _outputs.pop(prompt_id, None)
+    if succeeded:
+        _record(key, output or (data.get("outputs") or {}).get(VIDEO_COMBINE))
+
+
+def install() -> bool:
+    """Key prompts as the executor takes them; False when not running inside Studio."""
+    server = events.prompt_server()
+    if server is None or getattr(server, "prompt_queue", None) is None:
+        return False
+    events.prepare_taken(server.prompt_queue, prepare_taken)
+    return True
@@ -0,0 +1,26 @@
+"""
+Resumable uploads and ranged downloads for Studio (:mod:`painter.transfer`).
+
+Files go to and come from Studio's own input, output and temp folders. The
+handlers run on the server's event loop and do their disk I/O in its
+thread pool, so a large transfer never holds up the prompt executor.
+"""
+from pathlib import Path
+
+from painter.transfer import Transfers
+
+from . import events
+
+
+def install() -> bool:
+    """Add the transfer endpoints to Studio; False when not running inside Studio."""
+    server = events.prompt_server()
+    if server is None:
+        return False
+    import folder_paths
+
+    transfers = Transfers(Path(folder_paths.get_input_directory()), Path(folder_paths.get_output_directory()),
+                          Path(folder_paths.get_temp_directory()))
+    for method, path, handler in transfers.routes():
+        server.routes.route(method, path)(handler)
+    return True
@@ -0,0 +1,190 @@
+"""
+Boot-time warm-up and ``GET /ready`` inside Studio.
+
+``/`` and ``/system_stats`` answer as soon as Studio listens, which is
+liveness: the process is up. ``/ready`` is readiness: it answers 200 only
+once the warm-up prompt (:mod:`painter.warmup`) has run, so a load
+balancer or the dispatcher sends jobs to warm workers only. Without
+``PAINTER_WARMUP=1`` there is nothing to wait for and ``/ready`` answers 200
+straight away.
+
+The warm-up runs in a background thread. It waits for Studio to listen,
+writes the synthetic clip to ``input/``, and submits the prompt through
+Studio's own ``POST /prompt``, so it is validated, hooked and executed
+exactly like a client's. The executor's ``execution_success`` or
+``execution_error`` for that prompt ends it. A warm-up that fails or times
+out leaves ``/ready`` at 503 with the error, since the same jobs would fail.
+"""
+import json
+import logging
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from painter.warmup import WarmupConfig, clean_up, warmup_prompt, write_inputs
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("execution_success", "execution_error", "execution_interrupted")
+CLIENT_ID = "painter-warmup"
+
+
+class Warmup:
+    """One warm-up of the Studio server at ``base_url``; ``state`` is disabled, starting, warming, ready or failed."""
+
+    def __init__(self, config: WarmupConfig, base_url: str, input_dir: Path, output_dir: Optional[Path] = None,
+                 context: Optional[ssl.SSLContext] = None):
+        self.config = config
+        self.base_url = base_url.rstrip("/")
+        self.input_dir = Path(input_dir)
+        self.output_dir = output_dir
+        self.context = context
+        self.state = "starting" if config.enabled else "disabled"
+        self.error: Optional[str] = None
+        self.prompt_id: Optional[str] = None
+        self.started = time.monotonic()
+        self.seconds: Optional[float] = None
+        # prompt_id -> (event, data) of prompts that finished while warming
+        self._finished: Dict[str, Any] = {}
+        self._condition = threading.Condition()
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "disabled")
+
+    def status(self) -> Dict[str, Any]:
+        """The ``/ready`` body."""
+        status = {"ready": self.ready, "state": self.state}
+        if self.seconds is not None:
+            status["seconds"] = round(self.seconds, 3)
+        if self.prompt_id:
+            status["prompt_id"] = self.prompt_id
+        if self.error:
+            status["error"] = self.error
+        return status
+
+    def start(self) -> Optional[threading.Thread]:
+        """Run the warm-up in a daemon thread; None when it is disabled."""
+        if not self.config.enabled:
+            return None
+        thread = threading.Thread(target=self.run, name="painter-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def run(self) -> None:
+        """Warm up and set ``state``; never raises."""
+        deadline = self.started + self.config.timeout
+        inputs: Dict[str, str] = {}
+        try:
+            self._wait_listening(deadline)
+            self.state = "warming"
+            start = time.monotonic()
+            inputs = write_inputs(self.input_dir, self.config)
+            self.prompt_id = self._submit(warmup_prompt(inputs, self.config))
+            logger.info("warming up with prompt %s (%d frames at %dx%d, passes %s)", self.prompt_id,
+                        self.config.frames, self.config.width, self.config.height, ",".join(self.config.passes))
+            event, data = self._wait_finished(self.prompt_id, deadline)
+            if event != "execution_success":
+                raise RuntimeError((data or {}).get("exception_message") or event)
+            self.seconds = time.monotonic() - start
+            self.state = "ready"
+            logger.info("warm-up finished in %.1fs; ready", self.seconds)
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            self.state = "failed"
+            logger.error("warm-up failed, /ready stays 503: %s", self.error)
+        finally:
+            if inputs:
+                clean_up(self.input_dir, self.output_dir, inputs)
+
+    def _request(self, path: str, body: Optional[Dict[str, Any]] = None, timeout: float = 10.0) -> Any:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data,
+                                         headers={"Content-Type": "application/json"} if data else {})
+        with urllib.request.urlopen(request, timeout=timeout, context=self.context) as resp:
+            return json.loads(resp.read() or b"null")
+
+    def _wait_listening(self, deadline: float) -> None:
+        while True:
+            try:
+                self._request("/system_stats", timeout=2.0)
+                return
+            except (OSError, ValueError):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Studio did not answer on {self.base_url} within {self.config.timeout:.0f}s")
+                time.sleep(0.5)
+
+    def _submit(self, prompt: Dict[str, Any]) -> str:
+        body = {"prompt": prompt, "client_id": CLIENT_ID, "extra_data": {"painter_warmup": True}}
+        try:
+            return self._request("/prompt", body)["prompt_id"]
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"warm-up prompt rejected: {e.read().decode(errors='replace')}") from None
+
+    def _wait_finished(self, prompt_id: str, deadline: float):
+        with self._condition:
+            while prompt_id not in self._finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"warm-up prompt did not finish within {self.config.timeout:.0f}s")
+                self._condition.wait(remaining)
+            return self._finished.pop(prompt_id)
+
+    def on_message(self, server, event: str, data: Any) -> None:
+        if event not in FINISHED or self.state != "warming" or not isinstance(data, dict):
+            return
+        with self._condition:
+            self._finished[data.get("prompt_id")] = (event, data)
+            self._condition.notify_all()
+
+
+_warmup: Optional[Warmup] = None
+
+
+def on_message(server, event: str, data: Any) -> None:
+    if _warmup is not None:
+        _warmup.on_message(server, event, data)
+
+
+def _base_url(args) -> Tuple[str, Optional[ssl.SSLContext]]:
+    """How to reach this Studio from inside it, given its command-line ``args``."""
+    listen = (getattr(args, "listen", None) or "127.0.0.1").split(",")[0].strip()
+    host = "127.0.0.1" if listen in ("", "0.0.0.0") else "[::1]" if listen == "::" else listen
+    if ":" in host and not host.startswith("["):
+        host = f"[{host}]"
+    port = getattr(args, "port", 8188)
+    if getattr(args, "tls_keyfile", None):
+        # Our own certificate, reached by address rather than its name
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return f"https://{host}:{port}", context
+    return f"http://{host}:{port}", None
+
+
+def install() -> bool:
+    """Add ``GET /ready`` to Studio and start the warm-up if enabled; False when not running inside Studio."""
+    global _warmup
+    server = events.prompt_server()
+    if server is None:
+        return False
+    import folder_paths
+    from aiohttp import web
+    from comfy.cli_args import args
+
+    base_url, context = _base_url(args)
+    _warmup = Warmup(WarmupConfig.from_env(), base_url, Path(folder_paths.get_input_directory()),
+                     Path(folder_paths.get_output_directory()), context=context)
+
+    @server.routes.get("/ready")
+    async def ready_endpoint(request):
+        return web.json_response(_warmup.status(), status=200 if _warmup.ready else 503)
+
+    _warmup.start()
+    return True
@@ -0,0 +1,88 @@
+"""
+Synthetic test clips with moving content, generated without any assets.
+"""
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+
+def moving_frames(count: int, width: int = 320, height: int = 180, seed: int = 0) -> Iterator[np.ndarray]:
+    """Yield frames of a scrolling gradient with a bouncing square."""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width]
+    base = rng.integers(0, 255, size=3)
+    size = max(8, min(width, height) // 6)
+    for t in range(count):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (xs + 3 * t + base[0]) % 256
+        frame[..., 1] = (ys + 2 * t + base[1]) % 256
+        frame[..., 2] = ((xs + ys) // 2 + base[2]) % 256
+        x = abs((5 * t) % (2 * (width - size)) - (width - size))
+        y = abs((3 * t) % (2 * (height - size)) - (height - size))
+        frame[y:y + size, x:x + size] = (255, 255, 255)
+        yield frame
+
+
+def still_frames(count: int, width: int = 320, height: int = 180, shot: int = 16, seed: int = 0) -> Iterator[np.ndarray]:
+    """Yield locked-off shots: ``shot`` identical frames each, cutting to the next still of :func:`moving_frames`."""
+    stills = list(moving_frames(-(-count // shot), width, height, seed))
+    for t in range(count):
+        yield stills[t // shot]
+
+
+def panning_frames(count: int, width: int = 320, height: int = 180, speed=(1, 3), seed: int = 0) -> Iterator[np.ndarray]:
+    """Yield a camera pan across a smooth random texture, moving ``speed`` (dy, dx) pixels per frame."""
+    rng = np.random.default_rng(seed)
+    rows, cols = height + abs(speed[0]) * count, width + abs(speed[1]) * count
+    coarse = rng.integers(0, 255, size=(rows // 8 + 2, cols // 8 + 2, 3)).astype(np.float32)
+    canvas = np.kron(coarse, np.ones((8, 8, 1), dtype=np.float32))[:rows, :cols]
+    kernel = np.ones(5, dtype=np.float32) / 5
+    for axis in (0, 1):
+        canvas = np.apply_along_axis(np.convolve, axis, canvas, kernel, "same")
+    canvas = canvas.astype(np.uint8)
+    y0 = 0 if speed[0] >= 0 else rows - height
+    x0 = 0 if speed[1] >= 0 else cols - width
+    for t in range(count):
+        y, x = y0 + speed[0] * t, x0 + speed[1] * t
+        yield canvas[y:y + height, x:x + width].copy()
+
+
+def write_video(path: Path, frames: Iterator[np.ndarray], fps: float = 24.0, crf: int = 18) -> Path:
+    """Encode frames to ``path`` with libx264."""
+    from painter.ffmpeg import FrameWriter
+
+    frames = iter(frames)
+    first = next(frames)
+    height, width = first.shape[:2]
+    with FrameWriter(str(path), width, height, fps, crf=crf, preset="ultrafast") as writer:
+        writer.write(first)
+        for frame in frames:
+            writer.write(frame)
+    return Path(path)
+
+
+MASK_DIR = Path(__file__).resolve().parent.parent
+
+
+def watermark_mask(width: int, height: int) -> np.ndarray:
+    """
+    The repository mask the workflow would pick for this frame size, resized
+    to it: ``horizontal-mask.png`` for landscape, ``vertical-mask.png`` for
+    portrait (node 283 compares width < height). Returns a bool ``(H, W)``.
+    """
+    from PIL import Image
+
+    name = "vertical-mask.png" if width < height else "horizontal-mask.png"
+    with Image.open(MASK_DIR / name) as image:
+        resized = image.convert("L").resize((width, height), Image.NEAREST)
+    return np.asarray(resized) > 127
+
+
+def burn_watermark(frames: Iterator[np.ndarray], mask: np.ndarray, opacity: float = 0.6) -> Iterator[np.ndarray]:
+    """Blend a static striped "logo" into the masked region of every frame."""
+    rows, cols = np.indices(mask.shape)
+    pattern = (cols // 3 + rows // 5) % 2
+    alpha = (mask * (0.5 + 0.5 * pattern) * opacity).astype(np.float32)[..., None]
+    for frame in frames:
+        yield (frame * (1 - alpha) + 255 * alpha).astype(np.uint8)
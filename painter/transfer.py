@@ -0,0 +1,219 @@
+"""
+Resumable uploads into Studio's input folder and ranged downloads of its outputs.
+
+``PUT /painter/upload/{sha256}?filename=clip.mp4`` takes one chunk of a file
+with a ``Content-Range: bytes START-END/TOTAL`` header and appends it to a
+partial file named after the digest. ``GET`` on the same path returns the
+bytes received so far, so an interrupted client asks where to resume and
+sends the rest. When the last byte arrives the partial is hashed, and it is
+moved into the input folder only if the digest matches. A client that finds
+every byte already there (the reply to its last chunk was lost) sends an
+empty PUT with ``Content-Range: bytes */TOTAL`` to finish the upload. A name that is
+already taken by different content gets a `` (1)`` suffix, as Studio's own
+upload does.
+
+``GET /painter/download?filename=...&subfolder=...&type=output`` serves a
+file with ``web.FileResponse``, which answers ``Range`` requests and sends
+the file with ``sendfile``.
+
+Request bodies are read :data:`READ_SIZE` bytes at a time, and file writes
+and hashing run in the default thread pool. Memory use therefore does not
+grow with the file, and the event loop is never blocked by disk I/O.
+"""
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from a request body at a time
+READ_SIZE = 1 << 16
+# Bytes a client sends per PUT
+CHUNK_SIZE = 8 << 20
+STAGING = ".painter-uploads"
+# Partial uploads untouched for this long are deleted
+EXPIRE_SECONDS = 24 * 3600
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# An empty chunk that completes an upload whose bytes have all arrived
+FINISH_RANGE = re.compile(r"^bytes \*/(\d+)$")
+
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 of a file, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def free_name(directory: Path, filename: str) -> Path:
+    """``filename`` in ``directory``, or ``name (N).ext`` with the first free N."""
+    path = directory / filename
+    stem, suffix = os.path.splitext(filename)
+    counter = 1
+    while path.exists():
+        path = directory / f"{stem} ({counter}){suffix}"
+        counter += 1
+    return path
+
+
+def parse_content_range(header: Optional[str], length: Optional[int]) -> Tuple[int, int, int]:
+    """``(start, end exclusive, total)`` of a chunk; without a header the body is the whole file."""
+    if not header:
+        if length is None:
+            raise ValueError("a body without Content-Range needs a Content-Length")
+        return 0, length, length
+    match = CONTENT_RANGE.match(header.strip())
+    if match is None:
+        raise ValueError(f"bad Content-Range {header!r}")
+    start, last, total = (int(group) for group in match.groups())
+    if not start <= last < total:
+        raise ValueError(f"bad Content-Range {header!r}")
+    return start, last + 1, total
+
+
+class Transfers:
+    """aiohttp handlers for resumable uploads to ``input_dir`` and ranged downloads."""
+
+    def __init__(self, input_dir: Optional[Path], output_dir: Optional[Path], temp_dir: Optional[Path] = None):
+        self.input_dir = Path(input_dir) if input_dir is not None else None
+        self.folders = {name: Path(folder) for name, folder in
+                        (("input", input_dir), ("output", output_dir), ("temp", temp_dir)) if folder is not None}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+
+    def routes(self) -> List[Tuple[str, str, Any]]:
+        """``(method, path, handler)`` for each endpoint."""
+        return [
+            ("GET", "/painter/upload/{sha256}", self.get_upload),
+            ("PUT", "/painter/upload/{sha256}", self.put_upload),
+            ("GET", "/painter/download", self.download),
+        ]
+
+    def add_routes(self, router: web.UrlDispatcher) -> None:
+        for method, path, handler in self.routes():
+            router.add_route(method, path, handler)
+
+    @property
+    def staging(self) -> Path:
+        return self.input_dir / STAGING
+
+    def _partial(self, request: web.Request) -> Tuple[str, Path]:
+        if self.input_dir is None:
+            raise web.HTTPNotFound(reason="uploads are not enabled")
+        digest = request.match_info["sha256"].lower()
+        if not DIGEST.match(digest):
+            raise web.HTTPBadRequest(reason="expected a hex SHA-256")
+        return digest, self.staging / f"{digest}.part"
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, digest: str) -> AsyncIterator[None]:
+        """Hold the digest's lock, dropping it once no request uses or waits for it."""
+        lock = self._locks.setdefault(digest, asyncio.Lock())
+        self._lock_users[digest] = self._lock_users.get(digest, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[digest] -= 1
+            if not self._lock_users[digest]:
+                del self._lock_users[digest]
+                self._locks.pop(digest, None)
+
+    async def get_upload(self, request: web.Request) -> web.Response:
+        _, partial = self._partial(request)
+        return web.json_response({"offset": partial.stat().st_size if partial.exists() else 0})
+
+    async def put_upload(self, request: web.Request) -> web.Response:
+        digest, partial = self._partial(request)
+        filename = os.path.basename(request.query.get("filename", ""))
+        if not filename or filename.startswith("."):
+            raise web.HTTPBadRequest(reason="a filename is required")
+        finish = FINISH_RANGE.match(request.headers.get("Content-Range", "").strip())
+        try:
+            if finish:
+                start = end = total = int(finish.group(1))
+            else:
+                start, end, total = parse_content_range(request.headers.get("Content-Range"), request.content_length)
+        except ValueError as e:
+            raise web.HTTPBadRequest(reason=str(e))
+
+        async with self._locked(digest):
+            loop = asyncio.get_running_loop()
+            offset = partial.stat().st_size if partial.exists() else 0
+            if start != offset:
+                return web.json_response({"error": "chunk does not start at the upload's offset", "offset": offset},
+                                         status=409)
+            if offset == 0:
+                await loop.run_in_executor(None, self._prepare, total)
+            offset = await self._append(request, partial, end - start)
+            if offset < total:
+                return web.json_response({"offset": offset})
+            return web.json_response(await loop.run_in_executor(None, self._complete, digest, partial, filename),
+                                     status=201)
+
+    def _prepare(self, total: int) -> None:
+        """Make room for a new upload of ``total`` bytes, dropping expired partials."""
+        self.staging.mkdir(parents=True, exist_ok=True)
+        cutoff = time.time() - EXPIRE_SECONDS
+        for stale in self.staging.glob("*.part"):
+            try:
+                if stale.stat().st_mtime < cutoff:
+                    stale.unlink()
+            except OSError:
+                pass
+        if shutil.disk_usage(self.staging).free < total:
+            raise web.HTTPInsufficientStorage(reason=f"no room for {total} bytes")
+
+    async def _append(self, request: web.Request, partial: Path, length: int) -> int:
+        """Append at most ``length`` bytes of the body to ``partial``; returns its new size."""
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, partial, "ab")
+        try:
+            remaining = length
+            while remaining > 0:
+                block = await request.content.read(min(READ_SIZE, remaining))
+                if not block:
+                    break
+                await loop.run_in_executor(None, f.write, block)
+                remaining -= len(block)
+        finally:
+            # Whatever arrived before a disconnect is kept, and the client resumes after it
+            await loop.run_in_executor(None, f.close)
+        return partial.stat().st_size
+
+    def _complete(self, digest: str, partial: Path, filename: str) -> Dict[str, Any]:
+        actual = sha256_file(partial)
+        if actual != digest:
+            partial.unlink()
+            raise web.HTTPUnprocessableEntity(reason=f"upload hashed to {actual}, expected {digest}")
+        target = self.input_dir / filename
+        if target.exists() and sha256_file(target) == digest:
+            partial.unlink()
+        else:
+            target = free_name(self.input_dir, filename)
+            os.replace(partial, target)
+        logger.info("upload %s stored as %s", digest[:12], target.name)
+        return {"name": target.name, "subfolder": "", "type": "input", "sha256": digest,
+                "size": target.stat().st_size}
+
+    async def download(self, request: web.Request) -> web.FileResponse:
+        root = self.folders.get(request.query.get("type", "output"))
+        if root is None:
+            raise web.HTTPNotFound()
+        root = root.resolve()
+        path = (root / request.query.get("subfolder", "") / request.query.get("filename", "")).resolve()
+        if root not in path.parents or not path.is_file():
+            raise web.HTTPNotFound()
+        return web.FileResponse(path, headers={"Content-Disposition": f'attachment; filename="{path.name}"'})
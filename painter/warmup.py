@@ -0,0 +1,110 @@
+"""
+Warm a Studio worker up at boot by running the workflow on a tiny synthetic clip.
+
+The first job on a fresh worker pays for loading DiffuEraser, growing the
+CUDA allocator's pools and cuDNN's kernel selection. With
+``PAINTER_WARMUP=1`` the Painter node pack queues ``inpainting-workflow.json``
+once at boot on a few frames it generates itself (no download, nothing to
+mount), and ``GET /ready`` answers 503 until that prompt has finished. See
+:mod:`painter.studio.warmup`.
+
+Everything is configured from the environment:
+
+- ``PAINTER_WARMUP``: ``1`` to warm up at boot (off by default)
+- ``PAINTER_WARMUP_FRAMES``: frames in the clip (8)
+- ``PAINTER_WARMUP_SIZE``: ``WIDTHxHEIGHT`` of the clip (``320x180``); match
+  production resolution to select the kernels real jobs use
+- ``PAINTER_WARMUP_STEPS``: sampler steps (2, as the PCM LoRA runs)
+- ``PAINTER_WARMUP_PASSES``: comma-separated optimization passes
+  (``resident``, which keeps the loaded model for the jobs that follow)
+- ``PAINTER_WARMUP_TIMEOUT``: seconds before warm-up counts as failed (900)
+"""
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from painter.workflow import apply_job, compile_workflow, load_workflow, optimize
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+WORKFLOW = PROJECT_ROOT / "inpainting-workflow.json"
+
+ENV = "PAINTER_WARMUP"
+# Inputs are written to the top of Studio/input (the loaders list only that)
+# and outputs under this subfolder of Studio/output, which is removed after
+PREFIX = "painter-warmup"
+
+
+def _size(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+@dataclass
+class WarmupConfig:
+    """What the boot-time warm-up runs."""
+
+    enabled: bool = False
+    frames: int = 8
+    width: int = 320
+    height: int = 180
+    steps: int = 2
+    passes: List[str] = field(default_factory=lambda: ["resident"])
+    timeout: float = 900.0
+
+    @classmethod
+    def from_env(cls, environ: Optional[Dict[str, str]] = None) -> "WarmupConfig":
+        """Read the ``PAINTER_WARMUP*`` variables; unset ones keep their defaults."""
+        environ = os.environ if environ is None else environ
+        config = cls(enabled=environ.get(ENV, "").lower() in ("1", "true", "yes"))
+        if environ.get(f"{ENV}_FRAMES"):
+            config.frames = int(environ[f"{ENV}_FRAMES"])
+        if environ.get(f"{ENV}_SIZE"):
+            config.width, config.height = _size(environ[f"{ENV}_SIZE"])
+        if environ.get(f"{ENV}_STEPS"):
+            config.steps = int(environ[f"{ENV}_STEPS"])
+        if f"{ENV}_PASSES" in environ:
+            config.passes = [p.strip() for p in environ[f"{ENV}_PASSES"].split(",") if p.strip()]
+        if environ.get(f"{ENV}_TIMEOUT"):
+            config.timeout = float(environ[f"{ENV}_TIMEOUT"])
+        return config
+
+
+def write_inputs(input_dir: Path, config: WarmupConfig) -> Dict[str, str]:
+    """
+    Encode the synthetic watermarked clip and copy both masks into
+    ``input_dir``. Returns their file names relative to it.
+    """
+    from painter.synthetic import burn_watermark, moving_frames, watermark_mask, write_video
+
+    input_dir = Path(input_dir)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    names = {"video": f"{PREFIX}.mp4"}
+    clip = burn_watermark(moving_frames(config.frames, config.width, config.height),
+                          watermark_mask(config.width, config.height))
+    write_video(input_dir / names["video"], clip)
+    for orientation in ("horizontal", "vertical"):
+        names[orientation] = f"{PREFIX}-{orientation}-mask.png"
+        shutil.copyfile(PROJECT_ROOT / f"{orientation}-mask.png", input_dir / names[orientation])
+    return names
+
+
+def warmup_prompt(inputs: Dict[str, str], config: WarmupConfig, workflow: Path = WORKFLOW) -> Dict[str, Any]:
+    """The workflow with the warm-up passes applied, patched to run the clip from :func:`write_inputs`."""
+    template = optimize(compile_workflow(load_workflow(workflow)), config.passes)
+    return apply_job(template, {
+        "video": inputs["video"],
+        "frame_load_cap": config.frames,
+        "masks": {"horizontal": inputs["horizontal"], "vertical": inputs["vertical"]},
+        "sampler": {"num_inference_steps": config.steps},
+        "output_prefix": f"{PREFIX}/warmup",
+    })
+
+
+def clean_up(input_dir: Path, output_dir: Optional[Path], inputs: Dict[str, str]) -> None:
+    """Remove the warm-up clip, masks and outputs."""
+    for name in inputs.values():
+        (Path(input_dir) / name).unlink(missing_ok=True)
+    if output_dir is not None:
+        shutil.rmtree(Path(output_dir) / PREFIX, ignore_errors=True)
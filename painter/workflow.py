@@ -0,0 +1,660 @@
+"""
+Compile the UI-format inpainting workflow into Studio's API prompt format.
+
+The UI graph stored in ``inpainting-workflow.json`` keeps widget values as
+positional lists and connections in a separate ``links`` array. ``/prompt``
+expects ``{node_id: {"class_type": ..., "inputs": {...}}}`` instead, so the
+graph is converted once and each job only patches the compiled copy.
+"""
+import copy
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from painter.fused import IDENTITY_SUFFIX, SUFFIX, fused_names
+
+# Node ids in inpainting-workflow.json
+LOADER = "237"
+SAMPLER = "208"
+LOAD_VIDEO = "205"
+VIDEO_COMBINE = "209"
+VIDEO_INFO = "288"
+FRAME_CAP = "257"
+SCALE = "290"
+SCALE_LENGTH = "284"
+REPEAT_MASK = "289"
+ORIENTATION = "283"
+MASK_SWITCH = "267"
+MASK_VERTICAL = "287"
+MASK_HORIZONTAL = "286"
+RESIZE_VERTICAL = "258"
+RESIZE_HORIZONTAL = "279"
+CLEAN_GPU = "291"
+
+MASK_NODES = {"horizontal": MASK_HORIZONTAL, "vertical": MASK_VERTICAL}
+
+# Widget order for node types whose UI entry does not list all of its widgets.
+# ``None`` marks frontend-only widgets that have no API input.
+WIDGET_NAMES: Dict[str, List[Optional[str]]] = {
+    "DiffuEraserLoader": ["checkpoint", "lora"],
+    "LoadImage": ["image", None],
+    "JWInteger": ["value"],
+    "easy compare": ["comparison"],
+    "easy ifElse": ["boolean"],
+    "RepeatImageBatch": ["amount"],
+    "LayerUtility: ImageScaleByAspectRatio V2": [
+        "aspect_ratio",
+        "proportional_width",
+        "proportional_height",
+        "fit",
+        "method",
+        "round_to_multiple",
+        "scale_to_side",
+        "scale_to_length",
+        "background_color",
+    ],
+}
+
+# Dict-style widget values that only exist for the frontend
+UI_ONLY_WIDGETS = {"videopreview", "choose video to upload"}
+
+SEED_CONTROL_VALUES = {"fixed", "increment", "decrement", "randomize"}
+
+MUTED = 2
+BYPASSED = 4
+
+
+class WorkflowError(ValueError):
+    """Raised when a workflow cannot be compiled or patched."""
+
+
+def load_workflow(path: Path) -> Dict[str, Any]:
+    """Load a UI-format workflow from disk."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def widget_names(node: Dict[str, Any], object_info: Optional[Dict[str, Any]] = None) -> List[Optional[str]]:
+    """Return the API input name for each entry of a node's ``widgets_values``."""
+    node_type = node["type"]
+
+    if object_info and node_type in object_info:
+        spec = object_info[node_type].get("input", {})
+        names = []
+        for section in ("required", "optional"):
+            for name, config in spec.get(section, {}).items():
+                kind = config[0] if config else None
+                if isinstance(kind, list) or kind in ("INT", "FLOAT", "STRING", "BOOLEAN", "COMBO"):
+                    names.append(name)
+        return names
+
+    if node_type in WIDGET_NAMES:
+        return list(WIDGET_NAMES[node_type])
+    return [i["widget"]["name"] for i in node.get("inputs", []) if i.get("widget")]
+
+
+def _widget_inputs(node: Dict[str, Any], object_info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    values = node.get("widgets_values")
+    if values is None:
+        return {}
+    if isinstance(values, dict):
+        return {k: v for k, v in values.items() if k not in UI_ONLY_WIDGETS}
+
+    inputs: Dict[str, Any] = {}
+    names = iter(widget_names(node, object_info))
+    previous = None
+    for value in values:
+        # The frontend appends a "control_after_generate" widget after seeds
+        if previous in ("seed", "noise_seed") and value in SEED_CONTROL_VALUES:
+            previous = None
+            continue
+        name = next(names, None)
+        if name is not None:
+            inputs[name] = value
+        previous = name
+    return inputs
+
+
+def compile_workflow(workflow: Dict[str, Any], object_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Convert a UI-format workflow (``nodes``/``links``) into an API prompt.
+
+    ``object_info`` is the ``/object_info`` response of a running server; when
+    given it is used to name positional widget values instead of the built-in
+    table.
+    """
+    if "nodes" not in workflow or "links" not in workflow:
+        raise WorkflowError("Not a UI-format workflow (expected 'nodes' and 'links')")
+
+    links = {link[0]: link for link in workflow["links"]}
+    nodes = {str(n["id"]): n for n in workflow["nodes"] if n.get("mode", 0) != MUTED}
+
+    prompt: Dict[str, Any] = {}
+    for node_id, node in nodes.items():
+        if node.get("mode", 0) == BYPASSED:
+            raise WorkflowError(f"Node {node_id} ({node['type']}) is bypassed; unbypass or mute it")
+
+        inputs = _widget_inputs(node, object_info)
+        for slot in node.get("inputs", []):
+            link_id = slot.get("link")
+            if link_id is None:
+                continue
+            link = links.get(link_id)
+            if link is None:
+                raise WorkflowError(f"Node {node_id} input '{slot['name']}' references missing link {link_id}")
+            source = str(link[1])
+            if source not in nodes:
+                raise WorkflowError(f"Node {node_id} input '{slot['name']}' is fed by muted node {source}")
+            inputs[slot["name"]] = [source, link[2]]
+
+        prompt[node_id] = {
+            "class_type": node["type"],
+            "inputs": inputs,
+            "_meta": {"title": node.get("title", node["type"])},
+        }
+    return prompt
+
+
+def set_input(prompt: Dict[str, Any], node_id: str, name: str, value: Any) -> None:
+    """Set a literal input on a compiled prompt node."""
+    if node_id not in prompt:
+        raise WorkflowError(f"Prompt has no node {node_id}")
+    prompt[node_id]["inputs"][name] = value
+
+
+def sampler_id(prompt: Dict[str, Any]) -> str:
+    """Id of the node holding the sampler inputs; the stream pass folds them into VideoCombine's."""
+    return SAMPLER if SAMPLER in prompt else VIDEO_COMBINE
+
+
+def apply_job(prompt: Dict[str, Any], job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy of ``prompt`` with a job's overrides applied.
+
+    Recognised job keys:
+
+    - ``video``: VHS_LoadVideo 205 source file (relative to Studio/input)
+    - ``frame_load_cap``: JWInteger 257 value
+    - ``skip_first_frames``: VHS_LoadVideo 205 offset
+    - ``masks``: ``{"horizontal": file, "vertical": file}`` for LoadImage 286/287
+    - ``sampler``: DiffuEraserSampler 208 inputs (seed, steps, ...)
+    - ``output_prefix``: VHS_VideoCombine 209 ``filename_prefix``
+    - ``overrides``: raw ``{node_id: {input: value}}`` patches applied last
+    """
+    prompt = copy.deepcopy(prompt)
+
+    # The encode pass's PainterVideoCombine copies the audio from the same source
+    mirrors = [LOAD_VIDEO]
+    if prompt.get(VIDEO_COMBINE, {}).get("class_type") == "PainterVideoCombine":
+        mirrors.append(VIDEO_COMBINE)
+    for node_id in mirrors:
+        if "video" in job:
+            set_input(prompt, node_id, "video", job["video"])
+        if "skip_first_frames" in job:
+            set_input(prompt, node_id, "skip_first_frames", int(job["skip_first_frames"]))
+    if "frame_load_cap" in job:
+        set_input(prompt, FRAME_CAP, "value", int(job["frame_load_cap"]))
+    for orientation, filename in job.get("masks", {}).items():
+        if orientation not in MASK_NODES:
+            raise WorkflowError(f"Unknown mask orientation '{orientation}' (use {sorted(MASK_NODES)})")
+        set_input(prompt, MASK_NODES[orientation], "image", filename)
+    for name, value in job.get("sampler", {}).items():
+        set_input(prompt, sampler_id(prompt), name, value)
+    if "output_prefix" in job:
+        set_input(prompt, VIDEO_COMBINE, "filename_prefix", job["output_prefix"])
+    for node_id, values in job.get("overrides", {}).items():
+        for name, value in values.items():
+            set_input(prompt, str(node_id), name, value)
+
+    return prompt
+
+
+# Optimisation passes rewrite the compiled template once, before any job is
+# applied. They swap stock nodes for Hanzo-Painter nodes, so the server needs
+# the painter node pack installed (make install-nodes).
+
+
+def use_static_mask(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace RepeatImageBatch 289 with PainterStaticMask.
+
+    The mask is dilated once by the new node instead of per frame by the
+    sampler, so the sampler's ``mask_dilation_iter`` moves onto it.
+    """
+    prompt = copy.deepcopy(prompt)
+    repeat = prompt[REPEAT_MASK]
+    if repeat["class_type"] == "PainterStaticMask":
+        return prompt
+    dilation = _take_dilation(prompt, "static-mask")
+    repeat["class_type"] = "PainterStaticMask"
+    repeat["inputs"] = {
+        "image": repeat["inputs"]["image"],
+        "amount": repeat["inputs"]["amount"],
+        "dilation": dilation,
+        "threshold": 0.5,
+    }
+    return prompt
+
+
+def _new_node_id(prompt: Dict[str, Any]) -> str:
+    return str(max(int(node_id) for node_id in prompt if node_id.isdigit()) + 1)
+
+
+def _relink(prompt: Dict[str, Any], source: List[Any], target: List[Any]) -> None:
+    """Point every input linked to output ``source`` at ``target`` instead."""
+    for node in prompt.values():
+        for name, value in node["inputs"].items():
+            if value == source:
+                node["inputs"][name] = target
+
+
+def _take_dilation(prompt: Dict[str, Any], pass_name: str) -> int:
+    """
+    Remove mask dilation from wherever it currently happens and return it,
+    so a pass can apply it earlier: the sampler's ``mask_dilation_iter`` or a
+    PainterStaticMask left by the static-mask pass.
+    """
+    holders = [(sampler_id(prompt), "mask_dilation_iter")]
+    if prompt.get(REPEAT_MASK, {}).get("class_type") == "PainterStaticMask":
+        holders.append((REPEAT_MASK, "dilation"))
+    total = 0
+    for node_id, name in holders:
+        value = prompt[node_id]["inputs"].get(name, 0)
+        if isinstance(value, list):
+            raise WorkflowError(f"{pass_name} needs a literal {name} on node {node_id}")
+        total += int(value)
+        prompt[node_id]["inputs"][name] = 0
+    return total
+
+
+def _drop_unused(prompt: Dict[str, Any], node_ids: List[str]) -> None:
+    """Delete ``node_ids`` in order, skipping any whose outputs are still linked."""
+    for node_id in node_ids:
+        used = any(
+            isinstance(value, list) and value and value[0] == node_id
+            for node in prompt.values()
+            for value in node["inputs"].values()
+        )
+        if not used:
+            prompt.pop(node_id, None)
+
+
+def use_mask_crop(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inpaint only the mask's bounding box at source resolution.
+
+    The masks are resized to the loaded video size instead of the letterboxed
+    size from node 290, PainterMaskCrop cuts the frames and mask down to the
+    mask's union bounding box plus context, and PainterMaskPaste composites
+    the sampler output back into the source frames before VideoCombine 209.
+    Node 290 (and its length input 284) then has no consumers and is dropped.
+    """
+    prompt = copy.deepcopy(prompt)
+    if prompt.get(SAMPLER, {}).get("inputs", {}).get("images") != [SCALE, 0]:
+        raise WorkflowError("crop expects DiffuEraserSampler 208 fed by node 290; apply it before dedupe")
+    # Mask resizes sized by node 290 (width slot 3, height slot 4) follow the
+    # source size (VideoInfo loaded_width slot 8, loaded_height slot 9) instead
+    _relink(prompt, [SCALE, 3], [VIDEO_INFO, 8])
+    _relink(prompt, [SCALE, 4], [VIDEO_INFO, 9])
+
+    crop_id = _new_node_id(prompt)
+    prompt[crop_id] = {
+        "class_type": "PainterMaskCrop",
+        "inputs": {"images": [LOAD_VIDEO, 0], "mask": [REPEAT_MASK, 0], "margin": 64, "multiple": 8},
+        "_meta": {"title": "Crop To Mask"},
+    }
+    paste_id = _new_node_id(prompt)
+    prompt[paste_id] = {
+        "class_type": "PainterMaskPaste",
+        "inputs": {"images": [LOAD_VIDEO, 0], "inpainted": [SAMPLER, 0], "crop": [crop_id, 2], "feather": 8},
+        "_meta": {"title": "Paste Crop"},
+    }
+    set_input(prompt, SAMPLER, "images", [crop_id, 0])
+    set_input(prompt, SAMPLER, "video_mask", [crop_id, 1])
+    set_input(prompt, VIDEO_COMBINE, "images", [paste_id, 0])
+    _drop_unused(prompt, [SCALE, SCALE_LENGTH])
+    return prompt
+
+
+CACHED_MASK_METHODS = {"nearest-exact", "bilinear", "area", "bicubic"}
+
+
+def use_mask_cache(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace each LoadImage 286/287 -> ImageResizeKJv2 279/258 pair with one
+    PainterCachedMask under the LoadImage id.
+
+    The node caches the resized, binarised and dilated mask by file hash and
+    settings, so mask dilation moves onto it as well. Keeping the LoadImage
+    ids means job ``masks`` entries still apply.
+    """
+    prompt = copy.deepcopy(prompt)
+    pairs = []
+    for load_id, resize_id in ((MASK_HORIZONTAL, RESIZE_HORIZONTAL), (MASK_VERTICAL, RESIZE_VERTICAL)):
+        if prompt[load_id]["class_type"] == "PainterCachedMask":
+            continue
+        resize = prompt[resize_id]["inputs"]
+        if resize.get("image") != [load_id, 0]:
+            raise WorkflowError(f"mask-cache expects node {resize_id} to resize node {load_id}")
+        if resize.get("keep_proportion", "stretch") != "stretch":
+            raise WorkflowError(f"mask-cache only supports keep_proportion 'stretch' on node {resize_id}")
+        if resize.get("upscale_method") not in CACHED_MASK_METHODS:
+            raise WorkflowError(f"mask-cache cannot reproduce upscale_method {resize.get('upscale_method')!r}")
+        pairs.append((load_id, resize_id))
+    if not pairs:
+        return prompt
+
+    dilation = _take_dilation(prompt, "mask-cache")
+    for load_id, resize_id in pairs:
+        resize = prompt[resize_id]["inputs"]
+        prompt[load_id] = {
+            "class_type": "PainterCachedMask",
+            "inputs": {
+                "image": prompt[load_id]["inputs"]["image"],
+                "width": resize["width"],
+                "height": resize["height"],
+                "upscale_method": resize["upscale_method"],
+                "divisible_by": resize.get("divisible_by", 1),
+                "dilation": dilation,
+                "threshold": 0.5,
+            },
+            "_meta": {"title": "Load Mask Cached"},
+        }
+        _relink(prompt, [resize_id, 0], [load_id, 0])
+        del prompt[resize_id]
+    return prompt
+
+
+def use_frame_cache(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Load the video through PainterLoadVideoCached, which keeps VHS_LoadVideo's
+    inputs and outputs. A no-op after the stream pass, which stops decoding
+    the clip up front.
+    """
+    prompt = copy.deepcopy(prompt)
+    if prompt[LOAD_VIDEO]["class_type"] == "VHS_LoadVideo":
+        prompt[LOAD_VIDEO]["class_type"] = "PainterLoadVideoCached"
+    return prompt
+
+
+# Frames shared by neighbouring windows in the stream and compact passes
+WINDOW_OVERLAP = 8
+
+
+def use_streaming(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Overlap decode, inpaint and encode with PainterStreamInpaint.
+
+    VHS_LoadVideo 205 becomes PainterProbeVideo, which only probes the file
+    for VideoInfo 288. DiffuEraserSampler 208 and VHS_VideoCombine 209 are
+    folded into PainterStreamInpaint under id 209, so batch results and
+    ``output_prefix`` still find it. The stream node decodes, inpaints and
+    encodes ``subvideo_length``-frame windows concurrently. Node 290 is
+    dropped and masks are sized to the source like in the crop pass.
+    """
+    prompt = copy.deepcopy(prompt)
+    sampler = prompt.get(SAMPLER)
+    if sampler is None or sampler["inputs"].get("images") != [SCALE, 0]:
+        raise WorkflowError("stream expects DiffuEraserSampler 208 fed by node 290; apply it before crop")
+    load = prompt[LOAD_VIDEO]["inputs"]
+    for name, default in (("force_rate", 0), ("select_every_nth", 1), ("custom_width", 0), ("custom_height", 0)):
+        if load.get(name, default) != default:
+            raise WorkflowError(f"stream does not support {name}={load[name]!r} on node {LOAD_VIDEO}")
+
+    combine = prompt[VIDEO_COMBINE]["inputs"]
+    inputs = {k: v for k, v in sampler["inputs"].items() if k not in ("images", "fps")}
+    window = inputs.get("subvideo_length", 50)
+    inputs.update({
+        "video_info": [LOAD_VIDEO, 3],
+        "frame_rate": combine["frame_rate"],
+        "filename_prefix": combine.get("filename_prefix", "Painter"),
+        "crf": combine.get("crf", 19),
+        "window": window if isinstance(window, int) else 50,
+        "overlap": WINDOW_OVERLAP,
+        "queue_depth": 2,
+    })
+    prompt[LOAD_VIDEO]["class_type"] = "PainterProbeVideo"
+    prompt[VIDEO_COMBINE] = {
+        "class_type": "PainterStreamInpaint",
+        "inputs": inputs,
+        "_meta": {"title": "Stream Inpaint"},
+    }
+    del prompt[SAMPLER]
+    _relink(prompt, [SAMPLER, 0], [VIDEO_COMBINE, 0])
+    _relink(prompt, [SCALE, 3], [VIDEO_INFO, 8])
+    _relink(prompt, [SCALE, 4], [VIDEO_INFO, 9])
+    _drop_unused(prompt, [SCALE, SCALE_LENGTH])
+    return prompt
+
+
+def use_compact_frames(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pass frames between load, scale, sampler and save as uint8 instead of
+    float32 IMAGE tensors.
+
+    LoadVideo 205, scale 290, DiffuEraserSampler 208 and VideoCombine 209
+    keep their ids but become PainterLoadFrames, PainterScaleFrames,
+    PainterSampleFrames and PainterSaveFrames. The sampler node converts one
+    ``subvideo_length`` window at a time to float.
+    """
+    prompt = copy.deepcopy(prompt)
+    sampler = prompt.get(SAMPLER)
+    if sampler is None or sampler["inputs"].get("images") != [SCALE, 0]:
+        raise WorkflowError("compact expects DiffuEraserSampler 208 fed by node 290; it does not combine with "
+                            "stream or crop")
+    if prompt[LOAD_VIDEO]["class_type"] not in ("VHS_LoadVideo", "PainterLoadVideoCached"):
+        raise WorkflowError(f"compact cannot replace {prompt[LOAD_VIDEO]['class_type']} {LOAD_VIDEO}")
+
+    prompt[LOAD_VIDEO]["class_type"] = "PainterLoadFrames"
+
+    multiple = prompt[SCALE]["inputs"].get("round_to_multiple", 8)
+    prompt[SCALE] = {
+        "class_type": "PainterScaleFrames",
+        "inputs": {"frames": [LOAD_VIDEO, 0], "multiple": int(multiple) if str(multiple).isdigit() else 8},
+        "_meta": {"title": "Scale Frames"},
+    }
+    _relink(prompt, [SCALE, 3], [SCALE, 1])
+    _relink(prompt, [SCALE, 4], [SCALE, 2])
+
+    inputs = {k: v for k, v in sampler["inputs"].items() if k != "images"}
+    window = inputs.get("subvideo_length", 50)
+    inputs.update({
+        "frames": [SCALE, 0],
+        "window": window if isinstance(window, int) else 50,
+        "overlap": WINDOW_OVERLAP,
+    })
+    sampler["class_type"] = "PainterSampleFrames"
+    sampler["inputs"] = inputs
+
+    combine = prompt[VIDEO_COMBINE]["inputs"]
+    prompt[VIDEO_COMBINE] = {
+        "class_type": "PainterSaveFrames",
+        "inputs": {
+            "frames": [SAMPLER, 0],
+            "frame_rate": combine["frame_rate"],
+            "filename_prefix": combine.get("filename_prefix", "Painter"),
+            "crf": combine.get("crf", 19),
+            "video_info": [LOAD_VIDEO, 3],
+        },
+        "_meta": {"title": "Save Frames"},
+    }
+    _drop_unused(prompt, [SCALE_LENGTH])
+    return prompt
+
+
+def use_lazy_switch(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace easy ifElse 267 with PainterLazySwitch.
+
+    The orientation from easy compare 283 is resolved first and only the
+    chosen mask branch (287 -> 258 or 286 -> 279, or the cached mask nodes
+    after mask-cache) is executed; the other is skipped.
+    """
+    prompt = copy.deepcopy(prompt)
+    switch = prompt.get(MASK_SWITCH)
+    if switch is not None and switch["class_type"] == "easy ifElse":
+        switch["class_type"] = "PainterLazySwitch"
+        switch["_meta"] = {"title": "If Else Lazy"}
+    return prompt
+
+
+def use_resident_models(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep DiffuEraser loaded between prompts.
+
+    DiffuEraserLoader 237 becomes PainterResidentLoader with the same inputs,
+    and easy cleanGpuUsed 291 (if present) becomes PainterReleaseModels,
+    which only frees memory when the device runs short instead of after
+    every prompt.
+    """
+    prompt = copy.deepcopy(prompt)
+    if prompt[LOADER]["class_type"] == "DiffuEraserLoader":
+        prompt[LOADER]["class_type"] = "PainterResidentLoader"
+    if prompt.get(CLEAN_GPU, {}).get("class_type") == "easy cleanGpuUsed":
+        prompt[CLEAN_GPU]["class_type"] = "PainterReleaseModels"
+    return prompt
+
+
+def use_fused_model(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Load DiffuEraser from the checkpoint with its LoRA already fused in.
+
+    DiffuEraserLoader 237 is pointed at the fp16 file ``convert-models``
+    writes for its checkpoint and LoRA, and at the matching identity LoRA,
+    so loading skips the fp32 read and the LoRA fusion. Run
+    ``make convert-models`` first; Studio rejects the prompt if the files
+    are missing.
+    """
+    prompt = copy.deepcopy(prompt)
+    inputs = prompt[LOADER]["inputs"]
+    if not str(inputs["checkpoint"]).endswith(SUFFIX) and not str(inputs["lora"]).endswith(IDENTITY_SUFFIX):
+        inputs["checkpoint"], inputs["lora"] = fused_names(inputs["checkpoint"], inputs["lora"])
+    return prompt
+
+
+def use_frame_dedupe(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inpaint one frame per run of frames whose masked region is static.
+
+    PainterDedupeFrames sits between whatever feeds the sampler (node 290,
+    the crop pass's crop or the compact pass's frames) and DiffuEraserSampler
+    208, and PainterExpandFrames gives every consumer of the sampler the
+    full-length clip back. The compared context ring is widened by the
+    sampler's own ``mask_dilation_iter`` so the whole fill is carried over.
+    Apply after crop and compact; it does not combine with stream.
+    """
+    prompt = copy.deepcopy(prompt)
+    sampler = prompt.get(SAMPLER)
+    if sampler is None:
+        raise WorkflowError("dedupe needs DiffuEraserSampler 208; it does not combine with stream")
+    name = "frames" if sampler["class_type"] == "PainterSampleFrames" else "images"
+    source = sampler["inputs"][name]
+    if isinstance(source, list) and prompt.get(source[0], {}).get("class_type") == "PainterDedupeFrames":
+        return prompt
+    dilation = sampler["inputs"].get("mask_dilation_iter", 0)
+    if not isinstance(dilation, int):
+        raise WorkflowError(f"dedupe needs a literal mask_dilation_iter on node {SAMPLER}")
+
+    dedupe_id = _new_node_id(prompt)
+    prompt[dedupe_id] = {
+        "class_type": "PainterDedupeFrames",
+        "inputs": {"images": source, "mask": sampler["inputs"]["video_mask"], "tolerance": 1.0,
+                   "context": 16 + dilation},
+        "_meta": {"title": "Dedupe Static Frames"},
+    }
+    expand_id = _new_node_id(prompt)
+    _relink(prompt, [SAMPLER, 0], [expand_id, 0])
+    prompt[expand_id] = {
+        "class_type": "PainterExpandFrames",
+        "inputs": {"images": source, "inpainted": [SAMPLER, 0], "runs": [dedupe_id, 2]},
+        "_meta": {"title": "Expand Static Frames"},
+    }
+    set_input(prompt, SAMPLER, name, [dedupe_id, 0])
+    set_input(prompt, SAMPLER, "video_mask", [dedupe_id, 1])
+    return prompt
+
+
+def use_propagate_first(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill the hole by propagation and run diffusion only where it falls short.
+
+    DiffuEraserSampler 208 becomes PainterPropagateFirst with the same
+    inputs. Its windows and propagation reach follow ``subvideo_length``, as
+    ProPainter propagates across the whole subvideo. It does not combine
+    with stream or compact, which replace the sampler themselves.
+    """
+    prompt = copy.deepcopy(prompt)
+    sampler = prompt.get(SAMPLER)
+    if sampler is None or sampler["class_type"] not in ("DiffuEraserSampler", "PainterPropagateFirst"):
+        raise WorkflowError("propagate needs DiffuEraserSampler 208; it does not combine with stream or compact")
+    if sampler["class_type"] == "PainterPropagateFirst":
+        return prompt
+    inputs = sampler["inputs"]
+    window = inputs.get("subvideo_length", 50)
+    window = window if isinstance(window, int) else 50
+    inputs.update({"coverage": 0.98, "max_error": 6.0, "reach": window, "window": window})
+    sampler["class_type"] = "PainterPropagateFirst"
+    sampler["_meta"] = {"title": "DiffuEraser Sampler Propagate First"}
+    return prompt
+
+
+def use_pipe_encode(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode through PainterVideoCombine instead of VHS_VideoCombine 209.
+
+    Frames are streamed into ffmpeg's stdin and the audio is copied from
+    the source file rather than muxed from VHS_LoadVideo's decoded AUDIO.
+    The node mirrors node 205's ``video`` and ``skip_first_frames`` (kept in
+    step by :func:`apply_job`), and its frame rate is VHS_VideoInfo 288's
+    ``loaded_fps``. Compact and stream already encode this way.
+    """
+    prompt = copy.deepcopy(prompt)
+    combine = prompt.get(VIDEO_COMBINE, {})
+    if combine.get("class_type") == "PainterVideoCombine":
+        return prompt
+    if combine.get("class_type") != "VHS_VideoCombine":
+        raise WorkflowError(f"encode replaces VHS_VideoCombine {VIDEO_COMBINE}; compact and stream already pipe "
+                            "frames to ffmpeg")
+    inputs, load = combine["inputs"], prompt[LOAD_VIDEO]["inputs"]
+    prompt[VIDEO_COMBINE] = {
+        "class_type": "PainterVideoCombine",
+        "inputs": {
+            "images": inputs["images"],
+            "frame_rate": [VIDEO_INFO, 5],
+            "filename_prefix": inputs.get("filename_prefix", "Painter"),
+            "format": inputs.get("format", "video/h264-mp4"),
+            "crf": inputs.get("crf", 19),
+            "preset": "medium",
+            "threads": 0,
+            "video": load.get("video", ""),
+            "skip_first_frames": load.get("skip_first_frames", 0),
+            "save_output": inputs.get("save_output", True),
+        },
+        "_meta": {"title": "Video Combine Pipe"},
+    }
+    return prompt
+
+
+OPTIMIZATIONS = {
+    "static-mask": use_static_mask,
+    "crop": use_mask_crop,
+    "mask-cache": use_mask_cache,
+    "lazy-switch": use_lazy_switch,
+    "frame-cache": use_frame_cache,
+    "stream": use_streaming,
+    "compact": use_compact_frames,
+    "dedupe": use_frame_dedupe,
+    "propagate": use_propagate_first,
+    "encode": use_pipe_encode,
+    "fused": use_fused_model,
+    "resident": use_resident_models,
+}
+
+
+def optimize(prompt: Dict[str, Any], names: List[str]) -> Dict[str, Any]:
+    """Apply the named optimisation passes in order."""
+    for name in names:
+        if name not in OPTIMIZATIONS:
+            raise WorkflowError(f"Unknown optimization '{name}' (available: {', '.join(OPTIMIZATIONS)})")
+        prompt = OPTIMIZATIONS[name](prompt)
+    return prompt
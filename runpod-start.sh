@@ -3,6 +3,8 @@
 
 set -e
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 echo "🎨 Starting Hanzo Studio..."
 
 # Detect best Python version (prefer 3.11, avoid 3.14)
@@ -53,87 +55,27 @@ fi
 echo "  Workspace: $WORKSPACE"
 cd "$WORKSPACE"
 
-# Clone/update Studio if needed
-if [ ! -d "Studio" ]; then
-    echo "📦 Cloning Hanzo Studio..."
-    git clone https://github.com/hanzoai/studio.git Studio
-    cd Studio
-
-    # Install requirements
-    echo "  Installing dependencies..."
-
-    # Ensure critical dependencies are installed
-    $PYTHON -m pip install --break-system-packages pyyaml pillow 2>/dev/null || \
-        $PYTHON -m pip install pyyaml pillow 2>/dev/null || \
-        echo "⚠ Could not install base dependencies"
-
-    # Install requirements, filtering out SAM2 (installed via custom nodes)
-    grep -v "segment-anything" requirements.txt > /tmp/requirements-filtered.txt 2>/dev/null || cp requirements.txt /tmp/requirements-filtered.txt
-    $PYTHON -m pip install --break-system-packages -r /tmp/requirements-filtered.txt 2>/dev/null || \
-        $PYTHON -m pip install -r /tmp/requirements-filtered.txt 2>/dev/null || \
-        echo "⚠ Some requirements may have failed"
-
-    # Install Studio in editable mode
-    $PYTHON -m pip install --break-system-packages -e . 2>/dev/null || \
-        $PYTHON -m pip install -e . 2>/dev/null || \
-        echo "⚠ Could not install Studio in editable mode (continuing anyway)"
-    rm -f /tmp/requirements-filtered.txt
-else
-    echo "✓ Studio directory exists"
-    cd Studio
-
-    # Ensure critical dependencies are installed
-    $PYTHON -m pip install --break-system-packages pyyaml pillow 2>/dev/null || \
-        $PYTHON -m pip install pyyaml pillow 2>/dev/null || \
-        echo "⚠ Could not install base dependencies"
-
-    # Try to update
-    if command -v git &> /dev/null; then
-        git pull origin master 2>/dev/null || echo "⚠ Could not update Studio (continuing with existing version)"
-    fi
-fi
-
-# Install custom nodes if not present
-if [ ! -d "custom_nodes/Hanzo-DiffuEraser" ]; then
-    echo "📦 Installing custom nodes..."
-
-    # Check if install-nodes.sh exists
-    if [ -f "$WORKSPACE/install-nodes.sh" ]; then
-        bash "$WORKSPACE/install-nodes.sh"
-    elif [ -f "../install-nodes.sh" ]; then
-        bash ../install-nodes.sh
-    else
-        echo "⚠ install-nodes.sh not found, skipping custom nodes installation"
-        echo "  Clone nodes manually to custom_nodes/ directory"
-    fi
-else
-    echo "✓ Custom nodes already installed"
+# Clone Studio and the custom nodes, or bring them up to date. Each step is
+# fingerprinted (Studio and node revisions, requirements hashes), so a warm
+# boot skips straight to the server; node clones run in parallel and pip
+# installs from $WORKSPACE/wheelhouse when it exists. PAINTER_UPDATE=1
+# pulls Studio and the nodes first.
+BOOTSTRAP_ARGS=(--studio-dir "$WORKSPACE/Studio")
+if [ "${PAINTER_UPDATE:-0}" = "1" ]; then
+    BOOTSTRAP_ARGS+=(--update)
 fi
+PYTHONPATH="$SCRIPT_DIR${PYTHONPATH:+:$PYTHONPATH}" $PYTHON -m painter bootstrap "${BOOTSTRAP_ARGS[@]}"
+cd Studio
 
-# Download models if needed
+# Download models if needed: the SAM2 checkpoints and the DiffuEraser base
+# models in models.json, over parallel ranged connections with resume and
+# sha256 checks. Downloads go through a cache on the volume, so pods sharing
+# it fetch each file once.
 echo "📥 Checking models..."
-
-# SAM2 models
-if command -v wget &> /dev/null; then
-    if [ ! -f "models/sam2/sam2_hiera_large.safetensors" ]; then
-        echo "  Downloading SAM2 Large..."
-        mkdir -p models/sam2
-        wget -q --show-progress -O models/sam2/sam2_hiera_large.safetensors \
-            https://huggingface.co/Kijai/sam2-safetensors/resolve/main/sam2_hiera_large.safetensors || \
-            echo "⚠ Failed to download SAM2 Large"
-    fi
-
-    if [ ! -f "models/sam2/sam2_hiera_base_plus.safetensors" ]; then
-        echo "  Downloading SAM2 Base Plus..."
-        wget -q --show-progress -O models/sam2/sam2_hiera_base_plus.safetensors \
-            https://huggingface.co/Kijai/sam2-safetensors/resolve/main/sam2_hiera_base_plus.safetensors || \
-            echo "⚠ Failed to download SAM2 Base Plus"
-    fi
-    echo "✓ Models ready"
-else
-    echo "⚠ wget not found, skipping model downloads"
-    echo "  Download models manually to models/sam2/"
-fi
+export PAINTER_MODEL_CACHE="${PAINTER_MODEL_CACHE:-$WORKSPACE/.cache/painter-models}"
+PYTHONPATH="$SCRIPT_DIR${PYTHONPATH:+:$PYTHONPATH}" $PYTHON -m painter models \
+    --manifest "$SCRIPT_DIR/models.json" --models-dir "$WORKSPACE/Studio/models" && echo "✓ Models ready" || \
+    echo "⚠ Some models failed to download; run the same command again to resume"
 
 # Print access info
 echo ""
@@ -155,6 +97,17 @@ echo "   3. Update video filename in VHS_LoadVideo node"
 echo "   4. Click 'Queue Prompt'"
 echo ""
 
-# Start Studio
+# Start Studio. PAINTER_LAZY_NODES=1 imports only the Painter node pack at
+# boot and registers the others from cached metadata; each is imported the
+# first time a prompt uses it.
+STUDIO_ARGS=(--listen 0.0.0.0 --port 8188)
+if [ "${PAINTER_LAZY_NODES:-0}" = "1" ]; then
+    export PAINTER_LAZY_NODES
+    STUDIO_ARGS+=(--disable-all-custom-nodes --whitelist-custom-nodes Hanzo-Painter)
+fi
+# Warm up on boot: run the workflow once on a tiny synthetic clip, so
+# /ready turns 200 (and the pod takes jobs) only with the model loaded.
+# PAINTER_WARMUP=0 skips it; /ready then answers 200 straight away.
+export PAINTER_WARMUP="${PAINTER_WARMUP:-1}"
 echo "🚀 Starting server..."
-$PYTHON main.py --listen 0.0.0.0 --port 8188
+$PYTHON main.py "${STUDIO_ARGS[@]}"
@@ -85,3 +85,47 @@ def run_command(cmd: str, cwd: Path = None, check: bool = True) -> subprocess.Co
         text=True,
         check=check
     )
+
+
+@pytest.fixture
+def synthetic_video(tmp_path: Path):
+    """Factory that encodes a synthetic moving clip and returns its path."""
+    pytest.importorskip("numpy")
+    from painter.ffmpeg import FFmpegError, ffmpeg_exe
+
+    try:
+        ffmpeg_exe()
+    except FFmpegError:
+        pytest.skip("ffmpeg not available")
+
+    from painter.synthetic import moving_frames, write_video
+
+    def make(name: str = "clip.mp4", frames: int = 48, width: int = 160, height: int = 96, fps: float = 24.0) -> Path:
+        return write_video(tmp_path / name, moving_frames(frames, width, height), fps=fps)
+
+    return make
+
+
+@pytest.fixture
+def serve_app():
+    """Run ``scenario(base_url)`` against an aiohttp application on a free local port."""
+    pytest.importorskip("aiohttp")
+    import asyncio
+
+    from aiohttp import web
+
+    def run(app, scenario):
+        async def main():
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                return await scenario(f"http://127.0.0.1:{port}")
+            finally:
+                await runner.cleanup()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,219 @@
+"""
+Tests for the workflow compiler and headless batch runner.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from painter import workflow as wf
+
+
+@pytest.fixture
+def prompt(workflow_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Compiled API prompt for the shipped workflow."""
+    return wf.compile_workflow(workflow_json)
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+class TestCompileWorkflow:
+    """Test UI graph to API prompt conversion."""
+
+    def test_every_node_is_compiled(self, prompt: Dict[str, Any], workflow_json: Dict[str, Any]):
+        """Test that each UI node becomes a prompt entry."""
+        assert set(prompt) == {str(n["id"]) for n in workflow_json["nodes"]}
+
+    def test_links_become_references(self, prompt: Dict[str, Any]):
+        """Test that links are turned into [node_id, slot] references."""
+        sampler = prompt[wf.SAMPLER]["inputs"]
+        assert sampler["model"] == [wf.LOADER, 0]
+        assert sampler["images"] == [wf.SCALE, 0]
+        assert sampler["video_mask"] == [wf.REPEAT_MASK, 0]
+        assert prompt[wf.LOAD_VIDEO]["inputs"]["frame_load_cap"] == [wf.FRAME_CAP, 0]
+
+    def test_seed_control_widget_is_skipped(self, prompt: Dict[str, Any]):
+        """Test that control_after_generate does not shift sampler widgets."""
+        sampler = prompt[wf.SAMPLER]["inputs"]
+        assert sampler["seed"] == 43437104
+        assert sampler["num_inference_steps"] == 15
+        assert sampler["mask_dilation_iter"] == 4
+        assert sampler["subvideo_length"] == 50
+        assert "randomize" not in sampler.values()
+
+    def test_dict_widgets_drop_ui_only_keys(self, prompt: Dict[str, Any]):
+        """Test that VHS preview state is not sent to the server."""
+        load = prompt[wf.LOAD_VIDEO]["inputs"]
+        assert "videopreview" not in load
+        assert "choose video to upload" not in load
+        assert load["select_every_nth"] == 1
+
+    def test_table_widgets(self, prompt: Dict[str, Any]):
+        """Test widget names for nodes that do not list them in the UI graph."""
+        assert prompt[wf.MASK_HORIZONTAL]["inputs"] == {"image": "hori.png"}
+        assert prompt[wf.SCALE]["inputs"]["scale_to_length"] == [wf.SCALE_LENGTH, 0]
+        assert prompt[wf.SCALE]["inputs"]["method"] == "lanczos"
+        assert prompt[wf.FRAME_CAP]["inputs"] == {"value": 300}
+
+    def test_object_info_names_widgets(self, workflow_json: Dict[str, Any]):
+        """Test that server object_info overrides the built-in widget table."""
+        info = {"JWInteger": {"input": {"required": {"number": ["INT", {"default": 0}]}}}}
+        prompt = wf.compile_workflow(workflow_json, object_info=info)
+        assert prompt[wf.FRAME_CAP]["inputs"] == {"number": 300}
+
+    def test_muted_nodes_are_dropped(self, workflow_json: Dict[str, Any]):
+        """Test that muted nodes are left out and bypassed nodes rejected."""
+        for node in workflow_json["nodes"]:
+            if str(node["id"]) == wf.CLEAN_GPU:
+                node["mode"] = wf.MUTED
+        assert wf.CLEAN_GPU not in wf.compile_workflow(workflow_json)
+
+        for node in workflow_json["nodes"]:
+            if str(node["id"]) == wf.CLEAN_GPU:
+                node["mode"] = wf.BYPASSED
+        with pytest.raises(wf.WorkflowError):
+            wf.compile_workflow(workflow_json)
+
+    def test_rejects_api_format(self, prompt: Dict[str, Any]):
+        """Test that an already-compiled prompt is rejected."""
+        with pytest.raises(wf.WorkflowError):
+            wf.compile_workflow(prompt)
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+class TestApplyJob:
+    """Test per-job overrides."""
+
+    def test_job_overrides(self, prompt: Dict[str, Any]):
+        """Test that job keys land on the right nodes."""
+        patched = wf.apply_job(prompt, {
+            "video": "clip.mp4",
+            "frame_load_cap": 120,
+            "masks": {"horizontal": "band.png"},
+            "sampler": {"seed": 7, "num_inference_steps": 4},
+            "output_prefix": "clip",
+            "overrides": {wf.VIDEO_COMBINE: {"crf": 23}},
+        })
+        assert patched[wf.LOAD_VIDEO]["inputs"]["video"] == "clip.mp4"
+        assert patched[wf.FRAME_CAP]["inputs"]["value"] == 120
+        assert patched[wf.MASK_HORIZONTAL]["inputs"]["image"] == "band.png"
+        assert patched[wf.SAMPLER]["inputs"]["seed"] == 7
+        assert patched[wf.VIDEO_COMBINE]["inputs"]["filename_prefix"] == "clip"
+        assert patched[wf.VIDEO_COMBINE]["inputs"]["crf"] == 23
+
+    def test_template_is_not_modified(self, prompt: Dict[str, Any]):
+        """Test that applying a job leaves the compiled template untouched."""
+        before = json.dumps(prompt, sort_keys=True)
+        wf.apply_job(prompt, {"video": "other.mp4", "sampler": {"seed": 1}})
+        assert json.dumps(prompt, sort_keys=True) == before
+
+    def test_unknown_targets_rejected(self, prompt: Dict[str, Any]):
+        """Test that typos in job overrides fail loudly."""
+        with pytest.raises(wf.WorkflowError):
+            wf.apply_job(prompt, {"masks": {"diagonal": "x.png"}})
+        with pytest.raises(wf.WorkflowError):
+            wf.apply_job(prompt, {"overrides": {"9999": {"x": 1}}})
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+@pytest.mark.parametrize("name", sorted(wf.OPTIMIZATIONS))
+def test_optimized_nodes_are_registered(prompt: Dict[str, Any], name: str):
+    """Test that every Painter node an optimization emits is exported by the node pack."""
+    pytest.importorskip("torch")
+    from painter.studio.nodes import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS
+
+    optimized = wf.optimize(prompt, [name])
+    emitted = {node["class_type"] for node in optimized.values() if node["class_type"].startswith("Painter")}
+    assert emitted <= NODE_CLASS_MAPPINGS.keys()
+    assert NODE_CLASS_MAPPINGS.keys() == NODE_DISPLAY_NAME_MAPPINGS.keys()
+
+
+@pytest.mark.unit
+def test_load_manifest(tmp_path: Path):
+    """Test JSONL manifest parsing."""
+    pytest.importorskip("aiohttp")
+    from painter.batch import load_manifest
+
+    manifest = tmp_path / "jobs.jsonl"
+    manifest.write_text('# comment\n{"video": "a.mp4"}\n\n{"id": "b", "video": "b.mp4"}\n')
+    jobs = list(load_manifest(manifest))
+    assert [j["id"] for j in jobs] == ["jobs-2", "b"]
+
+    manifest.write_text("[1, 2]\n")
+    with pytest.raises(ValueError):
+        list(load_manifest(manifest))
+
+
+@pytest.mark.integration
+class TestBatchRunner:
+    """Drive the batch runner against the local stand-in server."""
+
+    @pytest.fixture(autouse=True)
+    def _serve(self, serve_app):
+        self.serve_app = serve_app
+
+    def _run(self, prompt, jobs, max_inflight=2, latency=0.02, should_fail=None):
+        from painter.batch import run_batch
+        from painter.standin import StandinServer
+
+        server = StandinServer(latency=latency, steps=2, should_fail=should_fail)
+        report = self.serve_app(server.app(), lambda url: run_batch(url, prompt, jobs, max_inflight=max_inflight))
+        return server, report
+
+    def test_drains_manifest(self, prompt: Dict[str, Any]):
+        """Test that every job completes and reports outputs."""
+        jobs = [{"id": f"job{i}", "video": f"clip{i}.mp4", "output_prefix": f"out{i}"} for i in range(6)]
+        server, report = self._run(prompt, jobs)
+
+        assert report.succeeded == 6
+        assert server.executed == 6
+        for result in report.results:
+            gifs = result.outputs[wf.VIDEO_COMBINE]["gifs"]
+            assert gifs[0]["filename"].startswith(f"out{result.job_id[3:]}_")
+            assert result.wait_time is not None and result.run_time is not None
+
+    def test_inflight_is_bounded(self, prompt: Dict[str, Any]):
+        """Test that the server queue never holds more than max_inflight prompts."""
+        jobs = [{"id": str(i)} for i in range(8)]
+        server, report = self._run(prompt, jobs, max_inflight=3)
+        assert report.succeeded == 8
+        assert 1 < server.max_queue_depth <= 3
+
+    def test_failures_are_reported(self, prompt: Dict[str, Any]):
+        """Test that execution errors mark the job failed without stopping the batch."""
+        jobs = [{"id": "ok", "video": "a.mp4"}, {"id": "bad", "video": "fail.mp4"}]
+        _, report = self._run(
+            prompt, jobs,
+            should_fail=lambda p: p[wf.LOAD_VIDEO]["inputs"]["video"] == "fail.mp4",
+        )
+        by_id = {r.job_id: r for r in report.results}
+        assert by_id["ok"].status == "success"
+        assert by_id["bad"].status == "error"
+        assert "stand-in failure" in by_id["bad"].error
+        assert report.failed == 1
+
+
+@pytest.mark.unit
+def test_runner_follows_only_its_prompts(prompt: Dict[str, Any]):
+    """Test that other prompts' events create no state and early events of its own are replayed."""
+    pytest.importorskip("aiohttp")
+    import asyncio
+
+    from painter import batch
+    from painter.batch import BatchRunner
+
+    async def scenario():
+        runner = BatchRunner(client=None, template=prompt)
+        for i in range(batch.RECENT + 10):
+            runner._dispatch({"type": "execution_start", "data": {"prompt_id": f"other-{i}"}})
+        assert runner._prompts == {} and len(runner._early) == batch.RECENT
+        runner._dispatch({"type": "execution_start", "data": {"prompt_id": "mine"}})
+        runner._dispatch({"type": "execution_success", "data": {"prompt_id": "mine"}})
+        state = runner._track("mine")
+        assert state.started_at is not None and await state.done is None
+        assert "mine" not in runner._early and list(runner._prompts) == ["mine"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,221 @@
+"""
+Tests for the in-process executor and the CPU benchmark.
+"""
+import copy
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import bench, frames, masks
+from painter import profiler as profiling
+from painter.executor import ExecutionError, execute, execution_order
+
+
+class Constant:
+    FUNCTION = "run"
+
+    def run(self, value):
+        return (value,)
+
+
+class Add:
+    FUNCTION = "run"
+
+    def run(self, a, b):
+        return (a + b,)
+
+
+class Show:
+    FUNCTION = "run"
+    OUTPUT_NODE = True
+
+    def run(self, value):
+        return {"ui": {"text": [str(value)]}, "result": ()}
+
+
+class Switch:
+    FUNCTION = "run"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"boolean": ("BOOLEAN",), "on_true": ("*", {"lazy": True}),
+                             "on_false": ("*", {"lazy": True})}}
+
+    def check_lazy_status(self, boolean, on_true=None, on_false=None):
+        return ["on_true" if boolean else "on_false"]
+
+    def run(self, boolean, on_true=None, on_false=None):
+        return (on_true if boolean else on_false,)
+
+
+NODE_TYPES = {"Constant": Constant, "Add": Add, "Show": Show, "Switch": Switch}
+
+
+def graph() -> Dict[str, Any]:
+    return {
+        "1": {"class_type": "Constant", "inputs": {"value": 2}},
+        "2": {"class_type": "Constant", "inputs": {"value": 3}},
+        "3": {"class_type": "Add", "inputs": {"a": ["1", 0], "b": ["2", 0]}},
+        "4": {"class_type": "Show", "inputs": {"value": ["3", 0]}},
+        "5": {"class_type": "Constant", "inputs": {"value": 9}},
+    }
+
+
+@pytest.mark.unit
+class TestExecutor:
+    """Test in-process prompt execution."""
+
+    def test_runs_output_dependencies_in_order(self):
+        """Test that only nodes feeding an output run, after their inputs."""
+        seen = []
+        report = execute(graph(), NODE_TYPES, on_node=lambda node_id, class_type, seconds: seen.append(node_id))
+        assert report.order == seen == ["1", "2", "3", "4"]
+        assert report.ui["4"] == {"text": ["5"]}
+        assert set(report.timings) == {"1", "2", "3", "4"}
+
+    def test_lazy_inputs_skip_the_untaken_branch(self):
+        """Test that only the branch a lazy switch asks for runs and the other is reported skipped."""
+        prompt = graph()
+        prompt["6"] = {"class_type": "Constant", "inputs": {"value": False}}
+        prompt["7"] = {"class_type": "Add", "inputs": {"a": ["5", 0], "b": ["5", 0]}}
+        prompt["8"] = {"class_type": "Switch", "inputs": {"boolean": ["6", 0], "on_true": ["3", 0],
+                                                          "on_false": ["7", 0]}}
+        prompt["4"]["inputs"]["value"] = ["8", 0]
+        prof = profiling.Profiler("lazy")
+        report = execute(prompt, NODE_TYPES, profiler=prof)
+
+        assert report.ui["4"] == {"text": ["18"]}
+        assert report.order == ["6", "5", "7", "8", "4"]
+        assert report.skipped == ["1", "2", "3"]
+        assert [(a["node"], a["class_type"]) for a in prof.skipped()] == [("1", "Constant"), ("2", "Constant"),
+                                                                          ("3", "Add")]
+        assert "5 nodes" in prof.summary() and "3 skipped" in prof.summary()
+
+    def test_errors_name_the_node(self):
+        """Test that unknown types, cycles and node failures are reported by node id."""
+        prompt = graph()
+        prompt["3"]["class_type"] = "Multiply"
+        with pytest.raises(ExecutionError, match="node 3"):
+            execution_order(prompt, NODE_TYPES)
+
+        prompt = graph()
+        prompt["1"]["inputs"]["value"] = ["3", 0]
+        with pytest.raises(ExecutionError, match="cycle"):
+            execution_order(prompt, NODE_TYPES)
+
+        prompt = graph()
+        prompt["2"]["inputs"]["value"] = "three"
+        with pytest.raises(ExecutionError, match=r"node 3 \(Add\)"):
+            execute(prompt, NODE_TYPES)
+
+
+def report(fps: float = 20.0, inpaint: float = 2.0, rss: float = 800.0) -> Dict[str, Any]:
+    config = {"frames": 64, "width": 320, "height": 176, "fps": 24.0, "steps": 4, "jobs": 1}
+    return {"config": config, "scenarios": {"stock": {
+        "frames": 64, "runs": 3, "wall_time": 64 / fps, "fps": fps,
+        "stages": {"decode": 0.08, "inpaint": inpaint}, "peak_rss_mb": rss,
+    }}}
+
+
+@pytest.mark.unit
+class TestCompare:
+    """Test regression detection against a baseline."""
+
+    def test_within_threshold(self):
+        """Test that noise below the thresholds passes."""
+        assert bench.compare(report(fps=18.0, inpaint=2.3, rss=850), report(), threshold=0.2) == []
+
+    def test_regressions(self):
+        """Test that slower fps, a slower stage and more memory are each reported."""
+        regressions = bench.compare(report(fps=12.0, inpaint=3.0, rss=1000), report(), threshold=0.2)
+        assert len(regressions) == 3
+        assert any("fps" in r for r in regressions)
+        assert any("stage inpaint" in r for r in regressions)
+        assert any("peak RSS" in r for r in regressions)
+
+    def test_tiny_stages_do_not_flap(self):
+        """Test that a doubled but tiny stage is not a regression."""
+        current = report()
+        current["scenarios"]["stock"]["stages"]["decode"] = 0.16
+        assert bench.compare(current, report()) == []
+
+    def test_stages_are_gated_on_the_median(self):
+        """Test that stages are compared by their median over the repeats, not by the best run."""
+        current = report()
+        current["scenarios"]["stock"]["median_stages"] = {"decode": 0.08, "inpaint": 2.1}
+        current["scenarios"]["stock"]["stages"]["inpaint"] = 1.9
+        assert bench.compare(current, report()) == []
+        current["scenarios"]["stock"]["median_stages"]["inpaint"] = 2.8
+        assert [r for r in bench.compare(current, report()) if "stage inpaint" in r]
+
+    def test_scenario_missing_from_baseline_fails(self):
+        """Test that a scenario without baseline numbers is reported and one this run left out is not."""
+        current = report()
+        current["scenarios"]["new"] = current["scenarios"]["stock"]
+        assert bench.compare(current, report()) == ["new: not in the baseline; record one with make bench-baseline"]
+        assert bench.compare(report(), current) == []
+
+    def test_every_scenario_has_a_baseline(self):
+        """Test that the committed baseline covers every scenario with the default config."""
+        baseline = bench.load_baseline(bench.DEFAULT_BASELINE)
+        assert set(baseline["scenarios"]) == set(bench.SCENARIOS)
+        assert baseline["config"] == asdict(bench.BenchConfig())
+
+    def test_config_mismatch(self):
+        """Test that results for a different clip are not compared."""
+        other = copy.deepcopy(report())
+        other["config"]["frames"] = 32
+        with pytest.raises(ValueError):
+            bench.compare(other, report())
+
+    def test_baseline_round_trip(self, tmp_path: Path):
+        """Test that a saved baseline loads back unchanged."""
+        path = tmp_path / "nested" / "baseline.json"
+        assert bench.load_baseline(path) is None
+        bench.save_baseline(report(), path)
+        assert bench.load_baseline(path) == report()
+        assert "stock" in bench.format_report(report(), report())
+
+
+@pytest.mark.unit
+def test_watermark_follows_orientation():
+    """Test that the burned-in watermark uses the mask the workflow would pick."""
+    pytest.importorskip("PIL")
+    from painter.synthetic import burn_watermark, watermark_mask
+
+    landscape, portrait = watermark_mask(320, 176), watermark_mask(176, 320)
+    assert landscape.shape == (176, 320) and portrait.shape == (320, 176)
+    assert 0 < landscape.mean() < 0.2 and 0 < portrait.mean() < 0.2
+
+    frame = np.zeros((176, 320, 3), dtype=np.uint8)
+    (marked,) = burn_watermark([frame], landscape)
+    assert (marked[landscape] > 0).all() and (marked[~landscape] == 0).all()
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+@pytest.mark.parametrize("scenario", ["stock", "stream", "compact", "dedupe", "propagate"])
+def test_scenario_runs_on_cpu(scenario: str, synthetic_video, tmp_path: Path, monkeypatch):
+    """Run the workflow end to end on CPU stand-ins and check the encoded output."""
+    pytest.importorskip("torch")
+    from painter.ffmpeg import probe
+
+    monkeypatch.setenv("PAINTER_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(frames, "_frame_cache", None)
+    monkeypatch.setattr(masks, "_mask_cache", None)
+    config = bench.BenchConfig(frames=20, width=96, height=56, steps=1)
+    clip = bench.make_clip(tmp_path / "input", config)
+
+    result = bench.run_scenario(bench.SCENARIOS[scenario], clip, config, tmp_path / "run")
+    assert result["frames"] == 20 and result["fps"] > 0
+    assert result["peak_rss_mb"] >= result["rss_before_mb"] > 0
+    assert "inpaint" in result["stages"] or "stream" in result["stages"]
+
+    (output,) = (tmp_path / "run" / "output").glob("bench_*.mp4")
+    info = probe(str(output))
+    assert info.frames == 20
+    assert (info.width, info.height) == (96, 56)
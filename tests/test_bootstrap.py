@@ -0,0 +1,126 @@
+"""
+Tests for the fingerprinted cold start.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from painter.bootstrap import Bootstrap, BootstrapError, format_timings
+
+NODES = ("Hanzo-A", "Hanzo-B")
+GIT = ["git", "-c", "user.email=test@example.com", "-c", "user.name=test"]
+
+
+def commit(repo: Path, files) -> None:
+    for name, text in files.items():
+        (repo / name).write_text(text)
+    subprocess.run([*GIT, "-C", str(repo), "add", "."], check=True, capture_output=True)
+    subprocess.run([*GIT, "-C", str(repo), "commit", "-qm", "update"], check=True, capture_output=True)
+
+
+@pytest.fixture
+def mirror(tmp_path: Path) -> Path:
+    """Local git remotes for Studio and two nodes."""
+    base = tmp_path / "mirror"
+    for name, files in [("studio", {"main.py": "", "requirements.txt": "torch\nsegment-anything\n"}),
+                        ("Hanzo-A", {"requirements.txt": "numpy\n"}),
+                        ("Hanzo-B", {"requirements.txt": "scipy\n"})]:
+        repo = base / f"{name}.git"
+        repo.mkdir(parents=True)
+        subprocess.run(["git", "init", "-q", "-b", "master", str(repo)], check=True)
+        commit(repo, files)
+    return base
+
+
+@pytest.fixture
+def pip(tmp_path: Path):
+    """A pip stand-in that logs each invocation's arguments and requirement files."""
+    log = tmp_path / "pip.jsonl"
+    script = tmp_path / "fake_pip.py"
+    script.write_text(
+        "import json, sys\n"
+        "args = sys.argv[1:]\n"
+        "files = [open(args[i + 1]).read() for i, a in enumerate(args) if a == '-r']\n"
+        f"open({str(log)!r}, 'a').write(json.dumps({{'args': args, 'files': files}}) + '\\n')\n"
+    )
+
+    def calls() -> List[dict]:
+        return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+    return [sys.executable, str(script)], calls
+
+
+def bootstrap(tmp_path: Path, mirror: Path, pip, **kwargs) -> Bootstrap:
+    return Bootstrap(tmp_path / "Studio", painter_dir=Path(__file__).resolve().parent.parent, nodes=NODES,
+                     git_base=f"file://{mirror}", pip=pip[0], log=lambda line: None, **kwargs)
+
+
+@pytest.mark.integration
+class TestBootstrap:
+    """Test cloning, skipping and reinstalling against local mirrors."""
+
+    def test_cold_then_warm(self, tmp_path: Path, mirror: Path, pip):
+        """Test that a cold start installs everything once and a warm start skips every step."""
+        cold = {t.name: t.status for t in bootstrap(tmp_path, mirror, pip).run()}
+        assert cold == {"studio": "ran", "studio-requirements": "ran", "node:Hanzo-A": "ran",
+                        "node:Hanzo-B": "ran", "node-requirements": "ran", "painter-link": "ran", "total": "ran"}
+        studio = tmp_path / "Studio"
+        assert (studio / "custom_nodes" / "Hanzo-A" / "requirements.txt").exists()
+        assert (studio / "custom_nodes" / "Hanzo-Painter" / "nodes.py").exists()
+        installs = pip[1]()
+        assert len(installs) == 2
+        assert "segment-anything" not in installs[0]["files"][0] and "pyyaml" in installs[0]["args"]
+        assert sorted(installs[1]["files"]) == ["numpy\n", "scipy\n"]
+
+        warm = bootstrap(tmp_path, mirror, pip).run()
+        assert all(t.status == "skipped" for t in warm if t.name != "total")
+        assert len(pip[1]()) == 2
+        saved = json.loads((studio / ".painter-bootstrap.json").read_text())
+        assert [t["name"] for t in saved["timings"]][-1] == "total"
+        assert "node-requirements" in format_timings(warm)
+
+    def test_update_reinstalls_only_changed_requirements(self, tmp_path: Path, mirror: Path, pip):
+        """Test that a pulled node with new requirements is installed alone, and only with --update."""
+        bootstrap(tmp_path, mirror, pip).run()
+        commit(mirror / "Hanzo-B.git", {"requirements.txt": "scipy>=1.10\n"})
+        commit(mirror / "Hanzo-A.git", {"README.md": "docs only\n"})
+
+        assert bootstrap(tmp_path, mirror, pip).run()[0].status == "skipped"
+        statuses = {t.name: t for t in bootstrap(tmp_path, mirror, pip, update=True).run()}
+        assert statuses["node:Hanzo-A"].status == statuses["node:Hanzo-B"].status == "ran"
+        assert statuses["node-requirements"].detail == "Hanzo-B"
+        assert pip[1]()[-1]["files"] == ["scipy>=1.10\n"]
+
+    def test_copied_node_pack_is_moved_aside(self, tmp_path: Path, mirror: Path, pip):
+        """Test that a real Hanzo-Painter folder is replaced by the link, and an occupied fallback fails clearly."""
+        custom_nodes = tmp_path / "Studio" / "custom_nodes"
+        (custom_nodes / "Hanzo-Painter").mkdir(parents=True)
+        (custom_nodes / "Hanzo-Painter" / "nodes.py").write_text("# old copy\n")
+        statuses = {t.name: t for t in bootstrap(tmp_path, mirror, pip).run()}
+        assert statuses["painter-link"].detail == "moved old copy to Hanzo-Painter.disabled"
+        assert (custom_nodes / "Hanzo-Painter").is_symlink()
+        assert (custom_nodes / "Hanzo-Painter.disabled" / "nodes.py").read_text() == "# old copy\n"
+
+        (custom_nodes / "Hanzo-Painter").unlink()
+        (custom_nodes / "Hanzo-Painter").write_text("")
+        with pytest.raises(BootstrapError, match="Hanzo-Painter.disabled already exists"):
+            bootstrap(tmp_path, mirror, pip).run()
+
+    def test_wheelhouse_and_failures(self, tmp_path: Path, mirror: Path, pip):
+        """Test that pip is pointed at an existing wheelhouse and a failed install is retried next time."""
+        wheelhouse = tmp_path / "wheelhouse"
+        wheelhouse.mkdir()
+        failing = bootstrap(tmp_path, mirror, ([sys.executable, "-c", "raise SystemExit(3)"], None),
+                            wheelhouse=wheelhouse, offline=True)
+        statuses = {t.name: t.status for t in failing.run()}
+        assert statuses["studio-requirements"] == statuses["node-requirements"] == "failed"
+
+        bootstrap(tmp_path, mirror, pip, wheelhouse=wheelhouse, offline=True).run()
+        installs = pip[1]()
+        assert len(installs) == 2
+        assert all(call["args"][1:5] == ["--quiet", "--find-links", str(wheelhouse), "--no-index"]
+                   for call in installs)
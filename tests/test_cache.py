@@ -0,0 +1,88 @@
+"""
+Tests for the content-addressed array cache.
+"""
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter.cache import ArrayCache, cache_key, file_digest
+
+
+def block(value, kib=1):
+    """A uint8 array of ``kib`` KiB filled with ``value``."""
+    return np.full(kib * 1024, value, dtype=np.uint8)
+
+
+@pytest.mark.unit
+class TestArrayCache:
+    """Test the memory tier, spill tier and counters."""
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted and cached arrays are read-only."""
+        cache = ArrayCache(memory_bytes=1 << 20)
+        assert cache.get("a") is None
+        cached = cache.put("a", block(1))
+        assert cache.get("a") is cached
+        assert not cached.flags.writeable
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+        assert stats["hit_rate"] == 0.5
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry leaves memory first."""
+        cache = ArrayCache(memory_bytes=2 * 1024)
+        cache.put("a", block(1))
+        cache.put("b", block(2))
+        cache.get("a")
+        cache.put("c", block(3))
+        assert "b" not in cache
+        assert "a" in cache and "c" in cache
+        assert cache.stats()["evictions"] == 1
+
+    def test_spill_is_memory_mapped(self, tmp_path: Path):
+        """Test that evicted entries are served from mmap'd spill files."""
+        cache = ArrayCache(memory_bytes=1024, spill_dir=tmp_path, disk_bytes=1 << 20)
+        cache.put("a", block(1))
+        cache.put("b", block(2))
+        spilled = cache.get("a")
+        assert isinstance(spilled, np.memmap)
+        assert (spilled == 1).all()
+        stats = cache.stats()
+        assert stats["spills"] == 1 and stats["disk_hits"] == 1
+
+    def test_spill_survives_restart(self, tmp_path: Path):
+        """Test that a new cache over the same directory sees old entries."""
+        first = ArrayCache(memory_bytes=0, spill_dir=tmp_path, disk_bytes=1 << 20)
+        first.put("a", block(7))
+        second = ArrayCache(memory_bytes=0, spill_dir=tmp_path, disk_bytes=1 << 20)
+        assert (second.get("a") == 7).all()
+
+    def test_disk_budget(self, tmp_path: Path):
+        """Test that the spill directory is trimmed oldest first."""
+        cache = ArrayCache(memory_bytes=0, spill_dir=tmp_path, disk_bytes=3 * 1024)
+        for i in range(5):
+            cache.put(str(i), block(i))
+        assert cache.stats()["disk_bytes"] <= 3 * 1024
+        assert "0" not in cache and "4" in cache
+        assert len(list(tmp_path.glob("*.npy"))) == cache.stats()["disk_entries"]
+
+    def test_get_or_compute(self):
+        """Test that compute only runs on a miss."""
+        cache = ArrayCache(memory_bytes=1 << 20)
+        calls = []
+        for _ in range(3):
+            cache.get_or_compute("k", lambda: calls.append(1) or block(0))
+        assert len(calls) == 1
+
+
+@pytest.mark.unit
+def test_keys(tmp_path: Path):
+    """Test that keys depend on content and settings, not file names."""
+    a, b = tmp_path / "a.png", tmp_path / "b.png"
+    a.write_bytes(b"mask")
+    b.write_bytes(b"mask")
+    assert file_digest(a) == file_digest(b)
+    assert cache_key(file_digest(a), 64, 64) != cache_key(file_digest(a), 64, 32)
+    assert cache_key("x", {"b": 1, "a": 2}) == cache_key("x", {"a": 2, "b": 1})
@@ -0,0 +1,128 @@
+"""
+Tests for mask bounding-box crop mode.
+"""
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import workflow as wf
+from painter.crop import Box, crop_box, feather_weights, paste, union_bbox
+
+
+def strip_mask(count=5, height=90, width=160, rows=(70, 80), cols=(100, 140)):
+    """Mask batch with a bottom-right watermark strip."""
+    mask = np.zeros((count, height, width, 3), dtype=np.float32)
+    mask[:, rows[0]:rows[1], cols[0]:cols[1]] = 1.0
+    return mask
+
+
+@pytest.mark.unit
+class TestCropBox:
+    """Test bounding box computation."""
+
+    def test_union_over_frames(self):
+        """Test that the box covers the mask on every frame."""
+        mask = np.zeros((3, 20, 30), dtype=np.float32)
+        mask[0, 2, 5] = 1.0
+        mask[2, 15, 25] = 1.0
+        assert union_bbox(mask) == (5, 2, 26, 16)
+        assert union_bbox(np.zeros((2, 4, 4))) is None
+
+    def test_broadcast_batch(self):
+        """Test that a zero-stride batch gives the same box as a copied one."""
+        frame = strip_mask(count=1)[0]
+        broadcast = np.broadcast_to(frame, (500,) + frame.shape)
+        assert union_bbox(broadcast) == union_bbox(strip_mask()) == (100, 70, 140, 80)
+
+    def test_margin_and_multiple(self):
+        """Test that the box gains context, rounds to the multiple and stays in frame."""
+        box = crop_box((100, 70, 140, 80), 160, 90, margin=16, multiple=8)
+        assert box.width % 8 == 0 and box.height % 8 == 0
+        assert box.x <= 84 and box.x + box.width >= 156
+        assert box.y <= 54 and box.y + box.height == 90
+
+    def test_box_never_exceeds_frame(self):
+        """Test that huge margins clamp to the largest aligned box."""
+        box = crop_box((10, 10, 20, 20), 100, 60, margin=500, multiple=8)
+        assert (box.width, box.height) == (96, 56)
+        assert box.x + box.width <= 100 and box.y + box.height <= 60
+
+    def test_empty_mask_uses_whole_frame(self):
+        """Test that no mask falls back to the full frame."""
+        assert crop_box(None, 160, 90, margin=64, multiple=8) == Box(0, 1, 160, 88)
+
+
+@pytest.mark.unit
+class TestPaste:
+    """Test compositing the crop back."""
+
+    def test_untouched_outside_box(self):
+        """Test that pixels outside the crop are the source pixels."""
+        frames = np.random.default_rng(0).integers(0, 255, (4, 40, 60, 3), dtype=np.uint8)
+        box = Box(16, 8, 24, 16)
+        out = paste(frames, np.zeros((4, 16, 24, 3), dtype=np.uint8), box, feather=4)
+        outside = np.ones((40, 60), dtype=bool)
+        outside[box.slices] = False
+        assert (out[:, outside] == frames[:, outside]).all()
+        assert (out[:, 12:20, 20:36] == 0).all()
+
+    def test_feather_skips_frame_edges(self):
+        """Test that sides on the frame border are pasted without blending."""
+        weights = feather_weights(Box(0, 10, 20, 10), 20, 20, feather=3)[:, :, 0]
+        assert (weights[:, 0] == weights[:, 10]).all()
+        assert weights[-1, 5] == 1.0
+        assert weights[0, 5] == pytest.approx(0.25)
+
+    def test_size_mismatch(self):
+        """Test that a patch of the wrong size is rejected."""
+        with pytest.raises(ValueError):
+            paste(np.zeros((1, 10, 10, 3)), np.zeros((1, 4, 4, 3)), Box(0, 0, 8, 8))
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_crop_pass(workflow_json: Dict[str, Any]):
+    """Test that the crop pass routes the sampler through crop and paste nodes."""
+    prompt = wf.optimize(wf.compile_workflow(workflow_json), ["crop"])
+    by_type = {node["class_type"]: node_id for node_id, node in prompt.items()}
+    crop_id, paste_id = by_type["PainterMaskCrop"], by_type["PainterMaskPaste"]
+
+    assert prompt[crop_id]["inputs"]["images"] == [wf.LOAD_VIDEO, 0]
+    assert prompt[crop_id]["inputs"]["mask"] == [wf.REPEAT_MASK, 0]
+    assert prompt[wf.SAMPLER]["inputs"]["images"] == [crop_id, 0]
+    assert prompt[wf.SAMPLER]["inputs"]["video_mask"] == [crop_id, 1]
+    assert prompt[paste_id]["inputs"]["inpainted"] == [wf.SAMPLER, 0]
+    assert prompt[wf.VIDEO_COMBINE]["inputs"]["images"] == [paste_id, 0]
+    assert prompt[wf.RESIZE_VERTICAL]["inputs"]["width"] == [wf.VIDEO_INFO, 8]
+    assert wf.SCALE not in prompt and wf.SCALE_LENGTH not in prompt
+
+    # Every remaining link points at a node that still exists
+    for node in prompt.values():
+        for value in node["inputs"].values():
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str):
+                assert value[0] in prompt
+
+
+@pytest.mark.unit
+def test_crop_and_paste_nodes():
+    """Test that the nodes round-trip a clip and only change the crop."""
+    torch = pytest.importorskip("torch")
+    from painter.studio.nodes import PainterMaskCrop, PainterMaskPaste
+
+    images = torch.rand((3, 90, 160, 3))
+    mask = torch.from_numpy(strip_mask(count=1)).expand(3, -1, -1, -1)
+    cropped, cropped_mask, box = PainterMaskCrop().crop(images, mask, margin=8, multiple=8)
+    assert cropped.shape[1:3] == (box.height, box.width)
+    assert cropped_mask.shape == cropped.shape
+    assert box.width % 8 == 0 and box.height % 8 == 0
+
+    (restored,) = PainterMaskPaste().paste(images, cropped, box, feather=4)
+    assert torch.allclose(restored, images)
+
+    (pasted,) = PainterMaskPaste().paste(images, torch.zeros_like(cropped), box, feather=0)
+    rows, cols = box.slices
+    assert (pasted[:, rows, cols] == 0).all()
+    # The source frames are not modified in place
+    assert not (images[:, rows, cols] == 0).all()
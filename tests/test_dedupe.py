@@ -0,0 +1,141 @@
+"""
+Tests for skipping inference on static masked regions.
+"""
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import workflow as wf
+from painter.dedupe import compare_region, expand, static_runs
+
+
+def shots(lengths=(5, 3, 4), height=36, width=64, seed=0):
+    """uint8 clip of held stills, one per entry of ``lengths``."""
+    rng = np.random.default_rng(seed)
+    stills = rng.integers(0, 255, size=(len(lengths), height, width, 3), dtype=np.uint8)
+    return np.concatenate([np.repeat(still[None], n, axis=0) for still, n in zip(stills, lengths)])
+
+
+def band(count=1, height=36, width=64, rows=(20, 26), cols=(10, 40)):
+    mask = np.zeros((count, height, width, 3), dtype=np.float32)
+    mask[:, rows[0]:rows[1], cols[0]:cols[1]] = 1.0
+    return mask
+
+
+@pytest.mark.unit
+class TestStaticRuns:
+    """Test finding runs of frames whose masked region is unchanged."""
+
+    def test_region_is_mask_plus_ring(self):
+        """Test that the region is the mask's union over frames grown by the context."""
+        region = compare_region(np.broadcast_to(band(), (4, 36, 64, 3)), context=2)
+        assert region[18:28, 10:40].all() and region[20:26, 8:42].all()
+        assert not region[17, 10] and not region[20, 7] and not region[:10].any()
+
+    def test_held_shots_become_runs(self):
+        """Test that each still shot is one run and the index maps frames to it."""
+        clip = shots()
+        runs = static_runs(clip, compare_region(band(), 4))
+        assert runs.starts.tolist() == [0, 5, 8]
+        assert runs.index.tolist() == [0] * 5 + [1] * 3 + [2] * 4
+
+    def test_change_outside_region_is_ignored_inside_is_not(self):
+        """Test that motion away from the logo keeps the run and motion in its ring breaks it."""
+        clip = shots(lengths=(10,))
+        region = compare_region(band(), 4)
+        clip[3:, :8] = 255
+        assert static_runs(clip, region).starts.tolist() == [0]
+        clip[6:, 17, 10:40] = 255 - clip[6:, 17, 10:40]
+        assert static_runs(clip, region).starts.tolist() == [0, 6]
+
+    def test_tolerance_and_drift(self):
+        """Test that noise within tolerance is absorbed but slow drift cannot chain a run."""
+        clip = np.full((12, 36, 64, 3), 100, dtype=np.uint8)
+        clip += np.arange(12, dtype=np.uint8)[:, None, None, None]
+        region = compare_region(band(), 4)
+        assert static_runs(clip, region, tolerance=0.0).starts.tolist() == list(range(12))
+        assert static_runs(clip, region, tolerance=3.5).starts.tolist() == [0, 4, 8]
+        as_float = clip.astype(np.float32) / 255
+        assert static_runs(as_float, region, tolerance=3.5).starts.tolist() == [0, 4, 8]
+
+    def test_changing_mask_starts_a_run(self):
+        """Test that per-frame masks that differ inside the region split runs."""
+        clip = shots(lengths=(6,))
+        masks = band(6).max(axis=-1) > 0.5
+        masks[4:, 20, 10] = False
+        runs = static_runs(clip, compare_region(band(), 4), masks=masks)
+        assert runs.starts.tolist() == [0, 4]
+
+    def test_expand_fills_region_only(self):
+        """Test that every frame gets its run's fill inside the region and keeps its own pixels outside."""
+        clip = shots()
+        clip[:, :4] = np.arange(len(clip), dtype=np.uint8)[:, None, None, None]
+        runs = static_runs(clip, compare_region(band(), 4))
+        inpainted = np.stack([np.full(clip.shape[1:], 10 * (k + 1), dtype=np.uint8) for k in range(3)])
+        out = expand(clip, inpainted, runs)
+        assert out.shape == clip.shape
+        assert (out[:5][:, runs.region] == 10).all() and (out[8:][:, runs.region] == 30).all()
+        assert (out[:, ~runs.region] == clip[:, ~runs.region]).all()
+        with pytest.raises(ValueError):
+            expand(clip, inpainted[:2], runs)
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+class TestDedupePass:
+    """Test wiring the dedupe nodes around the sampler."""
+
+    def assert_wired(self, prompt: Dict[str, Any], source, name="images"):
+        by_type = {node["class_type"]: node_id for node_id, node in prompt.items()}
+        dedupe_id, expand_id = by_type["PainterDedupeFrames"], by_type["PainterExpandFrames"]
+        assert prompt[dedupe_id]["inputs"]["images"] == source
+        assert prompt[wf.SAMPLER]["inputs"][name] == [dedupe_id, 0]
+        assert prompt[wf.SAMPLER]["inputs"]["video_mask"] == [dedupe_id, 1]
+        assert prompt[expand_id]["inputs"] == {"images": source, "inpainted": [wf.SAMPLER, 0], "runs": [dedupe_id, 2]}
+        consumers = [node_id for node_id, node in prompt.items() if [wf.SAMPLER, 0] in node["inputs"].values()]
+        assert consumers == [expand_id]
+        return dedupe_id
+
+    def test_stock_crop_and_compact(self, workflow_json: Dict[str, Any]):
+        """Test the pass after no pass, crop and compact, and that it is idempotent."""
+        prompt = wf.compile_workflow(workflow_json)
+        stock = wf.optimize(prompt, ["dedupe", "dedupe"])
+        dedupe_id = self.assert_wired(stock, [wf.SCALE, 0])
+        # The sampler's own dilation is inside the compared ring
+        assert stock[dedupe_id]["inputs"]["context"] == 16 + prompt[wf.SAMPLER]["inputs"]["mask_dilation_iter"]
+
+        cropped = wf.optimize(prompt, ["crop", "dedupe"])
+        crop_id = next(k for k, v in cropped.items() if v["class_type"] == "PainterMaskCrop")
+        self.assert_wired(cropped, [crop_id, 0])
+        self.assert_wired(wf.optimize(prompt, ["compact", "dedupe"]), [wf.SCALE, 0], name="frames")
+
+    def test_order_is_checked(self, workflow_json: Dict[str, Any]):
+        """Test that passes that need the stock sampler input refuse a deduped prompt, and stream is refused."""
+        prompt = wf.compile_workflow(workflow_json)
+        for later in ("crop", "compact"):
+            with pytest.raises(wf.WorkflowError):
+                wf.optimize(prompt, ["dedupe", later])
+        with pytest.raises(wf.WorkflowError):
+            wf.optimize(prompt, ["stream", "dedupe"])
+
+
+@pytest.mark.unit
+def test_dedupe_and_expand_nodes():
+    """Test that the nodes hand the sampler one frame per run and restore the clip, for IMAGE and uint8 frames."""
+    torch = pytest.importorskip("torch")
+    from painter.studio.nodes import PainterDedupeFrames, PainterExpandFrames
+
+    clip = shots()
+    mask = torch.from_numpy(band()).expand(len(clip), -1, -1, -1)
+    for images in (torch.from_numpy(clip.astype(np.float32) / 255), clip):
+        kept, kept_mask, runs = PainterDedupeFrames().dedupe(images, mask, tolerance=1.0, context=4)
+        assert len(kept) == len(kept_mask) == 3 and kept_mask.stride(0) == 0
+        assert type(kept) is type(images)
+        (restored,) = PainterExpandFrames().expand(images, kept, runs)
+        assert len(restored) == len(clip)
+        if torch.is_tensor(images):
+            assert torch.allclose(restored, images)
+        else:
+            assert (restored == images).all()
@@ -0,0 +1,284 @@
+"""
+Tests for the multi-worker dispatcher.
+"""
+import asyncio
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from painter import workflow as wf
+from painter.dispatcher import _prompt_job, plan_workers
+
+
+def run_cluster(servers, scenario, **kwargs):
+    """Run ``scenario(dispatcher_url, dispatcher)`` with a Dispatcher in front of stand-in ``servers``."""
+    from aiohttp import web
+
+    from painter.dispatcher import Dispatcher, Worker
+
+    async def start(app):
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    async def main():
+        runners = []
+        try:
+            workers = []
+            for index, server in enumerate(servers):
+                runner, url = await start(server.app())
+                runners.append(runner)
+                workers.append(Worker(f"worker-{index}", url))
+            dispatcher = Dispatcher(workers, reconnect_delay=0.05, **kwargs)
+            runner, url = await start(dispatcher.app())
+            runners.append(runner)
+            while not all(w.healthy for w in workers):
+                await asyncio.sleep(0.01)
+            return await scenario(url, dispatcher)
+        finally:
+            for runner in reversed(runners):
+                await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.unit
+class TestPlanWorkers:
+    """Test worker placement."""
+
+    def test_cpu_workers_get_disjoint_cpu_sets(self, monkeypatch):
+        """Test that CPU workers split the available CPUs and size their thread pools to match."""
+        monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(8)), raising=False)
+        workers = plan_workers(2, base_port=9000, standin=True)
+        assert [w.url for w in workers] == ["http://127.0.0.1:9000", "http://127.0.0.1:9001"]
+        assert workers[0].cpus == [0, 1, 2, 3] and workers[1].cpus == [4, 5, 6, 7]
+        assert workers[0].env["OMP_NUM_THREADS"] == "4"
+        assert workers[1].command[-3:] == ["standin", "--port", "9001"]
+
+    def test_gpu_workers_see_one_device(self, tmp_path: Path):
+        """Test that devices are assigned round-robin through CUDA_VISIBLE_DEVICES."""
+        workers = plan_workers(3, devices=["0", "1"], studio_dir=tmp_path)
+        assert [w.env["CUDA_VISIBLE_DEVICES"] for w in workers] == ["0", "1", "0"]
+        assert all(w.cpus is None and "--cpu" not in w.command for w in workers)
+        assert workers[0].cwd == str(tmp_path) and workers[0].command[1] == "main.py"
+
+    def test_prompt_job_reads_back_apply_job(self, workflow_json: Dict[str, Any]):
+        """Test that the chunk planner recovers the video, range and prefix set by apply_job."""
+        prompt = wf.apply_job(wf.compile_workflow(workflow_json), {
+            "video": "long.mp4", "skip_first_frames": 5, "frame_load_cap": 90, "output_prefix": "long",
+        })
+        job = _prompt_job(prompt, "p", {"window": 30, "frames": 200})
+        assert job == {"id": "p", "video": "long.mp4", "skip_first_frames": 5, "frame_load_cap": 90,
+                       "output_prefix": "long", "frames": 200}
+
+
+@pytest.mark.integration
+class TestDispatcher:
+    """Test routing, relaying and aggregation against stand-in workers."""
+
+    def test_batch_spreads_across_workers(self):
+        """Test that a batch through the dispatcher runs on every worker and completes."""
+        from painter.batch import run_batch
+        from painter.standin import StandinServer
+
+        servers = [StandinServer(latency=0.05, steps=1) for _ in range(2)]
+        prompt = {wf.VIDEO_COMBINE: {"class_type": "VHS_VideoCombine", "inputs": {}}}
+        jobs = [{"id": str(i)} for i in range(8)]
+
+        async def scenario(url, dispatcher):
+            report = await run_batch(url, prompt, jobs, max_inflight=4)
+            return report, [w.inflight for w in dispatcher.workers]
+
+        report, inflight = run_cluster(servers, scenario)
+        assert [r.status for r in report.results] == ["success"] * 8
+        assert all(server.executed >= 2 for server in servers)
+        assert sum(server.executed for server in servers) == 8
+        assert inflight == [0, 0]
+
+    def test_queue_stats_and_history_are_merged(self):
+        """Test /queue, /system_stats, /history and /metrics across workers."""
+        from painter.standin import StandinServer
+
+        servers = [StandinServer(latency=0.3, steps=1) for _ in range(2)]
+        prompt = {wf.VIDEO_COMBINE: {"class_type": "VHS_VideoCombine", "inputs": {}}}
+
+        async def scenario(url, dispatcher):
+            async with aiohttp.ClientSession() as session:
+                ids = []
+                for _ in range(4):
+                    async with session.post(f"{url}/prompt", json={"prompt": prompt}) as resp:
+                        ids.append((await resp.json())["prompt_id"])
+                async with session.get(f"{url}/queue") as resp:
+                    queue = await resp.json()
+                async with session.get(f"{url}/system_stats") as resp:
+                    stats = await resp.json()
+                async with session.get(f"{url}/metrics") as resp:
+                    metrics = await resp.text()
+                while any(w.inflight for w in dispatcher.workers):
+                    await asyncio.sleep(0.05)
+                async with session.get(f"{url}/history") as resp:
+                    history = await resp.json()
+                async with session.get(f"{url}/history/{ids[-1]}") as resp:
+                    entry = await resp.json()
+            return ids, queue, stats, metrics, history, entry
+
+        ids, queue, stats, metrics, history, entry = run_cluster(servers, scenario)
+        assert len(queue["queue_running"]) + len(queue["queue_pending"]) == 4
+        assert len(queue["queue_running"]) == 2
+        assert [w["name"] for w in stats["workers"]] == ["worker-0", "worker-1"]
+        assert 'painter_dispatch_submitted_total{worker="worker-1"} 2' in metrics
+        assert 'painter_queue_running{worker="worker-0"} 1' in metrics
+        assert 'painter_queue_running{worker="worker-1"} 1' in metrics
+        assert metrics.count("# TYPE painter_queue_running gauge") == 1
+        assert set(ids) <= set(history)
+        assert entry[ids[-1]]["status"]["status_str"] == "success"
+
+    def test_waits_for_worker_readiness(self):
+        """Test that workers are polled on /ready, with /system_stats for a Studio without one."""
+        from aiohttp import web
+
+        from painter.dispatcher import Worker, wait_until_ready
+        from painter.standin import StandinServer
+
+        polls = {"warming": 0}
+
+        async def warming(request):
+            polls["warming"] += 1
+            if polls["warming"] < 3:
+                return web.json_response({"ready": False, "state": "warming"}, status=503)
+            return web.json_response({"ready": True, "state": "ready"})
+
+        async def failed(request):
+            return web.json_response({"ready": False, "state": "failed", "error": "no checkpoint"}, status=503)
+
+        async def system_stats(request):
+            return web.json_response({"system": {}, "devices": []})
+
+        def app(ready=None) -> web.Application:
+            app = web.Application()
+            app.router.add_get("/system_stats", system_stats)
+            if ready is not None:
+                app.router.add_get("/ready", ready)
+            return app
+
+        async def scenario(url, dispatcher):
+            runners = []
+            try:
+                urls = []
+                for ready in (warming, None, failed):
+                    runner = web.AppRunner(app(ready))
+                    await runner.setup()
+                    site = web.TCPSite(runner, "127.0.0.1", 0)
+                    await site.start()
+                    runners.append(runner)
+                    urls.append(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+                await wait_until_ready([Worker("warming", urls[0]), Worker("stock", urls[1])], timeout=10)
+                with pytest.raises(RuntimeError, match="no checkpoint"):
+                    await wait_until_ready([Worker("failed", urls[2])], timeout=10)
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(f"{url}/ready") as resp:
+                        return resp.status, await resp.json()
+            finally:
+                for runner in runners:
+                    await runner.cleanup()
+
+        status, ready = run_cluster([StandinServer()], scenario)
+        assert polls["warming"] == 3
+        assert status == 200 and ready == {"ready": True, "workers": {"worker-0": True}}
+
+    @pytest.mark.slow
+    def test_long_prompt_is_split_across_workers(self, workflow_json, synthetic_video, tmp_path: Path):
+        """Test that a painter_chunk prompt runs its windows on both workers and is stitched once."""
+        from painter.chunking import plan_windows
+        from painter.ffmpeg import probe
+        from painter.standin import StandinServer
+
+        source = synthetic_video("long.mp4", frames=60)
+        input_dir, output_dir = source.parent, tmp_path / "output"
+        servers = [StandinServer(latency=0.0, steps=1, input_dir=input_dir, output_dir=tmp_path / f"worker-{i}")
+                   for i in range(2)]
+        prompt = wf.apply_job(wf.compile_workflow(workflow_json), {"video": "long.mp4", "output_prefix": "long"})
+        body = {"prompt": prompt, "client_id": "me",
+                "extra_data": {"painter_chunk": {"window": 24, "overlap": 6}}}
+
+        async def scenario(url, dispatcher):
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(f"{url}/ws?clientId=me") as ws:
+                    async with session.post(f"{url}/prompt", json=body) as resp:
+                        prompt_id = (await resp.json())["prompt_id"]
+                    events = []
+                    async for msg in ws:
+                        event = msg.json()
+                        events.append(event["type"])
+                        if event["type"] in ("execution_success", "execution_error"):
+                            break
+                async with session.get(f"{url}/history/{prompt_id}") as resp:
+                    history = (await resp.json())[prompt_id]
+            return events, history
+
+        events, history = run_cluster(servers, scenario, input_dir=input_dir, output_dir=output_dir)
+        assert events[-1] == "execution_success", history["status"]
+        assert "executed" in events
+        windows = history["outputs"]["windows"]
+        assert len(windows) == len(plan_windows(60, 24, 6))
+        assert {w["worker"] for w in windows} == {"worker-0", "worker-1"}
+        assert sum(server.executed for server in servers) == len(windows)
+
+        stitched = Path(history["outputs"][wf.VIDEO_COMBINE]["gifs"][0]["fullpath"])
+        assert stitched.parent == output_dir
+        assert probe(str(stitched)).frames == 60
+
+    def test_failed_window_stops_the_others(self, workflow_json, synthetic_video):
+        """Test that when one window fails, the windows still running or queued are cancelled on their workers."""
+        import time
+
+        from painter.standin import StandinServer
+
+        source = synthetic_video("long.mp4", frames=60)
+        servers = [StandinServer(latency=0.05, steps=1, should_fail=lambda p: True),
+                   StandinServer(latency=10.0, steps=100)]
+        prompt = wf.apply_job(wf.compile_workflow(workflow_json), {"video": "long.mp4", "output_prefix": "long"})
+        body = {"prompt": prompt, "client_id": "me",
+                "extra_data": {"painter_chunk": {"window": 24, "overlap": 6}}}
+
+        async def scenario(url, dispatcher):
+            started = time.monotonic()
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(f"{url}/ws?clientId=me") as ws:
+                    async with session.post(f"{url}/prompt", json=body) as resp:
+                        assert resp.status == 200
+                    async for msg in ws:
+                        if msg.json()["type"] in ("execution_success", "execution_error"):
+                            kind = msg.json()["type"]
+                            break
+            while servers[1].running is not None or servers[1].pending:
+                await asyncio.sleep(0.02)
+            return kind, time.monotonic() - started, [w.inflight for w in dispatcher.workers]
+
+        kind, elapsed, inflight = run_cluster(servers, scenario, input_dir=source.parent)
+        assert kind == "execution_error"
+        assert elapsed < 5.0
+        assert servers[1].history and all(entry["status"]["status_str"] == "error"
+                                          for entry in servers[1].history.values())
+        assert inflight == [0, 0]
+
+    def test_dispatcher_passes_ranges_through(self, tmp_path: Path):
+        """Test that the dispatcher's /view answers a range request from a worker's output."""
+        from painter.standin import StandinServer
+
+        (tmp_path / "output").mkdir()
+        (tmp_path / "output" / "out.mp4").write_bytes(bytes(range(256)) * 10)
+
+        async def scenario(url, dispatcher):
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{url}/view", params={"filename": "out.mp4"},
+                                       headers={"Range": "bytes=256-511"}) as resp:
+                    return resp.status, resp.headers.get("Content-Range"), await resp.read()
+
+        status, content_range, body = run_cluster([StandinServer(output_dir=tmp_path / "output")], scenario)
+        assert status == 206 and content_range == "bytes 256-511/2560" and body == bytes(range(256))
@@ -0,0 +1,86 @@
+"""
+Tests for encoding through an ffmpeg pipe with the source audio copied.
+"""
+import re
+import subprocess
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import workflow as wf
+from painter.ffmpeg import ffmpeg_exe
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+class TestEncodePass:
+    """Test swapping VHS_VideoCombine for PainterVideoCombine."""
+
+    def test_combine_is_replaced(self, workflow_json: Dict[str, Any]):
+        """Test that 209 keeps its settings, takes loaded_fps and mirrors the source, idempotently."""
+        prompt = wf.compile_workflow(workflow_json)
+        patched = wf.optimize(prompt, ["encode", "encode"])
+        combine, stock = patched[wf.VIDEO_COMBINE], prompt[wf.VIDEO_COMBINE]["inputs"]
+        assert combine["class_type"] == "PainterVideoCombine"
+        inputs = combine["inputs"]
+        assert inputs["frame_rate"] == [wf.VIDEO_INFO, 5]
+        assert inputs["images"] == stock["images"] and "audio" not in inputs
+        for name in ("filename_prefix", "format", "crf"):
+            assert inputs[name] == stock[name]
+        assert inputs["video"] == prompt[wf.LOAD_VIDEO]["inputs"]["video"]
+
+        job = wf.apply_job(patched, {"video": "clip.mp4", "skip_first_frames": 12, "output_prefix": "out"})
+        assert job[wf.VIDEO_COMBINE]["inputs"]["video"] == job[wf.LOAD_VIDEO]["inputs"]["video"] == "clip.mp4"
+        assert job[wf.VIDEO_COMBINE]["inputs"]["skip_first_frames"] == 12
+        assert job[wf.VIDEO_COMBINE]["inputs"]["filename_prefix"] == "out"
+
+    def test_other_encoders_are_refused(self, workflow_json: Dict[str, Any]):
+        """Test that compact and stream, which already encode through a pipe, refuse the pass."""
+        prompt = wf.compile_workflow(workflow_json)
+        for earlier in ("compact", "stream"):
+            with pytest.raises(wf.WorkflowError):
+                wf.optimize(prompt, [earlier, "encode"])
+        assert wf.optimize(prompt, ["crop", "encode"])[wf.VIDEO_COMBINE]["class_type"] == "PainterVideoCombine"
+
+
+def _streams(path: Path) -> str:
+    header = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", str(path)], capture_output=True, text=True).stderr
+    return "\n".join(line for line in header.splitlines() if re.search(r"Stream #", line))
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+def test_node_streams_frames_and_copies_audio(tmp_path: Path):
+    """Test that IMAGE batches are encoded at the given rate and the AAC track is copied, offset by the skip."""
+    torch = pytest.importorskip("torch")
+    from painter.ffmpeg import FrameReader, probe
+    from painter.studio.nodes import PainterVideoCombine, outside_studio
+
+    source = tmp_path / "source.mp4"
+    subprocess.run([ffmpeg_exe(), "-v", "error", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=24:duration=2",
+                    "-f", "lavfi", "-i", "sine=frequency=440:duration=2", "-c:v", "libx264", "-c:a", "aac",
+                    "-b:a", "64k", "-shortest", str(source)], check=True)
+    images = torch.from_numpy(FrameReader(str(source), start=12).read().astype(np.float32) / 255)
+
+    with outside_studio({}, tmp_path / "out"):
+        result = PainterVideoCombine().combine(
+            images, 24.0, "pipe", "video/h264-mp4", 18, "ultrafast", 1, video=str(source), skip_first_frames=12,
+        )
+    (output,) = result["result"]
+    info = probe(output)
+    assert info.frames == len(images) == 36 and info.has_audio
+    assert "aac" in _streams(Path(output)) and "64 kb/s" in _streams(Path(output))
+    assert result["ui"]["gifs"][0]["frames"] == 36
+
+    with outside_studio({}, tmp_path / "lossless"):
+        result = PainterVideoCombine().combine(
+            images, 24.0, "pipe", "video/ffv1-mkv", 18, "medium", 0, save_output=False,
+        )
+    (output,) = result["result"]
+    assert output.endswith(".mkv") and not probe(output).has_audio
+    assert result["ui"]["gifs"][0]["type"] == "temp"
+    rebuilt = FrameReader(output).read()
+    assert np.abs(rebuilt.astype(int) - np.rint(images.numpy() * 255).astype(int)).max() <= 1
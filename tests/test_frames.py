@@ -0,0 +1,169 @@
+"""
+Tests for the persistent decoded-frame cache.
+"""
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import frames
+from painter import workflow as wf
+from painter.cache import ArrayCache
+
+
+@pytest.fixture
+def cache(tmp_path: Path, monkeypatch) -> ArrayCache:
+    """A frame cache in a temporary directory, installed as the process cache."""
+    cache = ArrayCache(memory_bytes=0, spill_dir=tmp_path / "frames", disk_bytes=1 << 30, name="frames")
+    monkeypatch.setattr(frames, "_frame_cache", cache)
+    return cache
+
+
+@pytest.mark.unit
+class TestFrameCache:
+    """Test frame storage and keys."""
+
+    def test_uint8_round_trip(self):
+        """Test that VHS-style float frames convert back to the exact bytes."""
+        original = np.random.default_rng(0).integers(0, 256, (40, 8, 8, 3), dtype=np.uint8)
+        assert (frames.to_uint8(original.astype(np.float32) / 255.0) == original).all()
+        assert (frames.to_float(original) == original.astype(np.float32) / 255.0).all()
+
+    def test_hit_is_memory_mapped(self, cache: ArrayCache):
+        """Test that stored frames come back as a read-only mmap with metadata."""
+        clip = np.zeros((5, 4, 4, 3), dtype=np.uint8)
+        frames.store(cache, "k", clip, {"frame_count": 5}, audio=np.zeros((1, 2, 10), dtype=np.float32))
+        hit = frames.load(cache, "k")
+        assert hit is not None
+        cached, meta, audio = hit
+        assert isinstance(cached, np.memmap) and cached.shape == clip.shape
+        assert meta == {"frame_count": 5, "has_audio": True}
+        assert audio.shape == (1, 2, 10)
+
+    def test_partial_entry_is_a_miss(self, cache: ArrayCache):
+        """Test that metadata without its frames does not count as a hit."""
+        frames.store(cache, "k", np.zeros((2, 2, 2, 3), dtype=np.uint8), {"frame_count": 2})
+        cache._forget_disk("k")
+        assert frames.load(cache, "k") is None
+
+    def test_key_covers_load_parameters(self, tmp_path: Path):
+        """Test that any load parameter change gives a different key."""
+        video = tmp_path / "clip.mp4"
+        video.write_bytes(b"video")
+        base = {"frame_load_cap": 300, "skip_first_frames": 0, "select_every_nth": 1, "seed": 1}
+        key = frames.frame_key(str(video), base)
+        assert frames.frame_key(str(video), dict(base, seed=2)) == key
+        for name in ("frame_load_cap", "skip_first_frames", "select_every_nth", "custom_width"):
+            assert frames.frame_key(str(video), dict(base, **{name: 7})) != key
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_frame_cache_pass(workflow_json: Dict[str, Any]):
+    """Test that the pass only swaps the loader class."""
+    prompt = wf.compile_workflow(workflow_json)
+    optimized = wf.optimize(prompt, ["frame-cache"])
+    assert optimized[wf.LOAD_VIDEO]["class_type"] == "PainterLoadVideoCached"
+    assert optimized[wf.LOAD_VIDEO]["inputs"] == prompt[wf.LOAD_VIDEO]["inputs"]
+
+
+@pytest.mark.unit
+def test_cached_loader_node(tmp_path: Path, cache: ArrayCache, monkeypatch):
+    """Test that the loader decodes once and then serves identical frames from the cache."""
+    torch = pytest.importorskip("torch")
+    from painter.studio import nodes
+
+    decoded = torch.from_numpy(np.random.default_rng(1).integers(0, 256, (6, 8, 10, 3)).astype(np.float32) / 255)
+    info = {"source_fps": 24.0, "loaded_frame_count": 6}
+    calls = []
+
+    class FakeLoadVideo:
+        FUNCTION = "load_video"
+
+        def load_video(self, **kwargs):
+            calls.append(kwargs)
+            audio = {"waveform": torch.zeros((1, 2, 48)), "sample_rate": 48000}
+            return (decoded, 6, audio, info)
+
+    monkeypatch.setattr(nodes, "_stock_node", lambda class_type: FakeLoadVideo)
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"not really a video")
+    inputs = {"video": str(video), "frame_load_cap": 6, "skip_first_frames": 0, "select_every_nth": 1}
+
+    first = nodes.PainterLoadVideoCached().load_video(**inputs)
+    second = nodes.PainterLoadVideoCached().load_video(**inputs)
+
+    assert len(calls) == 1
+    assert torch.equal(second[0], decoded)
+    assert second[1:4:2] == (6, info)
+    assert second[2]["sample_rate"] == 48000 and second[2]["waveform"].shape == (1, 2, 48)
+    assert first[0] is decoded
+
+    nodes.PainterLoadVideoCached().load_video(**dict(inputs, skip_first_frames=2))
+    assert len(calls) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_compact_pass(workflow_json: Dict[str, Any]):
+    """Test that the compact pass swaps the frame path to uint8 nodes under the same ids."""
+    prompt = wf.optimize(wf.compile_workflow(workflow_json), ["compact"])
+
+    assert prompt[wf.LOAD_VIDEO]["class_type"] == "PainterLoadFrames"
+    assert prompt[wf.SCALE]["inputs"] == {"frames": [wf.LOAD_VIDEO, 0], "multiple": 8}
+    assert prompt[wf.SAMPLER]["inputs"]["frames"] == [wf.SCALE, 0]
+    assert "images" not in prompt[wf.SAMPLER]["inputs"]
+    assert prompt[wf.VIDEO_COMBINE]["inputs"]["frames"] == [wf.SAMPLER, 0]
+    assert prompt[wf.RESIZE_HORIZONTAL]["inputs"]["width"] == [wf.SCALE, 1]
+    assert prompt[wf.RESIZE_HORIZONTAL]["inputs"]["height"] == [wf.SCALE, 2]
+    assert wf.SCALE_LENGTH not in prompt
+
+    with pytest.raises(wf.WorkflowError):
+        wf.optimize(prompt, ["stream"])
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+def test_compact_nodes_end_to_end(synthetic_video, tmp_path: Path, cache: ArrayCache, monkeypatch):
+    """Run load, scale, sample and save on compact frames with an identity sampler."""
+    torch = pytest.importorskip("torch")
+    from painter.ffmpeg import FrameReader, probe
+    from painter.studio import nodes
+
+    source = synthetic_video("clip.mp4", frames=40, width=164, height=96)
+    windows = []
+
+    class IdentitySampler:
+        FUNCTION = "sample"
+
+        def sample(self, model, images, fps, video_mask, **kwargs):
+            windows.append((images.dtype, len(images), tuple(video_mask.shape[:3])))
+            return (images,)
+
+    output = tmp_path / "compact_00001.mp4"
+    monkeypatch.setattr(nodes, "_stock_node", lambda class_type: IdentitySampler)
+    monkeypatch.setattr(nodes, "_output_path", lambda prefix, suffix: (str(output), ""))
+
+    clip, count, _, info = nodes.PainterLoadFrames().load(str(source), skip_first_frames=4, frame_load_cap=30)
+    assert clip.dtype == np.uint8 and clip.shape == (30, 96, 164, 3) and count == 30
+    again = nodes.PainterLoadFrames().load(str(source), skip_first_frames=4, frame_load_cap=30)[0]
+    assert isinstance(again, np.memmap) and (again == clip).all()
+
+    scaled, width, height = nodes.PainterScaleFrames().scale(clip, 8)
+    assert (width, height) == (160, 96) and scaled.shape == (30, 96, 160, 3)
+    assert nodes.PainterScaleFrames().scale(scaled, 8)[0] is scaled
+
+    mask = torch.zeros((1, 96, 160, 3))
+    (inpainted,) = nodes.PainterSampleFrames().sample(
+        model=None, frames=scaled, fps=24.0, video_mask=mask, window=12, overlap=2, seed=1,
+    )
+    assert inpainted.dtype == np.uint8 and (inpainted == scaled).all()
+    assert all(dtype == torch.float32 and n <= 12 and shape == (n, 96, 160) for dtype, n, shape in windows)
+
+    result = nodes.PainterSaveFrames().save(inpainted, 24.0, "compact", 18, video_info=info)
+    assert result["result"] == (str(output),)
+    assert probe(str(output)).frames == 30
+    rebuilt = FrameReader(str(output)).read()
+    assert np.abs(rebuilt.astype(int) - scaled.astype(int)).mean() < 6
@@ -0,0 +1,206 @@
+"""
+Tests for fusing DiffuEraser's LoRA into its checkpoint and mapping the result.
+"""
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from painter import workflow as wf
+
+torch = pytest.importorskip("torch")
+safetensors_torch = pytest.importorskip("safetensors.torch")
+
+from painter import fused  # noqa: E402
+
+PROJ_IN = "model.diffusion_model.input_blocks.1.1.proj_in.weight"
+TO_Q = "model.diffusion_model.output_blocks.5.1.transformer_blocks.0.attn1.to_q.weight"
+CONV1 = "model.diffusion_model.output_blocks.5.0.in_layers.2.weight"
+
+
+def checkpoint() -> Dict[str, Any]:
+    """A few SD1.5 UNet weights: a 1x1 conv, a linear layer, a 3x3 conv and a bias."""
+    generator = torch.Generator().manual_seed(0)
+    return {
+        PROJ_IN: torch.randn((8, 8, 1, 1), generator=generator),
+        TO_Q: torch.randn((8, 8), generator=generator),
+        CONV1: torch.randn((8, 4, 3, 3), generator=generator),
+        "model.diffusion_model.output_blocks.5.0.in_layers.2.bias": torch.randn(8, generator=generator),
+    }
+
+
+def kohya_lora() -> Dict[str, Any]:
+    """A rank-2 LoRA with diffusers layer names, as the PCM LoRA has."""
+    generator = torch.Generator().manual_seed(1)
+    return {
+        "lora_unet_down_blocks_0_attentions_0_proj_in.lora_down.weight": torch.randn((2, 8, 1, 1), generator=generator),
+        "lora_unet_down_blocks_0_attentions_0_proj_in.lora_up.weight": torch.randn((8, 2, 1, 1), generator=generator),
+        "lora_unet_down_blocks_0_attentions_0_proj_in.alpha": torch.tensor(1.0),
+        "lora_unet_up_blocks_1_attentions_2_transformer_blocks_0_attn1_to_q.lora_down.weight":
+            torch.randn((2, 8), generator=generator),
+        "lora_unet_up_blocks_1_attentions_2_transformer_blocks_0_attn1_to_q.lora_up.weight":
+            torch.randn((8, 2), generator=generator),
+        "lora_unet_up_blocks_1_resnets_2_conv1.lora_down.weight": torch.randn((2, 4, 3, 3), generator=generator),
+        "lora_unet_up_blocks_1_resnets_2_conv1.lora_up.weight": torch.randn((8, 2, 1, 1), generator=generator),
+    }
+
+
+@pytest.fixture
+def models_dir(tmp_path: Path) -> Path:
+    """A Studio models folder with the workflow's checkpoint and LoRA names."""
+    (tmp_path / "checkpoints").mkdir()
+    (tmp_path / "diffusers").mkdir()
+    safetensors_torch.save_file(checkpoint(), str(tmp_path / "checkpoints" / "realisticVisionV51_v51VAE.safetensors"))
+    safetensors_torch.save_file(kohya_lora(), str(tmp_path / "diffusers" / "pcm.safetensors"))
+    return tmp_path
+
+
+@pytest.mark.unit
+class TestFuseLora:
+    """Test key matching and the fused weights."""
+
+    def test_diffusers_names(self):
+        """Test that checkpoint UNet layer names map to their diffusers names."""
+        assert fused.diffusers_name("input_blocks.1.1.proj_in") == "down_blocks.0.attentions.0.proj_in"
+        assert fused.diffusers_name("output_blocks.5.0.in_layers.2") == "up_blocks.1.resnets.2.conv1"
+        assert fused.diffusers_name("output_blocks.5.0.skip_connection") == "up_blocks.1.resnets.2.conv_shortcut"
+        assert fused.diffusers_name("output_blocks.2.1.conv") == "up_blocks.0.upsamplers.0.conv"
+        assert fused.diffusers_name("output_blocks.8.2.conv") == "up_blocks.2.upsamplers.0.conv"
+        assert fused.diffusers_name("middle_block.0.emb_layers.1") == "mid_block.resnets.0.time_emb_proj"
+        assert fused.diffusers_name("label_emb.0") is None
+
+    def test_kohya_layers_fused(self):
+        """Test that each layer gets strength * alpha / rank * up @ down added, and nothing else changes."""
+        state, lora = checkpoint(), kohya_lora()
+        original = {key: tensor.clone() for key, tensor in state.items()}
+        assert fused.fuse_lora(state, lora, strength=0.5) == 3
+
+        base = "lora_unet_down_blocks_0_attentions_0_proj_in"
+        delta = lora[f"{base}.lora_up.weight"].flatten(1) @ lora[f"{base}.lora_down.weight"].flatten(1)
+        torch.testing.assert_close(state[PROJ_IN], original[PROJ_IN] + 0.5 * 0.5 * delta.reshape(8, 8, 1, 1))
+        base = "lora_unet_up_blocks_1_resnets_2_conv1"
+        delta = lora[f"{base}.lora_up.weight"].flatten(1) @ lora[f"{base}.lora_down.weight"].flatten(1)
+        torch.testing.assert_close(state[CONV1], original[CONV1] + 0.5 * delta.reshape(8, 4, 3, 3))
+        assert torch.equal(state[CONV1.replace("weight", "bias")], original[CONV1.replace("weight", "bias")])
+
+    def test_peft_layers_fused(self):
+        """Test that PEFT lora_A/lora_B keys with diffusers names are matched too."""
+        state = checkpoint()
+        original = state[TO_Q].clone()
+        down, up = torch.ones((1, 8)), torch.ones((8, 1))
+        lora = {"unet.up_blocks.1.attentions.2.transformer_blocks.0.attn1.to_q.lora_A.weight": down,
+                "unet.up_blocks.1.attentions.2.transformer_blocks.0.attn1.to_q.lora_B.weight": up}
+        assert fused.fuse_lora(state, lora) == 1
+        torch.testing.assert_close(state[TO_Q], original + 1.0)
+
+    def test_unmatched_layer_rejected(self):
+        """Test that a LoRA layer matching no weight fails instead of being skipped."""
+        lora = dict(kohya_lora())
+        lora["lora_unet_nowhere.lora_down.weight"] = torch.ones((1, 8))
+        lora["lora_unet_nowhere.lora_up.weight"] = torch.ones((8, 1))
+        with pytest.raises(fused.FuseError, match="lora_unet_nowhere"):
+            fused.fuse_lora(checkpoint(), lora)
+
+    def test_identity_lora_changes_nothing(self):
+        """Test that the identity LoRA is in the same format and fuses to a no-op."""
+        identity = fused.identity_lora(kohya_lora())
+        assert len(fused.lora_layers(identity)) == 1
+        state = checkpoint()
+        fused.fuse_lora(state, identity)
+        assert all(torch.equal(state[key], tensor) for key, tensor in checkpoint().items())
+
+
+@pytest.mark.unit
+class TestMappedFile:
+    """Test the aligned safetensors file and mapping it."""
+
+    def test_data_section_page_aligned(self, tmp_path: Path):
+        """Test that tensors start on a page boundary and any safetensors reader loads the file."""
+        path = tmp_path / "model.safetensors"
+        tensors = {key: tensor.half() for key, tensor in checkpoint().items()}
+        fused.write_mappable(tensors, path, {"note": "x"})
+        header = int.from_bytes(path.read_bytes()[:8], "little")
+        assert (8 + header) % fused.ALIGN == 0
+        loaded = safetensors_torch.load_file(str(path))
+        assert loaded.keys() == tensors.keys()
+        assert all(torch.equal(loaded[key], tensors[key]) for key in tensors)
+        assert fused.read_metadata(path) == {"note": "x"}
+
+    def test_open_mapped_is_copy_on_write(self, tmp_path: Path):
+        """Test that mapped tensors match the file and writing to one leaves the file alone."""
+        path = tmp_path / "model.safetensors"
+        tensors = {key: tensor.half() for key, tensor in checkpoint().items()}
+        fused.write_mappable(tensors, path)
+        before = path.read_bytes()
+        mapped, metadata = fused.open_mapped(path)
+        assert metadata == {}
+        assert all(torch.equal(mapped[key], tensors[key]) for key in tensors)
+        mapped[TO_Q].add_(1)
+        assert path.read_bytes() == before
+
+
+@pytest.mark.unit
+class TestConvert:
+    """Test converting the workflow's models."""
+
+    def test_convert_writes_fused_and_identity(self, models_dir: Path):
+        """Test that the fused file is fp16, holds the fused weights and sits next to its sources."""
+        result = fused.convert(models_dir, "realisticVisionV51_v51VAE.safetensors", "pcm.safetensors")
+        assert result.converted and result.layers == 3
+        assert (result.checkpoint, result.identity) == fused.fused_names("realisticVisionV51_v51VAE.safetensors",
+                                                                         "pcm.safetensors")
+        mapped, metadata = fused.open_mapped(models_dir / "checkpoints" / result.checkpoint)
+        expected = checkpoint()
+        fused.fuse_lora(expected, kohya_lora())
+        assert all(mapped[key].dtype == torch.float16 for key in expected)
+        assert all(torch.equal(mapped[key], expected[key].half()) for key in expected)
+        assert metadata["painter_lora"] == "pcm.safetensors"
+        assert (models_dir / "diffusers" / result.identity).is_file()
+
+    def test_up_to_date_file_kept(self, models_dir: Path):
+        """Test that an unchanged source is not converted twice, and a replaced one is."""
+        names = ("realisticVisionV51_v51VAE.safetensors", "pcm.safetensors")
+        fused.convert(models_dir, *names)
+        again = fused.convert(models_dir, *names)
+        assert not again.converted and again.layers == 3
+
+        lora = models_dir / "diffusers" / "pcm.safetensors"
+        stat = lora.stat()
+        os.utime(lora, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert fused.convert(models_dir, *names).converted
+        assert fused.convert(models_dir, *names, force=True).converted
+
+    def test_missing_source(self, models_dir: Path):
+        """Test that a model that is not in the models folder is reported."""
+        with pytest.raises(FileNotFoundError):
+            fused.convert(models_dir, "missing.safetensors", "pcm.safetensors")
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_fused_pass(workflow_json: Dict[str, Any]):
+    """Test that the fused pass points the loader at the converted files only."""
+    prompt = wf.compile_workflow(workflow_json)
+    optimized = wf.optimize(prompt, ["fused"])
+    assert optimized[wf.LOADER]["class_type"] == "DiffuEraserLoader"
+    assert (optimized[wf.LOADER]["inputs"]["checkpoint"], optimized[wf.LOADER]["inputs"]["lora"]) == \
+        fused.fused_names(prompt[wf.LOADER]["inputs"]["checkpoint"], prompt[wf.LOADER]["inputs"]["lora"])
+    assert {k: v for k, v in optimized.items() if k != wf.LOADER} == \
+        {k: v for k, v in prompt.items() if k != wf.LOADER}
+    assert wf.optimize(optimized, ["fused"]) == optimized
+    both = wf.optimize(prompt, ["fused", "resident"])
+    assert both[wf.LOADER]["class_type"] == "PainterResidentLoader"
+    assert both[wf.LOADER]["inputs"] == optimized[wf.LOADER]["inputs"]
+
+
+@pytest.mark.slow
+def test_benchmark_load():
+    """Test that both load paths run in parallel workers and the fused one keeps less private memory."""
+    report = fused.benchmark_load(megabytes=64, workers=2, repeat=1)
+    stock, mapped = report["paths"]["stock"], report["paths"]["fused"]
+    assert report["files_mb"]["fused"] < report["files_mb"]["stock"]
+    assert stock["load_seconds"] > 0 and mapped["load_seconds"] > 0
+    if os.path.exists("/proc/self/smaps_rollup"):
+        assert mapped["private_mb"] < stock["private_mb"] / 2
+    assert "fused" in fused.format_load_report(report)
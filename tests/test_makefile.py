@@ -176,28 +176,23 @@ class TestMakefileExecution:
 @pytest.mark.unit
 @pytest.mark.makefile
 class TestMakefileModelURLs:
-    """Test that model URLs in Makefile are correct."""
+    """Test that the models make download-models fetches are correct."""
 
-    def test_sam2_urls_defined(self, makefile_path: Path):
-        """Test that SAM2 model URLs are defined."""
-        content = makefile_path.read_text()
+    def test_sam2_urls_defined(self, makefile_path: Path, project_root: Path):
+        """Test that download-models reads the manifest and it lists the SAM2 models."""
+        from painter.models import load_manifest
 
-        # Check for SAM2 URLs
-        assert "segment_anything_2" in content or "sam2" in content.lower(), \
-            "Makefile should define SAM2 model URLs"
+        content = makefile_path.read_text()
+        assert "painter models" in content and "models.json" in content, \
+            "download-models should use the model manifest"
 
-        # Check for specific model files
-        assert "sam2_hiera_large" in content, "Should have SAM2 large model URL"
-        assert "sam2_hiera_base" in content, "Should have SAM2 base model URL"
+        urls = [spec.url for spec in load_manifest(project_root / "models.json")]
+        assert any("sam2_hiera_large" in url for url in urls), "Should have SAM2 large model URL"
+        assert any("sam2_hiera_base" in url for url in urls), "Should have SAM2 base model URL"
 
-    def test_model_urls_use_https(self, makefile_path: Path):
+    def test_model_urls_use_https(self, project_root: Path):
         """Test that model URLs use HTTPS."""
-        content = makefile_path.read_text()
-
-        # Find all URLs
-        urls = re.findall(r'https?://[^\s]+', content)
+        from painter.models import load_manifest
 
-        for url in urls:
-            if "dl.fbaipublicfiles.com" in url:
-                assert url.startswith("https://"), \
-                    f"Model URL should use HTTPS: {url}"
+        for spec in load_manifest(project_root / "models.json"):
+            assert spec.url.startswith("https://"), f"Model URL should use HTTPS: {spec.url}"
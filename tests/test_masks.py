@@ -0,0 +1,167 @@
+"""
+Tests for static mask preparation and the static-mask workflow pass.
+"""
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import masks
+from painter import workflow as wf
+
+
+@pytest.mark.unit
+class TestMaskHelpers:
+    """Test numpy mask helpers."""
+
+    def test_to_binary_shapes(self):
+        """Test that batched, RGB and uint8 masks collapse to one bool plane."""
+        rgb = np.zeros((1, 4, 5, 3), dtype=np.float32)
+        rgb[0, 1, 2, 1] = 1.0
+        binary = masks.to_binary(rgb)
+        assert binary.shape == (4, 5) and binary.dtype == bool
+        assert binary.sum() == 1
+        assert masks.to_binary(np.full((2, 2), 200, dtype=np.uint8)).all()
+
+        with pytest.raises(ValueError):
+            masks.to_binary(np.zeros((3, 4, 5, 3)))
+
+    def test_dilate_uses_cross(self):
+        """Test that one iteration grows a point into a plus sign."""
+        mask = np.zeros((5, 5), dtype=bool)
+        mask[2, 2] = True
+        grown = masks.dilate(mask, 1)
+        assert grown.sum() == 5
+        assert grown[1, 2] and grown[2, 1] and not grown[1, 1]
+        assert masks.dilate(mask, 2).sum() == 13
+        assert masks.dilate(mask, 0).sum() == 1
+
+    def test_dilate_matches_scipy(self):
+        """Test against scipy's binary_dilation when it is available."""
+        ndimage = pytest.importorskip("scipy.ndimage")
+        rng = np.random.default_rng(0)
+        mask = rng.random((32, 40)) > 0.97
+        assert (masks.dilate(mask, 4) == ndimage.binary_dilation(mask, iterations=4)).all()
+
+    def test_broadcast_does_not_copy(self):
+        """Test that the broadcast batch shares one frame of memory."""
+        frame = np.ones((64, 64, 3), dtype=np.float32)
+        batch = masks.broadcast(frame, 300)
+        assert batch.shape == (300, 64, 64, 3)
+        assert masks.is_broadcast(batch)
+        assert np.shares_memory(batch, frame)
+        assert not masks.is_broadcast(np.ones((3, 2, 2)))
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_static_mask_pass(workflow_json: Dict[str, Any]):
+    """Test that the pass swaps RepeatImageBatch and moves dilation off the sampler."""
+    prompt = wf.compile_workflow(workflow_json)
+    optimized = wf.optimize(prompt, ["static-mask"])
+
+    node = optimized[wf.REPEAT_MASK]
+    assert node["class_type"] == "PainterStaticMask"
+    assert node["inputs"]["image"] == [wf.MASK_SWITCH, 0]
+    assert node["inputs"]["amount"] == [wf.VIDEO_INFO, 6]
+    assert node["inputs"]["dilation"] == 4
+    assert optimized[wf.SAMPLER]["inputs"]["mask_dilation_iter"] == 0
+    assert prompt[wf.REPEAT_MASK]["class_type"] == "RepeatImageBatch"
+    assert wf.optimize(optimized, ["static-mask"]) == optimized
+
+    with pytest.raises(wf.WorkflowError):
+        wf.optimize(prompt, ["no-such-pass"])
+
+
+@pytest.mark.unit
+def test_static_mask_node():
+    """Test that the node returns a zero-stride, pre-dilated IMAGE batch."""
+    torch = pytest.importorskip("torch")
+    from painter.studio.nodes import PainterStaticMask
+
+    image = torch.zeros((1, 16, 16, 3))
+    image[0, 8, 8] = 1.0
+    (batch,) = PainterStaticMask().build(image, amount=300, dilation=1, threshold=0.5)
+
+    assert batch.shape == (300, 16, 16, 3)
+    assert batch.stride(0) == 0
+    assert batch[0, :, :, 0].sum().item() == 5
+    assert torch.equal(batch[0], batch[299])
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+@pytest.mark.parametrize("passes", [["mask-cache"], ["static-mask", "mask-cache"], ["mask-cache", "crop"]])
+def test_mask_cache_pass(workflow_json: Dict[str, Any], passes):
+    """Test that the pass folds LoadImage and resize into cached mask nodes."""
+    prompt = wf.optimize(wf.compile_workflow(workflow_json), passes)
+
+    for load_id, resize_id in ((wf.MASK_HORIZONTAL, wf.RESIZE_HORIZONTAL), (wf.MASK_VERTICAL, wf.RESIZE_VERTICAL)):
+        node = prompt[load_id]
+        assert node["class_type"] == "PainterCachedMask"
+        assert node["inputs"]["dilation"] == 4
+        assert node["inputs"]["upscale_method"] == "nearest-exact"
+        assert resize_id not in prompt
+    assert prompt[wf.MASK_SWITCH]["inputs"]["on_true"] == [wf.MASK_VERTICAL, 0]
+    assert prompt[wf.SAMPLER]["inputs"]["mask_dilation_iter"] == 0
+    assert prompt[wf.REPEAT_MASK]["inputs"].get("dilation", 0) == 0
+
+    patched = wf.apply_job(prompt, {"masks": {"horizontal": "other.png"}})
+    assert patched[wf.MASK_HORIZONTAL]["inputs"]["image"] == "other.png"
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_lazy_switch_pass(workflow_json: Dict[str, Any]):
+    """Test that the pass makes the mask switch lazy and keeps both branches linked."""
+    prompt = wf.optimize(wf.compile_workflow(workflow_json), ["mask-cache", "lazy-switch"])
+    switch = prompt[wf.MASK_SWITCH]
+    assert switch["class_type"] == "PainterLazySwitch"
+    assert switch["inputs"] == {"boolean": [wf.ORIENTATION, 0], "on_true": [wf.MASK_VERTICAL, 0],
+                                "on_false": [wf.MASK_HORIZONTAL, 0]}
+    assert wf.optimize(prompt, ["lazy-switch"]) == prompt
+
+
+@pytest.mark.unit
+def test_lazy_switch_node():
+    """Test that the node asks only for the selected branch."""
+    pytest.importorskip("torch")
+    from painter.executor import lazy_inputs
+    from painter.studio.nodes import PainterLazySwitch
+
+    node = PainterLazySwitch()
+    assert lazy_inputs(PainterLazySwitch) == {"on_true", "on_false"}
+    assert node.check_lazy_status(True) == ["on_true"]
+    assert node.check_lazy_status(False, on_true="v") == ["on_false"]
+    assert node.switch(False, on_false="h") == ("h",)
+
+
+@pytest.mark.unit
+def test_cached_mask_node(tmp_path: Path, monkeypatch):
+    """Test that the cached mask node prepares once and then hits the cache."""
+    torch = pytest.importorskip("torch")
+    Image = pytest.importorskip("PIL.Image")
+    from painter.studio.nodes import PainterCachedMask
+
+    monkeypatch.setattr(masks, "_mask_cache", masks.ArrayCache(memory_bytes=1 << 20))
+    pixels = np.zeros((20, 40, 3), dtype=np.uint8)
+    pixels[10, 20] = 255
+    path = tmp_path / "mask.png"
+    Image.fromarray(pixels).save(path)
+
+    node = PainterCachedMask()
+    args = dict(width=80, height=41, upscale_method="nearest-exact", divisible_by=2, dilation=1, threshold=0.5)
+    (first,) = node.load(str(path), **args)
+    (second,) = node.load(str(path), **args)
+
+    assert first.shape == (1, 40, 80, 3)
+    assert torch.equal(first, second)
+    # One source pixel scales to a 2x2 block, then the cross dilation adds 8
+    assert first[0, :, :, 0].sum().item() == 12
+    stats = masks.mask_cache().stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    node.load(str(path), **dict(args, dilation=2))
+    assert masks.mask_cache().stats()["misses"] == 2
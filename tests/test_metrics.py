@@ -0,0 +1,230 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+import threading
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from painter.metrics import PromptMetrics, Registry
+from painter.residency import ModelResidency
+from painter.studio import metrics as studio_metrics
+
+
+def parse(text):
+    """``{sample name with labels: value}`` from the exposition text."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+@pytest.mark.unit
+class TestRegistry:
+    """Test the text exposition format."""
+
+    def test_counters_and_gauges(self):
+        """Test labelled samples, escaping and scrape-time callbacks."""
+        registry = Registry()
+        prompts = registry.counter("jobs_total", "Jobs")
+        prompts.inc(status="success")
+        prompts.inc(2, status="success")
+        prompts.inc(status='bad "one"')
+        registry.gauge("depth", "Queue depth", lambda: {(): 3})
+        text = registry.render()
+
+        assert "# HELP jobs_total Jobs\n# TYPE jobs_total counter\n" in text
+        samples = parse(text)
+        assert samples['jobs_total{status="success"}'] == 3
+        assert samples['jobs_total{status="bad \\"one\\""}'] == 1
+        assert samples["depth"] == 3
+        assert text.endswith("\n")
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket counts, +Inf, sum and count."""
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(1, 5))
+        for value in (0.5, 2, 7):
+            latency.observe(value, status="ok")
+        samples = parse(registry.render())
+        assert samples['latency_seconds_bucket{status="ok",le="1"}'] == 1
+        assert samples['latency_seconds_bucket{status="ok",le="5"}'] == 2
+        assert samples['latency_seconds_bucket{status="ok",le="+Inf"}'] == 3
+        assert samples['latency_seconds_sum{status="ok"}'] == 9.5
+        assert samples['latency_seconds_count{status="ok"}'] == 3
+
+
+@pytest.mark.unit
+class TestPromptMetrics:
+    """Test per-prompt metrics."""
+
+    def test_prompt_lifecycle(self):
+        """Test wait and run times, frames/s and peak memory of a finished prompt."""
+        metrics = PromptMetrics(lambda: (4, 1))
+        metrics.start("a", queued_at=100.0, now=103.0)
+        metrics.finish("a", "success", frames=60, peak_rss=3 << 30, now=113.0)
+        metrics.finish("never-started", "error")
+        samples = parse(metrics.render())
+
+        assert samples["painter_queue_pending"] == 4 and samples["painter_queue_running"] == 1
+        assert samples["painter_prompt_wait_seconds_sum"] == 3
+        assert samples['painter_prompt_run_seconds_sum{status="success"}'] == 10
+        assert samples['painter_prompts_total{status="success"}'] == 1
+        assert samples['painter_prompts_total{status="error"}'] == 1
+        assert samples["painter_frames_processed_total"] == 60
+        assert samples["painter_last_prompt_frames_per_second"] == 6
+        assert samples["painter_last_prompt_peak_rss_bytes"] == 3 << 30
+        assert samples['painter_prompt_peak_rss_bytes_bucket{le="4294967296"}'] == 1
+
+    def test_model_and_cache_counters(self):
+        """Test that model loads and cache hit ratios are read at scrape time."""
+        residency = ModelResidency(budget_bytes=1 << 20, measure=lambda model: 10)
+        cache = types.SimpleNamespace(hits=3, misses=1)
+        metrics = PromptMetrics(lambda: (0, 0), lambda: {"masks": cache}, lambda: residency)
+        residency.get_or_load("m", lambda: object())
+        residency.get_or_load("m", lambda: object())
+        samples = parse(metrics.render())
+
+        assert samples["painter_model_loads_total"] == 1
+        assert samples["painter_model_resident_bytes"] == 10
+        assert samples['painter_cache_hit_ratio{cache="masks"}'] == 0.75
+        assert samples['painter_cache_hit_ratio{cache="models"}'] == 0.5
+        assert samples['painter_cache_hits_total{cache="models"}'] == 1
+
+    def test_scrape_does_not_wait_for_a_model_load(self):
+        """Test that rendering works while a model load holds the residency lock."""
+        residency = ModelResidency(budget_bytes=1 << 20, measure=lambda model: 10)
+        metrics = PromptMetrics(lambda: (0, 1), models=lambda: residency)
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_load():
+            loading.set()
+            release.wait(5)
+            return object()
+
+        worker = threading.Thread(target=residency.get_or_load, args=("m", slow_load))
+        worker.start()
+        try:
+            assert loading.wait(5)
+            rendered = []
+            scrape = threading.Thread(target=lambda: rendered.append(metrics.render()))
+            scrape.start()
+            scrape.join(1)
+            assert rendered and "painter_model_loads_total 1" in rendered[0]
+        finally:
+            release.set()
+            worker.join()
+
+
+class FakeQueue:
+    """Studio's ``PromptQueue``, as far as the hooks use it."""
+
+    def __init__(self):
+        self.queue, self.currently_running, self.history = [], {}, {}
+
+    def put(self, item):
+        self.queue.append(item)
+
+    def get(self, timeout=None):
+        if not self.queue:
+            return None
+        item_id = len(self.history) + len(self.currently_running)
+        self.currently_running[item_id] = self.queue.pop(0)
+        return self.currently_running[item_id], item_id
+
+    def task_done(self, item_id, history_result, status, process_item=None):
+        self.history[self.currently_running.pop(item_id)[1]] = history_result
+
+
+def succeeded():
+    return types.SimpleNamespace(status_str="success", completed=True, messages=[])
+
+
+@pytest.mark.unit
+class TestStudioMetrics:
+    """Test metrics fed by Studio's prompt queue and progress messages."""
+
+    @pytest.fixture
+    def server(self, monkeypatch):
+        from painter.studio import events
+
+        monkeypatch.setattr(studio_metrics, "_metrics", None)
+        monkeypatch.setattr(studio_metrics, "_running", {})
+        monkeypatch.setattr(studio_metrics, "_queued_at", {})
+        monkeypatch.setattr(events, "_listeners", [studio_metrics.on_message])
+        server = types.SimpleNamespace(prompt_queue=FakeQueue())
+        studio_metrics._record_queued(server.prompt_queue)
+        events.observe_queue(server)
+        return server
+
+    def test_prompt_from_queue(self, server):
+        """Test that a prompt's queue wait, run, frames and status are recorded."""
+        queue = server.prompt_queue
+        queue.put((0, "p1", {}, {}, []))
+        queue.put((1, "p2", {}, {}, []))
+        _, item_id = queue.get()
+
+        studio_metrics.on_message(server, "executing", {"node": "209", "prompt_id": "p1"})
+        outputs = {"209": {"gifs": [{"filename": "a.mp4", "frames": 48}], "text": ["x"]}}
+        queue.task_done(item_id, {"outputs": outputs, "meta": {}}, status=succeeded())
+        samples = parse(studio_metrics.prompt_metrics(server).render())
+
+        assert samples["painter_queue_pending"] == 1 and samples["painter_queue_running"] == 0
+        assert samples["painter_prompt_wait_seconds_count"] == 1
+        assert samples['painter_prompts_total{status="success"}'] == 1
+        assert samples["painter_frames_processed_total"] == 48
+        assert samples["painter_last_prompt_peak_rss_bytes"] > 0
+        assert set(studio_metrics._queued_at) == {"p2"} and studio_metrics._running == {}
+
+    def test_prompt_without_client_id(self, server, synthetic_video):
+        """Test that a prompt no progress message is sent for is timed, with a stock VHS preview's frames."""
+        video = synthetic_video("out_00001.mp4", frames=12)
+        queue = server.prompt_queue
+        queue.put((0, "curl", {}, {}, ["209"]))
+        _, item_id = queue.get()
+        preview = {"filename": video.name, "subfolder": "", "type": "output", "format": "video/h264-mp4",
+                   "frame_rate": 24.0, "workflow": "out_00001.png", "fullpath": str(video)}
+        queue.task_done(item_id, {"outputs": {"209": {"gifs": [preview]}}}, status=succeeded())
+        queue.put((1, "stopped", {}, {}, []))
+        _, item_id = queue.get()
+        interrupted = types.SimpleNamespace(status_str="error", completed=False,
+                                            messages=[("execution_interrupted", {"prompt_id": "stopped"})])
+        queue.task_done(item_id, {"outputs": {}}, status=interrupted)
+        samples = parse(studio_metrics.prompt_metrics(server).render())
+
+        assert samples['painter_prompts_total{status="success"}'] == 1
+        assert samples['painter_prompts_total{status="interrupted"}'] == 1
+        assert samples["painter_frames_processed_total"] == 12
+        assert samples['painter_prompt_run_seconds_count{status="interrupted"}'] == 1
+        assert samples["painter_last_prompt_frames_per_second"] > 0
+
+
+@pytest.mark.integration
+def test_standin_serves_metrics(serve_app):
+    """Test that the stand-in server exposes /metrics for a batch it ran."""
+    import aiohttp
+
+    from painter import workflow as wf
+    from painter.batch import run_batch
+    from painter.standin import StandinServer
+
+    server = StandinServer(latency=0.02, steps=1)
+    prompt = {wf.VIDEO_COMBINE: {"class_type": "VHS_VideoCombine", "inputs": {}}}
+
+    async def scenario(url):
+        await run_batch(url, prompt, [{"id": "a"}, {"id": "b"}], max_inflight=2)
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{url}/metrics") as resp:
+                return resp.headers["Content-Type"], await resp.text()
+
+    content_type, text = serve_app(server.app(), scenario)
+    assert content_type.startswith("text/plain; version=0.0.4")
+    samples = parse(text)
+    assert samples['painter_prompts_total{status="success"}'] == 2
+    assert samples['painter_prompt_run_seconds_count{status="success"}'] == 2
+    assert samples["painter_prompt_wait_seconds_count"] == 2
+    assert samples["painter_queue_pending"] == 0
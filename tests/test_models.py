@@ -0,0 +1,202 @@
+"""
+Tests for the model manifest downloader.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from painter.models import MANIFEST, ModelSpec, load_manifest, pin, split_ranges
+
+SIZE = 300_000
+
+
+def model_server(files: Dict[str, bytes], log: List[Dict[str, Any]], cut_after=None, linked=None):
+    """An app serving ``files`` with ranges; logs each request and can cut the first GET short."""
+    from aiohttp import web
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        name = request.match_info["name"]
+        log.append({"method": request.method, "name": name, "range": request.headers.get("Range")})
+        body = files[name]
+        headers = {"Accept-Ranges": "bytes"}
+        if linked:
+            headers["X-Linked-ETag"] = f'"{linked}"'
+        if request.method == "HEAD":
+            return web.Response(headers=dict(headers, **{"Content-Length": str(len(body))}))
+        start, end = 0, len(body) - 1
+        if request.headers.get("Range"):
+            first, last = request.headers["Range"].split("=")[1].split("-")
+            start, end = int(first), int(last or len(body) - 1)
+        response = web.StreamResponse(status=206, headers=dict(
+            headers, **{"Content-Range": f"bytes {start}-{end}/{len(body)}", "Content-Length": str(end - start + 1)}))
+        await response.prepare(request)
+        if cut_after and not [entry for entry in log[:-1] if entry["method"] == "GET"]:
+            await response.write(body[start:start + cut_after])
+            request.transport.close()
+            return response
+        await response.write(body[start:end + 1])
+        return response
+
+    app = web.Application()
+    app.router.add_route("*", "/files/{name}", handle)
+    return app
+
+
+@pytest.fixture
+def payload() -> bytes:
+    return os.urandom(SIZE)
+
+
+def spec_for(url: str, payload: bytes, **overrides) -> ModelSpec:
+    fields = dict(name="model", url=f"{url}/files/model.bin", path="checkpoints/model.safetensors",
+                  size=len(payload), sha256=hashlib.sha256(payload).hexdigest())
+    fields.update(overrides)
+    return ModelSpec(**fields)
+
+
+@pytest.mark.unit
+class TestManifest:
+    """Test the manifest and range planning."""
+
+    def test_manifest_lists_the_workflow_models(self, workflow_json: Dict[str, Any]):
+        """Test that every model file named in the workflow has a manifest entry."""
+        paths = {Path(spec.path).name for spec in load_manifest(MANIFEST)}
+        text = json.dumps(workflow_json)
+        for name in ("realisticVisionV51_v51VAE.safetensors", "pcm_sd15_smallcfg_2step_converted.safetensors"):
+            assert name in text and name in paths
+        assert {"sam2_hiera_large.safetensors", "sam2_hiera_base_plus.safetensors"} <= paths
+
+    def test_split_ranges(self):
+        """Test that ranges cover the file without gaps and small files are not split."""
+        ranges = split_ranges(100, 3, min_segment=10)
+        assert ranges == [[0, 33, 0], [33, 66, 0], [66, 100, 0]]
+        assert split_ranges(100, 8, min_segment=64) == [[0, 100, 0]]
+
+    def test_pin(self):
+        """Test that pinning fills size and digest from successful fetches only."""
+        from painter.models import FetchResult
+
+        specs = [ModelSpec("a", "u", "a.bin"), ModelSpec("b", "u", "b.bin")]
+        pinned = pin(specs, [FetchResult("a", "downloaded", sha256="f" * 64, size=5), FetchResult("b", "failed")])
+        assert (pinned[0].size, pinned[0].sha256) == (5, "f" * 64) and pinned[1] == specs[1]
+
+
+@pytest.mark.integration
+class TestModelFetcher:
+    """Test downloading against a local HTTP server."""
+
+    def test_parallel_ranges_then_cache(self, tmp_path: Path, payload: bytes, serve_app):
+        """Test that a file is fetched over several ranges, and a second models folder is filled from the cache."""
+        from painter.models import ModelFetcher
+
+        log: List[Dict[str, Any]] = []
+
+        async def scenario(url):
+            spec = spec_for(url, payload)
+            first = ModelFetcher(tmp_path / "a", tmp_path / "cache", connections=4, min_segment=1000)
+            second = ModelFetcher(tmp_path / "b", tmp_path / "cache")
+            return await first.fetch_all([spec]), await second.fetch_all([spec]), await first.fetch_all([spec])
+
+        (downloaded,), (cached,), (present,) = serve_app(model_server({"model.bin": payload}, log), scenario)
+        assert (downloaded.status, cached.status, present.status) == ("downloaded", "cached", "present")
+        assert downloaded.downloaded == SIZE and cached.downloaded == 0
+        gets = [entry["range"] for entry in log if entry["method"] == "GET"]
+        assert len(gets) == 4 and all(r.startswith("bytes=") for r in gets)
+        for folder in ("a", "b"):
+            target = tmp_path / folder / "checkpoints" / "model.safetensors"
+            assert target.read_bytes() == payload
+        blob = tmp_path / "cache" / "sha256" / hashlib.sha256(payload).hexdigest()
+        assert blob.stat().st_nlink == 3
+        assert not list((tmp_path / "cache" / "partial").glob("*.part"))
+
+    def test_resume_after_interruption(self, tmp_path: Path, payload: bytes, serve_app):
+        """Test that a cut connection is retried from the bytes already written, not from the start."""
+        from painter.models import ModelFetcher
+
+        log: List[Dict[str, Any]] = []
+
+        async def scenario(url):
+            fetcher = ModelFetcher(tmp_path / "models", tmp_path / "cache", connections=1, retry_delay=0)
+            return await fetcher.fetch_all([spec_for(url, payload)])
+
+        (result,) = serve_app(model_server({"model.bin": payload}, log, cut_after=100_000), scenario)
+        assert result.status == "downloaded"
+        assert (tmp_path / "models" / "checkpoints" / "model.safetensors").read_bytes() == payload
+        gets = [entry["range"] for entry in log if entry["method"] == "GET"]
+        assert gets[0] == f"bytes=0-{SIZE - 1}"
+        resumed_from = int(gets[-1].split("=")[1].split("-")[0])
+        assert 0 < resumed_from <= 100_000 and result.downloaded == SIZE
+
+    def test_resume_from_saved_progress(self, tmp_path: Path, payload: bytes, serve_app):
+        """Test that a partial file left by an earlier process is completed from its recorded offsets."""
+        from painter.models import ModelFetcher
+
+        log: List[Dict[str, Any]] = []
+        cache = tmp_path / "cache"
+
+        async def scenario(url):
+            spec = spec_for(url, payload)
+            key = hashlib.sha256(spec.url.encode()).hexdigest()
+            part = cache / "partial" / f"{key}.part"
+            part.parent.mkdir(parents=True)
+            part.write_bytes(payload[:100_000] + bytes(SIZE - 100_000))
+            part.with_suffix(".json").write_text(json.dumps(
+                {"url": spec.url, "size": SIZE, "segments": [[0, 150_000, 100_000], [150_000, SIZE, 0]]}))
+            return await ModelFetcher(tmp_path / "models", cache).fetch_all([spec])
+
+        (result,) = serve_app(model_server({"model.bin": payload}, log), scenario)
+        assert result.status == "downloaded" and result.downloaded == SIZE - 100_000
+        assert sorted(entry["range"] for entry in log if entry["method"] == "GET") == [
+            "bytes=100000-149999", f"bytes=150000-{SIZE - 1}"]
+        assert (tmp_path / "models" / "checkpoints" / "model.safetensors").read_bytes() == payload
+
+    def test_bad_digest_is_not_installed(self, tmp_path: Path, payload: bytes, serve_app):
+        """Test that a download hashing to the wrong digest fails and leaves nothing behind."""
+        from painter.models import ModelFetcher
+
+        async def scenario(url):
+            fetcher = ModelFetcher(tmp_path / "models", tmp_path / "cache")
+            return await fetcher.fetch_all([spec_for(url, payload, sha256="0" * 64)])
+
+        (result,) = serve_app(model_server({"model.bin": payload}, []), scenario)
+        assert result.status == "failed" and "expected" in result.error
+        assert not (tmp_path / "models" / "checkpoints" / "model.safetensors").exists()
+        assert not list((tmp_path / "cache").rglob("*.part")) and not (tmp_path / "cache" / "sha256").exists()
+
+    def test_unpinned_entry_uses_published_digest(self, tmp_path: Path, payload: bytes, serve_app):
+        """Test that an entry without size or sha256 is checked against the server's X-Linked-ETag."""
+        from painter.models import ModelFetcher
+
+        async def scenario(url):
+            spec = spec_for(url, payload, size=None, sha256=None)
+            return await ModelFetcher(tmp_path / "models", None).fetch_all([spec])
+
+        digest = hashlib.sha256(payload).hexdigest()
+        (result,) = serve_app(model_server({"model.bin": payload}, [], linked=digest), scenario)
+        assert result.status == "downloaded" and result.sha256 == digest and result.size == SIZE
+
+        async def tampered(url):
+            spec = spec_for(url, payload, path="other.bin", size=None, sha256=None)
+            return await ModelFetcher(tmp_path / "models", None).fetch_all([spec])
+
+        (result,) = serve_app(model_server({"model.bin": payload}, [], linked="1" * 64), tampered)
+        assert result.status == "failed" and not (tmp_path / "models" / "other.bin").exists()
+
+    def test_require_pinned(self, tmp_path: Path, payload: bytes, serve_app):
+        """Test that with require_pinned an entry without a pinned digest is refused before anything is fetched."""
+        from painter.models import ModelFetcher
+
+        async def scenario(url):
+            spec = spec_for(url, payload, sha256=None)
+            return await ModelFetcher(tmp_path / "models", None, require_pinned=True).fetch_all([spec])
+
+        (result,) = serve_app(model_server({"model.bin": payload}, [], linked=hashlib.sha256(payload).hexdigest()),
+                              scenario)
+        assert result.status == "failed" and "no pinned" in result.error
+        assert not (tmp_path / "models" / "checkpoints").exists()
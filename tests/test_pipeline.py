@@ -0,0 +1,164 @@
+"""
+Tests for the overlapped decode -> inpaint -> encode pipeline.
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from painter import workflow as wf
+from painter.pipeline import PipelineAborted, run_pipeline
+
+
+def collect(results):
+    """Sink that returns every result it receives."""
+    return list(results)
+
+
+@pytest.mark.unit
+class TestRunPipeline:
+    """Test ordering, overlap, bounds and failure handling."""
+
+    def test_results_in_order(self):
+        """Test that every item is processed once and reaches the sink in order."""
+        stats = run_pipeline(range(20), lambda x: x * 2, collect, depth=2)
+        assert stats.result == [x * 2 for x in range(20)]
+        assert stats.items == 20
+
+    def test_process_runs_on_calling_thread(self):
+        """Test that inpainting stays on the caller's thread, which owns the accelerator."""
+        caller = threading.get_ident()
+        stats = run_pipeline(range(3), lambda x: threading.get_ident(), collect)
+        assert set(stats.result) == {caller}
+
+    def test_stages_overlap(self):
+        """Test that wall time approaches the slowest stage instead of the sum of all three."""
+        delay = 0.04
+
+        def decode():
+            for i in range(8):
+                time.sleep(delay)
+                yield i
+
+        def encode(results):
+            for _ in results:
+                time.sleep(delay)
+
+        stats = run_pipeline(decode(), lambda x: time.sleep(delay), encode, depth=2)
+        assert stats.serial_time >= 3 * 8 * delay * 0.9
+        assert stats.wall_time < 0.7 * stats.serial_time
+
+    def test_in_flight_is_bounded(self):
+        """Test that a slow encoder holds back decoding instead of buffering the clip."""
+        def encode(results):
+            for _ in results:
+                time.sleep(0.002)
+
+        stats = run_pipeline(range(100), lambda x: x, encode, depth=2)
+        assert stats.max_in_flight <= 2 * 2 + 3
+
+    @pytest.mark.parametrize("stage", ["decode", "process", "sink"])
+    def test_errors_propagate(self, stage: str):
+        """Test that a failure in any stage is re-raised and stops the others."""
+        aborted = []
+
+        def decode():
+            for i in range(50):
+                if stage == "decode" and i == 3:
+                    raise KeyError("decode failed")
+                yield i
+
+        def process(x):
+            if stage == "process" and x == 3:
+                raise KeyError("process failed")
+            return x
+
+        def sink(results):
+            try:
+                for x in results:
+                    if stage == "sink" and x == 3:
+                        raise KeyError("sink failed")
+            except PipelineAborted:
+                aborted.append(True)
+                raise
+
+        with pytest.raises(KeyError, match=f"{stage} failed"):
+            run_pipeline(decode(), process, sink, depth=1)
+        if stage != "sink":
+            assert aborted == [True]
+
+    def test_sink_may_stop_early(self):
+        """Test that a sink returning early does not leave the sampler blocked."""
+        def first_two(results):
+            return [next(results), next(results)]
+
+        stats = run_pipeline(range(1000), lambda x: x, first_two, depth=1)
+        assert stats.result == [0, 1]
+        assert stats.items < 1000
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_stream_pass(workflow_json: Dict[str, Any]):
+    """Test that the stream pass folds load, sampler and combine into probe and stream nodes."""
+    prompt = wf.optimize(wf.compile_workflow(workflow_json), ["stream"])
+    stream = prompt[wf.VIDEO_COMBINE]
+
+    assert stream["class_type"] == "PainterStreamInpaint"
+    assert prompt[wf.LOAD_VIDEO]["class_type"] == "PainterProbeVideo"
+    assert wf.SAMPLER not in prompt and wf.SCALE not in prompt
+    assert stream["inputs"]["video_info"] == [wf.LOAD_VIDEO, 3]
+    assert stream["inputs"]["model"] == [wf.LOADER, 0]
+    assert stream["inputs"]["window"] == 50
+    assert prompt[wf.CLEAN_GPU]["inputs"]["anything"] == [wf.VIDEO_COMBINE, 0]
+
+    job = wf.apply_job(prompt, {"video": "a.mp4", "sampler": {"seed": 7}, "output_prefix": "a"})
+    assert job[wf.VIDEO_COMBINE]["inputs"]["seed"] == 7
+    assert job[wf.VIDEO_COMBINE]["inputs"]["filename_prefix"] == "a"
+    assert job[wf.LOAD_VIDEO]["inputs"]["video"] == "a.mp4"
+
+    with pytest.raises(wf.WorkflowError):
+        wf.optimize(wf.compile_workflow(workflow_json), ["crop", "stream"])
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+def test_stream_node_end_to_end(synthetic_video, tmp_path: Path, monkeypatch):
+    """Run the probe and stream nodes with an identity sampler over a real clip."""
+    torch = pytest.importorskip("torch")
+    from painter.ffmpeg import FrameReader, probe
+    from painter.studio import nodes
+
+    source = synthetic_video("clip.mp4", frames=60, width=160, height=96)
+    calls = []
+
+    class IdentitySampler:
+        FUNCTION = "sample"
+
+        def sample(self, model, images, fps, video_mask, **kwargs):
+            calls.append((len(images), tuple(video_mask.shape)))
+            return (images, images, "")
+
+    output = tmp_path / "stream_00001.mp4"
+    monkeypatch.setattr(nodes, "_stock_node", lambda class_type: IdentitySampler)
+    monkeypatch.setattr(nodes, "_output_path", lambda prefix, suffix: (str(output), ""))
+
+    _, loaded, _, info = nodes.PainterProbeVideo().probe(str(source), skip_first_frames=6, frame_load_cap=0)
+    assert loaded == info["loaded_frame_count"] == 54
+
+    mask = torch.zeros((1, 96, 160, 3)).expand(loaded, -1, -1, -1)
+    result = nodes.PainterStreamInpaint().run(
+        model=None, video_mask=mask, video_info=info, frame_rate=info["source_fps"], filename_prefix="stream",
+        crf=18, window=20, overlap=4, queue_depth=1, seed=1,
+    )
+    assert result["result"] == (str(output),)
+    assert result["ui"]["gifs"][0]["filename"] == output.name
+    assert all(shape == (n, 96, 160, 3) for n, shape in calls)
+
+    written = probe(str(output))
+    assert written.frames == 54
+    original = FrameReader(str(source), start=6).read()
+    rebuilt = FrameReader(str(output)).read()
+    assert abs(rebuilt.astype(int) - original.astype(int)).mean() < 6
@@ -0,0 +1,198 @@
+"""
+Tests for the memory-aware planner.
+"""
+import json
+import types
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from painter import planner
+from painter import workflow as wf
+from painter.planner import GB, MINIMUMS, ClipShape
+
+
+@pytest.fixture
+def prompt(workflow_json):
+    return wf.compile_workflow(workflow_json)
+
+
+def hd(frames=300, **kwargs):
+    return ClipShape(width=1280, height=720, frames=frames, scaled_width=1280, scaled_height=720, **kwargs)
+
+
+@pytest.mark.unit
+class TestEstimate:
+    """Test what a prompt is predicted to load and hold."""
+
+    def test_scaled_size_follows_node_290(self):
+        """Test scaling the longest side to a length and rounding down to the multiple."""
+        inputs = {"scale_to_side": "longest", "round_to_multiple": "8"}
+        assert planner.scaled_size(1920, 1080, inputs, 1280) == (1280, 720)
+        assert planner.scaled_size(1000, 563, {"scale_to_side": "None", "round_to_multiple": "8"}) == (1000, 560)
+
+    def test_clip_shape_reads_job_and_passes(self, prompt):
+        """Test that skip, nth and the cap are applied in the loader's order, and passes change the shape."""
+        job = wf.apply_job(prompt, {"video": "a.mp4", "skip_first_frames": 10, "frame_load_cap": 100,
+                                    "overrides": {wf.LOAD_VIDEO: {"select_every_nth": 2}}})
+        shape = planner.clip_shape(job, 1280, 720, 300)
+        assert shape.frames == 100 and shape.bytes_per_value == 4 and not shape.static_mask
+        assert planner.clip_shape(job, 1280, 720, 150).frames == 70
+
+        compact = planner.clip_shape(wf.optimize(job, ["static-mask", "compact"]), 1280, 720, 300)
+        assert compact.bytes_per_value == 1 and compact.static_mask
+
+    def test_estimate_grows_with_frames_and_windows(self):
+        """Test that host memory follows the frame count and the sampler follows its windows."""
+        settings = {"subvideo_length": 50, "video_length": 10, "neighbor_length": 10, "ref_stride": 10}
+        short, long = planner.estimate(hd(100), settings, "cuda"), planner.estimate(hd(300), settings, "cuda")
+        assert long.host > short.host and long.device == short.device
+        smaller = planner.estimate(hd(300), dict(settings, subvideo_length=20), "cuda")
+        assert smaller.parts["sampler"] < long.parts["sampler"]
+        assert planner.estimate(hd(300), settings, "cuda", model_loaded=True).parts["model"] == 0
+
+    def test_cpu_counts_everything_as_host(self):
+        """Test that on CPU the model and sampler come out of RAM."""
+        settings = {"subvideo_length": 50, "video_length": 10, "neighbor_length": 10}
+        cpu = planner.estimate(hd(), settings, "cpu")
+        assert cpu.device == 0 and cpu.host == sum(cpu.parts.values())
+
+
+@pytest.mark.unit
+class TestPlan:
+    """Test choosing settings that fit."""
+
+    SETTINGS = {"subvideo_length": 50, "video_length": 10, "neighbor_length": 10, "ref_stride": 10}
+
+    def test_unchanged_when_it_fits(self):
+        """Test that a prompt with plenty of memory is left as asked."""
+        planned = planner.plan(hd(), self.SETTINGS, {"host": 256 * GB, "device": 80 * GB}, "cuda")
+        assert planned.fits and planned.changed == {}
+        assert planned.settings["frame_load_cap"] == 300
+
+    def test_windows_shrink_before_frames(self):
+        """Test that a tight device is met by smaller windows while every frame is kept."""
+        planned = planner.plan(hd(), self.SETTINGS, {"host": 64 * GB, "device": 10 * GB}, "cuda")
+        assert planned.fits
+        assert "frame_load_cap" not in planned.changed
+        assert planned.settings["subvideo_length"] < 50
+        assert planned.estimate.device <= 9 * GB
+
+    def test_short_device_never_cuts_frames(self):
+        """Test that fewer frames are not used to relieve a device they do not occupy."""
+        planned = planner.plan(hd(), self.SETTINGS, {"host": 64 * GB, "device": 4 * GB}, "cuda")
+        assert not planned.fits
+        assert "frame_load_cap" not in planned.changed
+        assert all(planned.settings[knob] == MINIMUMS[knob] for knob in planner.WINDOW_KNOBS)
+
+    def test_short_ram_cuts_frames_to_the_largest_that_fit(self):
+        """Test that once the windows are minimal the frame cap is the largest count that fits."""
+        available = {"host": 16 * GB}
+        planned = planner.plan(hd(), self.SETTINGS, available, "cpu")
+        cap = planned.settings["frame_load_cap"]
+        assert planned.fits and MINIMUMS["frame_load_cap"] <= cap < 300
+        assert planned.changed["frame_load_cap"] == (300, cap)
+        one_more = planner.estimate(hd(), dict(planned.settings, frame_load_cap=cap + 1), "cpu")
+        assert one_more.host > 0.9 * available["host"]
+
+    def test_apply_plan_writes_cap_and_windows(self, prompt):
+        """Test that the plan lands on node 257 and the sampler, and the prompt is copied."""
+        planned = planner.plan_prompt(prompt, 1280, 720, 300, {"host": 16 * GB}, "cpu")
+        rewritten = planner.apply_plan(prompt, planned)
+        assert rewritten[wf.FRAME_CAP]["inputs"]["value"] == planned.settings["frame_load_cap"]
+        assert rewritten[wf.SAMPLER]["inputs"]["subvideo_length"] == planned.settings["subvideo_length"]
+        assert prompt[wf.FRAME_CAP]["inputs"]["value"] == 300
+
+    def test_apply_plan_clamps_stream_window(self, prompt):
+        """Test that the streaming sampler's own window never exceeds the planned subvideo length."""
+        streamed = wf.optimize(prompt, ["stream"])
+        planned = planner.plan_prompt(streamed, 1280, 720, 300, {"host": 64 * GB, "device": 8 * GB}, "cuda")
+        rewritten = planner.apply_plan(streamed, planned)
+        inputs = rewritten[wf.sampler_id(rewritten)]["inputs"]
+        assert inputs["window"] <= inputs["subvideo_length"] == planned.settings["subvideo_length"]
+
+
+@pytest.mark.unit
+class TestCalibration:
+    """Test the predicted-vs-actual log."""
+
+    def test_record_and_scale_round_trip(self, tmp_path: Path, monkeypatch):
+        """Test that logged ratios become the scale factor, and the environment overrides it."""
+        monkeypatch.delenv("PAINTER_PLAN_SCALE", raising=False)
+        path = tmp_path / "plans" / "calibration.jsonl"
+        assert planner.load_scale(path) == 1.0
+        planned = planner.plan(hd(), TestPlan.SETTINGS, {"host": 256 * GB}, "cpu")
+        for ratio in (0.5, 0.8, 1.1, 1.2, 1.3):
+            planner.record(path, "p", planned, {"host": int(planned.estimate.host * ratio), "device": 0})
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert records[0]["settings"] == planned.settings
+        assert 1.1 < planner.load_scale(path) <= 1.3
+        assert planner.calibration_scale(records[:2]) == pytest.approx(0.8, rel=1e-3)
+
+        monkeypatch.setenv("PAINTER_PLAN_SCALE", "1.5")
+        assert planner.load_scale(path) == 1.5
+
+
+@pytest.mark.unit
+class TestStudioHook:
+    """Test measuring planned prompts inside Studio."""
+
+    def test_finished_prompt_is_recorded(self, tmp_path: Path, monkeypatch):
+        """Test that a planned prompt's run is measured from its messages and logged against the prediction."""
+        from painter.studio import events, planning
+
+        path = tmp_path / "calibration.jsonl"
+        monkeypatch.setattr(planning, "_calibration_path", lambda: path)
+        monkeypatch.setitem(planning._plans, "p", planner.plan(hd(), TestPlan.SETTINGS, {"host": 256 * GB}, "cpu"))
+        planning.on_message(None, events.PROMPT_STARTED, {"prompt_id": "p"})
+        planning.on_message(None, "executing", {"node": "208", "prompt_id": "p"})
+        planning.on_message(None, "executing", {"node": "208", "prompt_id": "other"})
+        planning.on_message(None, "execution_success", {"prompt_id": "p"})
+        planning.on_message(None, "executing", {"node": None, "prompt_id": "p"})
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [r["prompt_id"] for r in records] == ["p"]
+        assert records[0]["actual"]["device"] == 0 and records[0]["actual"]["host"] >= 0
+        assert "p" not in planning._plans and planning._running["prompt_id"] is None
+
+    def test_prompt_without_client_id_is_recorded(self, tmp_path: Path, monkeypatch):
+        """Test that a prompt Studio sends no progress messages for is measured from the queue events."""
+        from painter.studio import events, planning
+
+        path = tmp_path / "calibration.jsonl"
+        monkeypatch.setattr(planning, "_calibration_path", lambda: path)
+        monkeypatch.setitem(planning._plans, "p", planner.plan(hd(), TestPlan.SETTINGS, {"host": 256 * GB}, "cpu"))
+        planning.on_message(None, events.PROMPT_STARTED, {"prompt_id": "p"})
+        planning.on_message(None, events.PROMPT_FINISHED, {"prompt_id": "p", "status": "success", "outputs": {}})
+        assert [json.loads(line)["prompt_id"] for line in path.read_text().splitlines()] == ["p"]
+        assert planning._plans == {} and planning._running["prompt_id"] is None
+
+    def test_planned_when_taken_off_the_queue(self, monkeypatch):
+        """Test that a prompt is planned as the executor takes it, not while it waits in the queue."""
+        from painter.studio import events, planning
+
+        free = {"host": 256 * GB}
+        monkeypatch.setattr(planning, "_plans", {})
+        monkeypatch.setattr(planning, "plan_queued",
+                            lambda prompt_id, prompt: planner.plan(hd(), TestPlan.SETTINGS, dict(free), "cpu"))
+        queue = types.SimpleNamespace(items=[], currently_running={})
+        queue.put = queue.items.append
+        queue.get = lambda timeout=None: (queue.items.pop(0), 0)
+        events.prepare_taken(queue, planning.prepare_taken)
+        queue.put((0, "p", {}, {"painter_plan": True}, []))
+        # Memory the previous prompt held while this one waited is free again when it is taken
+        assert planning._plans == {}
+        free["host"] = 512 * GB
+        queue.get()
+        assert planning._plans["p"].available == {"host": 512 * GB}
+
+    def test_only_requested_prompts_are_planned(self, monkeypatch):
+        """Test the extra_data flag and the PAINTER_AUTOPLAN override."""
+        from painter.studio import planning
+
+        monkeypatch.delenv("PAINTER_AUTOPLAN", raising=False)
+        assert not planning._wants_plan({}) and planning._wants_plan({"painter_plan": True})
+        monkeypatch.setenv("PAINTER_AUTOPLAN", "1")
+        assert planning._wants_plan(None)
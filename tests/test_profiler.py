@@ -0,0 +1,213 @@
+"""
+Tests for the per-node profiler and its Studio hook.
+"""
+import json
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from painter import profiler
+from painter.executor import execute
+from painter.profiler import Profiler, span
+from painter.studio import profiling
+
+
+class Echo:
+    FUNCTION = "run"
+
+    def run(self, value):
+        return (value,)
+
+
+class Show:
+    FUNCTION = "run"
+    OUTPUT_NODE = True
+
+    def run(self, value):
+        return {"ui": {"text": [str(value)]}, "result": ()}
+
+
+@pytest.mark.unit
+class TestProfiler:
+    """Test span recording and export."""
+
+    def test_span_is_a_no_op_when_off(self):
+        """Test that spans record nothing and share one context manager without a profiler."""
+        assert profiler.current() is None
+        assert span("a") is span("b", step=1)
+        with span("a"):
+            pass
+
+    def test_node_and_sub_spans(self):
+        """Test that a node span carries resource usage and outputs, and sub-spans nest inside it."""
+        prof = Profiler("test")
+        with profiler.activate(prof):
+            with prof.node("7", "Sampler") as record:
+                for step in range(3):
+                    with span("denoise", step=step):
+                        pass
+                record.outputs({"ui": {}, "result": ([[1, 2]], "text")})
+        assert profiler.current() is None
+
+        (node,) = prof.node_spans()
+        assert node.node_id == "7" and node.name == "Sampler"
+        assert {"cpu_ms", "rss_mb", "rss_delta_mb"} <= set(node.args)
+        assert node.args["outputs"] == [[[1, 2]], "text"]
+        steps = [s for s in prof.spans if s.name == "denoise"]
+        assert [s.args["step"] for s in steps] == [0, 1, 2]
+        assert all(node.start <= s.start <= s.end <= node.end for s in steps)
+
+    def test_describe_tensors(self):
+        """Test that arrays are reported by shape and dtype, not by value."""
+        np = pytest.importorskip("numpy")
+        described = profiler.describe((np.zeros((4, 8, 3), dtype=np.uint8), 24.0, list(range(20))))
+        assert described[0] == {"shape": [4, 8, 3], "dtype": "uint8"}
+        assert described[1] == 24.0
+        assert len(described[2]) == 9 and described[2][-1] == "... 12 more"
+
+    def test_model_forward_spans(self):
+        """Test that each forward call of a model passed to a node is a sub-span, and hooks are removed."""
+        torch = pytest.importorskip("torch")
+        model = types.SimpleNamespace(unet=torch.nn.Linear(2, 2), scheduler="ddim")
+        prof = Profiler("test")
+        with prof.node("208", "DiffuEraserSampler", {"model": model, "images": torch.zeros(1, 2)}):
+            for _ in range(4):
+                model.unet(torch.zeros(1, 2))
+        model.unet(torch.zeros(1, 2))
+        forwards = [s for s in prof.spans if s.name == "model.unet"]
+        assert len(forwards) == 4
+        assert not model.unet._forward_hooks and not model.unet._forward_pre_hooks
+
+    def test_chrome_trace_and_summary(self, tmp_path: Path):
+        """Test the exported trace events and the text summary."""
+        prof = Profiler("job")
+        with profiler.activate(prof):
+            with prof.node("1", "Load"):
+                def decode():
+                    with span("decode"):
+                        pass
+
+                worker = threading.Thread(target=decode, name="painter-decode")
+                worker.start()
+                worker.join()
+        prof.instant("cached", node="2")
+        trace_path, summary_path = prof.write(tmp_path / "profiles")
+
+        trace = json.loads(trace_path.read_text())
+        complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert {e["name"] for e in complete} == {"#1 Load", "decode"}
+        assert all(e["dur"] >= 0 and e["ts"] >= 0 for e in complete)
+        assert any(e["ph"] == "i" and e["name"] == "cached" for e in trace["traceEvents"])
+        names = [e["args"]["name"] for e in trace["traceEvents"] if e["name"] == "thread_name"]
+        assert names == [threading.current_thread().name, "painter-decode"]
+
+        text = summary_path.read_text()
+        assert "1 nodes" in text and "Load" in text and "decode" in text
+
+    def test_executor_profiles_every_node(self):
+        """Test that in-process execution records one span per executed node."""
+        prompt = {
+            "1": {"class_type": "Echo", "inputs": {"value": 2}},
+            "2": {"class_type": "Show", "inputs": {"value": ["1", 0]}},
+        }
+        prof = Profiler("graph")
+        report = execute(prompt, {"Echo": Echo, "Show": Show}, profiler=prof)
+        assert [s.node_id for s in prof.node_spans()] == report.order == ["1", "2"]
+        assert prof.node_spans()[0].args["outputs"] == [2]
+        assert profiler.current() is None
+
+
+@pytest.mark.unit
+class TestStudioHook:
+    """Test per-prompt profiling driven by the executor's progress messages."""
+
+    @pytest.fixture
+    def studio(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sys.modules, "nodes",
+                            types.SimpleNamespace(NODE_CLASS_MAPPINGS={"Echo": Echo}))
+        monkeypatch.setitem(sys.modules, "folder_paths",
+                            types.SimpleNamespace(get_output_directory=lambda: str(tmp_path)))
+        monkeypatch.setattr(Echo, "run", Echo.__dict__["run"])
+        monkeypatch.delenv("PAINTER_PROFILE", raising=False)
+        queue = types.SimpleNamespace(currently_running={})
+        yield types.SimpleNamespace(prompt_queue=queue)
+        profiler._active = None
+        profiling._state.update(prompt_id=None, node=None, class_type=None, prompt={}, seen=set(), reported=False)
+
+    def run_prompt(self, server, prompt_id, extra_data):
+        server.prompt_queue.currently_running = {
+            0: (0, prompt_id, {"4": {"class_type": "Echo", "inputs": {}}}, extra_data, ["4"]),
+        }
+        profiling.on_message(server, "execution_start", {"prompt_id": prompt_id})
+        profiling.on_message(server, "execution_cached", {"nodes": ["2"], "prompt_id": prompt_id})
+        profiling.on_message(server, "executing", {"node": "4", "prompt_id": prompt_id})
+        result = Echo().run(value=3)
+        profiling.on_message(server, "execution_success", {"prompt_id": prompt_id})
+        return result
+
+    def test_profiles_only_requested_prompts(self, studio, tmp_path):
+        """Test that a flagged prompt is traced per node and an unflagged one is not."""
+        assert self.run_prompt(studio, "plain", {}) == (3,)
+        assert not (tmp_path / profiling.SUBFOLDER).exists()
+
+        assert self.run_prompt(studio, "abc", {"painter_profile": True}) == (3,)
+        trace = json.loads((tmp_path / profiling.SUBFOLDER / "abc.json").read_text())
+        (node,) = [e for e in trace["traceEvents"] if e.get("cat") == "node"]
+        assert node["name"] == "#4 Echo" and node["args"]["outputs"] == [3]
+        assert any(e["name"] == "cached" and e["args"]["node"] == "2" for e in trace["traceEvents"])
+        assert "Echo" in (tmp_path / profiling.SUBFOLDER / "abc.txt").read_text()
+        assert profiler.current() is None
+
+        # Once wrapped, unprofiled prompts go straight to the original function
+        assert Echo.run._painter_profiled
+        assert self.run_prompt(studio, "later", {}) == (3,)
+        assert not (tmp_path / profiling.SUBFOLDER / "later.json").exists()
+
+    def test_unexecuted_nodes_are_reported_skipped(self, studio, tmp_path, monkeypatch):
+        """Test that planned nodes that neither ran nor came from cache are listed as skipped."""
+        monkeypatch.setitem(sys.modules["nodes"].NODE_CLASS_MAPPINGS, "Show", Show)
+        prompt = {
+            "1": {"class_type": "Echo", "inputs": {"value": 1}},
+            "2": {"class_type": "Echo", "inputs": {"value": 2}},
+            "3": {"class_type": "Echo", "inputs": {"value": 3}},
+            "4": {"class_type": "Show", "inputs": {"a": ["1", 0], "b": ["2", 0], "c": ["3", 0]}},
+        }
+        studio.prompt_queue.currently_running = {0: (0, "lazy", prompt, {"painter_profile": True}, ["4"])}
+        for event, data in (("execution_start", {}), ("execution_cached", {"nodes": ["1"]}),
+                            ("executing", {"node": "2"}), ("executing", {"node": "4"}),
+                            ("execution_success", {})):
+            profiling.on_message(studio, event, dict(data, prompt_id="lazy"))
+
+        trace = json.loads((tmp_path / profiling.SUBFOLDER / "lazy.json").read_text())
+        skipped = [e["args"]["node"] for e in trace["traceEvents"] if e["name"] == "skipped"]
+        assert skipped == ["3"]
+        assert "skipped: 3 Echo" in (tmp_path / profiling.SUBFOLDER / "lazy.txt").read_text()
+
+    def test_environment_profiles_everything(self, studio, tmp_path, monkeypatch):
+        """Test that PAINTER_PROFILE=1 profiles prompts without the extra_data flag."""
+        monkeypatch.setenv("PAINTER_PROFILE", "1")
+        self.run_prompt(studio, "env", {})
+        assert (tmp_path / profiling.SUBFOLDER / "env.json").exists()
+
+    def test_prompt_without_client_id(self, studio, tmp_path, monkeypatch):
+        """Test that a prompt Studio sends no progress messages for is profiled from the queue events."""
+        from painter.studio import events
+
+        monkeypatch.setenv("PAINTER_PROFILE", "1")
+        prompt = {"1": {"class_type": "Echo", "inputs": {"value": 1}},
+                  "2": {"class_type": "Echo", "inputs": {"value": ["1", 0]}}}
+        studio.prompt_queue.currently_running = {0: (0, "curl", prompt, {}, ["2"])}
+        profiling.on_message(studio, events.PROMPT_STARTED, {"prompt_id": "curl"})
+        Echo().run(value=1)
+        Echo().run(value=1)
+        profiling.on_message(studio, events.PROMPT_FINISHED, {"prompt_id": "curl", "status": "success", "outputs": {}})
+
+        trace = json.loads((tmp_path / profiling.SUBFOLDER / "curl.json").read_text())
+        assert [e["name"] for e in trace["traceEvents"] if e.get("cat") == "node"] == ["#1 Echo", "#2 Echo"]
+        assert not [e for e in trace["traceEvents"] if e["name"] == "skipped"]
+        assert profiler.current() is None
@@ -0,0 +1,160 @@
+"""
+Tests for the propagation-first fast path.
+"""
+from typing import Any, Dict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from painter import workflow as wf
+from painter.masks import dilate
+from painter.propagate import camera_path, easy_windows, fill_remaining, frame_shift, propagate, to_gray
+from painter.synthetic import panning_frames
+
+
+def band(height=64, width=96, rows=(40, 50), cols=(20, 70)):
+    hole = np.zeros((height, width), dtype=bool)
+    hole[rows[0]:rows[1], cols[0]:cols[1]] = True
+    return hole
+
+
+def watermarked(clip, hole):
+    marked = clip.copy()
+    marked[:, hole] = 255
+    return marked
+
+
+@pytest.mark.unit
+class TestCameraPath:
+    """Test estimating the translation between frames."""
+
+    def test_pan_is_tracked_despite_static_logo(self):
+        """Test that the pan is found exactly even though the logo does not move."""
+        hole = band()
+        clip = watermarked(np.stack(list(panning_frames(12, 96, 64, speed=(1, 3)))), hole)
+        holes = np.broadcast_to(dilate(hole, 2), (12, 64, 96))
+        positions = camera_path(to_gray(clip), holes)
+        assert np.diff(positions, axis=0).tolist() == [[-1, -3]] * 11
+
+    def test_shift_sign(self):
+        """Test that frame_shift returns the offset with a[y, x] == b[y - dy, x - dx]."""
+        (b,) = panning_frames(1, 96, 64)
+        gray = to_gray(b)
+        a = np.roll(gray, (2, -5), axis=(0, 1))
+        valid = np.ones_like(gray, dtype=bool)
+        assert frame_shift(a, gray, valid, valid) == (2, -5)
+
+
+@pytest.mark.unit
+class TestPropagate:
+    """Test filling holes from neighbouring frames and scoring coverage."""
+
+    def test_pan_fills_hole_with_true_pixels(self):
+        """Test that a panned clip's hole is filled with the hidden background, for uint8 and float frames."""
+        hole = band()
+        truth = np.stack(list(panning_frames(24, 96, 64, speed=(1, 3))))
+        holes = np.broadcast_to(hole, (24, 64, 96))
+        for clip in (watermarked(truth, hole), watermarked(truth, hole).astype(np.float32) / 255):
+            out, scores = propagate(clip, holes, camera_path(to_gray(clip), holes), reach=24)
+            middle = slice(8, 16)
+            assert (scores[middle] == 1.0).all()
+            restored = out[middle][:, hole].astype(np.float32)
+            expected = truth[middle][:, hole].astype(np.float32)
+            if clip.dtype != np.uint8:
+                expected /= 255
+            assert np.abs(restored - expected).max() < 1e-5
+            assert (out[:, ~hole] == clip[:, ~hole]).all()
+
+    def test_static_camera_has_no_coverage(self):
+        """Test that a locked-off shot cannot be propagated and every window needs diffusion."""
+        hole = band()
+        (still,) = panning_frames(1, 96, 64)
+        clip = watermarked(np.repeat(still[None], 10, axis=0), hole)
+        holes = np.broadcast_to(hole, (10, 64, 96))
+        _, scores = propagate(clip, holes, camera_path(to_gray(clip), holes))
+        assert (scores == 0).all()
+        assert easy_windows(scores, 4, 0.98) == [(0, 4, False), (4, 8, False), (8, 10, False)]
+
+    def test_mismatched_context_is_not_trusted(self):
+        """Test that a neighbour whose aligned ring differs beyond max_error is not used."""
+        hole = band()
+        clip = watermarked(np.stack(list(panning_frames(3, 96, 64, speed=(0, 4)))), hole)
+        holes = np.broadcast_to(hole, (3, 64, 96))
+        positions = np.array([[0, 0], [0, -4], [0, -8]])
+        _, trusted = propagate(clip, holes, positions, reach=1)
+        _, shuffled = propagate(clip, holes, np.array([[0, 0], [0, 9], [0, -30]]), reach=1)
+        assert trusted[1] > 0 and shuffled.max() == 0
+
+    def test_fill_remaining_grows_inwards(self):
+        """Test that leftover pixels take the surrounding values."""
+        frame = np.full((9, 9, 3), 0.5, dtype=np.float32)
+        unknown = band(9, 9, (2, 7), (2, 7))
+        frame[unknown] = 0
+        fill_remaining(frame, unknown)
+        assert np.allclose(frame, 0.5)
+
+    def test_easy_windows_use_mean_coverage(self):
+        """Test that a window passes on its mean coverage."""
+        scores = np.array([1.0, 0.97, 1.0, 1.0, 0.5, 1.0])
+        assert easy_windows(scores, 3, 0.98) == [(0, 3, True), (3, 6, False)]
+        assert easy_windows(scores, 2, 0.98) == [(0, 2, True), (2, 4, True), (4, 6, False)]
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+class TestPropagatePass:
+    """Test swapping the sampler for the propagation-first node."""
+
+    def test_sampler_is_replaced(self, workflow_json: Dict[str, Any]):
+        """Test that the sampler keeps its inputs, gains the fast-path settings and the pass is idempotent."""
+        prompt = wf.optimize(wf.compile_workflow(workflow_json), ["crop"])
+        patched = wf.optimize(prompt, ["propagate", "propagate"])
+        sampler = patched[wf.SAMPLER]
+        assert sampler["class_type"] == "PainterPropagateFirst"
+        window = prompt[wf.SAMPLER]["inputs"]["subvideo_length"]
+        assert sampler["inputs"]["window"] == sampler["inputs"]["reach"] == window
+        assert sampler["inputs"]["coverage"] == 0.98
+        for name, value in prompt[wf.SAMPLER]["inputs"].items():
+            assert sampler["inputs"][name] == value
+        assert wf.optimize(prompt, ["propagate", "dedupe"])[wf.SAMPLER]["class_type"] == "PainterPropagateFirst"
+
+    def test_stream_and_compact_are_refused(self, workflow_json: Dict[str, Any]):
+        """Test that passes which replace the sampler do not combine with it."""
+        prompt = wf.compile_workflow(workflow_json)
+        for earlier in ("stream", "compact"):
+            with pytest.raises(wf.WorkflowError):
+                wf.optimize(prompt, [earlier, "propagate"])
+
+
+@pytest.mark.unit
+def test_node_runs_sampler_only_on_hard_windows(tmp_path):
+    """Test that easy windows keep the propagated fill and only the rest reaches the sampler."""
+    torch = pytest.importorskip("torch")
+    from painter.studio.nodes import PainterPropagateFirst, outside_studio
+
+    calls = []
+
+    class Sampler:
+        FUNCTION = "process"
+
+        def process(self, model, images, fps, video_mask, **kwargs):
+            calls.append(len(images))
+            return (torch.zeros_like(images),)
+
+    hole = band()
+    # A pan for 16 frames, then a cut to a locked-off shot that propagation cannot fill
+    pan = np.stack(list(panning_frames(16, 96, 64, speed=(1, 3))))
+    still = np.repeat(np.stack(list(panning_frames(1, 96, 64, seed=1))), 8, axis=0)
+    clip = watermarked(np.concatenate([pan, still]), hole)
+    images = torch.from_numpy(clip.astype(np.float32) / 255)
+    mask = torch.from_numpy(np.repeat(hole[None, :, :, None], 3, axis=-1).astype(np.float32))
+    with outside_studio({"DiffuEraserSampler": Sampler}, tmp_path):
+        result = PainterPropagateFirst().sample(
+            None, images, 24.0, mask.expand(len(clip), -1, -1, -1), coverage=0.95, max_error=6.0, reach=16,
+            window=8, mask_dilation_iter=0, num_inference_steps=1,
+        )
+    (out,) = result["result"]
+    assert calls == [8]
+    assert (out[16:] == 0).all() and out[4:12, torch.from_numpy(hole)].max() < 1
+    assert result["ui"]["painter_propagation"][0]["propagated"] == 16
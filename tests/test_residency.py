@@ -0,0 +1,143 @@
+"""
+Tests for the model residency manager.
+"""
+from typing import Any, Dict
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("aiohttp")
+
+from painter import workflow as wf
+from painter.batch import BatchReport, JobResult
+from painter.residency import ModelResidency, estimate_bytes
+
+
+class FakeModel:
+    """Stand-in for a loaded model with a fixed size."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+
+def residency(budget: int = 100) -> ModelResidency:
+    """Manager with plenty of free memory that measures FakeModel sizes."""
+    return ModelResidency(budget, free=lambda: ("ram", 1 << 30), measure=lambda model: model.size)
+
+
+@pytest.mark.unit
+class TestModelResidency:
+    """Test loading, eviction and release under pressure."""
+
+    def test_resident_model_is_reused(self):
+        """Test that a second prompt gets the same model without loading."""
+        models = residency()
+        loads = []
+        load = lambda: loads.append(1) or FakeModel(10)  # noqa: E731
+        first, _, resident = models.get_or_load("a", load)
+        assert not resident
+        second, seconds, resident = models.get_or_load("a", load)
+        assert second is first and resident and seconds == 0.0
+        assert len(loads) == 1
+        assert models.stats()["hits"] == 1 and models.stats()["misses"] == 1
+
+    def test_lru_eviction_under_budget(self):
+        """Test that the least recently used model leaves when the budget is exceeded."""
+        models = residency(budget=100)
+        models.get_or_load("a", lambda: FakeModel(40))
+        models.get_or_load("b", lambda: FakeModel(40))
+        models.get_or_load("a", lambda: FakeModel(40))
+        models.get_or_load("c", lambda: FakeModel(40))
+        assert "b" not in models
+        assert "a" in models and "c" in models
+        assert models.stats()["resident_bytes"] == 80
+
+    def test_oversized_model_not_kept(self):
+        """Test that a model larger than the budget is returned but not kept."""
+        models = residency(budget=100)
+        models.get_or_load("a", lambda: FakeModel(40))
+        model, _, _ = models.get_or_load("big", lambda: FakeModel(500))
+        assert model.size == 500
+        assert "big" not in models and "a" in models
+
+    def test_relieve_only_under_pressure(self):
+        """Test that release is a no-op with headroom and evicts LRU-first without."""
+        # A fake 90-byte device on which each resident model takes 30 bytes
+        models = ModelResidency(100, min_free_bytes=50, measure=lambda model: model.size,
+                                free=lambda: ("cuda", 90 - 30 * len(models)))
+        models.get_or_load("a", lambda: FakeModel(30))
+        assert models.relieve() == 0 and len(models) == 1
+
+        models.get_or_load("b", lambda: FakeModel(30))
+        models.get_or_load("c", lambda: FakeModel(30))
+        assert models.under_pressure()
+        assert models.relieve() == 2
+        assert "c" in models and len(models) == 1
+        assert models.stats()["releases"] == 1
+
+    def test_estimate_bytes(self):
+        """Test that modules and nested tensors are measured once each."""
+        torch = pytest.importorskip("torch")
+        linear = torch.nn.Linear(10, 10)
+        pipeline = {"unet": linear, "alias": linear, "extra": [torch.zeros(25)]}
+        assert estimate_bytes(linear) == (100 + 10) * 4
+        assert estimate_bytes(pipeline) == (100 + 10 + 25) * 4
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_resident_pass(workflow_json: Dict[str, Any]):
+    """Test that the resident pass swaps the loader and the GPU flush only."""
+    prompt = wf.compile_workflow(workflow_json)
+    optimized = wf.optimize(prompt, ["resident"])
+    assert optimized[wf.LOADER]["class_type"] == "PainterResidentLoader"
+    assert optimized[wf.LOADER]["inputs"] == prompt[wf.LOADER]["inputs"]
+    assert optimized[wf.CLEAN_GPU]["class_type"] == "PainterReleaseModels"
+    assert optimized[wf.CLEAN_GPU]["inputs"] == prompt[wf.CLEAN_GPU]["inputs"]
+    assert wf.optimize(optimized, ["resident"]) == optimized
+
+
+@pytest.mark.unit
+def test_resident_loader_node(monkeypatch):
+    """Test that the node loads once across prompts and reports load time."""
+    pytest.importorskip("torch")
+    from painter.studio import nodes
+
+    loads = []
+
+    class FakeLoader:
+        FUNCTION = "load"
+
+        def load(self, checkpoint, lora):
+            loads.append((checkpoint, lora))
+            return (FakeModel(10),)
+
+    models = residency()
+    monkeypatch.setattr(nodes, "_stock_node", lambda class_type: FakeLoader)
+    monkeypatch.setattr(nodes, "model_residency", lambda: models)
+
+    first = nodes.PainterResidentLoader().load(checkpoint="rv51.safetensors", lora="pcm.safetensors")
+    second = nodes.PainterResidentLoader().load(checkpoint="rv51.safetensors", lora="pcm.safetensors")
+    other = nodes.PainterResidentLoader().load(checkpoint="rv51.safetensors", lora="other.safetensors")
+    assert first["result"][0] is second["result"][0]
+    assert other["result"][0] is not first["result"][0]
+    assert len(loads) == 2
+    assert second["ui"]["painter_model"] == [{"load_seconds": 0.0, "resident": True}]
+
+    release = nodes.PainterReleaseModels().release(anything=None)
+    assert release["ui"]["painter_models"][0]["evicted"] == 0
+    assert len(models) == 2
+
+
+@pytest.mark.unit
+def test_model_load_time_in_results():
+    """Test that batch results and the summary carry model load time."""
+    loaded = JobResult("a", "p1", "success", 0.0, 1.0, 5.0,
+                       outputs={wf.LOADER: {"painter_model": [{"load_seconds": 3.5, "resident": False}]}})
+    warm = JobResult("b", "p2", "success", 0.0, 5.0, 6.0,
+                     outputs={wf.LOADER: {"painter_model": [{"load_seconds": 0.0, "resident": True}]}})
+    chunked = JobResult("c", None, "success", 0.0, outputs={"windows": [warm.to_dict(), loaded.to_dict()]})
+    assert loaded.to_dict()["model_load_time"] == 3.5
+    assert chunked.model_load_time == 3.5
+    assert JobResult("d", None, "error", 0.0).model_load_time is None
+    assert "model load 7.0s" in BatchReport([loaded, warm, chunked], wall_time=10.0).summary()
@@ -0,0 +1,228 @@
+"""
+Tests for deterministic seeds and the content-addressed result cache.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from painter import workflow as wf
+from painter.results import SEED_RANGE, ResultIndex, derive_seed, job_key, make_deterministic
+
+
+def in_folder(directory: Path):
+    return lambda name: str(directory / name)
+
+
+@pytest.fixture
+def job(workflow_json: Dict[str, Any], tmp_path: Path):
+    """A compiled prompt reading clip.mp4 from ``tmp_path``, and a resolver for it."""
+    prompt = wf.apply_job(wf.compile_workflow(workflow_json), {"video": "clip.mp4", "output_prefix": "first"})
+    for node in prompt.values():
+        for name in ("video", "image"):
+            if isinstance(node["inputs"].get(name), str):
+                (tmp_path / node["inputs"][name]).write_bytes(name.encode())
+    (tmp_path / "clip.mp4").write_bytes(b"frames")
+    return prompt, in_folder(tmp_path)
+
+
+@pytest.mark.unit
+class TestJobKey:
+    """Test keying prompts by content."""
+
+    def test_key_follows_file_content_not_name(self, job, tmp_path: Path):
+        """Test that renaming the video keeps the key and changing its bytes does not."""
+        prompt, resolve = job
+        key = job_key(prompt, resolve)
+        (tmp_path / "copy.mp4").write_bytes(b"frames")
+        renamed = wf.apply_job(prompt, {"video": "copy.mp4", "output_prefix": "second"})
+        assert job_key(renamed, resolve) == key
+        (tmp_path / "copy.mp4").write_bytes(b"other frames")
+        assert job_key(renamed, resolve) != key
+
+    def test_key_follows_settings(self, job):
+        """Test that any sampler setting changes the key and ignored inputs do not."""
+        prompt, resolve = job
+        key, unseeded = job_key(prompt, resolve), job_key(prompt, resolve, ignore=("seed",))
+        wf.set_input(prompt, wf.SAMPLER, "seed", 99)
+        assert job_key(prompt, resolve, ignore=("seed",)) == unseeded
+        wf.set_input(prompt, wf.SAMPLER, "num_inference_steps", 7)
+        assert job_key(prompt, resolve) != key
+
+    def test_missing_file_raises(self, job, tmp_path: Path):
+        """Test that a prompt whose video is gone cannot be keyed."""
+        prompt, resolve = job
+        (tmp_path / "clip.mp4").unlink()
+        with pytest.raises(OSError):
+            job_key(prompt, resolve)
+
+
+@pytest.mark.unit
+class TestDeterministicSeed:
+    """Test deriving the sampler seed from the job."""
+
+    def test_seed_is_stable_and_in_range(self):
+        """Test that a key always maps to the same seed below 2**32."""
+        key = "f" * 64
+        assert derive_seed(key) == derive_seed(key) < SEED_RANGE
+
+    def test_seed_replaces_client_seed(self, job):
+        """Test that prompts differing only in seed end up with the same seed and key."""
+        prompt, resolve = job
+        other = json.loads(json.dumps(prompt))
+        wf.set_input(other, wf.SAMPLER, "seed", 12345)
+        seed = make_deterministic(prompt, resolve)
+        assert make_deterministic(other, resolve) == seed
+        assert prompt[wf.SAMPLER]["inputs"]["seed"] == other[wf.SAMPLER]["inputs"]["seed"] == seed
+        assert job_key(prompt, resolve) == job_key(other, resolve)
+
+    def test_streamed_prompt_seeds_combine(self, job):
+        """Test that after the stream pass the seed goes to the node that samples."""
+        prompt, resolve = job
+        streamed = wf.optimize(prompt, ["stream"])
+        seed = make_deterministic(streamed, resolve)
+        assert streamed[wf.VIDEO_COMBINE]["inputs"]["seed"] == seed
+
+
+@pytest.mark.unit
+class TestResultIndex:
+    """Test storing output entries by job key."""
+
+    def test_put_and_get(self, tmp_path: Path):
+        """Test that an entry is returned while its video exists and dropped once it is deleted."""
+        video = tmp_path / "out_00001.mp4"
+        video.write_bytes(b"video")
+        index = ResultIndex(tmp_path / "index")
+        entry = {"filename": video.name, "subfolder": "", "type": "output", "fullpath": str(video)}
+        index.put("abc", entry)
+        assert index.get("abc") == entry and index.get("def") is None
+        video.unlink()
+        assert index.get("abc") is None
+        assert not (tmp_path / "index" / "abc.json").exists()
+
+    def test_entry_needs_fullpath(self, tmp_path: Path):
+        """Test that an entry without a path is refused."""
+        with pytest.raises(ValueError):
+            ResultIndex(tmp_path).put("abc", {"filename": "out.mp4"})
+
+
+@pytest.mark.unit
+class TestStudioHook:
+    """Test seeding, caching and replaying queued prompts."""
+
+    @pytest.fixture
+    def studio(self, job, tmp_path: Path, monkeypatch):
+        from painter.studio import nodes, results
+
+        prompt, resolve = job
+        monkeypatch.setattr(nodes, "_input_path", resolve)
+        monkeypatch.setattr(results, "_output_dir", lambda: tmp_path / "output")
+        monkeypatch.setattr(results, "_pending", {})
+        monkeypatch.setattr(results, "_outputs", {})
+        return results, prompt, resolve
+
+    def test_miss_then_hit(self, studio, tmp_path: Path):
+        """Test that a finished prompt's output is recorded and the next identical prompt replays it."""
+        results, prompt, resolve = studio
+        first = json.loads(json.dumps(prompt))
+        key = results.prepare_queued("one", first)
+        assert first[wf.SAMPLER]["inputs"]["seed"] == derive_seed(job_key(prompt, resolve, ("seed",)))
+        assert results._pending == {"one": key}
+
+        video = tmp_path / "output" / "first_00001.mp4"
+        video.parent.mkdir()
+        video.write_bytes(b"video")
+        output = {"gifs": [{"filename": video.name, "subfolder": "", "type": "output", "frames": 10}]}
+        results.on_message(None, "executed", {"prompt_id": "one", "node": wf.VIDEO_COMBINE, "output": output})
+        assert results._pending == {"one": key} and results.result_index().get(key) is None
+        results.on_message(None, "execution_success", {"prompt_id": "one"})
+        assert results._pending == {} and results._outputs == {}
+
+        second = json.loads(json.dumps(prompt))
+        assert results.prepare_queued("two", second) == key
+        assert list(second) == [wf.VIDEO_COMBINE]
+        assert second[wf.VIDEO_COMBINE]["class_type"] == "PainterCachedResult"
+        assert "two" not in results._pending
+
+        from painter.studio.nodes import PainterCachedResult
+
+        replay = PainterCachedResult().report(**second[wf.VIDEO_COMBINE]["inputs"])
+        assert replay["result"] == (str(video),)
+        assert replay["ui"]["gifs"][0]["cached"] and replay["ui"]["gifs"][0]["frames"] == 10
+
+    def test_failed_prompt_is_not_recorded(self, studio, tmp_path: Path):
+        """Test that a prompt that errors or is interrupted after VideoCombine ran leaves nothing in the index."""
+        from painter.studio import events
+
+        results, prompt, _ = studio
+        (tmp_path / "output").mkdir()
+        (tmp_path / "output" / "first_00001.mp4").write_bytes(b"video")
+        output = {"gifs": [{"filename": "first_00001.mp4", "subfolder": "", "type": "output"}]}
+        key = results.prepare_queued("one", json.loads(json.dumps(prompt)))
+        results.on_message(None, "execution_error", {"prompt_id": "one"})
+        results.prepare_queued("two", json.loads(json.dumps(prompt)))
+        results.on_message(None, "executed", {"prompt_id": "two", "node": wf.VIDEO_COMBINE, "output": output})
+        results.on_message(None, events.PROMPT_FINISHED, {"prompt_id": "two", "status": "interrupted",
+                                                          "outputs": {wf.VIDEO_COMBINE: output}})
+        assert results._pending == {} and results._outputs == {}
+        assert results.result_index().get(key) is None
+
+    def test_prompt_without_client_id_is_recorded(self, studio, tmp_path: Path):
+        """Test that a prompt Studio sends no progress for is recorded from its history outputs."""
+        from painter.studio import events
+
+        results, prompt, _ = studio
+        (tmp_path / "output").mkdir()
+        (tmp_path / "output" / "first_00001.mp4").write_bytes(b"video")
+        output = {"gifs": [{"filename": "first_00001.mp4", "subfolder": "", "type": "output"}]}
+        key = results.prepare_queued("one", prompt)
+        results.on_message(None, events.PROMPT_FINISHED, {"prompt_id": "one", "status": "success",
+                                                          "outputs": {wf.VIDEO_COMBINE: output}})
+        assert results.result_index().get(key)["filename"] == "first_00001.mp4"
+
+    def test_cached_queue_item(self, studio, tmp_path: Path, monkeypatch):
+        """Test that a queue item replayed from the cache only asks Studio to execute VideoCombine."""
+        from painter.studio import events
+
+        results, prompt, _ = studio
+        monkeypatch.setenv("PAINTER_DETERMINISTIC", "1")
+        (tmp_path / "output").mkdir()
+        (tmp_path / "output" / "first_00001.mp4").write_bytes(b"video")
+        key = results.prepare_queued("zero", json.loads(json.dumps(prompt)))
+        results.result_index().put(key, {"filename": "first_00001.mp4", "subfolder": "", "type": "output",
+                                         "fullpath": str(tmp_path / "output" / "first_00001.mp4")})
+
+        class Queue:
+            def __init__(self):
+                self.items, self.currently_running = [], {}
+
+            def put(self, item):
+                self.items.append(item)
+
+            def get(self, timeout=None):
+                # Studio keeps its own copy of the item it hands the executor
+                self.currently_running[0] = json.loads(json.dumps(self.items[0]))
+                return self.items.pop(0), 0
+
+        queue = Queue()
+        events.prepare_taken(queue, results.prepare_taken)
+        queue.put((1, "one", json.loads(json.dumps(prompt)), {}, [wf.CLEAN_GPU, wf.VIDEO_COMBINE]))
+        # Nothing is hashed while the prompt is only queued
+        assert queue.items[0][2][wf.SAMPLER]["inputs"]["seed"] == prompt[wf.SAMPLER]["inputs"]["seed"]
+        (_, _, queued, _, to_execute), item_id = queue.get()
+        assert list(queued) == [wf.VIDEO_COMBINE] and to_execute == [wf.VIDEO_COMBINE]
+        assert all(node in queued for node in to_execute)
+        assert list(queue.currently_running[item_id][2]) == [wf.VIDEO_COMBINE]
+
+    def test_opt_in(self, monkeypatch):
+        """Test that prompts are keyed only when asked to, per prompt or server-wide."""
+        from painter.studio.results import _wants_determinism
+
+        monkeypatch.delenv("PAINTER_DETERMINISTIC", raising=False)
+        assert not _wants_determinism({}) and not _wants_determinism(None)
+        assert _wants_determinism({"painter_deterministic": True})
+        monkeypatch.setenv("PAINTER_DETERMINISTIC", "1")
+        assert _wants_determinism({})
@@ -40,10 +40,12 @@ class TestRunPodStartScript:
         assert "set -e" in content, "runpod-start.sh should have 'set -e'"
 
     def test_runpod_script_clones_studio(self, runpod_script: Path):
-        """Test that script clones Hanzo Studio."""
+        """Test that script clones Hanzo Studio through the bootstrap."""
+        from painter.bootstrap import GIT_BASE, STUDIO_REPO
+
         content = runpod_script.read_text()
-        assert "git clone" in content, "Should clone repository"
-        assert "hanzoai/studio" in content, "Should clone hanzoai/studio"
+        assert "painter bootstrap" in content, "Should set up Studio with the bootstrap"
+        assert f"{GIT_BASE}/{STUDIO_REPO}" == "https://github.com/hanzoai/studio", "Should clone hanzoai/studio"
 
     def test_runpod_script_installs_nodes(self, runpod_script: Path):
         """Test that script installs custom nodes."""
@@ -52,10 +54,12 @@ class TestRunPodStartScript:
             "Should install custom nodes"
 
     def test_runpod_script_downloads_models(self, runpod_script: Path):
-        """Test that script downloads models."""
+        """Test that script downloads the SAM2 models through the model manifest."""
+        from painter.models import MANIFEST, load_manifest
+
         content = runpod_script.read_text()
-        assert "sam2" in content.lower(), "Should download SAM2 models"
-        assert "wget" in content or "curl" in content, "Should download files"
+        assert "painter models" in content and "models.json" in content, "Should download the manifest's models"
+        assert any(spec.path.startswith("sam2/") for spec in load_manifest(MANIFEST)), "Should download SAM2 models"
 
     def test_runpod_script_starts_server(self, runpod_script: Path):
         """Test that script starts the server."""
@@ -149,6 +153,14 @@ class TestDockerfile:
         content = dockerfile.read_text()
         assert "HEALTHCHECK" in content, "Should have health check"
 
+    def test_dockerfile_healthcheck_waits_for_warmup(self, dockerfile: Path):
+        """Test that the health check probes readiness after a boot-time warm-up."""
+        content = dockerfile.read_text()
+        healthcheck = content[content.index("HEALTHCHECK"):]
+        assert "/ready" in healthcheck.splitlines()[1], "Health check should probe /ready"
+        assert "PAINTER_WARMUP=1" in content, "Should warm up on boot"
+        assert "inpainting-workflow.json" in content, "Warm-up needs the workflow in the image"
+
     def test_dockerfile_sets_workdir(self, dockerfile: Path):
         """Test that Dockerfile sets working directory."""
         content = dockerfile.read_text()
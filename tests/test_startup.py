@@ -0,0 +1,210 @@
+"""
+Tests for the startup import profiler and lazy custom node registration.
+"""
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from painter import startup
+from painter.studio import lazy
+
+HEAVY = '''
+import time
+
+time.sleep(0.2)
+'''
+
+PACK = '''
+from pathlib import Path
+
+import heavydep  # noqa: F401
+
+with open(Path(__file__).parent / "imports.log", "a") as f:
+    f.write("imported\\n")
+
+WEB_DIRECTORY = "./js"
+
+
+class Blur:
+    RETURN_TYPES = ("IMAGE",)
+    RETURN_NAMES = ("image",)
+    FUNCTION = "blur"
+    CATEGORY = "heavy"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"image": ("IMAGE",), "radius": ("INT", {"default": 3, "min": 0})}}
+
+    def blur(self, image, radius):
+        return (f"{image} blurred by {radius}",)
+
+
+NODE_CLASS_MAPPINGS = {"Blur": Blur}
+NODE_DISPLAY_NAME_MAPPINGS = {"Blur": "Blur (Heavy)"}
+'''
+
+LIGHT = '''
+class Noop:
+    RETURN_TYPES = ()
+    OUTPUT_NODE = True
+    FUNCTION = "run"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {}}
+
+    def run(self):
+        return ()
+
+
+NODE_CLASS_MAPPINGS = {"Noop": Noop}
+'''
+
+
+@pytest.fixture
+def studio(tmp_path: Path):
+    """A Studio checkout with a core, a slow pack, a light one, a broken one and a disabled one."""
+    (tmp_path / "folder_paths.py").write_text("")
+    (tmp_path / "nodes.py").write_text("NODE_CLASS_MAPPINGS = {}\n")
+    (tmp_path / "heavydep.py").write_text(HEAVY)
+    custom = tmp_path / "custom_nodes"
+    (custom / "Heavy" / "js").mkdir(parents=True)
+    (custom / "Heavy" / "__init__.py").write_text(PACK)
+    (custom / "Light.py").write_text(LIGHT)
+    (custom / "Broken").mkdir()
+    (custom / "Broken" / "__init__.py").write_text("raise ImportError('no cv2')\n")
+    (custom / "Off.disabled").mkdir()
+    (custom / "Off.disabled" / "__init__.py").write_text("")
+    (custom / "__pycache__").mkdir()
+    sys.path.insert(0, str(tmp_path))
+    yield tmp_path
+    sys.path.remove(str(tmp_path))
+    for name in [name for name in sys.modules if name.startswith(str(tmp_path)) or name in ("heavydep", "Light")]:
+        del sys.modules[name]
+
+
+def fake_nodes() -> types.SimpleNamespace:
+    """Studio's ``nodes`` module with only the registries."""
+    return types.SimpleNamespace(NODE_CLASS_MAPPINGS={}, NODE_DISPLAY_NAME_MAPPINGS={}, EXTENSION_WEB_DIRS={})
+
+
+def imports(studio: Path) -> int:
+    log = studio / "custom_nodes" / "Heavy" / "imports.log"
+    return len(log.read_text().splitlines()) if log.exists() else 0
+
+
+@pytest.mark.unit
+class TestProfiler:
+    """Test finding packs and attributing import time to them."""
+
+    def test_node_packs(self, studio: Path):
+        """Test that packages and modules are found and disabled or hidden entries are not."""
+        packs = startup.node_packs(studio / "custom_nodes")
+        assert [startup.pack_name(pack) for pack in packs] == ["Broken", "Heavy", "Light"]
+
+    def test_parse_importtime(self):
+        """Test that each top-level package is charged its outermost import only."""
+        lines = [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |       transformers.utils",
+            "import time:       200 |        300 |     transformers.models",
+            "import time:       500 |        800 |   transformers",
+            "import time:       400 |        400 |   cv2",
+            "import time:        50 |       1250 | Heavy.nodes",
+            "import time:       100 |        100 | cv2.data",
+        ]
+        assert startup.parse_importtime(lines, own=["Heavy"]) == {"transformers": 0.0008, "cv2": 0.0005}
+
+    @pytest.mark.slow
+    def test_profile_startup(self, studio: Path):
+        """Test that a slow dependency is charged to the pack importing it and failures are reported."""
+        pytest.importorskip("psutil")
+        report = startup.profile_startup(studio)
+        profiles = {profile.name: profile for profile in report.packs}
+        assert set(profiles) == {"Broken", "Heavy", "Light"}
+        assert profiles["Heavy"].seconds >= 0.2 and profiles["Heavy"].nodes == 1
+        assert next(iter(profiles["Heavy"].dependencies)) == "heavydep"
+        assert profiles["Light"].seconds < profiles["Heavy"].seconds
+        assert "no cv2" in profiles["Broken"].error
+        text = startup.format_startup_report(report)
+        assert "heavydep" in text and "(Studio core)" in text
+
+
+@pytest.mark.unit
+class TestLazyPacks:
+    """Test registering packs from the node cache and importing them on first use."""
+
+    def register(self, studio: Path, cache: Path) -> lazy.LazyPacks:
+        packs = lazy.LazyPacks(fake_nodes(), [studio / "custom_nodes"], startup.NodeCache(cache), skip=["Broken"])
+        packs.register()
+        return packs
+
+    def test_first_boot_imports_and_records(self, studio: Path, tmp_path: Path):
+        """Test that packs without a cache entry are imported at boot and recorded."""
+        cache = tmp_path / "nodes.json"
+        packs = self.register(studio, cache)
+        assert imports(studio) == 1
+        assert not getattr(packs.nodes.NODE_CLASS_MAPPINGS["Blur"], "PAINTER_LAZY", False)
+        assert not packs.pending
+        entries = json.loads(cache.read_text())
+        entry = entries[str((studio / "custom_nodes" / "Heavy").resolve())]
+        assert entry["nodes"]["Blur"]["RETURN_TYPES"] == ["IMAGE"]
+        assert entry["display_names"] == {"Blur": "Blur (Heavy)"}
+
+    def test_second_boot_is_lazy(self, studio: Path, tmp_path: Path):
+        """Test that cached packs are registered as stand-ins without being imported."""
+        cache = tmp_path / "nodes.json"
+        self.register(studio, cache)
+        packs = self.register(studio, cache)
+        assert imports(studio) == 1
+        blur = packs.nodes.NODE_CLASS_MAPPINGS["Blur"]
+        assert blur.PAINTER_LAZY and blur.RETURN_TYPES == ("IMAGE",) and blur.CATEGORY == "heavy"
+        assert blur.INPUT_TYPES()["required"]["radius"] == ["INT", {"default": 3, "min": 0}]
+        assert blur.RELATIVE_PYTHON_MODULE == "custom_nodes.Heavy"
+        assert packs.nodes.NODE_DISPLAY_NAME_MAPPINGS["Blur"] == "Blur (Heavy)"
+        assert packs.nodes.EXTENSION_WEB_DIRS["Heavy"] == str((studio / "custom_nodes" / "Heavy" / "js").resolve())
+        assert packs.pending == {"Blur": "Heavy", "Noop": "Light"}
+
+    def test_prompt_imports_only_its_packs(self, studio: Path, tmp_path: Path):
+        """Test that submitting a prompt swaps in the real classes of the packs it uses."""
+        cache = tmp_path / "nodes.json"
+        self.register(studio, cache)
+        packs = self.register(studio, cache)
+        data = {"prompt": {"1": {"class_type": "Blur", "inputs": {}}, "2": {"class_type": "LoadImage"}}}
+        assert packs.on_prompt(data) is data
+        assert imports(studio) == 2
+        assert not getattr(packs.nodes.NODE_CLASS_MAPPINGS["Blur"], "PAINTER_LAZY", False)
+        assert getattr(packs.nodes.NODE_CLASS_MAPPINGS["Noop"], "PAINTER_LAZY", False)
+        packs.on_prompt(data)
+        assert imports(studio) == 2
+
+    def test_stand_in_runs_real_node(self, studio: Path, tmp_path: Path):
+        """Test that executing a stand-in imports its pack and runs the real node."""
+        cache = tmp_path / "nodes.json"
+        self.register(studio, cache)
+        packs = self.register(studio, cache)
+        blur = packs.nodes.NODE_CLASS_MAPPINGS["Blur"]
+        assert getattr(blur(), blur.FUNCTION)(image="frame", radius=2) == ("frame blurred by 2",)
+        assert "Blur" not in packs.pending
+
+    def test_changed_pack_is_reimported(self, studio: Path, tmp_path: Path):
+        """Test that a pack whose files changed is imported at boot instead of served from the cache."""
+        cache = tmp_path / "nodes.json"
+        self.register(studio, cache)
+        (studio / "custom_nodes" / "Heavy" / "__init__.py").write_text(PACK.replace('"heavy"', '"heavier"'))
+        packs = self.register(studio, cache)
+        assert imports(studio) == 2
+        assert packs.nodes.NODE_CLASS_MAPPINGS["Blur"].CATEGORY == "heavier"
+        assert "Blur" not in packs.pending
+
+
+@pytest.mark.unit
+def test_lazy_mode_is_opt_in(monkeypatch):
+    """Test that nothing is registered lazily without PAINTER_LAZY_NODES."""
+    monkeypatch.delenv(lazy.ENV, raising=False)
+    assert not lazy.install()
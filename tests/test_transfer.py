@@ -0,0 +1,167 @@
+"""
+Tests for resumable uploads and ranged downloads.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from painter.transfer import free_name, parse_content_range
+
+
+def transfer_app(tmp_path: Path):
+    from aiohttp import web
+
+    from painter.transfer import Transfers
+
+    (tmp_path / "input").mkdir(exist_ok=True)
+    (tmp_path / "output").mkdir(exist_ok=True)
+    app = web.Application()
+    Transfers(tmp_path / "input", tmp_path / "output").add_routes(app.router)
+    return app
+
+
+@pytest.mark.unit
+class TestHelpers:
+    """Test parsing chunk ranges and naming uploads."""
+
+    def test_content_range(self):
+        """Test that a range is read as a half-open interval and a missing one covers the whole body."""
+        assert parse_content_range("bytes 0-99/300", 100) == (0, 100, 300)
+        assert parse_content_range(None, 42) == (0, 42, 42)
+        for bad in ("bytes 5-2/10", "bytes 0-10/10", "bytes */10"):
+            with pytest.raises(ValueError):
+                parse_content_range(bad, None)
+
+    def test_free_name(self, tmp_path: Path):
+        """Test that taken names get the first free numbered suffix."""
+        assert free_name(tmp_path, "clip.mp4") == tmp_path / "clip.mp4"
+        (tmp_path / "clip.mp4").touch()
+        (tmp_path / "clip (1).mp4").touch()
+        assert free_name(tmp_path, "clip.mp4") == tmp_path / "clip (2).mp4"
+
+
+@pytest.mark.integration
+class TestUpload:
+    """Test chunked uploads into the input folder."""
+
+    def test_resumes_after_interruption(self, tmp_path: Path, serve_app):
+        """Test that an upload continues from the bytes the server kept and lands verified."""
+        from painter.client import StudioClient
+
+        source = tmp_path / "clip.mp4"
+        source.write_bytes(os.urandom(300_000))
+        digest = hashlib.sha256(source.read_bytes()).hexdigest()
+
+        async def scenario(url):
+            async with aiohttp.ClientSession() as session:
+                # A first attempt that only got its first chunk across
+                head = source.read_bytes()[:100_000]
+                async with session.put(f"{url}/painter/upload/{digest}", params={"filename": "clip.mp4"},
+                                       data=head, headers={"Content-Range": "bytes 0-99999/300000"}) as resp:
+                    assert resp.status == 200 and (await resp.json())["offset"] == 100_000
+                async with session.put(f"{url}/painter/upload/{digest}", params={"filename": "clip.mp4"},
+                                       data=head, headers={"Content-Range": "bytes 0-99999/300000"}) as resp:
+                    assert resp.status == 409 and (await resp.json())["offset"] == 100_000
+            async with StudioClient(url) as client:
+                return await client.upload(source, chunk_size=64 << 10)
+
+        stored = serve_app(transfer_app(tmp_path), scenario)
+        assert stored == {"name": "clip.mp4", "subfolder": "", "type": "input", "sha256": digest, "size": 300_000}
+        assert (tmp_path / "input" / "clip.mp4").read_bytes() == source.read_bytes()
+        assert not list((tmp_path / "input" / ".painter-uploads").glob("*.part"))
+
+    def test_names_and_checksums(self, tmp_path: Path, serve_app):
+        """Test that same content keeps its name, new content gets a suffix and a bad digest is refused."""
+        from painter.client import StudioClient
+
+        first, second, empty = tmp_path / "a.mp4", tmp_path / "b.mp4", tmp_path / "empty.mp4"
+        first.write_bytes(b"first")
+        second.write_bytes(b"second")
+        empty.touch()
+
+        async def scenario(url):
+            async with StudioClient(url) as client:
+                names = [(await client.upload(path, name="clip.mp4"))["name"] for path in (first, first, second)]
+                names.append((await client.upload(empty))["name"])
+                async with client.session.put(f"{url}/painter/upload/{'0' * 64}", params={"filename": "x.mp4"},
+                                              data=b"data") as resp:
+                    assert resp.status == 422
+                return names
+
+        assert serve_app(transfer_app(tmp_path), scenario) == ["clip.mp4", "clip.mp4", "clip (1).mp4", "empty.mp4"]
+        assert (tmp_path / "input" / "clip (1).mp4").read_bytes() == b"second"
+        assert not (tmp_path / "input" / ".painter-uploads" / f"{'0' * 64}.part").exists()
+
+    def test_finishes_complete_partial(self, tmp_path: Path, serve_app):
+        """Test that an upload whose bytes all arrived is finished with an empty chunk and its lock is dropped."""
+        from aiohttp import web
+
+        from painter.client import StudioClient
+        from painter.transfer import Transfers
+
+        source = tmp_path / "clip.mp4"
+        source.write_bytes(os.urandom(100_000))
+        digest = hashlib.sha256(source.read_bytes()).hexdigest()
+        (tmp_path / "input" / ".painter-uploads").mkdir(parents=True)
+        (tmp_path / "input" / ".painter-uploads" / f"{digest}.part").write_bytes(source.read_bytes())
+        transfers = Transfers(tmp_path / "input", None)
+        app = web.Application()
+        transfers.add_routes(app.router)
+
+        async def scenario(url):
+            async with StudioClient(url) as client:
+                return await client.upload(source, chunk_size=64 << 10)
+
+        assert serve_app(app, scenario)["size"] == 100_000
+        assert (tmp_path / "input" / "clip.mp4").read_bytes() == source.read_bytes()
+        assert transfers._locks == {} and transfers._lock_users == {}
+
+
+@pytest.mark.integration
+class TestDownload:
+    """Test serving outputs with ranges."""
+
+    def test_range_and_resume(self, tmp_path: Path, serve_app):
+        """Test that a range request gets 206 and a partial download is completed, not restarted."""
+        from painter.client import StudioClient
+
+        payload = os.urandom(200_000)
+        (tmp_path / "output" / "sub").mkdir(parents=True)
+        (tmp_path / "output" / "sub" / "out.mp4").write_bytes(payload)
+        dest = tmp_path / "out.mp4"
+        Path(str(dest) + ".part").write_bytes(payload[:50_000])
+
+        async def scenario(url):
+            async with StudioClient(url) as client:
+                params = {"filename": "out.mp4", "subfolder": "sub"}
+                async with client.session.get(f"{url}/painter/download", params=params,
+                                              headers={"Range": "bytes=10-19"}) as resp:
+                    assert resp.status == 206 and await resp.read() == payload[10:20]
+                async with client.session.get(f"{url}/painter/download",
+                                              params={"filename": "../../etc/passwd", "subfolder": "sub"}) as resp:
+                    assert resp.status == 404
+                return await client.download("out.mp4", dest, subfolder="sub")
+
+        assert serve_app(transfer_app(tmp_path), scenario) == dest
+        assert dest.read_bytes() == payload and not Path(str(dest) + ".part").exists()
+
+    def test_stale_partial_is_restarted(self, tmp_path: Path, serve_app):
+        """Test that a partial longer than the file is not taken as complete but downloaded again."""
+        from painter.client import StudioClient
+
+        payload = os.urandom(50_000)
+        (tmp_path / "output").mkdir(parents=True)
+        (tmp_path / "output" / "out.mp4").write_bytes(payload)
+        dest = tmp_path / "out.mp4"
+        Path(str(dest) + ".part").write_bytes(os.urandom(80_000))
+
+        async def scenario(url):
+            async with StudioClient(url) as client:
+                return await client.download("out.mp4", dest)
+
+        assert serve_app(transfer_app(tmp_path), scenario) == dest
+        assert dest.read_bytes() == payload
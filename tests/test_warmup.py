@@ -0,0 +1,151 @@
+"""
+Tests for the boot-time warm-up and the /ready endpoint.
+"""
+import asyncio
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from painter import workflow as wf
+from painter.warmup import PREFIX, WarmupConfig, clean_up, warmup_prompt, write_inputs
+
+
+@pytest.fixture
+def ffmpeg():
+    """Skip unless ffmpeg can encode the warm-up clip."""
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    from painter.ffmpeg import FFmpegError, ffmpeg_exe
+
+    try:
+        ffmpeg_exe()
+    except FFmpegError:
+        pytest.skip("ffmpeg not available")
+
+
+@pytest.mark.unit
+class TestWarmupConfig:
+    """Test reading the warm-up settings from the environment."""
+
+    def test_defaults(self):
+        """Test that warm-up is off and keeps the model resident by default."""
+        config = WarmupConfig.from_env({})
+        assert not config.enabled and config.passes == ["resident"]
+        assert (config.frames, config.width, config.height, config.steps) == (8, 320, 180, 2)
+
+    def test_from_env(self):
+        """Test that every variable is read and an empty pass list means the stock workflow."""
+        config = WarmupConfig.from_env({
+            "PAINTER_WARMUP": "1", "PAINTER_WARMUP_FRAMES": "4", "PAINTER_WARMUP_SIZE": "640x360",
+            "PAINTER_WARMUP_STEPS": "1", "PAINTER_WARMUP_PASSES": "fused, resident", "PAINTER_WARMUP_TIMEOUT": "30",
+        })
+        assert config.enabled and config.passes == ["fused", "resident"]
+        assert (config.frames, config.width, config.height, config.steps, config.timeout) == (4, 640, 360, 1, 30.0)
+        assert WarmupConfig.from_env({"PAINTER_WARMUP_PASSES": ""}).passes == []
+
+
+@pytest.mark.unit
+@pytest.mark.workflow
+def test_warmup_prompt(workflow_path: Path):
+    """Test that the warm-up runs the workflow with its passes on the synthetic inputs."""
+    inputs = {"video": f"{PREFIX}.mp4", "horizontal": "h.png", "vertical": "v.png"}
+    prompt = warmup_prompt(inputs, WarmupConfig(frames=4, steps=1), workflow=workflow_path)
+    assert prompt[wf.LOADER]["class_type"] == "PainterResidentLoader"
+    assert prompt[wf.LOAD_VIDEO]["inputs"]["video"] == f"{PREFIX}.mp4"
+    assert prompt[wf.FRAME_CAP]["inputs"]["value"] == 4
+    assert prompt[wf.sampler_id(prompt)]["inputs"]["num_inference_steps"] == 1
+    assert prompt[wf.VIDEO_COMBINE]["inputs"]["filename_prefix"] == f"{PREFIX}/warmup"
+    assert {prompt[node]["inputs"]["image"] for node in wf.MASK_NODES.values()} == {"h.png", "v.png"}
+
+
+@pytest.mark.unit
+def test_inputs_written_and_cleaned_up(tmp_path: Path, ffmpeg):
+    """Test that the clip has the configured size and length, and clean_up removes inputs and outputs."""
+    from painter.ffmpeg import probe
+
+    config = WarmupConfig(frames=5, width=96, height=64)
+    inputs = write_inputs(tmp_path / "input", config)
+    info = probe(str(tmp_path / "input" / inputs["video"]))
+    assert (info.width, info.height) == (96, 64)
+    assert all((tmp_path / "input" / name).is_file() for name in inputs.values())
+    (tmp_path / "output" / PREFIX).mkdir(parents=True)
+    (tmp_path / "output" / PREFIX / "warmup_00001.mp4").write_bytes(b"")
+    clean_up(tmp_path / "input", tmp_path / "output", inputs)
+    assert not any((tmp_path / "input").iterdir()) and not (tmp_path / "output" / PREFIX).exists()
+
+
+@pytest.mark.unit
+class TestReadiness:
+    """Test the warm-up state behind /ready."""
+
+    def warmup(self, tmp_path: Path, base_url: str, **config: Any):
+        from painter.studio.warmup import Warmup
+
+        return Warmup(WarmupConfig(enabled=True, frames=3, width=64, height=48, **config), base_url,
+                      tmp_path / "input", tmp_path / "output")
+
+    def run(self, serve_app, warmup, event: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Warm up against a stand-in server, reporting ``event`` once it has run the prompt."""
+        from painter.standin import StandinServer
+
+        server = StandinServer(latency=0.01)
+
+        async def scenario(url):
+            warmup.base_url = url
+            states = [warmup.status()]
+            thread = warmup.start()
+            while warmup.prompt_id not in server.history:
+                await asyncio.sleep(0.01)
+            states.append(warmup.status())
+            warmup.on_message(None, "execution_success", {"prompt_id": "another"})
+            warmup.on_message(None, event, dict(data, prompt_id=warmup.prompt_id))
+            await asyncio.get_running_loop().run_in_executor(None, thread.join, 10)
+            return states
+
+        return serve_app(server.app(), scenario)
+
+    def test_disabled_is_ready(self, tmp_path: Path):
+        """Test that without PAINTER_WARMUP there is nothing to wait for."""
+        from painter.studio.warmup import Warmup
+
+        warmup = Warmup(WarmupConfig(), "http://127.0.0.1:1", tmp_path)
+        assert warmup.start() is None
+        assert warmup.status() == {"ready": True, "state": "disabled"}
+
+    def test_ready_after_warmup(self, tmp_path: Path, serve_app, ffmpeg):
+        """Test that /ready turns 200 once the warm-up prompt succeeds, and its files are removed."""
+        warmup = self.warmup(tmp_path, "")
+        before, during = self.run(serve_app, warmup, "execution_success", {})
+        assert not before["ready"] and before["state"] == "starting"
+        assert not during["ready"] and during["state"] == "warming"
+        status = warmup.status()
+        assert status["ready"] and status["state"] == "ready" and status["seconds"] >= 0
+        assert not any((tmp_path / "input").iterdir())
+
+    def test_failed_warmup_is_not_ready(self, tmp_path: Path, serve_app, ffmpeg):
+        """Test that a warm-up whose prompt fails keeps /ready at 503 with the error."""
+        warmup = self.warmup(tmp_path, "")
+        self.run(serve_app, warmup, "execution_error", {"exception_message": "CUDA out of memory"})
+        assert warmup.status() == {"ready": False, "state": "failed", "prompt_id": warmup.prompt_id,
+                                   "error": "CUDA out of memory"}
+
+    def test_unreachable_server_times_out(self, tmp_path: Path):
+        """Test that a Studio that never answers fails the warm-up after its timeout."""
+        warmup = self.warmup(tmp_path, "http://127.0.0.1:9", timeout=0.2)
+        warmup.run()
+        assert warmup.state == "failed" and "did not answer" in warmup.error
+
+
+@pytest.mark.unit
+def test_studio_url():
+    """Test that the warm-up reaches Studio on loopback for wildcard listen addresses."""
+    from types import SimpleNamespace
+
+    from painter.studio.warmup import _base_url
+
+    assert _base_url(SimpleNamespace(listen="0.0.0.0", port=8188)) == ("http://127.0.0.1:8188", None)
+    assert _base_url(SimpleNamespace(listen="10.0.0.5,::", port=9000))[0] == "http://10.0.0.5:9000"
+    assert _base_url(SimpleNamespace(listen="::", port=8188))[0] == "http://[::1]:8188"
+    url, context = _base_url(SimpleNamespace(listen="127.0.0.1", port=8443, tls_keyfile="key.pem"))
+    assert url == "https://127.0.0.1:8443" and context is not None
@@ -108,6 +108,17 @@ def test_queue_status():
     print(f"✓ Queue status: {queue_data}")
 
 
+@pytest.mark.integration
+def test_metrics_endpoint():
+    """Verify Prometheus metrics are served by the Painter node pack."""
+    response = requests.get(f"{BASE_URL}/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "# TYPE painter_queue_pending gauge" in response.text
+    assert "painter_prompt_run_seconds" in response.text
+    print("✓ Metrics endpoint is accessible")
+
+
 @pytest.mark.integration
 def test_api_workflow_submission():
     """Test submitting a simple workflow via API."""